@@ -1,19 +1,85 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+
+from database import DB_NAME, getMotorClient
+from metrics import MetricsMiddleware, renderMetrics
+from profiling.profiler import ProfilingMiddleware
+from services.catalogService import CatalogRefreshService
+from services.eventBus import EventBus
+from services.importJobService import ImportJobService
+from services.liveIngestService import LiveIngestService
+from services.migrationService import MigrationService
+from services.revisionService import RevisionService
+from services.schemaService import SchemaCompactionService
+from services.userService import UserService
 
 from auth.router import router as authRouter
 from efficiencies.router import router as efficienciesRouter
 from upload.router import router as uploadRouter
 from table.router import router as tableRouter
 from graph.router import router as graphRouter
+from profiling.router import router as profilingRouter
+from live.router import router as liveRouter
+from events.router import router as eventsRouter
+from summaries.router import router as summariesRouter
+from timeseries.router import router as timeseriesRouter
+from pyramids.router import router as pyramidsRouter
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Creates the services once, sharing a single Motor client (and its
+    connection pool) across every request, and runs the import workers, the
+    schema compaction and the catalog refresh.
+    """
+    client = getMotorClient()
+    app.state.eventBus = EventBus()
+    app.state.revisionService = RevisionService(client[DB_NAME], app.state.eventBus)
+    app.state.userService = UserService(None, DB_NAME, client=client)
+    app.state.migrationService = MigrationService(
+        None, DB_NAME, client=client, eventBus=app.state.eventBus
+    )
+    await app.state.migrationService.ensureDataIndexes()
+    await app.state.migrationService.ensureStagingIndexes()
+    await app.state.migrationService.ensureDateIndex()
+    app.state.importJobService = ImportJobService(
+        client[DB_NAME], app.state.migrationService
+    )
+    await app.state.importJobService.start()
+    app.state.liveIngestService = LiveIngestService(
+        client[DB_NAME], app.state.migrationService
+    )
+    await app.state.liveIngestService.ensureIndexes()
+    app.state.schemaCompactionService = SchemaCompactionService(client[DB_NAME])
+    await app.state.schemaCompactionService.start()
+    app.state.catalogRefreshService = CatalogRefreshService(client[DB_NAME])
+    await app.state.catalogRefreshService.start()
+    try:
+        yield
+    finally:
+        await app.state.catalogRefreshService.stop()
+        await app.state.schemaCompactionService.stop()
+        await app.state.importJobService.stop()
+        client.close()
 
-app = FastAPI(docs_url="/docs")
+
+app = FastAPI(docs_url="/docs", lifespan=lifespan)
 
 app.include_router(authRouter)
 app.include_router(efficienciesRouter)
 app.include_router(uploadRouter)
 app.include_router(tableRouter)
 app.include_router(graphRouter)
+app.include_router(profilingRouter)
+app.include_router(liveRouter)
+app.include_router(eventsRouter)
+app.include_router(summariesRouter)
+app.include_router(timeseriesRouter)
+app.include_router(pyramidsRouter)
 
 app.add_middleware(
     CORSMiddleware,
@@ -22,6 +88,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 
 @app.get("/")
@@ -30,3 +98,14 @@ async def root():
     Basic root endpoint to confirm server is running.
     """
     return {"message": "FastAPI server is working!"}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def getMetrics():
+    """
+    Exposes request, MongoDB and hot-path metrics in the Prometheus text
+    format.
+    """
+    return PlainTextResponse(
+        renderMetrics(), media_type="text/plain; version=0.0.4"
+    )
@@ -4,26 +4,22 @@
 # Purpose: Authentication-related API endpoints.
 # -----------------------------------------------------------------------------
 
-import os
 import secrets
 
-from dotenv import load_dotenv
-from fastapi import HTTPException, APIRouter
+from fastapi import Depends, HTTPException, APIRouter
 from fastapi.responses import JSONResponse
 
 from auth.models import LoginData, UserModel, UserRequest
+from dependencies import getUserService
 from services.userService import UserService
 
 router = APIRouter()
 
-load_dotenv()
-
 
 @router.post("/login")
-async def login(req: LoginData):
-    MONGO_URI = os.getenv("CONNECTION_STRING")
-    DB_NAME = "alkalyticsDB"
-    userService = UserService(MONGO_URI, DB_NAME)
+async def login(
+    req: LoginData, userService: UserService = Depends(getUserService)
+):
     try:
         user = await userService.validateUser(req.email, req.password)
         if user:
@@ -50,17 +46,14 @@ async def login(req: LoginData):
         raise HTTPException(
             status_code=500, detail=f"Error logging in: {str(e)}"
         )
-    finally:
-        await userService.closeConnection()
 
     return response
 
 
 @router.post("/register")
-async def register(req: UserModel):
-    MONGO_URI = os.getenv("CONNECTION_STRING")
-    DB_NAME = "alkalyticsDB"
-    userService = UserService(MONGO_URI, DB_NAME)
+async def register(
+    req: UserModel, userService: UserService = Depends(getUserService)
+):
     try:
         user = await userService.createUser(req.email, req.password, req.role)
         if user:
@@ -75,20 +68,17 @@ async def register(req: UserModel):
             )
     except Exception as e:
         raise e
-    finally:
-        await userService.closeConnection()
     return response
 
 
 @router.post("/auth")
-async def getCurrentUser(request: UserRequest):
+async def getCurrentUser(
+    request: UserRequest, userService: UserService = Depends(getUserService)
+):
     sessionToken = request.token
     if not sessionToken:
         raise HTTPException(status_code=401, detail="Not authorized")
     try:
-        MONGO_URI = os.getenv("CONNECTION_STRING")
-        DB_NAME = "alkalyticsDB"
-        userService = UserService(MONGO_URI, DB_NAME)
         user = await userService.getCurrentUserAndRole(sessionToken)
         return JSONResponse(content={
             "email": user["email"],
@@ -96,19 +86,16 @@ async def getCurrentUser(request: UserRequest):
         })
     except HTTPException as e:
         raise e
-    finally:
-        await userService.closeConnection()
 
 
 @router.post("/logout")
-async def logout(request: UserRequest):
+async def logout(
+    request: UserRequest, userService: UserService = Depends(getUserService)
+):
     sessionToken = request.token
     if not sessionToken:
         raise HTTPException(status_code=401, detail="Not authorized")
     try:
-        MONGO_URI = os.getenv("CONNECTION_STRING")
-        DB_NAME = "alkalyticsDB"
-        userService = UserService(MONGO_URI, DB_NAME)
         await userService.endSession(sessionToken)
         response = JSONResponse(content={
             "status": "success",
@@ -0,0 +1,76 @@
+import json
+import os
+
+import pytest
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("regression")
+    group.addoption(
+        "--max-regression",
+        type=float,
+        default=float(os.getenv("BENCH_MAX_REGRESSION", 20)),
+        help="fail when a benchmark's median is this many percent slower than the baseline",
+    )
+    group.addoption(
+        "--baseline",
+        default=BASELINE_PATH,
+        help="JSON file of baseline medians (seconds) keyed by benchmark name",
+    )
+    group.addoption(
+        "--save-baseline",
+        action="store_true",
+        help="record this run's medians as the new baseline instead of comparing",
+    )
+
+
+@pytest.fixture(scope="session")
+def baseline(request):
+    path = request.config.getoption("--baseline")
+    medians = {}
+    if os.path.exists(path):
+        with open(path) as baselineFile:
+            medians = json.load(baselineFile)
+
+    yield medians
+
+    if request.config.getoption("--save-baseline"):
+        with open(path, "w") as baselineFile:
+            json.dump(medians, baselineFile, indent=2, sort_keys=True)
+
+
+@pytest.fixture
+def guardedBenchmark(benchmark, baseline, request):
+    """
+    Runs a function under pytest-benchmark and fails the test when its median
+    exceeds the recorded baseline by more than --max-regression percent.
+    """
+    maxRegression = request.config.getoption("--max-regression")
+    saveBaseline = request.config.getoption("--save-baseline")
+    name = request.node.name
+
+    def run(function, *args, rounds=5, setup=None, **kwargs):
+        if setup is None:
+            result = benchmark.pedantic(
+                function, args=args, kwargs=kwargs, rounds=rounds, iterations=1
+            )
+        else:
+            result = benchmark.pedantic(function, setup=setup, rounds=rounds)
+        # --benchmark-disable runs the function once without collecting stats
+        if benchmark.disabled or benchmark.stats is None:
+            return result
+        median = benchmark.stats.stats.median
+
+        if saveBaseline:
+            baseline[name] = median
+        elif name in baseline:
+            limit = baseline[name] * (1 + maxRegression / 100)
+            assert median <= limit, (
+                f"{name} regressed: median {median * 1000:.2f} ms exceeds "
+                f"baseline {baseline[name] * 1000:.2f} ms by more than {maxRegression}%"
+            )
+        return result
+
+    return run
@@ -0,0 +1,160 @@
+# -----------------------------------------------------------------------------
+# Primary author: Kate M
+# Year: 2025
+# Purpose: Microbenchmarks for the CPU hot paths of efficiency calculations and
+# data migration, with regression thresholds against a recorded baseline.
+# -----------------------------------------------------------------------------
+
+"""
+Usage (from src/backend, requires pytest-benchmark and pytest-asyncio):
+
+    # Record the medians of this machine as the baseline
+    python -m pytest benchmarks/hotPathsBench.py --save-baseline
+
+    # Fail any benchmark more than 20% slower than the baseline
+    python -m pytest benchmarks/hotPathsBench.py --max-regression 20
+
+Input sizes run from 1k rows up to BENCH_MAX_ROWS (default 100k); set
+BENCH_MAX_ROWS=1000000 for the full sweep.
+"""
+
+import asyncio
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from benchmarks.loadTest import buildDataFrame
+from efficiencies.efficiencyCalculations import (
+    computeCurrentEfficiency,
+    computeReactionEfficiency,
+    computeVoltageDropEfficiency,
+    convertCondtoConc,
+    getConverter,
+    groupData,
+)
+from services.migrationService import MigrationService
+
+SIZES = [1_000, 10_000, 100_000, 1_000_000]
+MAX_ROWS = int(os.getenv("BENCH_MAX_ROWS", 100_000))
+WIDTH = 10
+
+sizes = pytest.mark.parametrize(
+    "rows",
+    [
+        pytest.param(
+            rows,
+            marks=pytest.mark.skipif(rows > MAX_ROWS, reason="above BENCH_MAX_ROWS"),
+        )
+        for rows in SIZES
+    ],
+)
+
+
+def roundsFor(rows: int) -> int:
+    """Keeps each benchmark to a few seconds regardless of input size."""
+    return max(1, min(10, 200_000 // rows))
+
+
+@pytest.fixture(scope="module")
+def frames():
+    cache = {}
+
+    def build(rows: int) -> pd.DataFrame:
+        if rows not in cache:
+            rng = np.random.default_rng(rows)
+            cache[rows] = buildDataFrame("2024-01-01", rows, WIDTH, rng)
+        return cache[rows]
+
+    return build
+
+
+@pytest.fixture(scope="module")
+def migrationService():
+    return MigrationService("mongodb://localhost:27017", "benchmarks")
+
+
+# Efficiency calculations
+@sizes
+def test_groupData(guardedBenchmark, frames, rows):
+    data = frames(rows).to_dict("records")
+    guardedBenchmark(groupData, data, rounds=roundsFor(rows))
+
+
+@sizes
+def test_computeCurrentEfficiency(guardedBenchmark, frames, rows):
+    data = frames(rows).to_dict("records")
+    guardedBenchmark(
+        computeCurrentEfficiency, data, "HCL", 1.5, 10, rounds=roundsFor(rows)
+    )
+
+
+@sizes
+def test_computeVoltageDropEfficiency(guardedBenchmark, frames, rows):
+    data = frames(rows).to_dict("records")
+    guardedBenchmark(computeVoltageDropEfficiency, data, rounds=roundsFor(rows))
+
+
+@sizes
+def test_computeReactionEfficiency(guardedBenchmark, frames, rows):
+    data = frames(rows).to_dict("records")
+    guardedBenchmark(
+        computeReactionEfficiency, data, 1.5, 1.5, rounds=roundsFor(rows)
+    )
+
+
+@sizes
+def test_convertCondtoConc(guardedBenchmark, frames, rows):
+    conductivities = frames(rows)["C1 Cond"].tolist()
+
+    def convertAll():
+        return [convertCondtoConc(cond, "HCL") for cond in conductivities]
+
+    guardedBenchmark(convertAll, rounds=roundsFor(rows))
+
+
+@sizes
+def test_convertCondtoConcArray(guardedBenchmark, frames, rows):
+    conductivities = frames(rows)["C1 Cond"].to_numpy()
+    converter = getConverter("HCL")
+    guardedBenchmark(converter.convert, conductivities, rounds=roundsFor(rows))
+
+
+# Migration
+@sizes
+def test_cleanData(guardedBenchmark, frames, migrationService, rows):
+    df = frames(rows).copy()
+    # Sprinkle empty and all-zero rows so both filters do work
+    df.iloc[::50] = np.nan
+    df.iloc[1::50] = 0
+    guardedBenchmark(migrationService.cleanData, df, rounds=roundsFor(rows))
+
+
+@sizes
+def test_handleDuplicateColumns(guardedBenchmark, frames, migrationService, rows):
+    df = frames(rows)
+    # Repeat the sensor columns to force renaming
+    columns = list(df.columns) + [f"Sensor {i + 1}" for i in range(WIDTH)]
+    wide = pd.concat([df, df[[f"Sensor {i + 1}" for i in range(WIDTH)]]], axis=1)
+
+    def setup():
+        duplicated = wide.copy(deep=False)
+        duplicated.columns = columns
+        return (duplicated,), {}
+
+    guardedBenchmark(
+        migrationService.handleDuplicateColumns, setup=setup, rounds=roundsFor(rows)
+    )
+
+
+@sizes
+def test_linkData(guardedBenchmark, frames, migrationService, rows):
+    df = migrationService.cleanData(frames(rows))
+
+    def link():
+        return asyncio.run(migrationService.linkData(df, "#1 2024-01-01"))
+
+    guardedBenchmark(link, rounds=roundsFor(rows))
@@ -0,0 +1,410 @@
+# -----------------------------------------------------------------------------
+# Primary author: Jason T
+# Year: 2025
+# Purpose: Load-testing harness that seeds synthetic experiments and drives the
+# main API endpoints concurrently, reporting throughput and latency.
+# -----------------------------------------------------------------------------
+
+"""
+Usage (from src/backend):
+
+    # Against a local MongoDB, app served in-process. The synthetic data is
+    # seeded into its own database (--db-name, alkalyticsBench by default);
+    # --reset-db is required to drop what an earlier run left there
+    python -m benchmarks.loadTest --mongo-uri mongodb://localhost:27017 --reset-db
+
+    # Against a running server started with DB_NAME=alkalyticsBench
+    python -m benchmarks.loadTest --base-url http://localhost:8000 --reset-db
+
+    # Fully in-process, with mongomock and mongomock-motor as the database
+    python -m benchmarks.loadTest --in-process-db
+
+    # Compare a run against an earlier result file
+    python -m benchmarks.loadTest --in-process-db --compare results-main.json
+
+Results are written as JSON (see --output) so runs can be compared across
+commits.
+"""
+
+import argparse
+import asyncio
+import base64
+import contextlib
+import io
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+BENCH_DB_NAME = "alkalyticsBench"
+APP_DB_NAME = "alkalyticsDB"
+SCENARIOS = ("data", "filterCollectionData", "calculate-efficiencies", "upload")
+SENSOR_COLUMNS = ("I Cmm", "U Stac", "U Cmm", "C1 Cond", "C2 Cond")
+EFFICIENCIES = [
+    "Current Efficiency (HCl)",
+    "Current Efficiency (NaOH)",
+    "Voltage Drop Efficiency",
+]
+
+
+# Synthetic data
+def experimentDate(index: int) -> str:
+    return (datetime(2024, 1, 1) + timedelta(days=index)).strftime("%Y-%m-%d")
+
+
+def buildExperiments(numExperiments: int) -> list[dict]:
+    """Builds one experiment per day so data sheets link unambiguously."""
+    experiments = []
+    for i in range(numExperiments):
+        date = experimentDate(i)
+        experiments.append({
+            "experimentId": f"#{i + 1} {date}",
+            "#": i + 1,
+            "Date": date,
+            "# of Stacks": 10,
+            "Final volume (L) HCL": 1.5,
+            "Final volume (L) NaOH": 1.5,
+        })
+    return experiments
+
+
+def buildDataFrame(date: str, rows: int, width: int, rng) -> pd.DataFrame:
+    """Builds a data sheet with one sample per second and `width` extra columns."""
+    start = datetime.strptime(date, "%Y-%m-%d") + timedelta(hours=9)
+    times = pd.date_range(start, periods=rows, freq="s")
+    frame = {
+        "#": np.arange(1, rows + 1),
+        "Time": times.strftime("%Y/%m/%d %H:%M:%S"),
+        "I Cmm": rng.uniform(4.5, 5.5, rows),
+        "U Stac": rng.uniform(8, 10, rows),
+        "U Cmm": rng.uniform(10, 12, rows),
+        "C1 Cond": np.linspace(5, 40, rows) + rng.normal(0, 0.2, rows),
+        "C2 Cond": np.linspace(5, 30, rows) + rng.normal(0, 0.2, rows),
+    }
+    for j in range(width):
+        frame[f"Sensor {j + 1}"] = rng.normal(0, 1, rows)
+    return pd.DataFrame(frame)
+
+
+def seedDatabase(database, args, rng):
+    """
+    Replaces the benchmark database contents with synthetic experiments.
+    Refuses to drop existing collections unless --reset-db was passed.
+    """
+    existing = database.list_collection_names()
+    if existing and not args.reset_db:
+        sys.exit(f"Database '{database.name}' already holds {len(existing)} "
+                 "collections; pass --reset-db to drop them before seeding.")
+    for name in existing:
+        database[name].drop()
+
+    experiments = buildExperiments(args.experiments)
+    database["experiments"].insert_many([dict(e) for e in experiments])
+
+    for experiment in experiments:
+        df = buildDataFrame(experiment["Date"], args.rows, args.width, rng)
+        df["experimentId"] = experiment["experimentId"]
+        df["dataSheetId"] = "#" + df["#"].astype(str) + " " + df["Time"]
+        database["data"].insert_many(df.to_dict("records"))
+    database["data"].create_index("experimentId")
+    return experiments
+
+
+def encodeDataSheet(df: pd.DataFrame) -> str:
+    buffer = io.BytesIO()
+    df.to_excel(buffer, index=False)
+    return base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+# Database wiring
+def useInProcessDatabase():
+    """
+    Points the app at a single shared mongomock client. Both the PyMongo
+    connections used by the routers and the Motor clients used by the
+    services resolve to the same in-memory store.
+    """
+    try:
+        import mongomock
+        from mongomock_motor import AsyncMongoMockClient
+    except ImportError:
+        sys.exit("--in-process-db requires the mongomock and mongomock-motor packages.")
+
+    import database
+    import services.migrationService as migrationService
+    import services.userService as userService
+
+    syncClient = mongomock.MongoClient()
+    database.MongoClient = lambda *args, **kwargs: syncClient
+    asyncClient = lambda *args, **kwargs: AsyncMongoMockClient(
+        mock_mongo_client=syncClient
+    )
+    database.AsyncIOMotorClient = asyncClient
+    migrationService.AsyncIOMotorClient = asyncClient
+    userService.AsyncIOMotorClient = asyncClient
+    return syncClient
+
+
+# Measurement
+def percentile(values: list[float], q: float) -> float | None:
+    return float(np.percentile(values, q)) if values else None
+
+
+def peakRssKb(serverPid: int | None) -> int:
+    """Peak resident set size in KiB, of the server process when known."""
+    if serverPid:
+        with open(f"/proc/{serverPid}/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def gitCommit() -> str | None:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+def makeRequests(scenario: str, experiments: list[dict], args, rng) -> list:
+    """Pre-builds (method, path, body) tuples so payload creation is not timed."""
+    requests = []
+    if scenario == "upload":
+        sheets = [
+            encodeDataSheet(buildDataFrame(e["Date"], args.upload_rows, args.width, rng))
+            for e in experiments[:min(len(experiments), 5)]
+        ]
+    for i in range(args.requests):
+        experiment = experiments[i % len(experiments)]
+        if scenario == "data":
+            body = {"experimentId": experiment["experimentId"]}
+        elif scenario == "filterCollectionData":
+            body = {
+                "collection": "data",
+                "attributes": ["Time", "U Stac", "I Cmm"],
+                "dates": [experiment["Date"]],
+            }
+        elif scenario == "calculate-efficiencies":
+            # Each request uses a new interval, so none hits the stored result
+            body = {
+                "experimentId": experiment["experimentId"],
+                "selectedEfficiencies": EFFICIENCIES,
+                "timeInterval": (i // len(experiments)) + 1,
+            }
+        else:
+            content = sheets[i % len(sheets)]
+            body = {
+                "experimentFiles": [],
+                "dataFiles": [{
+                    "filename": f"bench_{i}.xlsx",
+                    "mimetype": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    "content": content,
+                }],
+            }
+        requests.append(("POST", f"/{scenario}", body))
+    return requests
+
+
+def isErrorResponse(response) -> bool:
+    """
+    Whether a response reports a failure. The routes answer most failures
+    with HTTP 200 and a {"status": "error"} body, so both are checked.
+    """
+    if response.status_code >= 400:
+        return True
+    if "application/json" not in response.headers.get("content-type", ""):
+        return False
+    try:
+        body = response.json()
+    except ValueError:
+        return True
+    return isinstance(body, dict) and body.get("status") == "error"
+
+
+async def runScenario(client, scenario: str, requests: list, concurrency: int) -> dict:
+    latencies = []
+    errors = 0
+    queue = asyncio.Queue()
+    for request in requests:
+        queue.put_nowait(request)
+
+    async def worker():
+        nonlocal errors
+        while True:
+            try:
+                method, path, body = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body)
+                if isErrorResponse(response):
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "errorRate": errors / len(latencies) if latencies else 0.0,
+        # Failed requests are usually cheap, so a run with errors does not
+        # measure the endpoint and is not comparable with other runs
+        "failed": errors > 0,
+        "durationSeconds": elapsed,
+        "throughputRps": len(latencies) / elapsed if elapsed else None,
+        "latencyMs": {
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": max(latencies) if latencies else None,
+        },
+    }
+
+
+def compareResults(current: dict, baseline: dict):
+    """Prints the relative change of each scenario against a baseline run."""
+    print(f"\nComparison with {baseline.get('commit') or 'baseline'}:")
+    for scenario, result in current["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(scenario)
+        if not previous:
+            continue
+        for label, now, before in (
+            ("throughput", result["throughputRps"], previous["throughputRps"]),
+            ("p95", result["latencyMs"]["p95"], previous["latencyMs"]["p95"]),
+            ("p99", result["latencyMs"]["p99"], previous["latencyMs"]["p99"]),
+        ):
+            if now is None or not before:
+                continue
+            print(f"  {scenario:24s} {label:10s} {before:10.2f} -> {now:10.2f} "
+                  f"({(now - before) / before * 100:+.1f}%)")
+
+
+async def main(args):
+    rng = np.random.default_rng(args.seed)
+    random.seed(args.seed)
+    # Read by database.py, so the in-process app uses the seeded database
+    os.environ["DB_NAME"] = args.db_name
+
+    if args.base_url is None:
+        if args.in_process_db:
+            mongoClient = useInProcessDatabase()
+        else:
+            from pymongo import MongoClient
+            os.environ["CONNECTION_STRING"] = args.mongo_uri
+            mongoClient = MongoClient(args.mongo_uri)
+    else:
+        from pymongo import MongoClient
+        mongoClient = MongoClient(args.mongo_uri)
+
+    import httpx
+
+    print(f"Seeding {args.experiments} experiments x {args.rows} rows "
+          f"({len(SENSOR_COLUMNS) + args.width} sensor columns)...")
+    experiments = seedDatabase(mongoClient[args.db_name], args, rng)
+
+    lifespan = contextlib.AsyncExitStack()
+    if args.base_url is None:
+        from api import app
+        # ASGITransport does not send lifespan events, so start the shared
+        # services here
+        await lifespan.enter_async_context(app.router.lifespan_context(app))
+        transport = httpx.ASGITransport(app=app)
+        baseUrl = "http://benchmark"
+    else:
+        transport = None
+        baseUrl = args.base_url
+
+    results = {
+        "commit": gitCommit(),
+        "timestamp": datetime.now().isoformat(),
+        "config": {
+            "experiments": args.experiments,
+            "rows": args.rows,
+            "width": args.width,
+            "uploadRows": args.upload_rows,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "database": "in-process" if args.in_process_db else args.mongo_uri,
+            "dbName": args.db_name,
+        },
+        "scenarios": {},
+    }
+
+    async with lifespan, httpx.AsyncClient(
+        transport=transport, base_url=baseUrl, timeout=args.timeout
+    ) as client:
+        for scenario in args.scenarios:
+            requests = makeRequests(scenario, experiments, args, rng)
+            result = await runScenario(client, scenario, requests, args.concurrency)
+            results["scenarios"][scenario] = result
+            latency = result["latencyMs"]
+            print(f"{scenario:24s} {result['throughputRps']:8.1f} req/s  "
+                  f"p50 {latency['p50']:8.1f} ms  p95 {latency['p95']:8.1f} ms  "
+                  f"p99 {latency['p99']:8.1f} ms  errors {result['errors']}"
+                  f"{'  FAILED' if result['failed'] else ''}")
+
+    results["peakRssKb"] = peakRssKb(args.server_pid)
+    print(f"Peak RSS: {results['peakRssKb'] / 1024:.1f} MiB")
+
+    with open(args.output, "w") as output:
+        json.dump(results, output, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as baseline:
+            compareResults(results, json.load(baseline))
+
+    failed = [name for name, result in results["scenarios"].items() if result["failed"]]
+    if failed:
+        print(f"Scenarios with failed requests: {', '.join(failed)}")
+    return 1 if failed else 0
+
+
+def parseArgs(argv=None):
+    parser = argparse.ArgumentParser(description="Alkalytics backend load test")
+    parser.add_argument("--experiments", type=int, default=20)
+    parser.add_argument("--rows", type=int, default=2000, help="rows per experiment")
+    parser.add_argument("--width", type=int, default=10, help="extra sensor columns")
+    parser.add_argument("--upload-rows", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=100, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017")
+    parser.add_argument("--db-name", default=BENCH_DB_NAME,
+                        help="database to seed; a --base-url server must use the same DB_NAME")
+    parser.add_argument("--reset-db", action="store_true",
+                        help="drop the collections of --db-name before seeding")
+    parser.add_argument("--in-process-db", action="store_true",
+                        help="use mongomock instead of a MongoDB server")
+    parser.add_argument("--base-url", default=None,
+                        help="drive an already running server instead of the in-process app")
+    parser.add_argument("--server-pid", type=int, default=None,
+                        help="report the peak RSS of this process instead of the harness")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="loadtest-results.json")
+    parser.add_argument("--compare", default=None, help="earlier results file to compare against")
+    args = parser.parse_args(argv)
+    if args.in_process_db and args.base_url:
+        parser.error("--in-process-db cannot be combined with --base-url")
+    if args.db_name == APP_DB_NAME:
+        parser.error(f"--db-name must not be the application database '{APP_DB_NAME}'")
+    return args
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parseArgs())))
@@ -1,15 +1,52 @@
 import os
 
 from dotenv import load_dotenv
-from pymongo import MongoClient
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient, ReturnDocument
+from pymongo.errors import DuplicateKeyError
 
 load_dotenv()
 
+# Overridable so tools such as the load test can run against their own database
+DB_NAME = os.getenv("DB_NAME", "alkalyticsDB")
+
 
 def getConnection(collection: str):
     MONGO_URI = os.getenv("CONNECTION_STRING")
-    DB_NAME = "alkalyticsDB"
     client = MongoClient(MONGO_URI)
     db = client[DB_NAME]
     collection = db[collection]
     return {"collection": collection, "client": client}
+
+
+def getMotorClient() -> AsyncIOMotorClient:
+    """
+    Creates the Motor client shared by the async services. Motor pools
+    connections internally, so one client serves every request.
+    """
+    return AsyncIOMotorClient(os.getenv("CONNECTION_STRING"))
+
+
+def getNextSequence(database, name: str) -> int:
+    """
+    Atomically allocates the next value of a named counter stored in the
+    'counters' collection.
+    """
+    counter = database["counters"].find_one_and_update(
+        {"_id": name},
+        {"$inc": {"seq": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return counter["seq"]
+
+
+def seedSequence(database, name: str, value: int):
+    """Initializes a named counter if it does not exist yet."""
+    try:
+        database["counters"].update_one(
+            {"_id": name}, {"$setOnInsert": {"seq": value}}, upsert=True
+        )
+    except DuplicateKeyError:
+        # Another request seeded the counter concurrently
+        pass
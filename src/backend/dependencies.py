@@ -0,0 +1,83 @@
+# -----------------------------------------------------------------------------
+# Primary author: Jason T
+# Year: 2025
+# Purpose: FastAPI dependencies exposing the services created in the app
+# lifespan.
+# -----------------------------------------------------------------------------
+
+from fastapi import HTTPException, Request, Response
+from starlette.requests import HTTPConnection
+
+from services.catalogService import CatalogRefreshService
+from services.conditionalRequests import (
+    cacheHeaders,
+    entityTag,
+    matchesEntityTag,
+    requestVariant
+)
+from services.eventBus import EventBus
+from services.importJobService import ImportJobService
+from services.liveIngestService import LiveIngestService
+from services.migrationService import MigrationService
+from services.schemaService import SchemaCompactionService
+from services.userService import UserService
+
+
+def getUserService(request: Request) -> UserService:
+    """Returns the UserService shared by every request."""
+    return request.app.state.userService
+
+
+def getMigrationService(request: Request) -> MigrationService:
+    """Returns the MigrationService shared by every request."""
+    return request.app.state.migrationService
+
+
+def getImportJobService(request: Request) -> ImportJobService:
+    """Returns the ImportJobService running the background import workers."""
+    return request.app.state.importJobService
+
+
+def getLiveIngestService(connection: HTTPConnection) -> LiveIngestService:
+    """Returns the LiveIngestService, for both WebSocket and HTTP routes."""
+    return connection.app.state.liveIngestService
+
+
+def getEventBus(request: Request) -> EventBus:
+    """Returns the EventBus that mutation endpoints publish changes to."""
+    return request.app.state.eventBus
+
+
+def getSchemaCompactionService(request: Request) -> SchemaCompactionService:
+    """Returns the SchemaCompactionService removing dropped columns."""
+    return request.app.state.schemaCompactionService
+
+
+def getCatalogRefreshService(request: Request) -> CatalogRefreshService:
+    """Returns the CatalogRefreshService recomputing stale catalog entries."""
+    return request.app.state.catalogRefreshService
+
+
+def conditionalOn(*collections: str):
+    """
+    Dependency making a read endpoint conditional on the collections it
+    reads. Responses carry an ETag of the collections' revision, and a
+    request whose If-None-Match still matches is answered 304 before the
+    endpoint runs. Revisions are kept in MongoDB and bumped by every writer,
+    so tags hold across workers and restarts; RevisionService caches them,
+    so a revalidation usually does not reach MongoDB.
+    """
+    async def checkRevision(request: Request, response: Response):
+        revisionService = request.app.state.revisionService
+        # Taken before the endpoint reads, so a concurrent change can only
+        # make the tag older than the data, never newer
+        revision, changedAt = await revisionService.revision(collections)
+        variant = requestVariant(
+            request.method, request.url.path, request.url.query, await request.body()
+        )
+        headers = cacheHeaders(entityTag(revision, variant), changedAt)
+        if matchesEntityTag(request.headers.get("if-none-match"), headers["ETag"]):
+            raise HTTPException(status_code=304, headers=headers)
+        response.headers.update(headers)
+
+    return checkRevision
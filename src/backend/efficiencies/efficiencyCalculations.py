@@ -9,6 +9,9 @@
 import numpy as np
 
 from datetime import datetime
+from functools import lru_cache
+
+from metrics import timed
 
 # Field constants
 C1_COND = "C1 Cond"
@@ -32,14 +35,59 @@ COND_TO_CONC = {
 }
 
 
+class CondToConcConverter:
+    """
+    Converts conductivity (mS/cm) to concentration (M) for one compound. The
+    lookup table is built once, and whole arrays of conductivities are
+    converted in a single call. With `logScale`, interpolation is done in
+    log-log space, which follows the table more closely across its five
+    decades than linear interpolation between points.
+    """
+
+    def __init__(self, compound: str, logScale: bool = False):
+        self.compound = compound
+        self.logScale = logScale
+        # Table conductivities are in uS/cm and concentrations in ppm
+        self.xVals = np.asarray(COND_TO_CONC[compound], dtype=float)
+        self.yVals = np.asarray(COND_TO_CONC["conc"], dtype=float)
+        if logScale:
+            self.xVals = np.log10(self.xVals)
+            self.yVals = np.log10(self.yVals)
+        self.ppmToMolar = 1 / (MOLAR_MASS[compound] * 1000)
+
+    def convert(self, cond):
+        """Converts a conductivity or an array of them; returns the same shape."""
+        uS = np.asarray(cond, dtype=float) * 1000
+        if self.logScale:
+            # Values below the table clamp to its first point, as np.interp
+            # does, which also keeps zero and negative readings out of log10
+            logUS = np.log10(np.maximum(uS, 10 ** self.xVals[0]))
+            ppm = 10 ** np.interp(logUS, self.xVals, self.yVals)
+        else:
+            ppm = np.interp(uS, self.xVals, self.yVals)
+        molar = ppm * self.ppmToMolar
+        return molar.item() if molar.ndim == 0 else molar
+
+
+@lru_cache(maxsize=None)
+def getConverter(compound: str, logScale: bool = False) -> CondToConcConverter:
+    """Shared converter per compound and scale."""
+    return CondToConcConverter(compound, logScale)
+
+
 def convertCondtoConc(cond: float, compound: str) -> float:
     """ Converts conductivity (mS/cm) to concentration (M) using interpolation."""
-    xVals = np.array(COND_TO_CONC[compound])
-    yVals = np.array(COND_TO_CONC["conc"])
-    ppm = np.interp(cond*1000, xVals, yVals)
-    return ppm/(MOLAR_MASS[compound]*1000)
+    return getConverter(compound).convert(cond)
+
+
+def concentrationSeries(data: list[dict], compound: str, logScale: bool = False) -> np.ndarray:
+    """ Per-sample concentration (M) of a compound over an experiment's data."""
+    dataField = C1_COND if compound == "HCL" else C2_COND
+    conductivities = np.array([entry[dataField] for entry in data], dtype=float)
+    return getConverter(compound, logScale).convert(conductivities)
 
 
+@timed("groupData")
 def groupData(data: list[dict], interval: int = 5) -> list[list[dict]]:
     """
     Groups data into intervals based on elapsed time from start of experiment.
@@ -63,12 +111,18 @@ def groupData(data: list[dict], interval: int = 5) -> list[list[dict]]:
     return intervals
 
 
-def computeCurrentEfficiency(data: list[dict], compound: str, finalVol: float, numTriplets: int) -> float:
-    """ Calculates the current efficiency (%) for either HCl or NaOH."""
+@timed("computeCurrentEfficiency")
+def currentEfficiencySeries(data: list[dict], compound: str, finalVol: float, numTriplets: int) -> dict:
+    """
+    Current efficiency (%) of every 5-minute interval after the first, which
+    sets the initial concentration. Returned as columns of interval start
+    times with the efficiency, average current and concentration (M).
+    """
     dataField = C1_COND if compound == "HCL" else C2_COND
+    converter = getConverter(compound)
 
     groupedData = groupData(data)
-    efficiencies = []
+    series = {"Time": [], "Efficiency": [], "Current": [], "Concentration": []}
 
     initialConc = 0
     for i, group in enumerate(groupedData):
@@ -76,49 +130,69 @@ def computeCurrentEfficiency(data: list[dict], compound: str, finalVol: float, n
 
         if i == 0:
             initialCondValues = np.array([entry[dataField] for entry in group])
-            initialConc = convertCondtoConc(np.mean(initialCondValues), compound)
+            initialConc = converter.convert(np.mean(initialCondValues))
             continue
-        
+
         currValues = np.array([entry[CURRENT] for entry in group])
         avgCurr = np.mean(currValues)
+        condValues = np.array([entry[dataField] for entry in group])
+        avgConc = converter.convert(np.mean(condValues))
 
         if avgCurr == 0:
-            efficiencies.append(0)
-            continue
-        
-        condValues = np.array([entry[dataField] for entry in group])
-        avgCond = np.mean(condValues)
-        avgConc = convertCondtoConc(avgCond, compound)
-        deltaConc = avgConc - initialConc
-        currentEfficiency = (deltaConc * finalVol * FARADAY_CONSTANT) / (numTriplets * timeInterval * avgCurr * 60)
-        efficiencies.append(currentEfficiency)
+            currentEfficiency = 0
+        else:
+            deltaConc = avgConc - initialConc
+            currentEfficiency = (deltaConc * finalVol * FARADAY_CONSTANT) / (numTriplets * timeInterval * avgCurr * 60)
 
-    overallEfficiency = np.mean(np.array(efficiencies)) * 100 if efficiencies else 0
-    return overallEfficiency
+        series["Time"].append(group[0]["Time"])
+        series["Efficiency"].append(float(currentEfficiency * 100))
+        series["Current"].append(float(avgCurr))
+        series["Concentration"].append(float(avgConc))
 
+    return series
 
-def computeVoltageDropEfficiency(data: list[dict]) -> float:
-    """ Calculates the voltage drop efficiency (%) for the given data."""
+
+@timed("computeVoltageDropEfficiency")
+def voltageDropEfficiencySeries(data: list[dict]) -> dict:
+    """
+    Voltage drop efficiency (%) of every 5-minute interval, as columns of
+    interval start times with the efficiency and average current.
+    """
     groupedData = groupData(data)
-    efficiencies = []
+    series = {"Time": [], "Efficiency": [], "Current": []}
 
-    for i, group in enumerate(groupedData):
+    for group in groupedData:
         uStackValues = np.array([entry[VOLTAGE_STACK] for entry in group])
         avgUStack = np.mean(uStackValues)
         uTotalValues = np.array([entry[VOLTAGE_TOTAL] for entry in group])
         avgUTotal = np.mean(uTotalValues)
+        currValues = np.array([entry.get(CURRENT, np.nan) for entry in group], dtype=float)
 
-        if avgUTotal == 0:
-            efficiencies.append(0)
-            continue
+        voltageDropEfficiency = (avgUStack / avgUTotal) if avgUTotal != 0 else 0
+
+        series["Time"].append(group[0]["Time"])
+        series["Efficiency"].append(float(voltageDropEfficiency * 100))
+        series["Current"].append(float(np.mean(currValues)))
+
+    return series
 
-        voltageDropEfficiency = (avgUStack / avgUTotal)
-        efficiencies.append(voltageDropEfficiency)
 
-    overallEfficiency = np.mean(np.array(efficiencies)) * 100 if efficiencies else 0
-    return overallEfficiency
+def meanEfficiency(series: dict) -> float:
+    """ Overall efficiency (%) of a per-interval series: the mean of its intervals."""
+    return float(np.mean(series["Efficiency"])) if series["Efficiency"] else 0
+
+
+def computeCurrentEfficiency(data: list[dict], compound: str, finalVol: float, numTriplets: int) -> float:
+    """ Calculates the current efficiency (%) for either HCl or NaOH."""
+    return meanEfficiency(currentEfficiencySeries(data, compound, finalVol, numTriplets))
+
+
+def computeVoltageDropEfficiency(data: list[dict]) -> float:
+    """ Calculates the voltage drop efficiency (%) for the given data."""
+    return meanEfficiency(voltageDropEfficiencySeries(data))
 
 
+@timed("computeReactionEfficiency")
 def computeReactionEfficiency(data: list[dict], volHCl: float, volNaOH: float) -> float:
     """ Calculates the reaction efficiency (%) for the last 5 minutes of the experiment."""
 
@@ -6,20 +6,34 @@
 
 from datetime import datetime, timedelta
 
-from fastapi import HTTPException, APIRouter
+from fastapi import Depends, HTTPException, APIRouter
 
 from database import getConnection
+from dependencies import conditionalOn, getEventBus
 from utils import cleanData
 from efficiencies.models import EfficiencyRequest
+from services.eventBus import REPLACE, UPDATE, EventBus
+from services.revisionService import REVISIONS_COLLECTION, buildRevisionUpdates
+from services.schemaService import applySchema, loadSchema
 from efficiencies.efficiencyCalculations import (
-    computeCurrentEfficiency,
-    computeVoltageDropEfficiency,
+    currentEfficiencySeries,
+    voltageDropEfficiencySeries,
+    meanEfficiency,
     computeReactionEfficiency,
     computeOverallEfficiency,
 )
 
 router = APIRouter()
 
+# Per-interval efficiencies, one document per experiment and time interval
+# sharing the _id of its entry in 'efficiencies'
+EFFICIENCY_SERIES_COLLECTION = "efficiency_series"
+SERIES_EFFICIENCIES = [
+    "Current Efficiency (HCl)",
+    "Current Efficiency (NaOH)",
+    "Voltage Drop Efficiency",
+]
+
 
 # Helper functions
 async def getExperimentData(experimentId: str, interval: int):
@@ -65,7 +79,10 @@ async def getExperimentData(experimentId: str, interval: int):
 
 
 async def compute(efficiency, experiment, results, payload):
-    """Helper function to call corresponding efficiency computation functions."""
+    """
+    Helper function to call corresponding efficiency computation functions.
+    Returns the efficiency and, for those computed per interval, its series.
+    """
     if efficiency in ["Current Efficiency (HCl)", "Current Efficiency (NaOH)"]:
         VOLUME_FIELD = "Final volume (L) "
         COMPOUND = "HCL" if efficiency == "Current Efficiency (HCl)" else "NaOH"
@@ -73,10 +90,12 @@ async def compute(efficiency, experiment, results, payload):
 
         if finalVol is None or numStacks is None:
             raise Exception(f"Missing data for final volumes or number of stacks (triplets).")
-        return computeCurrentEfficiency(results, COMPOUND, finalVol, numStacks)
+        series = currentEfficiencySeries(results, COMPOUND, finalVol, numStacks)
+        return meanEfficiency(series), series
 
     if efficiency == "Voltage Drop Efficiency":
-        return computeVoltageDropEfficiency(results)
+        series = voltageDropEfficiencySeries(results)
+        return meanEfficiency(series), series
 
     if efficiency == "Reaction Efficiency":
         VOLUME_FIELD = "Final volume (L) "
@@ -85,13 +104,13 @@ async def compute(efficiency, experiment, results, payload):
         if volHCl is None or volNaOH is None:
             raise Exception("Missing data for final volumes.")
         reactionResults = await getExperimentData(payload.experimentId, -5)
-        return computeReactionEfficiency(reactionResults, volHCl, volNaOH)
+        return computeReactionEfficiency(reactionResults, volHCl, volNaOH), None
 
-    return None
+    return None, None
 
 
 # Routes
-@router.get("/efficiencies")
+@router.get("/efficiencies", dependencies=[Depends(conditionalOn("efficiencies"))])
 async def getEfficiencies():
     """Fetches all data from the 'efficiencies' collection."""
     connection = getConnection("efficiencies")
@@ -129,19 +148,57 @@ async def getEfficiencies():
         client.close()
 
 
+@router.get(
+    "/efficiencies/{experimentId}/series",
+    dependencies=[Depends(conditionalOn(EFFICIENCY_SERIES_COLLECTION))]
+)
+async def getEfficiencySeries(experimentId: str, timeInterval: int = 0):
+    """
+    Fetches the per-interval efficiencies stored by /calculate-efficiencies
+    for an experiment and time interval. Each efficiency is a set of columns:
+    interval start times with the efficiency (%), average current and, for
+    current efficiencies, concentration (M) of each 5-minute interval.
+    """
+    connection = getConnection(EFFICIENCY_SERIES_COLLECTION)
+    collection, client = connection["collection"], connection["client"]
+
+    try:
+        entry = collection.find_one({"_id": experimentId + " " + str(timeInterval)})
+        if not entry:
+            raise HTTPException(
+                status_code=404,
+                detail=f"No efficiency series found for {experimentId} and time interval {timeInterval}."
+            )
+        return {"status": "success", "data": cleanData(entry)}
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching efficiency series: {str(e)}")
+    finally:
+        client.close()
+
+
 @router.post("/calculate-efficiencies")
-async def calculateEfficiency(payload: EfficiencyRequest):
+async def calculateEfficiency(
+    payload: EfficiencyRequest, eventBus: EventBus = Depends(getEventBus)
+):
     efficienciesConnection = getConnection("efficiencies")
     efficienciesCollection, efficienciesClient = efficienciesConnection["collection"], efficienciesConnection["client"]
     
-    # Check if calculations were already done before
+    seriesCollection = efficienciesCollection.database[EFFICIENCY_SERIES_COLLECTION]
+    entryId = payload.experimentId + " " + str(payload.timeInterval)
+
+    # Check if calculations were already done before. Efficiencies computed
+    # before their series were stored are computed again to store it.
     try:
-        existingEntry = efficienciesCollection.find_one({
-            "_id": payload.experimentId + " " + str(payload.timeInterval)
-        })
+        existingEntry = efficienciesCollection.find_one({"_id": entryId})
         if existingEntry:
             computedEfficiencies = {key: value for key, value in existingEntry.items() if key not in ["_id", "experimentId", "Time Interval"]}
-            efficienciesToCompute = [eff for eff in payload.selectedEfficiencies if eff not in computedEfficiencies]
+            storedSeries = seriesCollection.find_one({"_id": entryId}, {"_id": 1, **{eff: 1 for eff in SERIES_EFFICIENCIES}}) or {}
+            efficienciesToCompute = [
+                eff for eff in payload.selectedEfficiencies
+                if eff not in computedEfficiencies or (eff in SERIES_EFFICIENCIES and eff not in storedSeries)
+            ]
             if not efficienciesToCompute:
                 return {"message": "Efficiency factors in this request have already been computed", "status": "repeated"}
         else:
@@ -154,15 +211,22 @@ async def calculateEfficiency(payload: EfficiencyRequest):
     expConnection = getConnection("experiments")
     expCollection, expClient = expConnection["collection"], expConnection["client"]
     experiment = expCollection.find_one({"experimentId": payload.experimentId})
+    if experiment:
+        # Computed from the columns the schema shows, not dropped leftovers
+        experiment = applySchema([experiment], loadSchema(expCollection.database["config"]))[0]
     if not experiment:
         raise HTTPException(status_code=404, detail=f"Experiment metadata not found for {payload.experimentId}.")
     
     # Fetch detailed experiment data
     results = await getExperimentData(payload.experimentId, payload.timeInterval)
 
+    # Per-interval series are stored from the same pass as their mean
+    computedSeries = {}
     for efficiency in efficienciesToCompute:
         try:
-            computedEfficiencies[efficiency] = await compute(efficiency, experiment, results, payload)
+            computedEfficiencies[efficiency], series = await compute(efficiency, experiment, results, payload)
+            if series is not None:
+                computedSeries[efficiency] = series
         except Exception as e:
             computedEfficiencies[efficiency] = 0
             raise Exception(f"Error computing {efficiency}: {str(e)}")
@@ -177,19 +241,46 @@ async def calculateEfficiency(payload: EfficiencyRequest):
 
     # Store computed efficiencies in collections
     try:
+        revisions = efficienciesCollection.database[REVISIONS_COLLECTION]
         efficienciesCollection.update_one(
-            {"_id": payload.experimentId + " " + str(payload.timeInterval),
+            {"_id": entryId,
              "experimentId": payload.experimentId, 
              "Time Interval": payload.timeInterval
             },
             {"$set": computedEfficiencies},
             upsert=True
         )
+        revisions.bulk_write(buildRevisionUpdates(["efficiencies"]))
+        if computedSeries:
+            seriesCollection.update_one(
+                {"_id": entryId,
+                 "experimentId": payload.experimentId,
+                 "Time Interval": payload.timeInterval
+                },
+                {"$set": computedSeries},
+                upsert=True
+            )
+            revisions.bulk_write(buildRevisionUpdates([EFFICIENCY_SERIES_COLLECTION]))
+            eventBus.publish(
+                EFFICIENCY_SERIES_COLLECTION, UPDATE,
+                key="_id", ids=[entryId], set=computedSeries
+            )
+        eventBus.publish("efficiencies", REPLACE, key="_id", documents=[{
+            "_id": entryId,
+            "experimentId": payload.experimentId,
+            "Time Interval": payload.timeInterval,
+            **computedEfficiencies,
+        }])
         if payload.timeInterval == 0:
             expCollection.update_one(
                 {"experimentId": payload.experimentId},
                 {"$set": computedEfficiencies}
             )
+            revisions.bulk_write(buildRevisionUpdates(["experiments"]))
+            eventBus.publish(
+                "experiments", UPDATE,
+                key="experimentId", ids=[payload.experimentId], set=computedEfficiencies
+            )
         return {"message": "Efficiency factors computed successfully", "status": "success"}
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error adding calculations: {str(e)}")
@@ -0,0 +1,52 @@
+# -----------------------------------------------------------------------------
+# Primary author: Jason T
+# Year: 2025
+# Purpose: Server-sent events feed of changes to the collections shown by the
+# dashboards, so clients patch their state instead of refetching.
+# -----------------------------------------------------------------------------
+
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, Request
+from fastapi.responses import StreamingResponse
+
+from dependencies import getEventBus
+from services.eventBus import EventBus, formatEvent
+
+router = APIRouter()
+
+# A comment line is sent this often when idle, so proxies keep the stream open
+KEEPALIVE_SECONDS = 15
+
+
+# Routes
+@router.get("/events")
+async def streamEvents(
+    request: Request,
+    collections: Optional[str] = None,
+    lastEventId: Optional[str] = Header(None, alias="Last-Event-ID"),
+    eventBus: EventBus = Depends(getEventBus)
+):
+    """
+    Streams changes as server-sent events. `collections` is an optional
+    comma-separated filter. Each 'change' event carries the collection, the
+    operation and the changed documents or fields; a 'resync' event asks the
+    client to reload, after it fell behind or missed events while away.
+    """
+    names = [name.strip() for name in collections.split(",")] if collections else None
+    subscription = eventBus.subscribe(names, lastEventId)
+
+    async def stream():
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                event = await subscription.next(timeout=KEEPALIVE_SECONDS)
+                yield formatEvent(event) if event else ": keepalive\n\n"
+        finally:
+            eventBus.unsubscribe(subscription)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
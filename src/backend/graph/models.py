@@ -29,10 +29,11 @@ class GeneratedGraphs(BaseModel):
     data: List[Dict]
     properties: List[Dict]
     attributes: List[str]
+    query: Optional[Dict] = None
 
 
-class GeneratedGraphRequest(BaseModel):
-    latest: Optional[int]
+class GraphDataRequest(BaseModel):
+    graphId: int
 
 
 class RemoveGraphRequest(BaseModel):
@@ -6,24 +6,51 @@
 # -----------------------------------------------------------------------------
 
 import math
+from typing import Optional
 
 import numpy as np
-from fastapi import APIRouter, HTTPException
-
-from database import getConnection
-from utils import cleanData
+from fastapi import APIRouter, Depends, HTTPException
+
+from database import getConnection, getNextSequence, seedSequence
+from dependencies import conditionalOn, getEventBus
+from utils import cleanData, decodeSeries, encodeSeries
+from services.catalogService import (
+    CATALOG_COLLECTION,
+    CATALOGED_COLLECTIONS,
+    catalogId,
+    ensureCatalog,
+    getCatalogFields
+)
+from services.dateIndexService import (
+    DATE_INDEX_COLLECTION,
+    getExperimentIdsForDates,
+    getIndexedDates
+)
+from services.eventBus import DELETE, INSERT, EventBus
+from services.revisionService import REVISIONS_COLLECTION, buildRevisionUpdates
+from services.schemaService import (
+    applySchema,
+    isDropped,
+    isRegistered,
+    loadSchema,
+    schemaQuery
+)
 from graph.models import (  
     DataAttrs,
     DataFilter,
     ExperimentFilter,
     AttributeValues,
     GeneratedGraphs,
-    GeneratedGraphRequest,
+    GraphDataRequest,
     RemoveGraphRequest
 )
 
 router = APIRouter()
 
+# Saved graphs keep at most this many points
+MAX_STORED_POINTS = 5000
+GRAPH_METADATA_PROJECTION = {"data": 0, "series": 0}
+
 
 # Heper functions
 async def fetchData(collection, query, projection, client):
@@ -43,6 +70,91 @@ async def fetchData(collection, query, projection, client):
         client.close()
 
 
+def numericColumns(rows):
+    """Matrix of the numeric attributes of the rows, NaN where a row has none."""
+    names = list(dict.fromkeys(
+        key for row in rows for key, value in row.items()
+        if isinstance(value, (int, float)) and not isinstance(value, bool)
+    ))
+    matrix = np.full((len(rows), len(names)), np.nan)
+    for i, row in enumerate(rows):
+        for j, name in enumerate(names):
+            value = row.get(name)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                matrix[i, j] = value
+    return matrix
+
+
+def downsampleRows(rows, maxPoints=MAX_STORED_POINTS):
+    """
+    Reduces a list of points to at most maxPoints, keeping the first and last
+    point. Points are split into consecutive buckets, and each bucket keeps
+    the points holding the minimum and maximum of every numeric attribute,
+    so spikes and extrema survive. Points without numeric attributes are
+    reduced by evenly spaced selection.
+    """
+    if len(rows) <= maxPoints:
+        return rows
+    matrix = numericColumns(rows)
+    if matrix.shape[1] == 0:
+        indices = np.unique(np.linspace(0, len(rows) - 1, maxPoints).round().astype(int))
+        return [rows[i] for i in indices]
+
+    bucketCount = max(1, (maxPoints - 2) // (2 * matrix.shape[1]))
+    edges = np.linspace(1, len(rows) - 1, bucketCount + 1).round().astype(int)
+    keep = {0, len(rows) - 1}
+    for start, end in zip(edges[:-1], edges[1:]):
+        bucket = matrix[start:end]
+        columns = ~np.isnan(bucket).all(axis=0)
+        if not len(bucket) or not columns.any():
+            continue
+        keep.update(start + np.nanargmin(bucket[:, columns], axis=0))
+        keep.update(start + np.nanargmax(bucket[:, columns], axis=0))
+    return [rows[i] for i in sorted(keep)]
+
+
+def distinctValues(collection, collectionName, attribute):
+    """
+    Distinct values of an attribute. Experiments are read through their
+    schema: a dropped column has no values, and a registered column has its
+    default too while some documents lack it.
+    """
+    if collectionName != "experiments":
+        return collection.distinct(attribute)
+    schema = loadSchema(collection.database["config"])
+    if isDropped(schema, attribute):
+        return []
+    values = collection.distinct(attribute)
+    if isRegistered(schema, attribute) and collection.count_documents(
+        {attribute: {"$exists": False}}, limit=1
+    ):
+        default = next(
+            column["default"] for column in schema["columns"] if column["name"] == attribute
+        )
+        if default not in values:
+            values.append(default)
+    return values
+
+
+def nextGraphId(collection):
+    """
+    Allocates a graph ID from an atomic counter. The counter is seeded from
+    the highest existing ID the first time it is used.
+    """
+    database = collection.database
+    if database["counters"].find_one({"_id": "graphs"}) is None:
+        latest = collection.find_one({}, {"_id": 1}, sort=[("_id", -1)])
+        seedSequence(database, "graphs", latest["_id"] if latest else 0)
+    return getNextSequence(database, "graphs")
+
+
+def loadGraphData(graph):
+    """Decodes the stored points of a graph, supporting legacy row storage."""
+    if "series" in graph:
+        return decodeSeries(graph["series"])
+    return graph.get("data", [])
+
+
 def performAnalysis(data, attributes):
     """
     Performs simple linear regression analysis on the provided data.
@@ -87,14 +199,25 @@ def performAnalysis(data, attributes):
 @router.post("/getAttrs")
 async def getCollectionAttrs(payload: DataAttrs):
     """
-    Fetches the attributes of the data in a specified collection.
+    Fetches the attributes of the data in a specified collection. Cataloged
+    collections are served from the attribute catalog, which holds the union
+    of fields across all documents.
     """
     connection = getConnection(payload.collection)
     collection, client = connection["collection"], connection["client"]
 
     try:
-        data = collection.find_one()
-        datalist = list(data)
+        if payload.collection in CATALOGED_COLLECTIONS:
+            catalog = collection.database[CATALOG_COLLECTION]
+            ensureCatalog(collection, catalog)
+            datalist = [
+                entry["field"]
+                for entry in getCatalogFields(catalog, payload.collection)
+            ]
+        else:
+            data = collection.find_one()
+            datalist = list(data) if data else []
+
         if datalist:
             return {"status": "success", "data": datalist}
         else:
@@ -113,22 +236,21 @@ async def getFilterCollectionData(payload: DataFilter):
     # Prepare attributes for projection
     attrs = {field: 1 for field in payload.attributes}
     attrs["Date"] = 1
+    # Not connected yet when resolving the dates fails
+    targetClient = None
 
     try:
         # Need to get experimentId from the Dates selected
         if payload.collection == "data" and payload.dates:
-            # Get experiment IDs from the "experiments" collection
+            # Resolve experiment IDs through the date index
             experimentsConn = getConnection("experiments")
             experimentsCollection, experimentsClient = experimentsConn["collection"], experimentsConn["client"]
 
-            experimentIds = [
-                item["experimentId"]
-                for item in experimentsCollection.find(
-                    {"Date": {"$in": payload.dates}}, 
-                    {"experimentId": 1, "_id": 0}
-                )
-            ]
-            experimentsClient.close()
+            try:
+                dateIndex = experimentsCollection.database[DATE_INDEX_COLLECTION]
+                experimentIds = getExperimentIdsForDates(dateIndex, payload.dates)
+            finally:
+                experimentsClient.close()
 
             if not experimentIds:
                 raise HTTPException(status_code=404, detail="No experiments found for the given dates.")
@@ -150,7 +272,17 @@ async def getFilterCollectionData(payload: DataFilter):
                 query = {"Date": {"$in": payload.dates}}
             else:
                 query = {}
+            # Experiments are read through their schema, which holds the
+            # defaults of added columns and hides dropped ones
+            schema = (
+                loadSchema(targetCollection.database["config"])
+                if payload.collection == "experiments" else None
+            )
+            if schema:
+                query = schemaQuery(schema, query)
             response = await fetchData(targetCollection, query, attrs, targetClient)
+            if schema and response["status"] == "success":
+                response["data"] = applySchema(response["data"], schema, attrs)
         # Check if analysis is requested
         if payload.analysis:
             try:
@@ -168,7 +300,8 @@ async def getFilterCollectionData(payload: DataFilter):
     except Exception as e:
         return {"status": "error", "message": str(e)}
     finally:
-        targetClient.close()
+        if targetClient is not None:
+            targetClient.close()
 
 
 @router.post("/getFilterCollectionDates")
@@ -180,16 +313,19 @@ async def getFilterCollectionDates(payload: ExperimentFilter):
     targetCollection, targetClient = targetConn["collection"], targetConn["client"]
 
     try: 
-        # Get all dates from given collection 
+        dateIndex = targetCollection.database[DATE_INDEX_COLLECTION]
+
+        # Get all dates from the date index, or only those of the experiments
+        # matching the filter
         if payload.filterValue == "":
-            query = {}
+            dataList = getIndexedDates(dateIndex)
         else:
             query = {payload.attribute: payload.filterValue}
-        
-        dataList = targetCollection.find(query, {"experimentId": 1, "_id": 0})
-        dataList = [date['experimentId'].split()[-1] for date in dataList]
-        dataList = set(dataList)
-        dataList = sorted(list(dataList))
+            if payload.collection == "experiments":
+                query = schemaQuery(loadSchema(targetCollection.database["config"]), query)
+            experimentIds = targetCollection.distinct("experimentId", query)
+            dataList = getIndexedDates(dateIndex, experimentIds)
+
         if not dataList:
             raise HTTPException(status_code=404, detail="There is no date with the given attribute value")
         return {"status": "success", "data": dataList}
@@ -202,13 +338,28 @@ async def getFilterCollectionDates(payload: ExperimentFilter):
 @router.post("/filterCollectionData/attrValues")
 async def getFilterCollectionAttrValues(payload: AttributeValues):
     """
-    Fetches all values of a certain attribute in a collection.
+    Fetches all values of a certain attribute in a collection. Values are read
+    from the attribute catalog, falling back to a distinct scan only for
+    uncataloged collections and high-cardinality fields.
     """
     targetConn = getConnection(payload.collection)
-    targetCollection = targetConn["collection"]
+    targetCollection, targetClient = targetConn["collection"], targetConn["client"]
     attributeValues = []
     try:
-        uniqueValues = targetCollection.distinct(payload.attribute)
+        uniqueValues = None
+        if payload.collection in CATALOGED_COLLECTIONS:
+            catalog = targetCollection.database[CATALOG_COLLECTION]
+            ensureCatalog(targetCollection, catalog)
+            entry = catalog.find_one(
+                {"_id": catalogId(payload.collection, payload.attribute)}
+            )
+            if entry is None:
+                uniqueValues = []
+            elif not entry.get("valuesCapped"):
+                uniqueValues = entry.get("values", [])
+
+        if uniqueValues is None:
+            uniqueValues = distinctValues(targetCollection, payload.collection, payload.attribute)
         uniqueValues = [x for x in uniqueValues if not (isinstance(x, float) and math.isnan(x))]
         attributeValues = sorted(uniqueValues)
         if attributeValues:
@@ -218,58 +369,102 @@ async def getFilterCollectionAttrValues(payload: AttributeValues):
 
     except Exception as e:
         return {"status": "error", "message": str(e)}
+    finally:
+        targetClient.close()
 
 
 @router.put("/generatedGraphs")
-async def addGeneratedGraphs(payload: GeneratedGraphs):
+async def addGeneratedGraphs(
+    payload: GeneratedGraphs, eventBus: EventBus = Depends(getEventBus)
+):
     """
-    Caches the graph data in the database.  
+    Caches the graph data in the database. Points are downsampled and stored
+    column-wise, with compression for large payloads.
     """
     connection = getConnection("graphs")
     collection, client = connection["collection"], connection["client"]
 
-    latest = collection.find().sort({"_id":-1}).limit(1)
-    dataList = list(latest)
-    dataList = [cleanData(item) for item in dataList]
-    nextId = 1 if not dataList else dataList[0]["_id"] + 1
-    
-    graph = {
-        "_id": nextId,  
-        "graphtype": payload.graphType,
-        "data": payload.data,
-        "properties": payload.properties,
-        "attributes": payload.attributes
-    }
-
     try:
+        nextId = nextGraphId(collection)
+        points = downsampleRows(payload.data)
+        graph = {
+            "_id": nextId,  
+            "graphtype": payload.graphType,
+            "series": encodeSeries(points),
+            "pointCount": len(payload.data),
+            "storedPointCount": len(points),
+            "properties": payload.properties,
+            "attributes": payload.attributes
+        }
+        if payload.query:
+            graph["query"] = payload.query
+
         collection.insert_one(graph)
-        return {"status": "success", "message": f"Added generated graph {graph} to storage."}
+        collection.database[REVISIONS_COLLECTION].bulk_write(buildRevisionUpdates(["graphs"]))
+        metadata = {
+            field: value for field, value in graph.items()
+            if field not in GRAPH_METADATA_PROJECTION
+        }
+        eventBus.publish("graphs", INSERT, key="_id", documents=[metadata])
+        return {"status": "success", "message": f"Added generated graph {nextId} to storage."}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generated graph: {str(e)}")
     finally:
         client.close()
 
 
-@router.post("/generatedGraphs/latest")
-async def getLastestGraph(payload: GeneratedGraphRequest):
+@router.get("/generatedGraphs/latest", dependencies=[Depends(conditionalOn("graphs"))])
+async def getLastestGraph(latest: Optional[int] = None, includeData: bool = False):
     """
-    Fetches the latest number of generated graphs.
+    Fetches the `latest` generated graphs, all of them when not positive.
+    Only graph metadata is returned unless includeData is set; points can be
+    loaded per graph from /generatedGraphs/data.
     """
     connection = getConnection("graphs")
     collection, client = connection["collection"], connection["client"]
 
     try:
-        limit = payload.latest if payload.latest and payload.latest > 0 else 0
-        latestGraphs = list(collection.find().sort("_id", -1).limit(limit))
+        limit = latest if latest and latest > 0 else 0
+        projection = None if includeData else GRAPH_METADATA_PROJECTION
+        latestGraphs = list(collection.find({}, projection).sort("_id", -1).limit(limit))
+        if includeData:
+            for graph in latestGraphs:
+                graph["data"] = loadGraphData(graph)
+                graph.pop("series", None)
         return latestGraphs
     except Exception as e: 
-        raise HTTPException(status_code=500, detail=f"Error in retreaving latest {payload.latest} graphs: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error in retreaving latest {latest} graphs: {str(e)}")
+    finally:
+        client.close()
+
+
+@router.post("/generatedGraphs/data")
+async def getGraphData(payload: GraphDataRequest):
+    """
+    Fetches a single saved graph including its points.
+    """
+    connection = getConnection("graphs")
+    collection, client = connection["collection"], connection["client"]
+
+    try:
+        graph = collection.find_one({"_id": payload.graphId})
+        if not graph:
+            raise HTTPException(status_code=404, detail="Graph not found.")
+        graph["data"] = loadGraphData(graph)
+        graph.pop("series", None)
+        return graph
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching graph {payload.graphId}: {str(e)}")
     finally:
         client.close()
 
 
 @router.delete("/generatedGraphs/remove-graph")
-async def removeGraph(payload: RemoveGraphRequest):
+async def removeGraph(
+    payload: RemoveGraphRequest, eventBus: EventBus = Depends(getEventBus)
+):
     """
     Removes a graph from the graphs collection.
     """
@@ -282,6 +477,8 @@ async def removeGraph(payload: RemoveGraphRequest):
         )
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Graph not found.")
+        collection.database[REVISIONS_COLLECTION].bulk_write(buildRevisionUpdates(["graphs"]))
+        eventBus.publish("graphs", DELETE, key="_id", ids=[payload.graphId])
         return {
             "status": "success",
             "message": f"Successfully removed graph {payload.graphId}",
@@ -0,0 +1,97 @@
+# -----------------------------------------------------------------------------
+# Primary author: Jason T
+# Year: 2025
+# Purpose: Live ingestion endpoints for samples streamed by a lab-side agent
+# while an experiment runs.
+# -----------------------------------------------------------------------------
+
+import asyncio
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect
+
+from dependencies import getLiveIngestService
+from services.liveIngestService import LiveIngestService
+
+router = APIRouter()
+logger = logging.getLogger('LiveIngest')
+
+
+# Routes
+@router.websocket("/live/{experimentId}")
+async def liveIngest(
+    websocket: WebSocket, experimentId: str,
+    liveIngestService: LiveIngestService = Depends(getLiveIngestService)
+):
+    """
+    Receives samples for an experiment as JSON messages, either one sample
+    object or {"samples": [...]}. Samples are inserted in batches, and after
+    each batch an update with the rolling efficiencies is sent back.
+    """
+    await websocket.accept()
+    session = await liveIngestService.openSession(experimentId)
+    if session is None:
+        await websocket.close(code=1008, reason=f"No experiment found for {experimentId}")
+        return
+
+    sendLock = asyncio.Lock()
+    stop = asyncio.Event()
+
+    async def send(message):
+        async with sendLock:
+            await websocket.send_json(message)
+
+    async def flush():
+        try:
+            update = await session.flush()
+        except Exception as e:
+            logger.error(f"Error storing live samples for {experimentId}: {e}")
+            update = {"type": "error", "detail": f"Error storing samples: {e}"}
+        if update and not stop.is_set():
+            await send(update)
+
+    async def flushPeriodically():
+        # Writes samples that arrive too slowly to fill a batch
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), liveIngestService.flushSeconds)
+            except asyncio.TimeoutError:
+                await flush()
+
+    flusher = asyncio.create_task(flushPeriodically())
+    try:
+        while True:
+            try:
+                message = await websocket.receive_json()
+                if isinstance(message, dict):
+                    message = message.get("samples", [message])
+                session.add(message if isinstance(message, list) else [message])
+            except ValueError as e:
+                await send({"type": "error", "detail": str(e)})
+                continue
+            if session.shouldFlush():
+                await flush()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        stop.set()
+        await asyncio.gather(flusher, return_exceptions=True)
+        # Store what is left in the buffer; the agent is gone, so no update
+        try:
+            await session.close()
+        except Exception as e:
+            logger.error(f"Error storing live samples for {experimentId}: {e}")
+
+
+@router.get("/live/{experimentId}/efficiencies")
+async def getLiveEfficiencies(
+    experimentId: str,
+    liveIngestService: LiveIngestService = Depends(getLiveIngestService)
+):
+    """Rolling efficiencies of an experiment from its live bins."""
+    efficiencies = await liveIngestService.getEfficiencies(experimentId)
+    if efficiencies is None:
+        raise HTTPException(
+            status_code=404, detail=f"No live data found for experimentId: {experimentId}"
+        )
+    return {"status": "success", "data": efficiencies}
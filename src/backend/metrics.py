@@ -0,0 +1,240 @@
+# -----------------------------------------------------------------------------
+# Primary author: Jason T
+# Year: 2025
+# Purpose: In-process metrics (request latency, MongoDB commands, hot-path
+# timings) exposed in the Prometheus text format.
+# -----------------------------------------------------------------------------
+
+import threading
+import time
+from contextlib import contextmanager
+
+from pymongo import monitoring
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+
+def formatLabels(labelNames: tuple, labelValues: tuple) -> str:
+    if not labelNames:
+        return ""
+    pairs = []
+    for name, value in zip(labelNames, labelValues):
+        escaped = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    def __init__(self, name: str, documentation: str, labelNames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelNames = labelNames
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1, *labelValues):
+        with self.lock:
+            self.values[labelValues] = self.values.get(labelValues, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for labelValues, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{formatLabels(self.labelNames, labelValues)} {value}")
+        return lines
+
+
+class Histogram:
+    """Cumulative histogram with optional labels."""
+
+    def __init__(
+        self, name: str, documentation: str, labelNames: tuple = (),
+        buckets: tuple = DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelNames = labelNames
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, *labelValues):
+        with self.lock:
+            series = self.series.get(labelValues)
+            if series is None:
+                series = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+                self.series[labelValues] = series
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        bucketNames = self.labelNames + ("le",)
+        with self.lock:
+            for labelValues, series in sorted(self.series.items()):
+                for bound, count in zip(self.buckets, series["counts"]):
+                    labels = formatLabels(bucketNames, labelValues + (bound,))
+                    lines.append(f"{self.name}_bucket{labels} {count}")
+                labels = formatLabels(bucketNames, labelValues + ("+Inf",))
+                lines.append(f"{self.name}_bucket{labels} {series['count']}")
+                labels = formatLabels(self.labelNames, labelValues)
+                lines.append(f"{self.name}_sum{labels} {series['sum']}")
+                lines.append(f"{self.name}_count{labels} {series['count']}")
+        return lines
+
+
+# Metric definitions
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Time spent handling HTTP requests, by route template.",
+    ("method", "route", "status"),
+)
+RESPONSE_BYTES = Counter(
+    "http_response_bytes_total",
+    "Bytes sent in HTTP response bodies, by route template.",
+    ("method", "route"),
+)
+MONGO_COMMAND_DURATION = Histogram(
+    "mongo_command_duration_seconds",
+    "Duration of MongoDB commands, by command name.",
+    ("command", "collection"),
+)
+MONGO_COMMANDS = Counter(
+    "mongo_commands_total",
+    "MongoDB commands issued, by command name and outcome.",
+    ("command", "collection", "status"),
+)
+MONGO_DOCUMENTS_RETURNED = Counter(
+    "mongo_documents_returned_total",
+    "Documents returned by MongoDB cursors, by command name.",
+    ("command", "collection"),
+)
+OPERATION_DURATION = Histogram(
+    "operation_duration_seconds",
+    "Time spent in instrumented hot paths (cleaning, parsing, calculations).",
+    ("operation",),
+)
+
+REGISTRY = (
+    REQUEST_DURATION,
+    RESPONSE_BYTES,
+    MONGO_COMMAND_DURATION,
+    MONGO_COMMANDS,
+    MONGO_DOCUMENTS_RETURNED,
+    OPERATION_DURATION,
+)
+
+
+def renderMetrics() -> str:
+    """Renders every registered metric in the Prometheus text format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def timed(operation: str):
+    """
+    Records the duration of a block under `operation`. Also usable as a
+    function decorator.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        OPERATION_DURATION.observe(time.perf_counter() - start, operation)
+
+
+# MongoDB command monitoring
+class MongoCommandListener(monitoring.CommandListener):
+    """
+    Records the duration and outcome of every MongoDB command, for both the
+    PyMongo connections and the Motor clients, which share PyMongo's
+    monitoring hooks.
+    """
+
+    def __init__(self):
+        self.collections = {}
+        self.lock = threading.Lock()
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = ""
+        if event.command_name == "getMore":
+            collection = event.command.get("collection", "")
+        with self.lock:
+            self.collections[(event.connection_id, event.request_id)] = collection
+
+    def popCollection(self, event) -> str:
+        with self.lock:
+            return self.collections.pop((event.connection_id, event.request_id), "")
+
+    def succeeded(self, event):
+        collection = self.popCollection(event)
+        command = event.command_name
+        MONGO_COMMAND_DURATION.observe(event.duration_micros / 1e6, command, collection)
+        MONGO_COMMANDS.inc(1, command, collection, "success")
+
+        cursor = event.reply.get("cursor") if isinstance(event.reply, dict) else None
+        if cursor:
+            batch = cursor.get("firstBatch", cursor.get("nextBatch", []))
+            MONGO_DOCUMENTS_RETURNED.inc(len(batch), command, collection)
+
+    def failed(self, event):
+        collection = self.popCollection(event)
+        command = event.command_name
+        MONGO_COMMAND_DURATION.observe(event.duration_micros / 1e6, command, collection)
+        MONGO_COMMANDS.inc(1, command, collection, "failure")
+
+
+# Registered globally so it applies to every client created afterwards
+monitoring.register(MongoCommandListener())
+
+
+# Request timing
+class MetricsMiddleware:
+    """
+    ASGI middleware recording per-route latency and response size. Routes are
+    labelled by their path template so path parameters do not create new
+    series.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = {"code": 500}
+        bodyBytes = 0
+
+        async def sendWrapper(message):
+            nonlocal bodyBytes
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            elif message["type"] == "http.response.body":
+                bodyBytes += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, sendWrapper)
+        finally:
+            route = scope.get("route")
+            routePath = getattr(route, "path", None) or "unmatched"
+            method = scope.get("method", "")
+            REQUEST_DURATION.observe(
+                time.perf_counter() - start, method, routePath, str(status["code"])
+            )
+            RESPONSE_BYTES.inc(bodyBytes, method, routePath)
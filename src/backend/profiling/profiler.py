@@ -0,0 +1,224 @@
+# -----------------------------------------------------------------------------
+# Primary author: Jason T
+# Year: 2025
+# Purpose: Opt-in sampling profiler for individual requests, with results kept
+# in a bounded in-memory ring buffer.
+# -----------------------------------------------------------------------------
+
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from datetime import datetime
+from urllib.parse import parse_qs
+
+from services.userService import UserService
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_QUERY_PARAMETER = "profile"
+SESSION_HEADER = b"x-session-token"
+PROFILER_ROLES = ("admin",)
+
+SAMPLE_INTERVAL = 0.001
+PROFILE_BUFFER_SIZE = 20
+MAX_STACK_DEPTH = 128
+
+
+class StackSampler:
+    """
+    Periodically samples the stack of one thread from a background thread.
+    Samples are aggregated per unique stack, so memory grows with the number
+    of distinct code paths rather than with the request duration. With a
+    `rootFrame`, only stacks running under that frame are kept, which on the
+    event loop thread excludes the other requests it serves meanwhile.
+    """
+
+    def __init__(self, threadId: int, interval: float = SAMPLE_INTERVAL, rootFrame=None):
+        self.threadId = threadId
+        self.interval = interval
+        self.rootFrame = rootFrame
+        self.samples = Counter()
+        self.stopEvent = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        ownFile = __file__
+        while not self.stopEvent.wait(self.interval):
+            frame = sys._current_frames().get(self.threadId)
+            stack = []
+            underRoot = self.rootFrame is None
+            while frame is not None:
+                underRoot = underRoot or frame is self.rootFrame
+                code = frame.f_code
+                if code.co_filename != ownFile and len(stack) < MAX_STACK_DEPTH:
+                    stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                frame = frame.f_back
+            if stack and underRoot:
+                self.samples[tuple(reversed(stack))] += 1
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self) -> Counter:
+        self.stopEvent.set()
+        self.thread.join()
+        self.rootFrame = None
+        return self.samples
+
+
+class ProfileStore:
+    """Thread-safe ring buffer holding the most recent request profiles."""
+
+    def __init__(self, size: int = PROFILE_BUFFER_SIZE):
+        self.profiles = deque(maxlen=size)
+        self.lock = threading.Lock()
+
+    def add(self, profile: dict):
+        with self.lock:
+            self.profiles.append(profile)
+
+    def list(self) -> list[dict]:
+        with self.lock:
+            return [
+                {key: value for key, value in profile.items() if key != "samples"}
+                for profile in reversed(self.profiles)
+            ]
+
+    def get(self, profileId: str) -> dict | None:
+        with self.lock:
+            for profile in self.profiles:
+                if profile["id"] == profileId:
+                    return profile
+        return None
+
+
+profileStore = ProfileStore()
+
+
+def frameName(frame: tuple) -> str:
+    name, filename, line = frame
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def toCollapsed(profile: dict) -> str:
+    """Renders a profile as collapsed stacks, as read by flamegraph.pl."""
+    lines = [
+        ";".join(frameName(frame) for frame in stack) + f" {count}"
+        for stack, count in profile["samples"].items()
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def toSpeedscope(profile: dict) -> dict:
+    """Renders a profile in the speedscope sampled-profile file format."""
+    frames, frameIndex = [], {}
+    samples, weights = [], []
+    intervalMs = profile["intervalMs"]
+
+    for stack, count in profile["samples"].items():
+        indices = []
+        for frame in stack:
+            if frame not in frameIndex:
+                frameIndex[frame] = len(frames)
+                name, filename, line = frame
+                frames.append({"name": name, "file": filename, "line": line})
+            indices.append(frameIndex[frame])
+        samples.append(indices)
+        weights.append(count * intervalMs)
+
+    name = f"{profile['method']} {profile['path']}"
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": name,
+        "exporter": "alkalytics",
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": name,
+            "unit": "milliseconds",
+            "startValue": 0,
+            "endValue": sum(weights),
+            "samples": samples,
+            "weights": weights,
+        }],
+    }
+
+
+async def isProfilerAuthorized(
+    userService: UserService, sessionToken: str | None
+) -> bool:
+    """Checks that a session token belongs to a user allowed to profile."""
+    if not sessionToken:
+        return False
+    user = await userService.getCurrentUserAndRole(sessionToken)
+    return bool(user) and user["role"] in PROFILER_ROLES
+
+
+def getHeader(scope, name: bytes) -> str | None:
+    for key, value in scope.get("headers", []):
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def isProfileRequested(scope) -> bool:
+    """Whether a request carries the profile header or a `profile=1` query parameter."""
+    if getHeader(scope, PROFILE_HEADER):
+        return True
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    return query.get(PROFILE_QUERY_PARAMETER) == ["1"]
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware that profiles a request when it carries an `X-Profile`
+    header or a `profile=1` query flag and an admin `X-Session-Token`. The
+    profile ID is returned in the `X-Profile-Id` response header. Requests
+    without the flag only pay for a header lookup. Only stacks of the
+    request's own task are sampled; work it hands to a thread pool is not.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not isProfileRequested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        userService = scope["app"].state.userService
+        if not await isProfilerAuthorized(userService, getHeader(scope, SESSION_HEADER)):
+            # Unauthorized profiling requests run normally, unprofiled
+            await self.app(scope, receive, send)
+            return
+
+        profileId = uuid.uuid4().hex
+        # Stacks running under this call belong to this request's task
+        sampler = StackSampler(threading.get_ident(), rootFrame=sys._getframe())
+
+        async def sendWrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile-id", profileId.encode("ascii")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        startedAt = datetime.now()
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, sendWrapper)
+        finally:
+            samples = sampler.stop()
+            profileStore.add({
+                "id": profileId,
+                "method": scope.get("method", ""),
+                "path": scope.get("path", ""),
+                "startedAt": startedAt.isoformat(),
+                "durationMs": (time.perf_counter() - start) * 1000,
+                "intervalMs": SAMPLE_INTERVAL * 1000,
+                "sampleCount": sum(samples.values()),
+                "samples": samples,
+            })
@@ -0,0 +1,71 @@
+# -----------------------------------------------------------------------------
+# Primary author: Jason T
+# Year: 2025
+# Purpose: Admin-only endpoints for listing and downloading request profiles.
+# -----------------------------------------------------------------------------
+
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from dependencies import getUserService
+from profiling.profiler import (
+    isProfilerAuthorized,
+    profileStore,
+    toCollapsed,
+    toSpeedscope
+)
+from services.userService import UserService
+
+router = APIRouter()
+
+
+# Helper functions
+async def requireProfiler(userService: UserService, sessionToken: Optional[str]):
+    """Raise unless the session token belongs to an admin."""
+    if not await isProfilerAuthorized(userService, sessionToken):
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+
+# Routes
+@router.get("/profiles")
+async def getProfiles(
+    x_session_token: Optional[str] = Header(None),
+    userService: UserService = Depends(getUserService)
+):
+    """
+    Lists the request profiles currently held in the ring buffer.
+    """
+    await requireProfiler(userService, x_session_token)
+    return {"status": "success", "data": profileStore.list()}
+
+
+@router.get("/profiles/{profileId}")
+async def downloadProfile(
+    profileId: str,
+    format: str = "speedscope",
+    x_session_token: Optional[str] = Header(None),
+    userService: UserService = Depends(getUserService)
+):
+    """
+    Downloads a request profile as a speedscope file or as collapsed stacks
+    for flamegraph tools.
+    """
+    await requireProfiler(userService, x_session_token)
+    profile = profileStore.get(profileId)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found.")
+
+    disposition = f'attachment; filename="profile-{profileId}'
+    if format == "collapsed":
+        return PlainTextResponse(
+            toCollapsed(profile),
+            headers={"Content-Disposition": disposition + '.folded"'}
+        )
+    if format == "speedscope":
+        return JSONResponse(
+            toSpeedscope(profile),
+            headers={"Content-Disposition": disposition + '.speedscope.json"'}
+        )
+    raise HTTPException(status_code=400, detail=f"Unknown profile format: {format}")
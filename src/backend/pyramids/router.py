@@ -0,0 +1,121 @@
+# -----------------------------------------------------------------------------
+# Primary author: Jennifer Y
+# Year: 2025
+# Purpose: Tile endpoints serving experiment data from its downsample pyramid
+# at the resolution a plot needs for its time window and width.
+# -----------------------------------------------------------------------------
+
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+
+from database import getConnection
+from dependencies import getMigrationService
+from utils import cleanData
+from services.migrationService import MigrationService
+from services.pyramidService import (
+    DEFAULT_TILE_PIXELS,
+    MAX_TILE_PIXELS,
+    assembleTile,
+    chooseLevel,
+    parseWindowTime,
+    tileQuery
+)
+
+router = APIRouter()
+
+
+# Helper functions
+def parseWindow(start: Optional[str], end: Optional[str], pyramid: dict):
+    """Window in epoch seconds, defaulting to the whole run."""
+    try:
+        window = (
+            parseWindowTime(start) if start else pyramid["start"],
+            parseWindowTime(end) if end else pyramid["end"],
+        )
+    except ValueError:
+        raise HTTPException(
+            status_code=400, detail="start and end must use the format YYYY/MM/DD HH:MM:SS."
+        )
+    if window[1] < window[0]:
+        raise HTTPException(status_code=400, detail="end must not be before start.")
+    return window
+
+
+# Routes
+@router.get("/pyramids/{experimentId}/tile")
+async def getTile(
+    experimentId: str, attributes: str, start: Optional[str] = None,
+    end: Optional[str] = None, pixels: int = DEFAULT_TILE_PIXELS,
+    migrationService: MigrationService = Depends(getMigrationService)
+):
+    """
+    Fetches the comma-separated `attributes` of an experiment between `start`
+    and `end` (default: the whole run) for a plot `pixels` wide. Values come
+    from the pyramid level whose buckets are closest to a pixel, as columns of
+    bucket start times with the count, mean, min and max of each bucket, so a
+    pan or zoom reads O(pixels) values whatever the length of the run.
+    Experiments imported before pyramids existed are built on first request.
+    """
+    if not 0 < pixels <= MAX_TILE_PIXELS:
+        raise HTTPException(
+            status_code=400, detail=f"pixels must be between 1 and {MAX_TILE_PIXELS}."
+        )
+    names = [name.strip() for name in attributes.split(",") if name.strip()]
+    if not names:
+        raise HTTPException(status_code=400, detail="At least one attribute is required.")
+
+    connection = getConnection("data_pyramids")
+    collection, client = connection["collection"], connection["client"]
+
+    try:
+        pyramid = collection.find_one({"_id": experimentId})
+        if not pyramid:
+            await migrationService.buildPyramid(experimentId)
+            pyramid = collection.find_one({"_id": experimentId})
+        if not pyramid:
+            raise HTTPException(
+                status_code=404, detail=f"No data found for experimentId: {experimentId}"
+            )
+        unknown = [name for name in names if name not in pyramid["attributes"]]
+        if unknown:
+            raise HTTPException(
+                status_code=404, detail=f"No numeric data for attributes: {', '.join(unknown)}"
+            )
+
+        windowStart, windowEnd = parseWindow(start, end, pyramid)
+        level = chooseLevel(windowStart, windowEnd, pixels, pyramid)
+        documents = list(collection.find(
+            tileQuery(pyramid, names, level, windowStart, windowEnd)
+        ))
+        return {
+            "status": "success",
+            "data": cleanData({
+                "experimentId": experimentId,
+                "level": level,
+                "bucketSeconds": 1 << level,
+                "series": assembleTile(documents, names, level, windowStart, windowEnd),
+            }),
+        }
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching tile: {str(e)}")
+    finally:
+        client.close()
+
+
+@router.post("/pyramids/{experimentId}/rebuild")
+async def rebuildExperimentPyramid(
+    experimentId: str,
+    migrationService: MigrationService = Depends(getMigrationService)
+):
+    """
+    Rebuilds the downsample pyramid of one experiment from its data rows.
+    Tiles keep reading the previous pyramid until the new one is complete.
+    """
+    try:
+        await migrationService.buildPyramid(experimentId)
+        return {"status": "success", "message": f"Rebuilt pyramid of {experimentId}."}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error rebuilding pyramid: {str(e)}")
@@ -0,0 +1,473 @@
+# -----------------------------------------------------------------------------
+# Primary author: Jennifer Y
+# Year: 2025
+# Purpose: Maintained attribute catalog for the 'data' and 'experiments'
+# collections, used by the graph-builder dropdowns.
+# -----------------------------------------------------------------------------
+
+import asyncio
+import logging
+import math
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from pymongo import DeleteMany, DeleteOne, UpdateOne
+
+from services.schemaService import applySchema, loadSchema, loadSchemaAsync
+
+CATALOG_COLLECTION = "catalog"
+CATALOGED_COLLECTIONS = ("data", "experiments")
+
+# Maximum number of distinct values kept per field before the value list is
+# dropped and the field is flagged as high-cardinality.
+VALUE_CARDINALITY_CAP = 500
+
+# Stale entries are refreshed shortly after the edit marking them, so bursts
+# of edits are recomputed once, and otherwise checked this often
+CATALOG_REFRESH_DELAY_SECONDS = 2.0
+CATALOG_REFRESH_IDLE_SECONDS = 60.0
+
+
+def inferType(value) -> str:
+    """Maps a Python value to the catalog type name."""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return "null"
+    if isinstance(value, (bool, np.bool_)):
+        return "boolean"
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return "number"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, datetime):
+        return "date"
+    return "object"
+
+
+def catalogId(collectionName: str, field: str) -> str:
+    """Builds the catalog document ID for a collection field."""
+    return f"{collectionName}:{field}"
+
+
+def emptyFieldSummary() -> dict:
+    return {
+        "count": 0,
+        "nullCount": 0,
+        "types": {},
+        "min": None,
+        "max": None,
+        "values": set(),
+        "valuesCapped": False,
+    }
+
+
+def addValue(fieldSummary: dict, value):
+    """Accumulates a single value into a field summary."""
+    valueType = inferType(value)
+    fieldSummary["count"] += 1
+    fieldSummary["types"][valueType] = fieldSummary["types"].get(valueType, 0) + 1
+
+    if valueType == "null":
+        fieldSummary["nullCount"] += 1
+        return
+
+    if valueType == "number":
+        value = value.item() if isinstance(value, np.generic) else value
+        if fieldSummary["min"] is None or value < fieldSummary["min"]:
+            fieldSummary["min"] = value
+        if fieldSummary["max"] is None or value > fieldSummary["max"]:
+            fieldSummary["max"] = value
+
+    if valueType == "object" or fieldSummary["valuesCapped"]:
+        return
+    fieldSummary["values"].add(value)
+    if len(fieldSummary["values"]) > VALUE_CARDINALITY_CAP:
+        fieldSummary["values"] = set()
+        fieldSummary["valuesCapped"] = True
+
+
+def summarizeRecords(records: list[dict]) -> dict:
+    """
+    Summarizes a list of documents into per-field statistics. Intended for the
+    small batches written by the table endpoints.
+    """
+    summary = {}
+    for record in records:
+        for field, value in record.items():
+            if field == "_id":
+                continue
+            if field not in summary:
+                summary[field] = emptyFieldSummary()
+            addValue(summary[field], value)
+    return summary
+
+
+def summarizeDataFrame(df: pd.DataFrame) -> dict:
+    """
+    Summarizes a DataFrame into per-field statistics using column-wise
+    operations, so large data sheets do not pay a per-cell Python cost.
+    """
+    summary = {}
+    for field in df.columns:
+        if field == "_id":
+            continue
+        column = df[field]
+        fieldSummary = emptyFieldSummary()
+        fieldSummary["count"] = len(column)
+
+        nullMask = column.isna()
+        nullCount = int(nullMask.sum())
+        fieldSummary["nullCount"] = nullCount
+        if nullCount:
+            fieldSummary["types"]["null"] = nullCount
+
+        present = column[~nullMask]
+        if pd.api.types.is_bool_dtype(present):
+            fieldSummary["types"]["boolean"] = len(present)
+        elif pd.api.types.is_numeric_dtype(present):
+            fieldSummary["types"]["number"] = len(present)
+            if len(present):
+                fieldSummary["min"] = present.min().item()
+                fieldSummary["max"] = present.max().item()
+        elif pd.api.types.is_datetime64_any_dtype(present):
+            fieldSummary["types"]["date"] = len(present)
+            present = pd.Series([value.to_pydatetime() for value in present], dtype=object)
+        else:
+            # Mixed object columns still need per-value inspection
+            for value in present:
+                addValue(fieldSummary, value)
+            fieldSummary["count"] = len(column)
+            fieldSummary["nullCount"] = nullCount
+            summary[field] = fieldSummary
+            continue
+
+        uniqueValues = pd.unique(present)
+        if len(uniqueValues) > VALUE_CARDINALITY_CAP:
+            fieldSummary["valuesCapped"] = True
+        else:
+            fieldSummary["values"] = {
+                v.item() if isinstance(v, np.generic) else v for v in uniqueValues
+            }
+        summary[field] = fieldSummary
+    return summary
+
+
+def buildCatalogUpdates(collectionName: str, summary: dict) -> list:
+    """
+    Converts a summary into bulk write operations that merge it into the
+    catalog. Counts are incremented and min/max are widened atomically, so
+    concurrent writers never lose updates. The operations can be passed to
+    either a PyMongo or a Motor `bulk_write`.
+    """
+    createdAt = datetime.now()
+    operations = []
+
+    for position, (field, fieldSummary) in enumerate(summary.items()):
+        docId = catalogId(collectionName, field)
+        update = {
+            "$setOnInsert": {
+                "collection": collectionName,
+                "field": field,
+                "createdAt": createdAt,
+                "position": position,
+            },
+            "$inc": {
+                "count": fieldSummary["count"],
+                "nullCount": fieldSummary["nullCount"],
+                **{
+                    f"types.{valueType}": n
+                    for valueType, n in fieldSummary["types"].items()
+                },
+            },
+        }
+        if fieldSummary["min"] is not None:
+            update["$min"] = {"min": fieldSummary["min"]}
+            update["$max"] = {"max": fieldSummary["max"]}
+        operations.append(UpdateOne({"_id": docId}, update, upsert=True))
+
+        if fieldSummary["valuesCapped"]:
+            operations.append(UpdateOne(
+                {"_id": docId},
+                {"$set": {"valuesCapped": True}, "$unset": {"values": ""}}
+            ))
+        elif fieldSummary["values"]:
+            operations.append(UpdateOne(
+                {"_id": docId, "valuesCapped": {"$ne": True}},
+                {"$addToSet": {"values": {"$each": list(fieldSummary["values"])}}}
+            ))
+            # Drop the value list once the merged set exceeds the cap
+            operations.append(UpdateOne(
+                {"_id": docId, f"values.{VALUE_CARDINALITY_CAP}": {"$exists": True}},
+                {"$set": {"valuesCapped": True}, "$unset": {"values": ""}}
+            ))
+
+    return operations
+
+
+def buildFieldRemoval(collectionName: str, field: str) -> list:
+    """Builds the operations that drop a field from the catalog."""
+    return [DeleteOne({"_id": catalogId(collectionName, field)})]
+
+
+def buildFieldReset(
+    collectionName: str, field: str, defaultValue, docCount: int
+) -> list:
+    """
+    Builds the operations for a field that was set to the same value on every
+    document, replacing whatever the catalog knew about it.
+    """
+    fieldSummary = emptyFieldSummary()
+    if docCount:
+        addValue(fieldSummary, defaultValue)
+        fieldSummary["count"] = docCount
+        fieldSummary["types"] = {inferType(defaultValue): docCount}
+        fieldSummary["nullCount"] = docCount if defaultValue is None else 0
+
+    return (
+        buildFieldRemoval(collectionName, field)
+        + buildCatalogUpdates(collectionName, {field: fieldSummary})
+    )
+
+
+def buildFieldRefresh(collectionName: str, documents: list[dict], fields: list[str]) -> list:
+    """
+    Builds the operations replacing the catalog entries of `fields` with
+    statistics recomputed from `documents`, for edits that may have removed
+    values as well as added them. Entries keep their place in the catalog
+    order; fields no document holds are dropped.
+    """
+    summary = summarizeRecords([
+        {field: document[field] for field in fields if field in document}
+        for document in documents
+    ])
+    createdAt = datetime.now()
+    operations = []
+
+    for field in fields:
+        if field not in summary:
+            operations += buildFieldRemoval(collectionName, field)
+            continue
+        fieldSummary = summary[field]
+        stats = {
+            "count": fieldSummary["count"],
+            "nullCount": fieldSummary["nullCount"],
+            "types": fieldSummary["types"],
+            "min": fieldSummary["min"],
+            "max": fieldSummary["max"],
+        }
+        if fieldSummary["valuesCapped"]:
+            update = {"$set": {**stats, "valuesCapped": True}, "$unset": {"values": ""}}
+        else:
+            update = {
+                "$set": {**stats, "values": list(fieldSummary["values"])},
+                "$unset": {"valuesCapped": ""},
+            }
+        update["$setOnInsert"] = {
+            "collection": collectionName,
+            "field": field,
+            "createdAt": createdAt,
+            "position": 0,
+        }
+        operations.append(
+            UpdateOne({"_id": catalogId(collectionName, field)}, update, upsert=True)
+        )
+
+    return operations
+
+
+def buildRecordRemoval(collectionName: str, records: list[dict]) -> list:
+    """
+    Builds the operations taking documents, or the old values of edited
+    fields, out of the catalog. Counts are decremented at once; min, max and
+    the value list cannot be narrowed without reading the other documents,
+    so entries that may have held a removed value are marked stale for the
+    CatalogRefreshService to recompute. Entries left without documents are
+    dropped.
+    """
+    summary = summarizeRecords(records)
+    operations = []
+
+    for field, fieldSummary in summary.items():
+        docId = catalogId(collectionName, field)
+        operations.append(UpdateOne({"_id": docId}, {"$inc": {
+            "count": -fieldSummary["count"],
+            "nullCount": -fieldSummary["nullCount"],
+            **{
+                f"types.{valueType}": -n
+                for valueType, n in fieldSummary["types"].items()
+            },
+        }}))
+
+        if fieldSummary["valuesCapped"]:
+            operations.append(UpdateOne({"_id": docId}, {"$inc": {"stale": 1}}))
+        elif fieldSummary["values"]:
+            removed = list(fieldSummary["values"])
+            extremes = [
+                value for value in (fieldSummary["min"], fieldSummary["max"])
+                if value is not None
+            ]
+            operations.append(UpdateOne(
+                {"_id": docId, "$or": [
+                    {"values": {"$in": removed}},
+                    {"min": {"$in": extremes}},
+                    {"max": {"$in": extremes}},
+                ]},
+                {"$inc": {"stale": 1}}
+            ))
+
+    if summary:
+        operations.append(DeleteMany({
+            "collection": collectionName,
+            "field": {"$in": list(summary)},
+            "count": {"$lte": 0},
+        }))
+    return operations
+
+
+def buildRecordEdit(collectionName: str, before: dict, after: dict) -> list:
+    """
+    Builds the operations for a document whose fields changed from the
+    values in `before` to those in `after`, both holding only the edited
+    fields. Fields whose value did not change are left alone.
+    """
+    changed = [
+        field for field, value in after.items()
+        if field not in before or before[field] != value
+    ]
+    if not changed:
+        return []
+    return (
+        buildCatalogUpdates(collectionName, summarizeRecords([
+            {field: after[field] for field in changed}
+        ]))
+        + buildRecordRemoval(collectionName, [
+            {field: before[field] for field in changed if field in before}
+        ])
+    )
+
+
+def rebuildCatalog(collection, catalog, batchSize: int = 5000):
+    """
+    Recomputes the catalog entries of a collection from scratch. Used to
+    bootstrap the catalog for databases populated before it existed.
+    Experiments are summarized as their schema describes them.
+    """
+    collectionName = collection.name
+    schema = (
+        loadSchema(collection.database["config"])
+        if collectionName == "experiments" else None
+    )
+    catalog.bulk_write([DeleteMany({"collection": collectionName})])
+
+    def summarize(batch):
+        if schema:
+            batch = applySchema(batch, schema)
+        catalog.bulk_write(buildCatalogUpdates(collectionName, summarizeRecords(batch)))
+
+    batch = []
+    for document in collection.find({}, batch_size=batchSize):
+        batch.append(document)
+        if len(batch) >= batchSize:
+            summarize(batch)
+            batch = []
+    if batch:
+        summarize(batch)
+
+
+def ensureCatalog(collection, catalog):
+    """Bootstraps the catalog for a collection if it has no entries yet."""
+    if catalog.count_documents({"collection": collection.name}, limit=1) == 0:
+        rebuildCatalog(collection, catalog)
+
+
+def getCatalogFields(catalog, collectionName: str) -> list[dict]:
+    """Fetches the catalog entries of a collection in first-seen order."""
+    return list(
+        catalog.find({"collection": collectionName}).sort(
+            [("createdAt", 1), ("position", 1)]
+        )
+    )
+
+
+class CatalogRefreshService:
+    """
+    Background job recomputing the catalog entries that edits and deletions
+    marked stale. Each entry is recomputed from the field's values across
+    its collection; an entry marked again meanwhile stays stale and is
+    recomputed on the next pass.
+    """
+
+    def __init__(
+        self, database, delaySeconds: float = CATALOG_REFRESH_DELAY_SECONDS,
+        idleSeconds: float = CATALOG_REFRESH_IDLE_SECONDS
+    ):
+        self.database = database
+        self.catalogCollection = database[CATALOG_COLLECTION]
+        self.delaySeconds = delaySeconds
+        self.idleSeconds = idleSeconds
+        self.wakeup = asyncio.Event()
+        self.task = None
+        self.logger = logging.getLogger('CatalogRefresh')
+
+    async def start(self):
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+    def wake(self):
+        """Refresh stale entries soon rather than at the next idle check."""
+        self.wakeup.set()
+
+    async def run(self):
+        while True:
+            if await self.waitForWakeup():
+                await asyncio.sleep(self.delaySeconds)
+            self.wakeup.clear()
+            try:
+                await self.refreshOnce()
+            except Exception as e:
+                self.logger.error(f"Catalog refresh failed: {e}")
+
+    async def waitForWakeup(self) -> bool:
+        """
+        Waits for wake() or the idle interval. Unlike asyncio.wait_for, a
+        stop() arriving just as wake() is called is not swallowed.
+        """
+        waiting = asyncio.ensure_future(self.wakeup.wait())
+        try:
+            done, _ = await asyncio.wait({waiting}, timeout=self.idleSeconds)
+            return bool(done)
+        finally:
+            waiting.cancel()
+
+    async def refreshOnce(self) -> int:
+        """Recomputes every stale entry. Returns the number of entries refreshed."""
+        entries = await self.catalogCollection.find(
+            {"stale": {"$gt": 0}}, {"collection": 1, "field": 1, "stale": 1}
+        ).to_list(None)
+        fieldsByCollection = {}
+        for entry in entries:
+            fieldsByCollection.setdefault(entry["collection"], []).append(entry["field"])
+
+        for collectionName, fields in fieldsByCollection.items():
+            projection = {field: 1 for field in fields}
+            documents = await self.database[collectionName].find(
+                {}, {"_id": 0, **projection}
+            ).to_list(None)
+            if collectionName == "experiments":
+                schema = await loadSchemaAsync(self.database["config"])
+                documents = applySchema(documents, schema, fields=projection)
+            await self.catalogCollection.bulk_write(
+                buildFieldRefresh(collectionName, documents, fields)
+            )
+
+        for entry in entries:
+            await self.catalogCollection.update_one(
+                {"_id": entry["_id"], "stale": entry["stale"]},
+                {"$unset": {"stale": ""}}
+            )
+        return len(entries)
@@ -0,0 +1,52 @@
+# -----------------------------------------------------------------------------
+# Primary author: Jason T
+# Year: 2025
+# Purpose: HTTP conditional request helpers. Read endpoints are tagged with the
+# revision of the collections they read, so unchanged responses are answered
+# with 304 Not Modified without running their queries.
+# -----------------------------------------------------------------------------
+
+import hashlib
+from datetime import datetime
+from email.utils import format_datetime
+
+# Caches may store responses but must revalidate them, which costs a 304
+CACHE_CONTROL = "no-cache"
+
+
+def requestVariant(method: str, path: str, query: str, body: bytes = b"") -> str:
+    """
+    Short digest of what selects a representation, so requests to other
+    endpoints or with other parameters never share an ETag.
+    """
+    digest = hashlib.sha1()
+    for part in (method.encode(), path.encode(), query.encode(), body):
+        digest.update(part)
+        digest.update(b"\0")
+    return digest.hexdigest()[:12]
+
+
+def entityTag(revision: str, variant: str) -> str:
+    """Weak ETag of a response: the revision of what it read, and its variant."""
+    return f'W/"{revision}-{variant}"'
+
+
+def matchesEntityTag(ifNoneMatch: str, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag."""
+    if not ifNoneMatch:
+        return False
+    if ifNoneMatch.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in ifNoneMatch.split(",")
+    )
+
+
+def cacheHeaders(etag: str, lastModified: datetime) -> dict:
+    return {
+        "ETag": etag,
+        "Last-Modified": format_datetime(lastModified.replace(microsecond=0), usegmt=True),
+        "Cache-Control": CACHE_CONTROL,
+    }
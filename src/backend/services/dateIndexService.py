@@ -0,0 +1,107 @@
+# -----------------------------------------------------------------------------
+# Primary author: Jennifer Y
+# Year: 2025
+# Purpose: Maintained date -> experimentIds lookup used by the graph filters.
+# -----------------------------------------------------------------------------
+
+from datetime import datetime
+
+from pymongo import DeleteMany, ReplaceOne, UpdateMany, UpdateOne
+
+from services.revisionService import REVISIONS_COLLECTION, buildRevisionUpdates
+
+DATE_INDEX_COLLECTION = "experimentDates"
+
+
+def normalizeDate(value) -> str | None:
+    """Returns the 'YYYY-MM-DD' form of an experiment date, if it has one."""
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d")
+    if isinstance(value, str) and value:
+        return value
+    return None
+
+
+def groupExperimentIdsByDate(experiments) -> dict[str, list[str]]:
+    """Groups experimentIds under the normalized form of their dates."""
+    experimentIdsByDate = {}
+    for experiment in experiments:
+        date = normalizeDate(experiment.get("Date"))
+        experimentId = experiment.get("experimentId")
+        if date is None or experimentId is None:
+            continue
+        experimentIdsByDate.setdefault(date, []).append(experimentId)
+    return experimentIdsByDate
+
+
+def buildDateIndexUpdates(experiments: list[dict]) -> list:
+    """
+    Builds the bulk write operations that add experiments to the date index.
+    The operations can be passed to either a PyMongo or a Motor `bulk_write`.
+    """
+    return [
+        UpdateOne(
+            {"_id": date},
+            {"$addToSet": {"experimentIds": {"$each": experimentIds}}},
+            upsert=True
+        )
+        for date, experimentIds in groupExperimentIdsByDate(experiments).items()
+    ]
+
+
+def buildDateIndexRemoval(experimentIds: list[str]) -> list:
+    """Builds the operations that drop experiments from the date index."""
+    return [
+        UpdateMany(
+            {"experimentIds": {"$in": experimentIds}},
+            {"$pull": {"experimentIds": {"$in": experimentIds}}}
+        ),
+        DeleteMany({"experimentIds": {"$size": 0}}),
+    ]
+
+
+def buildDateIndexRebuild(experiments) -> list:
+    """
+    Builds the operations replacing the date index with the dates of the
+    given experiments, grouped with normalizeDate as incremental updates are.
+    Dates no experiment has anymore are dropped.
+    """
+    experimentIdsByDate = groupExperimentIdsByDate(experiments)
+    operations = [
+        ReplaceOne(
+            {"_id": date},
+            {"_id": date, "experimentIds": sorted(set(experimentIds))},
+            upsert=True
+        )
+        for date, experimentIds in experimentIdsByDate.items()
+    ]
+    operations.append(DeleteMany({"_id": {"$nin": list(experimentIdsByDate)}}))
+    return operations
+
+
+def rebuildDateIndex(experiments, dateIndex):
+    """Recomputes the date index from the 'experiments' collection."""
+    dateIndex.bulk_write(buildDateIndexRebuild(
+        experiments.find({}, {"_id": 0, "Date": 1, "experimentId": 1})
+    ))
+    dateIndex.create_index("experimentIds")
+    dateIndex.database[REVISIONS_COLLECTION].bulk_write(
+        buildRevisionUpdates([dateIndex.name])
+    )
+
+
+def getIndexedDates(dateIndex, experimentIds: list[str] | None = None) -> list[str]:
+    """
+    Fetches the sorted list of dates, optionally restricted to the dates of the
+    given experiments.
+    """
+    query = {} if experimentIds is None else {"experimentIds": {"$in": experimentIds}}
+    return [doc["_id"] for doc in dateIndex.find(query, {"_id": 1}).sort("_id", 1)]
+
+
+def getExperimentIdsForDates(dateIndex, dates: list[str]) -> list[str]:
+    """Fetches the experimentIds recorded on any of the given dates."""
+    experimentIds = []
+    for doc in dateIndex.find({"_id": {"$in": dates}}).sort("_id", 1):
+        experimentIds.extend(doc.get("experimentIds", []))
+    return experimentIds
@@ -0,0 +1,141 @@
+# -----------------------------------------------------------------------------
+# Primary author: Jason T
+# Year: 2025
+# Purpose: In-process change feed. Mutation endpoints publish the documents
+# or fields they changed, and subscribers receive them as deltas.
+# -----------------------------------------------------------------------------
+
+import asyncio
+import json
+import uuid
+from collections import deque
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+
+from utils import cleanData
+
+# Events a slow subscriber may fall behind by before it is told to resync
+EVENT_QUEUE_SIZE = 256
+# Recent events kept so a reconnecting client can catch up from its last ID
+EVENT_HISTORY_SIZE = 1024
+
+# Operations
+INSERT = "insert"
+UPDATE = "update"
+REPLACE = "replace"
+DELETE = "delete"
+RESYNC = "resync"
+
+
+class Subscription:
+    """A subscriber's queue of events, optionally limited to some collections."""
+
+    def __init__(self, collections=None, queueSize: int = EVENT_QUEUE_SIZE):
+        self.collections = set(collections) if collections else None
+        self.queue = asyncio.Queue(maxsize=queueSize)
+
+    def wants(self, event: dict) -> bool:
+        return (
+            event["operation"] == RESYNC
+            or self.collections is None
+            or event["collection"] in self.collections
+        )
+
+    def offer(self, event: dict):
+        if not self.wants(event):
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Dropping events would leave the client inconsistent, so its
+            # backlog is replaced by a request to reload
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(resyncEvent(event["id"]))
+
+    async def next(self, timeout: float = None):
+        """The next event, or None if none arrives within `timeout` seconds."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+def resyncEvent(eventId: str) -> dict:
+    return {"id": eventId, "collection": None, "operation": RESYNC}
+
+
+class EventBus:
+    """
+    Fans published changes out to subscribers. Event IDs carry a per-process
+    prefix, so a client reconnecting after a restart is told to resync
+    rather than replayed events from a different history.
+    """
+
+    def __init__(
+        self, queueSize: int = EVENT_QUEUE_SIZE, historySize: int = EVENT_HISTORY_SIZE
+    ):
+        self.queueSize = queueSize
+        self.history = deque(maxlen=historySize)
+        self.subscribers = set()
+        self.listeners = []
+        self.bootId = uuid.uuid4().hex[:8]
+        self.sequence = 0
+
+    def publish(self, collection: str, operation: str, **fields) -> dict:
+        """
+        Publish a change. Fields are made JSON-safe here, once, for all
+        subscribers. Returns the event.
+        """
+        self.sequence += 1
+        event = {
+            "id": f"{self.bootId}-{self.sequence}",
+            "collection": collection,
+            "operation": operation,
+            **jsonable_encoder(cleanData(fields), custom_encoder={ObjectId: str}),
+        }
+        self.history.append(event)
+        for listener in self.listeners:
+            listener(event)
+        for subscription in list(self.subscribers):
+            subscription.offer(event)
+        return event
+
+    def addListener(self, listener):
+        """
+        Register a function called with every event as it is published, for
+        in-process state that must follow changes at once.
+        """
+        self.listeners.append(listener)
+
+    def subscribe(self, collections=None, lastEventId: str = None) -> Subscription:
+        """
+        Register a subscriber. With `lastEventId`, the events it missed are
+        queued first, or a resync if they are no longer held.
+        """
+        subscription = Subscription(collections, self.queueSize)
+        if lastEventId:
+            for event in self.missedEvents(lastEventId):
+                subscription.offer(event)
+        self.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self.subscribers.discard(subscription)
+
+    def missedEvents(self, lastEventId: str) -> list[dict]:
+        bootId, _, sequence = lastEventId.partition("-")
+        if bootId != self.bootId or not sequence.isdigit():
+            return [resyncEvent(f"{self.bootId}-{self.sequence}")]
+        sequence = int(sequence)
+        oldest = self.sequence - len(self.history) + 1
+        if sequence + 1 < oldest:
+            return [resyncEvent(f"{self.bootId}-{self.sequence}")]
+        return list(self.history)[sequence + 1 - oldest:]
+
+
+def formatEvent(event: dict) -> str:
+    """Encodes an event as a server-sent event."""
+    name = "resync" if event["operation"] == RESYNC else "change"
+    return f"id: {event['id']}\nevent: {name}\ndata: {json.dumps(event)}\n\n"
@@ -0,0 +1,381 @@
+# -----------------------------------------------------------------------------
+# Primary author: Jason T
+# Year: 2025
+# Purpose: Background import jobs with progress reporting, resumable across
+# restarts and idempotent per data sheet.
+# -----------------------------------------------------------------------------
+
+import asyncio
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import uuid
+from datetime import datetime, timedelta
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from services.migrationService import MigrationResult, MigrationService
+
+IMPORT_JOBS_COLLECTION = "importJobs"
+IMPORTED_SHEETS_COLLECTION = "importedSheets"
+
+DEFAULT_WORKERS = 2
+DEFAULT_SPOOL_DIR = os.path.join(tempfile.gettempdir(), "alkalytics-imports")
+# How long a claim on a job or sheet lasts unless its worker renews it
+DEFAULT_LEASE_SECONDS = 300
+
+EXPERIMENT = "experiment"
+DATA = "data"
+
+# Job statuses
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+
+# File statuses
+PENDING = "pending"
+IMPORTED = "imported"
+SKIPPED = "skipped"
+AMBIGUOUS = "ambiguous"
+UNMATCHED = "unmatched"
+FAILED = "failed"
+DUPLICATE = "duplicate"
+
+
+def contentHash(content: bytes) -> str:
+    """Idempotency key of a data sheet: the sha256 of its bytes."""
+    return hashlib.sha256(content).hexdigest()
+
+
+def expiredLease(now: datetime) -> list[dict]:
+    """Conditions for a claim whose worker stopped renewing it."""
+    return [{"leaseUntil": {"$lt": now}}, {"leaseUntil": {"$exists": False}}]
+
+
+def recordCount(records) -> int:
+    """Records imported by importDataSheet, which streams large sheets."""
+    if isinstance(records, int):
+        return records
+    return len(records or [])
+
+
+class ImportJobService:
+    """
+    Runs uploads as background jobs. Submitted files are spooled to disk and
+    the job, with per-file status, is kept in MongoDB so progress can be
+    polled and queued jobs resume after a restart. Each data sheet is keyed
+    by the hash of its content, so resubmitting a sheet that was already
+    imported skips it instead of inserting its rows again.
+
+    Jobs and sheets are claimed atomically with a lease that the claiming
+    worker renews while it runs, so several processes can share the
+    collections: a claim is only taken over once its lease has expired.
+    """
+
+    def __init__(
+        self, database, migrationService: MigrationService,
+        spoolDir: str = DEFAULT_SPOOL_DIR, workers: int = DEFAULT_WORKERS,
+        leaseSeconds: float = DEFAULT_LEASE_SECONDS
+    ):
+        self.jobsCollection = database[IMPORT_JOBS_COLLECTION]
+        self.importedSheetsCollection = database[IMPORTED_SHEETS_COLLECTION]
+        self.migrationService = migrationService
+        self.spoolDir = spoolDir
+        self.workers = workers
+        self.leaseSeconds = leaseSeconds
+        self.owner = uuid.uuid4().hex
+
+        self.queue = asyncio.Queue()
+        self.tasks = []
+        self.logger = logging.getLogger('ImportJobService')
+
+    async def start(self):
+        """Start the worker pool and requeue jobs left unfinished."""
+        os.makedirs(self.spoolDir, exist_ok=True)
+        self.tasks = [
+            asyncio.create_task(self.worker()) for _ in range(self.workers)
+        ]
+        await self.resume()
+
+    async def stop(self):
+        """
+        Stop the workers and release their leases, so jobs in progress
+        resume on the next start, here or in another process.
+        """
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        try:
+            release = {"$unset": {"leaseUntil": ""}}
+            await self.jobsCollection.update_many(
+                {"owner": self.owner, "status": RUNNING}, release
+            )
+            await self.importedSheetsCollection.update_many(
+                {"owner": self.owner, "status": RUNNING}, release
+            )
+        except Exception as e:
+            self.logger.warning(f"Could not release import leases: {e}")
+
+    async def resume(self):
+        """
+        Requeue the jobs that are queued or whose worker stopped renewing
+        its lease. Jobs another worker is running are watched, and requeued
+        if their lease runs out.
+        """
+        jobs = await self.jobsCollection.find(
+            {"status": {"$in": [QUEUED, RUNNING]}}, {"status": 1, "leaseUntil": 1}
+        ).to_list(None)
+        now = datetime.now()
+        resumed = 0
+        for job in jobs:
+            leaseUntil = job.get("leaseUntil")
+            if job["status"] == RUNNING and leaseUntil and leaseUntil >= now:
+                self.requeueAfterLease(job["_id"], leaseUntil)
+                continue
+            await self.queue.put(job["_id"])
+            resumed += 1
+        if resumed:
+            self.logger.info(f"Resumed {resumed} import jobs")
+
+    def requeueAfterLease(self, jobId: str, leaseUntil: datetime):
+        """Queue a job held by another worker again once its lease ends."""
+        async def requeue():
+            await asyncio.sleep(max((leaseUntil - datetime.now()).total_seconds(), 0))
+            await self.queue.put(jobId)
+
+        self.tasks = [task for task in self.tasks if not task.done()]
+        self.tasks.append(asyncio.create_task(requeue()))
+
+    def lease(self) -> datetime:
+        """End of a claim taken or renewed now."""
+        return datetime.now() + timedelta(seconds=self.leaseSeconds)
+
+    async def claimJob(self, jobId: str):
+        """
+        Atomically claim a queued job, or a running one whose lease expired.
+        Returns the job, or None when it is completed or held by another
+        worker.
+        """
+        now = datetime.now()
+        return await self.jobsCollection.find_one_and_update(
+            {
+                "_id": jobId,
+                "$or": [
+                    {"status": QUEUED},
+                    *({"status": RUNNING, **condition} for condition in expiredLease(now)),
+                ],
+            },
+            {"$set": {
+                "status": RUNNING,
+                "owner": self.owner,
+                "leaseUntil": self.lease(),
+                "updatedAt": now,
+            }},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def renewLeases(self, jobId: str):
+        """Keep extending the leases of a job and its sheets while they run."""
+        while True:
+            await asyncio.sleep(self.leaseSeconds / 3)
+            leaseUntil = self.lease()
+            await self.jobsCollection.update_one(
+                {"_id": jobId, "owner": self.owner},
+                {"$set": {"leaseUntil": leaseUntil}}
+            )
+            await self.importedSheetsCollection.update_many(
+                {"jobId": jobId, "owner": self.owner, "status": RUNNING},
+                {"$set": {"leaseUntil": leaseUntil}}
+            )
+
+    async def submit(self, files: list[dict]) -> str:
+        """
+        Spool the files of a new job and queue it. Each file is a dict with
+        `filename`, `kind` ('experiment' or 'data') and `content` bytes.
+        Returns the job ID.
+        """
+        jobId = uuid.uuid4().hex
+        jobDir = os.path.join(self.spoolDir, jobId)
+        os.makedirs(jobDir, exist_ok=True)
+
+        jobFiles = []
+        for i, file in enumerate(files):
+            # One directory per file keeps the original name, which the date
+            # fallback reads, even when two files share it
+            fileDir = os.path.join(jobDir, str(i))
+            os.makedirs(fileDir, exist_ok=True)
+            path = os.path.join(fileDir, file["filename"])
+            with open(path, "wb") as spooled:
+                spooled.write(file["content"])
+            jobFiles.append({
+                "filename": file["filename"],
+                "kind": file["kind"],
+                "path": path,
+                "sha256": contentHash(file["content"]),
+                "status": PENDING,
+            })
+
+        # Experiments first, so data sheets can link to them
+        jobFiles.sort(key=lambda jobFile: jobFile["kind"] != EXPERIMENT)
+
+        now = datetime.now()
+        await self.jobsCollection.insert_one({
+            "_id": jobId,
+            "status": QUEUED,
+            "createdAt": now,
+            "updatedAt": now,
+            "total": len(jobFiles),
+            "processed": 0,
+            "files": jobFiles,
+        })
+        await self.queue.put(jobId)
+        return jobId
+
+    async def getJob(self, jobId: str) -> dict:
+        """Job status and per-file results, without spool paths."""
+        return await self.jobsCollection.find_one(
+            {"_id": jobId}, {"files.path": 0}
+        )
+
+    async def worker(self):
+        while True:
+            jobId = await self.queue.get()
+            try:
+                await self.processJob(jobId)
+            except Exception as e:
+                self.logger.error(f"Import job {jobId} failed: {e}")
+            finally:
+                self.queue.task_done()
+
+    async def processJob(self, jobId: str):
+        """
+        Claim a job and import its pending files, recording each outcome.
+        Stops if the lease is lost, leaving the rest to the new holder.
+        """
+        job = await self.claimJob(jobId)
+        if job is None:
+            held = await self.jobsCollection.find_one(
+                {"_id": jobId}, {"status": 1, "owner": 1, "leaseUntil": 1}
+            )
+            if held and held["status"] == RUNNING and held.get("owner") != self.owner:
+                self.requeueAfterLease(jobId, held["leaseUntil"])
+            return
+
+        renewal = asyncio.create_task(self.renewLeases(jobId))
+        try:
+            for i, jobFile in enumerate(job["files"]):
+                if jobFile["status"] != PENDING:
+                    continue
+                outcome = await self.processFile(jobId, jobFile)
+                recorded = await self.jobsCollection.update_one(
+                    {"_id": jobId, "owner": self.owner},
+                    {
+                        "$set": {
+                            **{f"files.{i}.{key}": value for key, value in outcome.items()},
+                            "updatedAt": datetime.now(),
+                        },
+                        "$inc": {"processed": 1},
+                    }
+                )
+                if recorded.matched_count == 0:
+                    self.logger.warning(f"Lost the lease on import job {jobId}")
+                    return
+
+            await self.jobsCollection.update_one(
+                {"_id": jobId, "owner": self.owner},
+                {
+                    "$set": {"status": COMPLETED, "updatedAt": datetime.now()},
+                    "$unset": {"leaseUntil": ""},
+                }
+            )
+        finally:
+            renewal.cancel()
+        shutil.rmtree(os.path.join(self.spoolDir, jobId), ignore_errors=True)
+
+    async def claimSheet(self, jobId: str, jobFile: dict) -> bool:
+        """
+        Claim a data sheet's content hash. A claim left by a worker that
+        stopped renewing it is taken over, so the sheet is imported again;
+        any other existing claim means the sheet is imported or importing.
+        """
+        now = datetime.now()
+        claim = {
+            "filename": jobFile["filename"],
+            "jobId": jobId,
+            "owner": self.owner,
+            "status": RUNNING,
+            "claimedAt": now,
+            "leaseUntil": self.lease(),
+        }
+        try:
+            await self.importedSheetsCollection.insert_one({"_id": jobFile["sha256"], **claim})
+            return True
+        except DuplicateKeyError:
+            pass
+        taken = await self.importedSheetsCollection.find_one_and_update(
+            {"_id": jobFile["sha256"], "status": RUNNING, "$or": expiredLease(now)},
+            {"$set": claim},
+        )
+        return taken is not None
+
+    async def processFile(self, jobId: str, jobFile: dict) -> dict:
+        """Import one spooled file and return its status fields."""
+        if jobFile["kind"] == EXPERIMENT:
+            try:
+                experiments = await self.migrationService.importExperimentSheet(
+                    jobFile["path"]
+                )
+            except Exception as e:
+                return {"status": FAILED, "error": str(e)}
+            return {"status": IMPORTED, "records": len(experiments or [])}
+
+        if not await self.claimSheet(jobId, jobFile):
+            return {"status": SKIPPED, "reason": "Sheet already imported"}
+
+        result = MigrationResult()
+        try:
+            records = await self.migrationService.importDataSheet(
+                jobFile["path"], result
+            )
+        except Exception as e:
+            records = None
+            result.errors += 1
+            self.logger.error(f"Error importing {jobFile['filename']}: {e}")
+
+        count = recordCount(records)
+        if count or result.duplicateRows:
+            await self.importedSheetsCollection.update_one(
+                {"_id": jobFile["sha256"], "owner": self.owner},
+                {
+                    "$set": {"status": IMPORTED, "importedAt": datetime.now()},
+                    "$unset": {"leaseUntil": ""},
+                }
+            )
+        if count:
+            return {"status": IMPORTED, "records": count}
+        if result.duplicateRows:
+            return {
+                "status": DUPLICATE,
+                "reason": f"All {result.duplicateRows} rows were already imported",
+            }
+
+        # Nothing landed, so the sheet can be submitted again later
+        await self.importedSheetsCollection.delete_one(
+            {"_id": jobFile["sha256"], "owner": self.owner}
+        )
+        if result.ambiguousData:
+            return {
+                "status": AMBIGUOUS,
+                "matchingExp": result.ambiguousData[0]["matchingExp"],
+                "token": result.ambiguousData[0].get("token"),
+            }
+        if result.errors:
+            return {"status": FAILED, "error": "Import failed; see migration.log"}
+        return {
+            "status": UNMATCHED,
+            "reason": "No records imported; no single matching experiment was found"
+        }
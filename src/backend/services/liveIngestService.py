@@ -0,0 +1,388 @@
+# -----------------------------------------------------------------------------
+# Primary author: Jason T
+# Year: 2025
+# Purpose: Live ingestion of instrument samples streamed during a run, with
+# batched inserts into 'data' and running per-interval efficiency aggregates.
+# -----------------------------------------------------------------------------
+
+import asyncio
+import logging
+import time
+from datetime import datetime
+
+import pandas as pd
+from pymongo import UpdateOne
+
+from efficiencies.efficiencyCalculations import (
+    C1_COND,
+    C2_COND,
+    CURRENT,
+    FARADAY_CONSTANT,
+    VOLTAGE_STACK,
+    VOLTAGE_TOTAL,
+    getConverter,
+)
+from services.migrationService import MigrationService, SheetImport
+from services.schemaService import applySchema, loadSchemaAsync
+from utils import TIME_FORMAT
+
+LIVE_BINS_COLLECTION = "liveBins"
+
+BIN_MINUTES = 5
+# Buffered samples are written once this many are pending, or after
+# LIVE_FLUSH_SECONDS, whichever comes first
+LIVE_BATCH_SIZE = 500
+LIVE_FLUSH_SECONDS = 1.0
+# Stored rows are merged into the data summary and pyramid once this many are
+# pending, or after LIVE_ROLLUP_SECONDS, as both rewrite per-experiment documents
+LIVE_ROLLUP_ROWS = 5000
+LIVE_ROLLUP_SECONDS = 30.0
+
+# Data fields summed per bin, keyed by the name stored in the bin documents
+BIN_FIELDS = {
+    "current": CURRENT,
+    "uStack": VOLTAGE_STACK,
+    "uTotal": VOLTAGE_TOTAL,
+    "c1Cond": C1_COND,
+    "c2Cond": C2_COND,
+}
+
+VOLUME_FIELD = "Final volume (L) "
+STACKS_FIELD = "# of Stacks"
+
+
+def parseTime(value) -> datetime:
+    """Parses a sample's Time, which uses the format of imported sheets."""
+    if isinstance(value, datetime):
+        return value
+    return datetime.strptime(str(value), TIME_FORMAT)
+
+
+def isNumber(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and value == value
+
+
+class RunningBins:
+    """
+    Running sums and counts of the efficiency fields per BIN_MINUTES bin of
+    elapsed time. Adding a sample is O(1), and efficiencies are derived from
+    the bin means without revisiting the samples. Bins are aligned to
+    `startTime`, the first sample of the experiment.
+    """
+
+    def __init__(self, startTime: datetime, binMinutes: int = BIN_MINUTES):
+        self.startTime = startTime
+        self.binMinutes = binMinutes
+        self.bins = {}
+
+    def binIndex(self, time: datetime) -> int:
+        elapsed = (time - self.startTime).total_seconds() / 60
+        return max(0, int(elapsed // self.binMinutes))
+
+    def add(self, sample: dict, delta: dict = None) -> int:
+        """
+        Adds a sample to its bin and returns the bin index. When `delta` is
+        given, the increments are also accumulated there, keyed by bin, so
+        they can be persisted in one write.
+        """
+        index = self.binIndex(parseTime(sample["Time"]))
+        targets = [self.bins.setdefault(index, newBin())]
+        if delta is not None:
+            targets.append(delta.setdefault(index, newBin()))
+        for name, field in BIN_FIELDS.items():
+            value = sample.get(field)
+            if isNumber(value):
+                for target in targets:
+                    target["sums"][name] += value
+                    target["counts"][name] += 1
+        return index
+
+    def load(self, documents: list[dict]):
+        """Restores bins persisted by earlier sessions."""
+        for document in documents:
+            self.bins[document["bin"]] = {
+                "sums": {name: document.get("sums", {}).get(name, 0) for name in BIN_FIELDS},
+                "counts": {name: document.get("counts", {}).get(name, 0) for name in BIN_FIELDS},
+            }
+
+    def mean(self, index: int, name: str):
+        current = self.bins[index]
+        count = current["counts"][name]
+        return current["sums"][name] / count if count else None
+
+    def voltageDropEfficiency(self) -> float:
+        """Mean over bins of mean(U Stac) / mean(U Cmm), in percent."""
+        efficiencies = []
+        for index in sorted(self.bins):
+            uStack, uTotal = self.mean(index, "uStack"), self.mean(index, "uTotal")
+            if uStack is None or uTotal is None:
+                continue
+            efficiencies.append(uStack / uTotal if uTotal else 0)
+        return sum(efficiencies) / len(efficiencies) * 100 if efficiencies else 0
+
+    def currentEfficiency(self, compound: str, finalVol: float, numTriplets: int) -> float:
+        """
+        Current efficiency (%) from the concentration change of each bin
+        against the first, following computeCurrentEfficiency.
+        """
+        name = "c1Cond" if compound == "HCL" else "c2Cond"
+        converter = getConverter(compound)
+        indexes = [index for index in sorted(self.bins) if self.mean(index, name) is not None]
+        if not indexes:
+            return 0
+
+        initialConc = converter.convert(self.mean(indexes[0], name))
+        efficiencies = []
+        for index in indexes[1:]:
+            avgCurr = self.mean(index, "current")
+            if not avgCurr:
+                efficiencies.append(0)
+                continue
+            deltaConc = converter.convert(self.mean(index, name)) - initialConc
+            timeInterval = (index + 1) * self.binMinutes
+            efficiencies.append(
+                (deltaConc * finalVol * FARADAY_CONSTANT)
+                / (numTriplets * timeInterval * avgCurr * 60)
+            )
+        return sum(efficiencies) / len(efficiencies) * 100 if efficiencies else 0
+
+    def efficiencies(self, experiment: dict) -> dict:
+        """
+        Live efficiencies of an experiment. Current efficiencies are None
+        when its final volumes or number of stacks are missing.
+        """
+        numTriplets = experiment.get(STACKS_FIELD)
+        results = {"bins": len(self.bins)}
+        for compound, label in (("HCL", "HCl"), ("NaOH", "NaOH")):
+            finalVol = experiment.get(VOLUME_FIELD + compound)
+            results[f"Current Efficiency ({label})"] = (
+                float(self.currentEfficiency(compound, finalVol, numTriplets))
+                if finalVol is not None and numTriplets else None
+            )
+        results["Voltage Drop Efficiency"] = float(self.voltageDropEfficiency())
+        return results
+
+
+def newBin() -> dict:
+    return {
+        "sums": {name: 0.0 for name in BIN_FIELDS},
+        "counts": {name: 0 for name in BIN_FIELDS},
+    }
+
+
+def buildBinUpdates(experimentId: str, startTime: datetime, delta: dict) -> list:
+    """$inc upserts adding the bin increments of a flushed batch."""
+    operations = []
+    for index, increments in delta.items():
+        operations.append(UpdateOne(
+            {"_id": f"{experimentId}:{index}"},
+            {
+                "$setOnInsert": {
+                    "experimentId": experimentId,
+                    "bin": index,
+                    "startTime": startTime,
+                },
+                "$inc": {
+                    **{f"sums.{name}": value for name, value in increments["sums"].items()},
+                    **{f"counts.{name}": value for name, value in increments["counts"].items()},
+                },
+            },
+            upsert=True,
+        ))
+    return operations
+
+
+class LiveSession:
+    """
+    One agent's stream of samples for an experiment. Samples are buffered and
+    written in batches through the regular import path, so resent samples are
+    not stored twice and only new rows are added to the bins. The summary and
+    pyramid are brought up to date less often, through `sheet`.
+    """
+
+    def __init__(
+        self, service: "LiveIngestService", experiment: dict, bins: RunningBins
+    ):
+        self.service = service
+        self.experiment = experiment
+        self.experimentId = experiment["experimentId"]
+        self.bins = bins
+        self.pending = []
+        self.received = 0
+        self.inserted = 0
+        self.sheet = SheetImport(self.experimentId, deferRollups=True)
+        self.rolledUpAt = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def add(self, samples: list[dict]) -> int:
+        """
+        Buffers samples. Raises ValueError, buffering none of them, if a
+        sample is not an object or lacks a valid Time.
+        """
+        for sample in samples:
+            if not isinstance(sample, dict) or "Time" not in sample:
+                raise ValueError("Each sample must be an object with a Time field")
+            try:
+                parseTime(sample["Time"])
+            except ValueError:
+                raise ValueError(f"Invalid Time {sample['Time']!r}; expected {TIME_FORMAT}")
+        self.pending.extend(samples)
+        self.received += len(samples)
+        return len(samples)
+
+    def shouldFlush(self) -> bool:
+        return len(self.pending) >= self.service.batchSize
+
+    async def flush(self):
+        """
+        Write the buffered samples and update the bins with the new rows.
+        Returns an update message, or None when nothing new was stored.
+        """
+        async with self.lock:
+            try:
+                return await self.store()
+            finally:
+                if self.rollupDue():
+                    await self.rollUp()
+
+    async def store(self):
+        if not self.pending:
+            return None
+        samples, self.pending = self.pending, []
+        records = await self.service.storeSamples(self.experimentId, samples, self.sheet)
+        if not records:
+            return None
+
+        if self.bins is None:
+            startTime = min(parseTime(record["Time"]) for record in records)
+            self.bins = RunningBins(startTime)
+        delta = {}
+        for record in records:
+            self.bins.add(record, delta)
+        await self.service.saveBins(self.experimentId, self.bins.startTime, delta)
+
+        self.inserted += len(records)
+        return self.update()
+
+    def rollupDue(self) -> bool:
+        if not (self.sheet.pending or self.sheet.replaced):
+            return False
+        return (
+            self.sheet.pendingRows >= self.service.rollupRows
+            or time.monotonic() - self.rolledUpAt >= self.service.rollupSeconds
+        )
+
+    async def rollUp(self):
+        """Merge the rows stored since the last rollup into the summary and pyramid."""
+        sheet, self.sheet = self.sheet, SheetImport(self.experimentId, deferRollups=True)
+        self.rolledUpAt = time.monotonic()
+        await self.service.migrationService.finishSheet(sheet)
+
+    async def close(self):
+        """Store the buffered samples and roll up every row stored."""
+        async with self.lock:
+            try:
+                await self.store()
+            finally:
+                await self.rollUp()
+
+    def update(self) -> dict:
+        return {
+            "type": "update",
+            "experimentId": self.experimentId,
+            "received": self.received,
+            "inserted": self.inserted,
+            "efficiencies": self.bins.efficiencies(self.experiment) if self.bins else None,
+        }
+
+
+class LiveIngestService:
+    """Opens live sessions and keeps their bins in the liveBins collection."""
+
+    def __init__(
+        self, database, migrationService: MigrationService,
+        batchSize: int = LIVE_BATCH_SIZE, flushSeconds: float = LIVE_FLUSH_SECONDS,
+        rollupRows: int = LIVE_ROLLUP_ROWS, rollupSeconds: float = LIVE_ROLLUP_SECONDS
+    ):
+        self.binsCollection = database[LIVE_BINS_COLLECTION]
+        self.experimentsCollection = database["experiments"]
+        self.configCollection = database["config"]
+        self.dataCollection = database["data"]
+        self.migrationService = migrationService
+        self.batchSize = batchSize
+        self.flushSeconds = flushSeconds
+        self.rollupRows = rollupRows
+        self.rollupSeconds = rollupSeconds
+        self.logger = logging.getLogger('LiveIngestService')
+
+    async def ensureIndexes(self):
+        await self.binsCollection.create_index("experimentId")
+
+    async def loadBins(self, experimentId: str):
+        """
+        Bins of an experiment, restored from earlier sessions or aligned to
+        its first stored sample. None if it has no data yet.
+        """
+        documents = await self.binsCollection.find(
+            {"experimentId": experimentId}
+        ).to_list(None)
+        if documents:
+            bins = RunningBins(documents[0]["startTime"])
+            bins.load(documents)
+            return bins
+
+        first = await self.dataCollection.find_one(
+            {"experimentId": experimentId, "Time": {"$type": "string"}},
+            {"Time": 1},
+            sort=[("Time", 1)],
+        )
+        return RunningBins(parseTime(first["Time"])) if first else None
+
+    async def loadExperiment(self, experimentId: str):
+        """An experiment's metadata as its schema describes it, or None."""
+        experiment = await self.experimentsCollection.find_one(
+            {"experimentId": experimentId}, {"_id": 0}
+        )
+        if not experiment:
+            return None
+        return applySchema([experiment], await loadSchemaAsync(self.configCollection))[0]
+
+    async def openSession(self, experimentId: str):
+        """A session for an existing experiment, or None if it is unknown."""
+        experiment = await self.loadExperiment(experimentId)
+        if not experiment:
+            return None
+        return LiveSession(self, experiment, await self.loadBins(experimentId))
+
+    async def getEfficiencies(self, experimentId: str):
+        """Live efficiencies from the stored bins, or None without any."""
+        experiment = await self.loadExperiment(experimentId)
+        documents = await self.binsCollection.find(
+            {"experimentId": experimentId}
+        ).to_list(None)
+        if not experiment or not documents:
+            return None
+        bins = RunningBins(documents[0]["startTime"])
+        bins.load(documents)
+        return bins.efficiencies(experiment)
+
+    async def storeSamples(
+        self, experimentId: str, samples: list[dict], sheet: SheetImport = None
+    ) -> list[dict]:
+        """
+        Clean, link and insert samples; returns the records that were new.
+        Their summary and pyramid updates are left to `sheet`, if given.
+        """
+        dataDf = self.migrationService.cleanData(pd.DataFrame(samples))
+        if dataDf.empty:
+            return []
+        # Agents resend samples, so rows are identified by their values only
+        records = await self.migrationService.linkData(dataDf, experimentId, firstRow=None)
+        if not records:
+            return []
+        return await self.migrationService.storeLinkedData(dataDf, records, sheet)
+
+    async def saveBins(self, experimentId: str, startTime: datetime, delta: dict):
+        operations = buildBinUpdates(experimentId, startTime, delta)
+        if operations:
+            await self.binsCollection.bulk_write(operations, ordered=False)
@@ -5,14 +5,200 @@
 # Purpose: Migration algorithm for importing experimental data.
 # -----------------------------------------------------------------------------
 
+import hashlib
 import os
 import logging
 import re
+from dataclasses import dataclass, field
 from datetime import datetime
+from functools import lru_cache
 
 import numpy as np
 import pandas as pd
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError, OperationFailure
+
+from metrics import timed
+from services.catalogService import (
+    CATALOG_COLLECTION,
+    buildCatalogUpdates,
+    summarizeDataFrame,
+    summarizeRecords
+)
+from services.dateIndexService import (
+    DATE_INDEX_COLLECTION,
+    buildDateIndexRebuild,
+    buildDateIndexUpdates,
+)
+from services.eventBus import INSERT
+from services.revisionService import REVISIONS_COLLECTION, buildRevisionUpdates
+from services.pyramidService import (
+    DATA_PYRAMIDS_COLLECTION,
+    appendToPyramid,
+    rebuildPyramid
+)
+from services.stagingService import (
+    STAGED_ROWS_COLLECTION,
+    STAGED_SHEETS_COLLECTION,
+    STAGING_TTL_SECONDS,
+    buildStagedRows,
+    buildStagedSheet,
+    newStagingToken
+)
+from services.summaryService import (
+    DATA_SUMMARIES_COLLECTION,
+    buildSummaryRefresh,
+    buildSummaryUpdates,
+    summarizeDataSheet,
+    summaryPipeline
+)
+from services.sheetReader import (
+    DEFAULT_CHUNK_ROWS,
+    iterInThread,
+    iterSheetChunks,
+    readSheet,
+    shouldStream
+)
+
+# How re-imported data rows are handled: SKIP keeps the stored row, UPSERT
+# replaces it with the new one
+SKIP_DUPLICATES = "skip"
+UPSERT_DUPLICATES = "upsert"
+
+DATA_ROW_INDEX = "experimentId_dataSheetId"
+
+
+# Sheets from one instrument share a header, so normalized headers are cached
+# per header signature
+HEADER_CACHE_SIZE = 256
+SPECIAL_COLUMNS = {
+    'notes': 'Notes',
+    '#': '#',
+    'date': 'Date',
+    'time': 'Time'
+}
+
+
+def rowFingerprint(values) -> str:
+    """Stable ID for a data row without '#' and 'Time', from its values."""
+    return hashlib.sha1(repr(tuple(values)).encode("utf-8")).hexdigest()[:16]
+
+
+@lru_cache(maxsize=HEADER_CACHE_SIZE)
+def dedupeColumnNames(names: tuple) -> tuple:
+    """
+    Standardizes special column names and appends (1), (2), etc. to real
+    duplicates.
+    """
+    colNames = list(names)
+    seen = {}
+    for i, name in enumerate(colNames):
+        nameStr = str(name).lower().strip()
+
+        # Special handling for notes-like columns
+        if nameStr in SPECIAL_COLUMNS:
+            # Standardize the name
+            colNames[i] = SPECIAL_COLUMNS[nameStr]
+            continue
+
+        # Now handle real duplicates
+        if name in seen:
+            j = 1
+            baseName = name
+            while f"{baseName} ({j})" in seen:
+                j += 1
+            newName = f"{baseName} ({j})"
+            colNames[i] = newName
+            seen[newName] = True
+        else:
+            seen[name] = True
+    return tuple(colNames)
+
+
+@lru_cache(maxsize=HEADER_CACHE_SIZE)
+def mergeHeaderRows(columns: tuple) -> tuple:
+    """Combines the two header rows of an experiment sheet into one."""
+    newCols = []
+    for col in columns:
+        col0, col1 = str(col[0]), str(col[1])
+
+        # Handle Notes column specially
+        if 'notes' in col0.lower() or 'notes' in col1.lower():
+            newCols.append('Notes')
+            continue
+
+        # Handle empty or unnamed columns
+        if col1.startswith("Unnamed"):
+            newCols.append(col0)
+        elif col0.startswith("Unnamed"):
+            newCols.append(col1)
+        else:
+            # Both columns have content, combine them
+            newCols.append(f"{col0} {col1}")
+    return tuple(newCols)
+
+
+def toRecords(df) -> list[dict]:
+    """
+    Emits a DataFrame as MongoDB documents, converting NaN and NaT to None.
+    Cleaning keeps numeric dtypes, so this is the only place values are
+    boxed into Python objects.
+    """
+    columns = list(df.columns)
+    values = []
+    for position in range(df.shape[1]):
+        column = df.iloc[:, position]
+        items = column.tolist()
+        if column.hasnans:
+            items = [
+                None if missing else item
+                for item, missing in zip(items, column.isna().tolist())
+            ]
+        values.append(items)
+    return [dict(zip(columns, row)) for row in zip(*values)]
+
+
+# Configured once at import; the service itself is shared across requests
+logging.basicConfig(
+    filename='migration.log',
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+
+
+@dataclass
+class MigrationResult:
+    """
+    Outcome of a single migrate() call. Kept per call so concurrent uploads
+    sharing one MigrationService do not see each other's ambiguous links.
+    """
+    experimentsImported: int = 0
+    dataSheetsImported: int = 0
+    errors: int = 0
+    # Rows of linked sheets skipped because they were already imported
+    duplicateRows: int = 0
+    ambiguousData: list = field(default_factory=list)
+
+
+@dataclass
+class SheetImport:
+    """
+    Progress of one data sheet's import across its chunks, so work that reads
+    the whole experiment runs once per sheet rather than once per chunk.
+    With `deferRollups`, the rows stored are kept in `pending` and merged
+    into the summary and pyramid by finishSheet instead of per chunk.
+    """
+    experimentId: str
+    inserted: int = 0
+    skipped: int = 0
+    replaced: bool = False
+    deferRollups: bool = False
+    pending: list = field(default_factory=list)
+
+    @property
+    def pendingRows(self) -> int:
+        return sum(len(dataDf) for dataDf in self.pending)
 
 
 class MigrationService:
@@ -23,34 +209,56 @@ class MigrationService:
     date and manual user input when ambiguity exists.
     """
 
-    def __init__(self, mongoUri, dbName):
+    def __init__(
+        self, mongoUri, dbName, client=None, importMode=SKIP_DUPLICATES, eventBus=None
+    ):
         """
-        Initialize the migration service with MongoDB connection details.
+        Initialize the migration service with MongoDB connection details. When
+        a shared `client` is given it is used instead of opening a new one,
+        and is left open by closeConnection. `importMode` decides whether
+        re-imported data rows are skipped or replace the stored rows. Imports
+        are announced on `eventBus` when one is given.
         """
-        self.client = AsyncIOMotorClient(mongoUri)
+        self.importMode = importMode
+        self.eventBus = eventBus
+        self.ownsClient = client is None
+        self.client = client if client is not None else AsyncIOMotorClient(mongoUri)
         self.db = self.client[dbName]
 
         self.experimentsCollection = self.db["experiments"]
         self.dataSheetsCollection = self.db["data"]
+        self.catalogCollection = self.db[CATALOG_COLLECTION]
+        self.dateIndexCollection = self.db[DATE_INDEX_COLLECTION]
+        self.stagedSheetsCollection = self.db[STAGED_SHEETS_COLLECTION]
+        self.stagedRowsCollection = self.db[STAGED_ROWS_COLLECTION]
+        self.dataSummariesCollection = self.db[DATA_SUMMARIES_COLLECTION]
+        self.dataPyramidsCollection = self.db[DATA_PYRAMIDS_COLLECTION]
+        self.revisionsCollection = self.db[REVISIONS_COLLECTION]
 
-        self.ambiguousData = []
-        
-        # Configure logging
-        logging.basicConfig(
-            filename='migration.log',
-            level=logging.INFO,
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        )
         self.logger = logging.getLogger('MigrationService')
 
+    @timed("cleanData")
     def cleanData(self, df):
-        """Clean dataframe by removing empty rows and columns"""
+        """
+        Remove rows that are entirely empty or entirely zero. Column dtypes
+        are kept; NaN becomes None only when records are emitted (toRecords).
+        """
         # Remove rows where all elements are NaN
         df = df.dropna(how="all")
-        # Remove rows where all elements are 0
-        df = df.loc[~(df == 0).all(axis=1)]
-        # Replace NaN values with None for proper MongoDB storage
-        df = df.replace({np.nan: None})
+        if df.shape[1] == 0:
+            return df
+
+        # Remove rows where all elements are 0, comparing the numeric block
+        # first and checking the other columns only for its all-zero rows
+        numeric = df.dtypes.map(pd.api.types.is_numeric_dtype).to_numpy()
+        allZero = np.ones(len(df), dtype=bool)
+        if numeric.any():
+            allZero &= (df.iloc[:, numeric].to_numpy() == 0).all(axis=1)
+        if allZero.any() and not numeric.all():
+            others = df.iloc[allZero, ~numeric]
+            allZero[allZero] = (others == 0).all(axis=1).to_numpy()
+        if allZero.any():
+            df = df.iloc[~allZero]
         return df
     
     def handleDuplicateColumns(self, df):
@@ -58,39 +266,22 @@ class MigrationService:
         Handle duplicate column names by appending (1), (2), etc.
         Preserves special columns like Notes without creating duplicates.
         """
-        colNames = list(df.columns)
-        seen = {}
-        specialColsMapping = {
-            'notes': 'Notes',
-            '#': '#',
-            'date': 'Date',
-            'time': 'Time'
-        }
-        
-        for i, name in enumerate(colNames):
-            nameStr = str(name).lower().strip()
-            
-            # Special handling for notes-like columns
-            if nameStr in specialColsMapping:
-                # Standardize the name
-                colNames[i] = specialColsMapping[nameStr]
-                continue
-                
-            # Now handle real duplicates
-            if name in seen:
-                j = 1
-                baseName = name
-                while f"{baseName} ({j})" in seen:
-                    j += 1
-                newName = f"{baseName} ({j})"
-                colNames[i] = newName
-                seen[newName] = True
-            else:
-                seen[name] = True
-                
-        df.columns = colNames
+        df.columns = list(dedupeColumnNames(tuple(df.columns)))
         return df
 
+    async def updateCatalog(self, collectionName, summary):
+        """
+        Merge a summary of newly inserted documents into the attribute catalog.
+        Failures are logged rather than raised, since the import itself has
+        already succeeded.
+        """
+        try:
+            operations = buildCatalogUpdates(collectionName, summary)
+            if operations:
+                await self.catalogCollection.bulk_write(operations)
+        except Exception as e:
+            self.logger.warning(f"Could not update catalog for {collectionName}: {e}")
+
     async def isExpDuplicate(self, experimentId):
         """Check if an experiment with this ID already exists in the database"""
         return (
@@ -100,10 +291,10 @@ class MigrationService:
             is not None
         )
 
-    async def findExperiment(self, date, dataId):
+    async def findExperiment(self, date, dataId, result=None):
         """
         Attempt to find or prompt the user to link a data sheet to an
-        experiment by date.
+        experiment by date. Ambiguous matches are recorded on `result`.
         """
         try:
             # Normalize date format to ensure consistent matching
@@ -122,7 +313,9 @@ class MigrationService:
             if len(matchingExperiments) == 1:
                 return matchingExperiments[0]["experimentId"]
             elif len(matchingExperiments) > 1:
-                self.ambiguousData.append(
+                if result is None:
+                    return None
+                result.ambiguousData.append(
                     {
                         "dataId": dataId,
                         "matchingExp": [
@@ -144,37 +337,17 @@ class MigrationService:
         try:
             self.logger.info(f"Importing experiment sheet: {experimentFilePath}")
             
-            # Try to read the Excel file with various header configurations
+            # Try to read the sheet with various header configurations
             try:
-                expDf = pd.read_excel(
-                    experimentFilePath, sheet_name=0, header=[0, 1]
-                )
+                expDf = readSheet(experimentFilePath, header=[0, 1])
                 
                 # Combine the two header rows in a smart way
-                newCols = []
-                for col in expDf.columns:
-                    col0, col1 = str(col[0]), str(col[1])
-                    
-                    # Handle Notes column specially
-                    if 'notes' in col0.lower() or 'notes' in col1.lower():
-                        newCols.append('Notes')
-                        continue
-                    
-                    # Handle empty or unnamed columns
-                    if pd.isna(col1) or col1.startswith("Unnamed"):
-                        newCols.append(col0)
-                    elif pd.isna(col0) or col0.startswith("Unnamed"):
-                        newCols.append(col1)
-                    else:
-                        # Both columns have content, combine them
-                        newCols.append(f"{col0} {col1}")
-                
-                expDf.columns = newCols
+                expDf.columns = list(mergeHeaderRows(tuple(expDf.columns)))
                 
             except Exception as e:
                 self.logger.warning(f"Could not process with multi-index headers, trying single header: {e}")
                 # If multi-index header fails, try with a single header row
-                expDf = pd.read_excel(experimentFilePath, sheet_name=0)
+                expDf = readSheet(experimentFilePath)
             
             # Handle duplicate column names
             expDf = self.handleDuplicateColumns(expDf)
@@ -196,29 +369,27 @@ class MigrationService:
             # Print the columns for debugging
             self.logger.info(f"Experiment sheet columns after processing: {expDf.columns.tolist()}")
             
+            # Skip rows without date
+            dateCol = None
+            for col in expDf.columns:
+                if isinstance(col, str) and 'date' in col.lower() and 'upload' not in col.lower():
+                    dateCol = col
+                    break
+
+            if dateCol is None:
+                dateCol = 'Date'
+
             experiments = []
-            for _, row in expDf.iterrows():
-                # Skip rows without date
-                dateCol = None
-                for col in expDf.columns:
-                    if isinstance(col, str) and 'date' in col.lower() and 'upload' not in col.lower():
-                        dateCol = col
-                        break
-                
-                if dateCol is None:
-                    dateCol = 'Date'
-                
-                if dateCol not in row or pd.isna(row[dateCol]):
+            for experimentData in toRecords(expDf):
+                if experimentData.get(dateCol) is None:
                     continue
 
-                experimentData = row.to_dict()
-                
                 # Create a unique ID using # column and date if available
-                if '#' in row and pd.notna(row['#']):
-                    experimentId = f"#{row['#']} {row[dateCol]}"
+                if experimentData.get('#') is not None:
+                    experimentId = f"#{experimentData['#']} {experimentData[dateCol]}"
                 else:
                     # Generate a fallback ID if # column doesn't exist
-                    experimentId = f"EXP-{row[dateCol]}-{len(experiments) + 1}"
+                    experimentId = f"EXP-{experimentData[dateCol]}-{len(experiments) + 1}"
 
                 if await self.isExpDuplicate(experimentId):
                     self.logger.info(
@@ -237,6 +408,12 @@ class MigrationService:
 
             if experiments:
                 await self.experimentsCollection.insert_many(experiments)
+                await self.updateCatalog("experiments", summarizeRecords(experiments))
+                await self.updateDateIndex(experiments)
+                await self.bumpRevisions("experiments", DATE_INDEX_COLLECTION)
+                self.publish(
+                    "experiments", INSERT, key="experimentId", documents=experiments
+                )
                 self.logger.info(f"Successfully imported {len(experiments)} experiments")
                 return experiments
             else:
@@ -248,82 +425,424 @@ class MigrationService:
             )
             return []
 
-    async def linkData(self, dataDf, experimentId):
-        """Link data rows to their matching experiment ID"""
+    async def linkData(self, dataDf, experimentId, firstRow: int | None = 0):
+        """
+        Link data rows to their matching experiment ID. Row IDs are
+        deterministic, so importing the same sheet again yields the same IDs.
+        Rows without '#' and 'Time' are identified by their values and their
+        position in the sheet, `firstRow` being that of the frame's first
+        row, so identical rows of one sheet are all kept. With `firstRow`
+        None, as for live samples that may be resent, identical rows are
+        identified by their values alone and stored once.
+        """
         records = []
         try:
-            for _, row in dataDf.iterrows():
+            hasRowKeys = '#' in dataDf.columns and 'Time' in dataDf.columns
+            for position, row in enumerate(toRecords(dataDf)):
                 # Create a unique ID for the data row
-                if '#' in row and 'Time' in row and pd.notna(row['#']) and pd.notna(row['Time']):
+                if hasRowKeys and row['#'] is not None and row['Time'] is not None:
                     rowId = f"#{row['#']} {row['Time']}"
+                elif firstRow is None:
+                    rowId = f"DATA-{rowFingerprint(row.values())}"
                 else:
-                    # Generate a fallback ID if required columns don't exist
-                    rowId = f"DATA-{len(records) + 1}-{datetime.now().strftime('%Y%m%d%H%M%S')}"
-                
-                dataDoc = {
+                    # Derive a fallback ID if required columns don't exist
+                    rowId = f"DATA-{rowFingerprint(row.values())}-{firstRow + position}"
+
+                records.append({
                     "dataSheetId": rowId,
                     "experimentId": experimentId,
-                    **row.to_dict(),
-                }
-                records.append(dataDoc)
+                    **row,
+                })
             return records
         except Exception as e:
             self.logger.error(f"Error linking data: {e}")
             return records
 
-    async def importDataSheet(self, dataFilePath):
+    async def ensureDataIndexes(self):
+        """
+        Create the unique {experimentId, dataSheetId} index that makes data
+        imports idempotent, and the indexes of the data summaries. Rows
+        without a dataSheetId are not indexed.
+        """
+        try:
+            await self.createDataRowIndex()
+        except OperationFailure as e:
+            # Rows imported before the index existed may have been stored
+            # twice; without the index every import would silently stop
+            # being idempotent, so they are removed and the index is created
+            # again, failing startup if that does not work either
+            self.logger.warning(f"Duplicate data rows block the unique data index: {e}")
+            removed = await self.dedupeDataRows()
+            self.logger.info(f"Removed {removed} duplicate data rows")
+            await self.createDataRowIndex()
+        # Summaries are read per experiment and, across experiments, per column
+        await self.dataSummariesCollection.create_index("experimentId")
+        await self.dataSummariesCollection.create_index("column")
+        # Tiles read a range of chunks of one level of the current generation
+        await self.dataPyramidsCollection.create_index(
+            [("experimentId", 1), ("generation", 1), ("attribute", 1), ("level", 1), ("chunk", 1)]
+        )
+
+    async def createDataRowIndex(self):
+        await self.dataSheetsCollection.create_index(
+            [("experimentId", 1), ("dataSheetId", 1)],
+            name=DATA_ROW_INDEX,
+            unique=True,
+            partialFilterExpression={"dataSheetId": {"$type": "string"}},
+        )
+
+    async def dedupeDataRows(self):
+        """
+        Keep the first stored copy of each {experimentId, dataSheetId} and
+        delete the others, then bring the summaries and pyramids of the
+        affected experiments up to date. Returns the number of rows removed.
+        """
+        duplicates = await self.dataSheetsCollection.aggregate([
+            {"$match": {"dataSheetId": {"$type": "string"}}},
+            {"$sort": {"_id": 1}},
+            {"$group": {
+                "_id": {"experimentId": "$experimentId", "dataSheetId": "$dataSheetId"},
+                "ids": {"$push": "$_id"},
+                "count": {"$sum": 1},
+            }},
+            {"$match": {"count": {"$gt": 1}}},
+        ]).to_list(None)
+        if not duplicates:
+            return 0
+
+        extraIds = [rowId for group in duplicates for rowId in group["ids"][1:]]
+        result = await self.dataSheetsCollection.delete_many({"_id": {"$in": extraIds}})
+        for experimentId in sorted({group["_id"]["experimentId"] for group in duplicates}):
+            await self.refreshDataSummary(experimentId)
+            await self.refreshPyramid(experimentId)
+        await self.bumpRevisions("data")
+        return result.deleted_count
+
+    async def ensureDateIndex(self):
+        """
+        Bootstrap the date -> experimentIds index when it is empty while
+        experiments exist, e.g. on the first start after an upgrade, so that
+        requests never rebuild it themselves.
+        """
+        if (
+            await self.dateIndexCollection.estimated_document_count() > 0
+            or await self.experimentsCollection.estimated_document_count() == 0
+        ):
+            return
+        experiments = await self.experimentsCollection.find(
+            {}, {"_id": 0, "Date": 1, "experimentId": 1}
+        ).to_list(None)
+        await self.dateIndexCollection.bulk_write(buildDateIndexRebuild(experiments))
+        await self.dateIndexCollection.create_index("experimentIds")
+        await self.bumpRevisions(DATE_INDEX_COLLECTION)
+        self.logger.info(f"Rebuilt the date index from {len(experiments)} experiments")
+
+    async def ensureStagingIndexes(self):
+        """Expire unresolved staged sheets and index their rows by token."""
+        try:
+            for collection in (self.stagedSheetsCollection, self.stagedRowsCollection):
+                await collection.create_index(
+                    "createdAt", expireAfterSeconds=STAGING_TTL_SECONDS
+                )
+            await self.stagedRowsCollection.create_index([("token", 1), ("chunk", 1)])
+        except OperationFailure as e:
+            self.logger.warning(f"Could not create staging indexes: {e}")
+
+    async def stageSheet(self, ambiguous):
+        """
+        Stage an ambiguous data sheet under a new token, which is added to its
+        ambiguous entry and returned.
+        """
+        token = newStagingToken()
+        await self.stagedSheetsCollection.insert_one(buildStagedSheet(token, ambiguous))
+        ambiguous["token"] = token
+        return token
+
+    async def stageRows(self, token, dataDf, firstChunk=0):
+        """Stage cleaned rows of a sheet. Returns the next chunk number."""
+        documents = buildStagedRows(token, toRecords(dataDf), firstChunk)
+        if documents:
+            await self.stagedRowsCollection.insert_many(documents)
+        return firstChunk + len(documents)
+
+    async def resolveStagedSheet(self, token, experimentId):
+        """
+        Link a staged sheet to the experiment the user chose and import its
+        rows. Returns the number of records inserted, or None if the token is
+        unknown or expired. Raises ValueError for an experiment that was not
+        one of the sheet's candidates.
+        """
+        stagedSheet = await self.stagedSheetsCollection.find_one({"_id": token})
+        if not stagedSheet:
+            return None
+        if experimentId not in stagedSheet["matchingExp"]:
+            raise ValueError(
+                f"{experimentId} is not a candidate experiment for {stagedSheet['dataId']}"
+            )
+
+        sheet = SheetImport(experimentId)
+        firstRow = 0
+        async for stagedRows in self.stagedRowsCollection.find(
+            {"token": token}
+        ).sort("chunk", 1):
+            dataDf = pd.DataFrame(stagedRows["rows"])
+            records = await self.linkData(dataDf, experimentId, firstRow)
+            firstRow += len(dataDf)
+            if records:
+                await self.storeLinkedData(dataDf, records, sheet)
+        await self.finishSheet(sheet)
+        inserted = sheet.inserted
+
+        await self.stagedRowsCollection.delete_many({"token": token})
+        await self.stagedSheetsCollection.delete_one({"_id": token})
+        self.logger.info(
+            f"Resolved staged sheet {stagedSheet['dataId']} to {experimentId}: "
+            f"{inserted} records"
+        )
+        return inserted
+
+    async def insertRecords(self, records):
+        """
+        Write linked data records with unordered bulk upserts keyed on
+        {experimentId, dataSheetId}, so re-importing a sheet does not add
+        rows. Returns the positions of the records that were new.
+        """
+        operations = []
+        positions = []
+        seen = set()
+        for position, record in enumerate(records):
+            key = (record["experimentId"], record["dataSheetId"])
+            # Repeated rows within a batch would race each other's upsert
+            if key in seen:
+                continue
+            seen.add(key)
+            rowFilter = {"experimentId": key[0], "dataSheetId": key[1]}
+            if self.importMode == UPSERT_DUPLICATES:
+                operations.append(ReplaceOne(rowFilter, record, upsert=True))
+            else:
+                operations.append(
+                    UpdateOne(rowFilter, {"$setOnInsert": record}, upsert=True)
+                )
+            positions.append(position)
+
+        if not operations:
+            return []
+        try:
+            result = await self.dataSheetsCollection.bulk_write(
+                operations, ordered=False
+            )
+            upserted = result.upserted_ids.keys()
+        except BulkWriteError as e:
+            # A concurrent import inserted some of the same rows first
+            self.logger.warning(f"Skipped rows written concurrently: {len(e.details['writeErrors'])}")
+            upserted = [item["index"] for item in e.details.get("upserted", [])]
+        return sorted(positions[index] for index in upserted)
+
+    async def storeLinkedData(self, dataDf, records, sheet=None):
+        """
+        Insert linked records and merge the new ones into the catalog.
+        Returns the records that were new. Part of a `sheet`, replaced rows
+        are only noted, for finishSheet to refresh the summary once, as are
+        the new rows of a sheet deferring its rollups.
+        """
+        positions = await self.insertRecords(records)
+        experimentId = records[0]["experimentId"] if records else None
+        # Replaced rows change values already merged into the summary
+        replaced = self.importMode == UPSERT_DUPLICATES and len(positions) < len(records)
+        if positions or replaced:
+            await self.bumpRevisions("data")
+        skipped = len(records) - len(positions)
+        if skipped:
+            self.logger.info(f"Skipped {skipped} rows already imported")
+            dataDf = dataDf.iloc[positions]
+            records = [records[position] for position in positions]
+        if records:
+            await self.updateDataCatalog(dataDf, records)
+            # Data rows are too many to push; clients reload what they show
+            self.publish("data", INSERT, experimentId=experimentId, count=len(records))
+        if sheet is not None:
+            sheet.inserted += len(records)
+            sheet.skipped += skipped
+            sheet.replaced = sheet.replaced or replaced
+        if sheet is not None and sheet.deferRollups:
+            if records:
+                sheet.pending.append(dataDf)
+        elif replaced and sheet is None:
+            await self.refreshDataSummary(experimentId)
+            await self.refreshPyramid(experimentId)
+        elif records:
+            await self.updateDataSummary(experimentId, dataDf)
+            # Once a sheet replaced rows, its pyramid is rebuilt at the end
+            if sheet is None or not sheet.replaced:
+                await self.appendToPyramid(experimentId, dataDf)
+        return records
+
+    async def finishSheet(self, sheet):
+        """
+        Bring what reads a whole experiment up to date after the last chunk
+        of a sheet. Needed when rows were replaced, as their old values
+        cannot be taken out of the summary and pyramid, or when the sheet
+        deferred its rollups.
+        """
+        if sheet.replaced:
+            await self.refreshDataSummary(sheet.experimentId)
+            await self.refreshPyramid(sheet.experimentId)
+        elif sheet.pending:
+            dataDf = pd.concat(sheet.pending, ignore_index=True)
+            await self.updateDataSummary(sheet.experimentId, dataDf)
+            await self.appendToPyramid(sheet.experimentId, dataDf)
+
+    def publish(self, collection, operation, **fields):
+        if self.eventBus is not None:
+            self.eventBus.publish(collection, operation, **fields)
+
+    async def bumpRevisions(self, *collections):
+        """Bump the revisions of the collections an import changed."""
+        try:
+            await self.revisionsCollection.bulk_write(buildRevisionUpdates(list(collections)))
+        except Exception as e:
+            self.logger.warning(f"Could not bump revisions: {e}")
+
+    async def updateDateIndex(self, experiments):
+        """Record newly imported experiments in the date -> experimentIds index."""
+        try:
+            operations = buildDateIndexUpdates(experiments)
+            if operations:
+                await self.dateIndexCollection.bulk_write(operations)
+        except Exception as e:
+            self.logger.warning(f"Could not update date index: {e}")
+
+    async def updateDataSummary(self, experimentId, dataDf):
+        """Merge new data rows into the experiment's summary statistics."""
+        try:
+            await self.dataSummariesCollection.bulk_write(
+                buildSummaryUpdates(experimentId, summarizeDataSheet(dataDf))
+            )
+        except Exception as e:
+            self.logger.warning(f"Could not update data summary: {e}")
+
+    async def refreshDataSummary(self, experimentId):
+        """Recompute an experiment's summary from its stored data rows."""
+        try:
+            aggregated = await self.dataSheetsCollection.aggregate(
+                summaryPipeline(experimentId)
+            ).to_list(None)
+            await self.dataSummariesCollection.bulk_write(
+                buildSummaryRefresh(experimentId, aggregated)
+            )
+        except Exception as e:
+            self.logger.warning(f"Could not refresh data summary: {e}")
+
+    async def appendToPyramid(self, experimentId, dataDf):
+        """Merge newly inserted data rows into the experiment's pyramid."""
+        try:
+            await appendToPyramid(
+                self.dataPyramidsCollection, self.dataSheetsCollection, experimentId, dataDf
+            )
+        except Exception as e:
+            self.logger.warning(f"Could not update downsample pyramid: {e}")
+
+    async def buildPyramid(self, experimentId):
+        """
+        Rebuild an experiment's downsample pyramid from its stored data rows,
+        read in batches. Tiles keep reading the previous pyramid until the
+        new one is complete.
+        """
+        await rebuildPyramid(
+            self.dataPyramidsCollection, self.dataSheetsCollection, experimentId
+        )
+
+    async def refreshPyramid(self, experimentId):
+        """Rebuild an experiment's pyramid after an import replaced rows."""
+        try:
+            await self.buildPyramid(experimentId)
+        except Exception as e:
+            self.logger.warning(f"Could not rebuild downsample pyramid: {e}")
+
+    async def updateDataCatalog(self, dataDf, records):
+        """Merge the columns of a linked data sheet into the attribute catalog."""
+        try:
+            catalogDf = dataDf.assign(
+                experimentId=[record["experimentId"] for record in records],
+                dataSheetId=[record["dataSheetId"] for record in records],
+            )
+        except Exception as e:
+            self.logger.warning(f"Could not summarize data sheet for catalog: {e}")
+            return
+        await self.updateCatalog("data", summarizeDataFrame(catalogDf))
+
+    def extractSheetDate(self, dataDf, dataFilePath):
+        """
+        Determine the date of a data sheet from its first valid Time entry,
+        falling back to a date in the filename.
+        """
+        date = None
+        # Attempt to determine the date from the Time column
+        if 'Time' in dataDf.columns and len(dataDf) > 0:
+            try:
+                # Get the date from the first non-null Time entry
+                firstValidTime = None
+                for timeValue in dataDf['Time']:
+                    if pd.notna(timeValue):
+                        firstValidTime = timeValue
+                        break
+                
+                if firstValidTime is not None:
+                    date = pd.to_datetime(firstValidTime).date().isoformat()
+                else:
+                    self.logger.warning("Could not find valid time value in Time column")
+                    date = None
+            except Exception as e:
+                self.logger.warning(f"Error extracting date from Time column: {e}")
+                date = None
+        else:
+            # Try to extract date from filename as fallback
+            filename = os.path.basename(dataFilePath)
+            dateMatch = re.search(r'(\d{4}-\d{2}-\d{2}|\d{2}-\d{2}-\d{4}|\d{4}/\d{2}/\d{2})', filename)
+            if dateMatch:
+                dateStr = dateMatch.group(1)
+                try:
+                    date = pd.to_datetime(dateStr).date().isoformat()
+                except:
+                    date = None
+            else:
+                date = None
+        return date
+
+    async def importDataSheet(self, dataFilePath, result=None):
         """
         Import and process a data sheet, creating a separate document for each
         row with a matching experiment ID, if applicable.
         """
         try:
             self.logger.info(f"Importing data sheet: {dataFilePath}")
+
+            if shouldStream(dataFilePath):
+                return await self.importDataSheetStreaming(dataFilePath, result)
             
-            dataDf = pd.read_excel(dataFilePath, sheet_name=0)
+            dataDf = readSheet(dataFilePath)
             
             # Handle duplicate column names
             dataDf = self.handleDuplicateColumns(dataDf)
             
             dataDf = self.cleanData(dataDf)
             
-            # Attempt to determine the date from the Time column
-            if 'Time' in dataDf.columns and len(dataDf) > 0:
-                try:
-                    # Get the date from the first non-null Time entry
-                    firstValidTime = None
-                    for timeValue in dataDf['Time']:
-                        if pd.notna(timeValue):
-                            firstValidTime = timeValue
-                            break
-                    
-                    if firstValidTime is not None:
-                        date = pd.to_datetime(firstValidTime).date().isoformat()
-                    else:
-                        self.logger.warning("Could not find valid time value in Time column")
-                        date = None
-                except Exception as e:
-                    self.logger.warning(f"Error extracting date from Time column: {e}")
-                    date = None
-            else:
-                # Try to extract date from filename as fallback
-                filename = os.path.basename(dataFilePath)
-                dateMatch = re.search(r'(\d{4}-\d{2}-\d{2}|\d{2}-\d{2}-\d{4}|\d{4}/\d{2}/\d{2})', filename)
-                if dateMatch:
-                    dateStr = dateMatch.group(1)
-                    try:
-                        date = pd.to_datetime(dateStr).date().isoformat()
-                    except:
-                        date = None
-                else:
-                    date = None
-            
+            date = self.extractSheetDate(dataDf, dataFilePath)
+
             if not date:
                 self.logger.warning("Could not determine date from data sheet")
                 return None
                 
+            ambiguousCount = len(result.ambiguousData) if result is not None else 0
             experimentId = await self.findExperiment(
-                date, os.path.basename(dataFilePath)
+                date, os.path.basename(dataFilePath), result
             )
+
+            if not experimentId and result is not None and len(result.ambiguousData) > ambiguousCount:
+                # Keep the parsed rows so the user's choice needs no re-upload
+                token = await self.stageSheet(result.ambiguousData[-1])
+                await self.stageRows(token, dataDf)
+                return None
             
             if not experimentId:
                 self.logger.warning(
@@ -337,7 +856,11 @@ class MigrationService:
             records = await self.linkData(dataDf, experimentId)
             
             if records:
-                await self.dataSheetsCollection.insert_many(records)
+                sheet = SheetImport(experimentId)
+                records = await self.storeLinkedData(dataDf, records, sheet)
+                await self.finishSheet(sheet)
+                if result is not None:
+                    result.duplicateRows += sheet.skipped
                 self.logger.info(f"Successfully imported {len(records)} data records linked to experiment {experimentId}")
                 return records
             else:
@@ -347,44 +870,138 @@ class MigrationService:
             self.logger.error(f"Error processing data file {dataFilePath}: {e}")
             return None
 
+    async def importDataSheetStreaming(
+        self, dataFilePath, result=None, experimentId=None,
+        chunkRows=DEFAULT_CHUNK_ROWS
+    ):
+        """
+        Import a large data sheet chunk by chunk. Each chunk is cleaned,
+        linked and inserted while the next one is parsed on a worker thread,
+        so memory stays bounded by a few chunks whatever the sheet size. The
+        experiment is found from the first non-empty chunk unless
+        `experimentId` is given; sheets with several candidate experiments
+        are staged instead. Returns the number of records inserted.
+        """
+        self.logger.info(f"Streaming data sheet: {dataFilePath}")
+        columns = None
+        sheet = None
+        stagingToken = None
+        stagedChunks = 0
+        firstRow = 0
+        chunks = iterInThread(lambda: iterSheetChunks(dataFilePath, chunkRows))
+        try:
+            async for chunk in chunks:
+                # Duplicate headers are resolved once and reused for every chunk
+                if columns is None:
+                    chunk = self.handleDuplicateColumns(chunk)
+                    columns = list(chunk.columns)
+                else:
+                    chunk.columns = columns
+
+                chunk = self.cleanData(chunk)
+                if chunk.empty:
+                    continue
+
+                if experimentId is None and stagingToken is None:
+                    date = self.extractSheetDate(chunk, dataFilePath)
+                    if not date:
+                        self.logger.warning("Could not determine date from data sheet")
+                        return 0
+                    ambiguousCount = len(result.ambiguousData) if result is not None else 0
+                    experimentId = await self.findExperiment(
+                        date, os.path.basename(dataFilePath), result
+                    )
+                    if not experimentId and result is not None and len(result.ambiguousData) > ambiguousCount:
+                        stagingToken = await self.stageSheet(result.ambiguousData[-1])
+                    elif not experimentId:
+                        self.logger.warning(
+                            f"No single matching experiment found for data sheet "
+                            f"date {date}. Skipping."
+                        )
+                        return 0
+
+                if stagingToken:
+                    # Ambiguous sheets are staged whole for the user to link
+                    stagedChunks = await self.stageRows(stagingToken, chunk, stagedChunks)
+                    continue
+
+                if sheet is None:
+                    sheet = SheetImport(experimentId)
+                records = await self.linkData(chunk, experimentId, firstRow)
+                firstRow += len(chunk)
+                if records:
+                    await self.storeLinkedData(chunk, records, sheet)
+        finally:
+            await chunks.aclose()
+
+        if stagingToken:
+            self.logger.info(f"Staged ambiguous data sheet {dataFilePath} ({stagedChunks} chunks)")
+            return 0
+        if sheet is None:
+            return 0
+        await self.finishSheet(sheet)
+        if result is not None:
+            result.duplicateRows += sheet.skipped
+        self.logger.info(
+            f"Streamed {sheet.inserted} data records linked to experiment {experimentId}"
+        )
+        return sheet.inserted
+
+    async def importLinkedDataSheet(self, dataFilePath, experimentId):
+        """
+        Import a data sheet the user has linked to an experiment manually.
+        Returns the number of records inserted.
+        """
+        if shouldStream(dataFilePath):
+            return await self.importDataSheetStreaming(
+                dataFilePath, experimentId=experimentId
+            )
+
+        dataDf = readSheet(dataFilePath)
+        dataDf = self.handleDuplicateColumns(dataDf)
+        dataDf = self.cleanData(dataDf)
+
+        sheet = SheetImport(experimentId)
+        records = await self.linkData(dataDf, experimentId)
+        if records:
+            await self.storeLinkedData(dataDf, records, sheet)
+        await self.finishSheet(sheet)
+        return sheet.inserted
+
     async def migrate(self, experimentFilePaths=None, dataFilePaths=None):
         """
         Run the migration process, importing experiments and data sheets,
         then linking them as needed.
         """
         self.logger.info("Starting migration process")
-        results = {
-            "experiments_imported": 0,
-            "data_sheets_imported": 0,
-            "ambiguous_links": 0,
-            "errors": 0
-        }
-        
+        result = MigrationResult()
+
         if experimentFilePaths:
             for path in experimentFilePaths:
                 try:
                     experiments = await self.importExperimentSheet(path)
                     if experiments:
-                        results["experiments_imported"] += len(experiments)
+                        result.experimentsImported += len(experiments)
                 except Exception as e:
                     self.logger.error(f"Failed to import experiment file {path}: {e}")
-                    results["errors"] += 1
+                    result.errors += 1
 
         if dataFilePaths:
             for path in dataFilePaths:
                 try:
-                    dataRecords = await self.importDataSheet(path)
+                    dataRecords = await self.importDataSheet(path, result)
                     if dataRecords:
-                        results["data_sheets_imported"] += 1
+                        result.dataSheetsImported += 1
                 except Exception as e:
                     self.logger.error(f"Failed to import data file {path}: {e}")
-                    results["errors"] += 1
-        
-        self.logger.info(f"Migration completed with results: {results}")
-        
-        return self.ambiguousData
+                    result.errors += 1
+
+        self.logger.info(f"Migration completed with results: {result}")
+
+        return result
 
     async def closeConnection(self):
-        """Close the MongoDB client connection."""
-        self.client.close()
-        self.logger.info("Closed MongoDB connection")
+        """Close the MongoDB client connection if this service opened it."""
+        if self.ownsClient:
+            self.client.close()
+            self.logger.info("Closed MongoDB connection")
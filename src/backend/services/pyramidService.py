@@ -0,0 +1,408 @@
+# -----------------------------------------------------------------------------
+# Primary author: Jennifer Y
+# Year: 2025
+# Purpose: Multi-resolution downsample pyramids of experiment data, so zoomable
+# plots read a number of points proportional to their width, not to the run.
+# -----------------------------------------------------------------------------
+
+import math
+import uuid
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from pymongo import InsertOne, ReplaceOne, ReturnDocument
+from pymongo.errors import BulkWriteError
+
+from services.summaryService import UNSUMMARIZED_COLUMNS
+from utils import TIME_FORMAT
+
+DATA_PYRAMIDS_COLLECTION = "data_pyramids"
+
+# Buckets of level L span 2**L seconds. Levels finer than the sampling
+# interval would repeat the raw data, so the finest level kept is the
+# widest that does not exceed the median interval.
+MAX_LEVEL = 24
+# Buckets stored per document of a level
+CHUNK_BUCKETS = 1024
+# Chunk arrays are stored as little-endian binary, which is compact and
+# converts to and from numpy without building Python objects
+FIELD_DTYPES = {
+    "buckets": "<i8",
+    "count": "<i8",
+    "mean": "<f8",
+    "min": "<f8",
+    "max": "<f8",
+}
+
+DEFAULT_TILE_PIXELS = 1000
+MAX_TILE_PIXELS = 10000
+
+# Rows read per batch when a pyramid is rebuilt from the stored data
+PYRAMID_BATCH_ROWS = 20000
+# Attempts at merging into chunks that other writers keep changing
+PYRAMID_WRITE_ATTEMPTS = 5
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def epochSeconds(times) -> np.ndarray:
+    """Seconds since the epoch of sample times; NaN when unparseable."""
+    parsed = pd.to_datetime(pd.Series(times), format=TIME_FORMAT, errors="coerce")
+    nanos = parsed.to_numpy(dtype="datetime64[ns]").astype("int64").astype(float)
+    nanos[parsed.isna().to_numpy()] = np.nan
+    return nanos / 1e9
+
+
+def parseWindowTime(value: str) -> float:
+    """Seconds since the epoch of a time in TIME_FORMAT. Raises ValueError."""
+    return (datetime.strptime(value, TIME_FORMAT) - EPOCH).total_seconds()
+
+
+def formatBucketTimes(buckets, level: int) -> list[str]:
+    seconds = np.asarray(buckets, dtype="int64") * (1 << level)
+    return pd.to_datetime(seconds, unit="s").strftime(TIME_FORMAT).tolist()
+
+
+def finestLevel(seconds: np.ndarray) -> int:
+    """The widest level whose buckets do not exceed the median sampling interval."""
+    ordered = np.unique(seconds)
+    interval = np.median(np.diff(ordered)) if len(ordered) > 1 else 1
+    return min(max(0, int(math.floor(math.log2(max(interval, 1))))), MAX_LEVEL)
+
+
+def coarsestLevel(span: float, finest: int) -> int:
+    """The first level holding a run of `span` seconds in one bucket."""
+    return min(max(finest, int(math.ceil(math.log2(span + 1)))), MAX_LEVEL)
+
+
+def levelRange(seconds: np.ndarray) -> tuple[int, int]:
+    """
+    Finest and coarsest levels of an experiment: the median sampling
+    interval, and the first level holding the whole run in one bucket.
+    """
+    finest = finestLevel(seconds)
+    span = np.max(seconds) - np.min(seconds) if len(seconds) else 0
+    return finest, coarsestLevel(span, finest)
+
+
+def reduceBuckets(buckets, counts, sums, mins, maxs):
+    """Merges entries of sorted bucket arrays that share a bucket."""
+    buckets, starts = np.unique(buckets, return_index=True)
+    return (
+        buckets,
+        np.add.reduceat(counts, starts),
+        np.add.reduceat(sums, starts),
+        np.minimum.reduceat(mins, starts),
+        np.maximum.reduceat(maxs, starts),
+    )
+
+
+def buildLevels(seconds: np.ndarray, values: np.ndarray, finest: int, coarsest: int):
+    """
+    Yields (level, buckets, counts, sums, mins, maxs) from `finest` to
+    `coarsest`. Each level is merged from the one below it, so building every
+    level costs about twice the finest.
+    """
+    valid = ~(np.isnan(seconds) | np.isnan(values))
+    seconds, values = seconds[valid], values[valid]
+    if not len(values):
+        return
+    order = np.argsort(seconds, kind="stable")
+    seconds, values = seconds[order], values[order]
+
+    level = reduceBuckets(
+        np.floor(seconds / (1 << finest)).astype("int64"),
+        np.ones(len(values), dtype="int64"), values, values, values,
+    )
+    yield (finest, *level)
+    for depth in range(finest + 1, coarsest + 1):
+        buckets, *stats = level
+        # Floor division by two, also for buckets before the epoch
+        level = reduceBuckets(buckets >> 1, *stats)
+        yield (depth, *level)
+
+
+def newGeneration() -> str:
+    """A new identifier for the chunks of a rebuilt pyramid."""
+    return uuid.uuid4().hex
+
+
+def pyramidDocuments(experimentId: str, generation: str, attribute: str, levels) -> list[dict]:
+    """Chunk documents of an attribute's levels, as parallel binary arrays."""
+    documents = []
+    for level, buckets, counts, sums, mins, maxs in levels:
+        fields = {"buckets": buckets, "count": counts, "mean": sums / counts, "min": mins, "max": maxs}
+        chunks = buckets // CHUNK_BUCKETS
+        boundaries = np.flatnonzero(np.diff(chunks)) + 1
+        for first, last in zip(np.r_[0, boundaries], np.r_[boundaries, len(buckets)]):
+            chunk = int(chunks[first])
+            documents.append({
+                "_id": f"{experimentId}:{generation}:{attribute}:{level}:{chunk}",
+                "experimentId": experimentId,
+                "generation": generation,
+                "attribute": attribute,
+                "level": level,
+                "chunk": chunk,
+                **{
+                    field: values[first:last].astype(FIELD_DTYPES[field]).tobytes()
+                    for field, values in fields.items()
+                },
+            })
+    return documents
+
+
+def batchDocuments(experimentId: str, generation: str, df: pd.DataFrame, finest: int):
+    """
+    Chunk documents of every level, from `finest` up, of the numeric
+    attributes of a batch of data rows. Returns (documents, attributes,
+    start, end), or None when the batch has no timed rows. Every level is
+    kept, so later rows extending the run never need levels rebuilt.
+    """
+    if "Time" not in df.columns:
+        return None
+    seconds = epochSeconds(df["Time"])
+    if np.isnan(seconds).all():
+        return None
+
+    documents, attributes = [], []
+    for column in df.columns:
+        if column in UNSUMMARIZED_COLUMNS:
+            continue
+        values = df[column]
+        if pd.api.types.is_bool_dtype(values) or not pd.api.types.is_numeric_dtype(values):
+            continue
+        levels = buildLevels(seconds, values.to_numpy(dtype=float), finest, MAX_LEVEL)
+        attributeDocuments = pyramidDocuments(experimentId, generation, column, levels)
+        if attributeDocuments:
+            attributes.append(column)
+            documents.extend(attributeDocuments)
+    return documents, attributes, float(np.nanmin(seconds)), float(np.nanmax(seconds))
+
+
+def mergeDocuments(stored: dict | None, new: dict) -> dict:
+    """A chunk document holding the buckets of both documents, merged."""
+    if stored is None:
+        return new
+    buckets = np.concatenate([concatenate([stored], "buckets"), concatenate([new], "buckets")])
+    counts = np.concatenate([concatenate([stored], "count"), concatenate([new], "count")])
+    means = np.concatenate([concatenate([stored], "mean"), concatenate([new], "mean")])
+    mins = np.concatenate([concatenate([stored], "min"), concatenate([new], "min")])
+    maxs = np.concatenate([concatenate([stored], "max"), concatenate([new], "max")])
+
+    order = np.argsort(buckets, kind="stable")
+    buckets, counts, sums, mins, maxs = reduceBuckets(
+        buckets[order], counts[order], (means * counts)[order], mins[order], maxs[order]
+    )
+    fields = {"buckets": buckets, "count": counts, "mean": sums / counts, "min": mins, "max": maxs}
+    return {
+        **new,
+        **{field: values.astype(FIELD_DTYPES[field]).tobytes() for field, values in fields.items()},
+    }
+
+
+def describePyramid(
+    experimentId: str, generation: str, attributes: list[str], finest: int,
+    start: float, end: float
+) -> dict:
+    """The document describing an experiment's pyramid and its generation."""
+    return {
+        "_id": experimentId,
+        "experimentId": experimentId,
+        "attribute": None,
+        "generation": generation,
+        "attributes": attributes,
+        "finestLevel": finest,
+        "coarsestLevel": coarsestLevel(end - start, finest),
+        "start": start,
+        "end": end,
+        "updatedAt": datetime.now(),
+    }
+
+
+async def mergeIntoPyramid(collection, documents: list[dict]):
+    """
+    Merges chunk documents into the stored ones. Each write is conditioned
+    on the chunk being unchanged since it was read, and chunks another
+    writer changed meanwhile are merged again.
+    """
+    pending = {document["_id"]: document for document in documents}
+    for _ in range(PYRAMID_WRITE_ATTEMPTS):
+        writer = uuid.uuid4().hex
+        stored = {
+            document["_id"]: document
+            for document in await collection.find({"_id": {"$in": list(pending)}}).to_list(None)
+        }
+        operations = []
+        for documentId, document in pending.items():
+            previous = stored.get(documentId)
+            merged = {**mergeDocuments(previous, document), "writer": writer}
+            if previous is None:
+                operations.append(InsertOne(merged))
+            else:
+                operations.append(ReplaceOne(
+                    {"_id": documentId, "writer": previous.get("writer")}, merged
+                ))
+        try:
+            await collection.bulk_write(operations, ordered=False)
+        except BulkWriteError:
+            # Chunks created concurrently are merged again below
+            pass
+        written = await collection.find(
+            {"_id": {"$in": list(pending)}, "writer": writer}, {"_id": 1}
+        ).to_list(None)
+        for document in written:
+            pending.pop(document["_id"], None)
+        if not pending:
+            return
+    raise RuntimeError(f"Pyramid chunks kept changing concurrently: {len(pending)} not merged.")
+
+
+async def appendToPyramid(collection, dataCollection, experimentId: str, df: pd.DataFrame):
+    """
+    Merges newly inserted data rows into an experiment's pyramid, touching
+    only the chunks their buckets fall in. An experiment without a pyramid,
+    or with one from before generations, is rebuilt from all its rows.
+    """
+    pyramid = await collection.find_one({"_id": experimentId})
+    if not pyramid or "generation" not in pyramid:
+        await rebuildPyramid(collection, dataCollection, experimentId)
+        return
+
+    generation = pyramid["generation"]
+    batch = batchDocuments(experimentId, generation, df, pyramid["finestLevel"])
+    if batch is None:
+        return
+    documents, attributes, start, end = batch
+    await mergeIntoPyramid(collection, documents)
+
+    updated = await collection.find_one_and_update(
+        {"_id": experimentId, "generation": generation},
+        {
+            "$min": {"start": start},
+            "$max": {"end": end},
+            "$addToSet": {"attributes": {"$each": attributes}},
+            "$set": {"updatedAt": datetime.now()},
+        },
+        return_document=ReturnDocument.AFTER,
+    )
+    if updated:
+        await collection.update_one(
+            {"_id": experimentId},
+            {"$max": {"coarsestLevel": coarsestLevel(
+                updated["end"] - updated["start"], updated["finestLevel"]
+            )}},
+        )
+
+
+async def rebuildPyramid(
+    collection, dataCollection, experimentId: str, batchRows: int = PYRAMID_BATCH_ROWS
+):
+    """
+    Rebuilds an experiment's pyramid from its stored rows, read in batches
+    so memory stays bounded whatever the length of the run. The new levels
+    are written under a new generation, and the description is switched to
+    it only once they are complete, so tiles never read a partial pyramid.
+    Chunks of earlier generations are removed afterwards. An experiment
+    without timed rows loses its pyramid.
+    """
+    generation = newGeneration()
+    finest, attributes, start, end = None, [], math.inf, -math.inf
+
+    cursor = dataCollection.find(
+        {"experimentId": experimentId}, {"_id": 0, "experimentId": 0}
+    ).batch_size(batchRows)
+    while rows := await cursor.to_list(length=batchRows):
+        df = pd.DataFrame(rows)
+        if finest is None:
+            if "Time" not in df.columns:
+                continue
+            seconds = epochSeconds(df["Time"])
+            if np.isnan(seconds).all():
+                continue
+            finest = finestLevel(seconds[~np.isnan(seconds)])
+        batch = batchDocuments(experimentId, generation, df, finest)
+        if batch is None:
+            continue
+        documents, batchAttributes, batchStart, batchEnd = batch
+        await mergeIntoPyramid(collection, documents)
+        attributes.extend(name for name in batchAttributes if name not in attributes)
+        start, end = min(start, batchStart), max(end, batchEnd)
+
+    if finest is None:
+        await collection.delete_one({"_id": experimentId})
+        await collection.delete_many({"experimentId": experimentId})
+        return
+    await collection.replace_one(
+        {"_id": experimentId},
+        describePyramid(experimentId, generation, attributes, finest, start, end),
+        upsert=True,
+    )
+    await collection.delete_many({
+        "experimentId": experimentId,
+        "attribute": {"$ne": None},
+        "generation": {"$ne": generation},
+    })
+
+
+def chooseLevel(start: float, end: float, pixels: int, pyramid: dict) -> int:
+    """
+    The coarsest level with buckets no wider than a pixel, so a window is
+    drawn from between `pixels` and twice as many buckets.
+    """
+    secondsPerPixel = (end - start) / max(pixels, 1)
+    level = int(math.floor(math.log2(secondsPerPixel))) if secondsPerPixel >= 1 else 0
+    return min(max(level, pyramid["finestLevel"]), pyramid["coarsestLevel"])
+
+
+def tileQuery(
+    pyramid: dict, attributes: list[str], level: int, start: float, end: float
+) -> dict:
+    """Filter for the chunks of a level of a pyramid overlapping the window."""
+    width = 1 << level
+    return {
+        "experimentId": pyramid["experimentId"],
+        # Pyramids from before generations have chunks without one
+        "generation": pyramid.get("generation"),
+        "attribute": {"$in": attributes},
+        "level": level,
+        "chunk": {
+            "$gte": int(math.floor(start / width)) // CHUNK_BUCKETS,
+            "$lte": int(math.floor(end / width)) // CHUNK_BUCKETS,
+        },
+    }
+
+
+def assembleTile(
+    documents: list[dict], attributes: list[str], level: int, start: float, end: float
+) -> dict:
+    """
+    Series of each attribute within the window, as columns of bucket start
+    times and their count, mean, min and max.
+    """
+    width = 1 << level
+    first, last = math.floor(start / width), math.floor(end / width)
+    chunksByAttribute = {attribute: [] for attribute in attributes}
+    for document in sorted(documents, key=lambda document: document["chunk"]):
+        chunksByAttribute[document["attribute"]].append(document)
+
+    series = {}
+    for attribute, chunks in chunksByAttribute.items():
+        buckets = concatenate(chunks, "buckets")
+        keep = (buckets >= first) & (buckets <= last)
+        series[attribute] = {
+            "Time": formatBucketTimes(buckets[keep], level),
+            **{
+                field: concatenate(chunks, field)[keep].tolist()
+                for field in ("count", "mean", "min", "max")
+            },
+        }
+    return series
+
+
+def concatenate(chunks: list[dict], field: str) -> np.ndarray:
+    """A field's values across chunks, decoded from their binary arrays."""
+    dtype = FIELD_DTYPES[field]
+    if not chunks:
+        return np.array([], dtype=dtype)
+    return np.concatenate([np.frombuffer(chunk[field], dtype=dtype) for chunk in chunks])
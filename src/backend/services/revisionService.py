@@ -0,0 +1,112 @@
+# -----------------------------------------------------------------------------
+# Primary author: Jason T
+# Year: 2025
+# Purpose: Collection revisions kept in MongoDB. Every writer bumps the
+# revision of the collections it changes, so conditional reads see changes
+# made by any worker or background job, not only those of their own process.
+# -----------------------------------------------------------------------------
+
+import hashlib
+import time
+import uuid
+from datetime import datetime, timezone
+
+from pymongo import UpdateOne
+
+REVISIONS_COLLECTION = "revisions"
+
+# How long a worker serves cached revisions before reading them again. Writes
+# published on the EventBus clear the cache at once; this bounds how late
+# changes made by other workers and by background jobs are seen
+REVISION_CACHE_SECONDS = 2.0
+
+
+def buildRevisionUpdates(collections: list[str]) -> list:
+    """
+    Builds the operations bumping the revision of each collection. The
+    operations can be passed to either a PyMongo or a Motor `bulk_write`.
+    """
+    return [
+        UpdateOne(
+            {"_id": collection},
+            {
+                "$inc": {"sequence": 1},
+                "$currentDate": {"changedAt": True},
+                # Tells a collection's revisions apart from those it had
+                # before the revisions collection was dropped
+                "$setOnInsert": {"epoch": uuid.uuid4().hex[:8]},
+            },
+            upsert=True,
+        )
+        for collection in sorted(set(collections))
+    ]
+
+
+def combineRevisions(documents: list[dict], collections, startedAt: datetime) -> tuple:
+    """
+    Revision and time of the latest change of a set of collections, from
+    their revision documents. Collections never bumped are at revision 0;
+    when none was, the time is `startedAt`.
+    """
+    byCollection = {document["_id"]: document for document in documents}
+    digest = hashlib.sha1()
+    changedAt = None
+    for collection in sorted(set(collections)):
+        document = byCollection.get(collection)
+        if document is None:
+            digest.update(f"{collection}:0\0".encode())
+            continue
+        digest.update(f"{collection}:{document['epoch']}:{document['sequence']}\0".encode())
+        documentChangedAt = document["changedAt"]
+        if documentChangedAt.tzinfo is None:
+            # PyMongo returns naive UTC datetimes
+            documentChangedAt = documentChangedAt.replace(tzinfo=timezone.utc)
+        changedAt = max(changedAt or documentChangedAt, documentChangedAt)
+    return digest.hexdigest()[:12], changedAt or startedAt
+
+
+class RevisionService:
+    """
+    Reads collection revisions for conditional requests. Revision documents
+    are cached, so a conditional request usually needs no MongoDB round
+    trip: every event published on the EventBus clears the cache, and
+    entries expire after `cacheSeconds`.
+    """
+
+    def __init__(self, database, eventBus=None, cacheSeconds: float = REVISION_CACHE_SECONDS):
+        self.revisionsCollection = database[REVISIONS_COLLECTION]
+        self.startedAt = datetime.now(timezone.utc)
+        self.cacheSeconds = cacheSeconds
+        # collection -> (revision document or None, time read)
+        self.cache = {}
+        # Tells reads that raced an invalidation not to cache what they read
+        self.generation = 0
+        if eventBus is not None:
+            eventBus.addListener(self.invalidate)
+
+    def invalidate(self, event=None):
+        self.cache.clear()
+        self.generation += 1
+
+    async def revision(self, collections) -> tuple:
+        """Revision and time of the latest change to any of the collections."""
+        now = time.monotonic()
+        cached = {
+            collection: self.cache[collection][0] for collection in set(collections)
+            if collection in self.cache and now - self.cache[collection][1] < self.cacheSeconds
+        }
+        missing = sorted(set(collections) - set(cached))
+        if missing:
+            generation = self.generation
+            documents = await self.revisionsCollection.find(
+                {"_id": {"$in": missing}}
+            ).to_list(None)
+            byCollection = {document["_id"]: document for document in documents}
+            fetched = {collection: byCollection.get(collection) for collection in missing}
+            if generation == self.generation:
+                self.cache.update(
+                    (collection, (document, now)) for collection, document in fetched.items()
+                )
+            cached.update(fetched)
+        documents = [document for document in cached.values() if document is not None]
+        return combineRevisions(documents, collections, self.startedAt)
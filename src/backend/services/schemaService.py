@@ -0,0 +1,282 @@
+# -----------------------------------------------------------------------------
+# Primary author: Jason T
+# Year: 2025
+# Purpose: Schema registry of the 'experiments' collection, so adding and
+# removing columns only changes metadata. Reads apply column defaults and hide
+# dropped columns, and a throttled background job removes dropped fields.
+# -----------------------------------------------------------------------------
+
+import asyncio
+import logging
+
+from pymongo.errors import DuplicateKeyError
+
+from services.revisionService import REVISIONS_COLLECTION, buildRevisionUpdates
+
+# The registry shares the 'config' collection with the column types
+EXPERIMENTS_SCHEMA_ID = "experimentsSchema"
+COLUMN_TYPES_QUERY = {"_id": {"$ne": EXPERIMENTS_SCHEMA_ID}}
+
+# Columns the importer and the date index query directly in MongoDB, so they
+# are still added and removed on every document
+EAGER_COLUMNS = ("experimentId", "Date")
+
+SCHEMA_WRITE_ATTEMPTS = 5
+
+# Documents cleaned per compaction batch, the pause between batches, and how
+# often an idle compactor checks for dropped columns
+COMPACTION_BATCH_SIZE = 500
+COMPACTION_PAUSE_SECONDS = 0.5
+COMPACTION_IDLE_SECONDS = 60.0
+
+
+def emptySchema() -> dict:
+    return {"_id": EXPERIMENTS_SCHEMA_ID, "version": 0, "columns": [], "dropped": []}
+
+
+def withColumn(schema: dict, name: str, default) -> dict:
+    """The schema with a column registered, or its default replaced."""
+    return {
+        **schema,
+        "version": schema["version"] + 1,
+        "columns": [column for column in schema["columns"] if column["name"] != name]
+        + [{"name": name, "default": default}],
+        "dropped": [entry for entry in schema["dropped"] if entry["name"] != name],
+    }
+
+
+def withoutColumn(schema: dict, name: str, droppedAt) -> dict:
+    """The schema with a column dropped, pending compaction."""
+    return {
+        **schema,
+        "version": schema["version"] + 1,
+        "columns": [column for column in schema["columns"] if column["name"] != name],
+        "dropped": [entry for entry in schema["dropped"] if entry["name"] != name]
+        + [{"name": name, "droppedAt": droppedAt}],
+    }
+
+
+def isDropped(schema: dict, name: str) -> bool:
+    return any(entry["name"] == name for entry in schema["dropped"])
+
+
+def isRegistered(schema: dict, name: str) -> bool:
+    return any(column["name"] == name for column in schema["columns"])
+
+
+def applySchema(documents: list[dict], schema: dict, fields=None) -> list[dict]:
+    """
+    Documents as the schema describes them: dropped columns removed and
+    registered columns they lack set to their default, after their own
+    fields so new columns keep their place at the end. With `fields`, as for
+    a projected read, only those columns get defaults.
+    """
+    defaults = [
+        (column["name"], column["default"]) for column in schema["columns"]
+        if fields is None or column["name"] in fields
+    ]
+    dropped = {entry["name"] for entry in schema["dropped"]}
+    if not defaults and not dropped:
+        return documents
+
+    applied = []
+    for document in documents:
+        row = {field: value for field, value in document.items() if field not in dropped}
+        for name, default in defaults:
+            row.setdefault(name, default)
+        applied.append(row)
+    return applied
+
+
+def conditionMatches(condition, value, present: bool = True):
+    """
+    Whether a field holding `value` (or missing, when not `present`)
+    satisfies a query condition, as MongoDB evaluates it. Returns None for
+    operators this does not evaluate.
+    """
+    if not isinstance(condition, dict) or not condition:
+        return value == condition if present else condition is None
+    results = []
+    for operator, operand in condition.items():
+        if operator == "$eq":
+            results.append(value == operand if present else operand is None)
+        elif operator == "$ne":
+            results.append(value != operand if present else operand is not None)
+        elif operator == "$in":
+            results.append(value in operand if present else None in operand)
+        elif operator == "$nin":
+            results.append(value not in operand if present else None not in operand)
+        elif operator == "$exists":
+            results.append(bool(operand) == present)
+        else:
+            return None
+    return all(results)
+
+
+def schemaQuery(schema: dict, query: dict) -> dict:
+    """
+    A filter on experiments as the schema describes them. A condition on a
+    registered column also matches the documents without it when its
+    default does, and one on a dropped column treats it as missing from
+    every document. Conditions with operators conditionMatches cannot
+    evaluate are kept as given.
+    """
+    defaults = {column["name"]: column["default"] for column in schema["columns"]}
+    dropped = {entry["name"] for entry in schema["dropped"]}
+    translated, clauses = {}, []
+    for field, condition in query.items():
+        if field in dropped:
+            matches = conditionMatches(condition, None, present=False)
+            if matches is None:
+                translated[field] = condition
+            elif not matches:
+                # No document holds a dropped column, so none matches
+                clauses.append({"_id": {"$exists": False}})
+        elif field in defaults:
+            matches = conditionMatches(condition, defaults[field])
+            if matches is None:
+                translated[field] = condition
+            elif matches:
+                clauses.append({"$or": [{field: condition}, {field: {"$exists": False}}]})
+            else:
+                clauses.append({"$and": [{field: {"$exists": True}}, {field: condition}]})
+        else:
+            translated[field] = condition
+    if clauses:
+        translated["$and"] = translated.get("$and", []) + clauses
+    return translated
+
+
+def loadSchema(config) -> dict:
+    """The stored schema, or an empty one before any column change."""
+    return config.find_one({"_id": EXPERIMENTS_SCHEMA_ID}) or emptySchema()
+
+
+async def loadSchemaAsync(config) -> dict:
+    """loadSchema for a Motor collection."""
+    return await config.find_one({"_id": EXPERIMENTS_SCHEMA_ID}) or emptySchema()
+
+
+def updateSchema(config, change) -> dict:
+    """
+    Applies `change`, a function from schema to schema, and stores the result
+    if no other writer changed the schema meanwhile, retrying otherwise.
+    Returns the stored schema.
+    """
+    for _ in range(SCHEMA_WRITE_ATTEMPTS):
+        current = loadSchema(config)
+        updated = change(current)
+        try:
+            result = config.replace_one(
+                {"_id": EXPERIMENTS_SCHEMA_ID, "version": current["version"]},
+                updated,
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            # Another writer created the schema first
+            continue
+        if result.matched_count or result.upserted_id is not None:
+            return updated
+    raise RuntimeError("The schema was changed concurrently; try again.")
+
+
+class SchemaCompactionService:
+    """
+    Background job physically removing dropped columns from 'experiments'.
+    Documents are cleaned in small batches in _id order with a pause between
+    batches, so concurrent edits are never locked out for long. A dropped
+    column leaves the schema once no document holds it.
+    """
+
+    def __init__(
+        self, database, batchSize: int = COMPACTION_BATCH_SIZE,
+        pauseSeconds: float = COMPACTION_PAUSE_SECONDS,
+        idleSeconds: float = COMPACTION_IDLE_SECONDS
+    ):
+        self.configCollection = database["config"]
+        self.experimentsCollection = database["experiments"]
+        self.revisionsCollection = database[REVISIONS_COLLECTION]
+        self.batchSize = batchSize
+        self.pauseSeconds = pauseSeconds
+        self.idleSeconds = idleSeconds
+
+        # (column, droppedAt) -> last _id cleaned
+        self.positions = {}
+        self.wakeup = asyncio.Event()
+        self.task = None
+        self.logger = logging.getLogger('SchemaCompaction')
+
+    async def start(self):
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+    def wake(self):
+        """Start compacting now rather than at the next idle check."""
+        self.wakeup.set()
+
+    async def run(self):
+        while True:
+            self.wakeup.clear()
+            try:
+                cleaned = await self.compactOnce()
+            except Exception as e:
+                self.logger.error(f"Schema compaction failed: {e}")
+                cleaned = 0
+            if cleaned:
+                await asyncio.sleep(self.pauseSeconds)
+                continue
+            await self.waitForWakeup()
+
+    async def waitForWakeup(self) -> bool:
+        """
+        Waits for wake() or the idle interval. Unlike asyncio.wait_for, a
+        stop() arriving just as wake() is called is not swallowed.
+        """
+        waiting = asyncio.ensure_future(self.wakeup.wait())
+        try:
+            done, _ = await asyncio.wait({waiting}, timeout=self.idleSeconds)
+            return bool(done)
+        finally:
+            waiting.cancel()
+
+    async def compactOnce(self) -> int:
+        """
+        Cleans one batch of documents holding a dropped column. Returns the
+        number of documents cleaned, 0 when nothing is left to do.
+        """
+        schema = await self.configCollection.find_one({"_id": EXPERIMENTS_SCHEMA_ID})
+        for entry in (schema or {}).get("dropped", []):
+            name, droppedAt = entry["name"], entry["droppedAt"]
+            position = (name, droppedAt)
+            query = {name: {"$exists": True}}
+            if position in self.positions:
+                query["_id"] = {"$gt": self.positions[position]}
+            batch = await self.experimentsCollection.find(
+                query, {"_id": 1}
+            ).sort("_id", 1).limit(self.batchSize).to_list(None)
+
+            if batch:
+                ids = [document["_id"] for document in batch]
+                await self.experimentsCollection.update_many(
+                    {"_id": {"$in": ids}}, {"$unset": {name: ""}}
+                )
+                await self.revisionsCollection.bulk_write(buildRevisionUpdates(["experiments"]))
+                self.positions[position] = ids[-1]
+                return len(ids)
+
+            await self.configCollection.update_one(
+                {"_id": EXPERIMENTS_SCHEMA_ID},
+                {
+                    "$pull": {"dropped": {"name": name, "droppedAt": droppedAt}},
+                    "$inc": {"version": 1},
+                }
+            )
+            await self.revisionsCollection.bulk_write(buildRevisionUpdates(["config"]))
+            self.positions.pop(position, None)
+            self.logger.info(f"Compacted dropped column {name}")
+        return 0
@@ -0,0 +1,253 @@
+# -----------------------------------------------------------------------------
+# Primary author: Jason T
+# Year: 2025
+# Purpose: Readers for Excel, CSV and Parquet data sheets, including chunked
+# readers so large imports run with bounded memory and parsing overlaps with
+# database inserts.
+# -----------------------------------------------------------------------------
+
+import asyncio
+import importlib.util
+import os
+import queue
+import threading
+
+import openpyxl
+import pandas as pd
+
+from metrics import timed
+
+# pyarrow is optional: it speeds up CSV parsing and is required for Parquet
+PYARROW_AVAILABLE = importlib.util.find_spec("pyarrow") is not None
+
+EXCEL = "excel"
+CSV = "csv"
+PARQUET = "parquet"
+
+EXTENSION_FORMATS = {
+    ".xlsx": EXCEL,
+    ".xlsm": EXCEL,
+    ".xls": EXCEL,
+    ".csv": CSV,
+    ".parquet": PARQUET,
+    ".pq": PARQUET,
+}
+MIMETYPE_EXTENSIONS = {
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet": ".xlsx",
+    "application/vnd.ms-excel": ".xls",
+    "text/csv": ".csv",
+    "application/csv": ".csv",
+    "application/vnd.apache.parquet": ".parquet",
+    "application/x-parquet": ".parquet",
+}
+
+# Sheets larger than this on disk are streamed instead of read whole
+STREAMING_THRESHOLD_BYTES = 10 * 1024 * 1024
+DEFAULT_CHUNK_ROWS = 5000
+# Parsed chunks allowed to wait for the consumer; bounds peak memory
+MAX_PENDING_CHUNKS = 2
+
+# openpyxl cannot read legacy .xls workbooks
+STREAMABLE_EXTENSIONS = (".xlsx", ".xlsm", ".csv", ".parquet", ".pq")
+
+# CSV columns read as the text the sheet holds rather than inferred types.
+# Data rows are keyed on, and their times parsed from, the text of Time
+CSV_TEXT_COLUMNS = ("time",)
+
+
+def detectFormat(filePath: str) -> str:
+    """Sheet format from the file extension; unknown extensions are Excel."""
+    extension = os.path.splitext(filePath)[1].lower()
+    return EXTENSION_FORMATS.get(extension, EXCEL)
+
+
+def withFormatExtension(filename: str, mimetype: str) -> str:
+    """
+    Appends the extension matching `mimetype` when a filename has no
+    recognized extension, so the format survives saving to disk. A known
+    extension wins over the mimetype, which browsers often guess wrong for
+    CSV files.
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    if extension in EXTENSION_FORMATS:
+        return filename
+    return filename + MIMETYPE_EXTENSIONS.get((mimetype or "").lower(), "")
+
+
+def shouldStream(filePath: str) -> bool:
+    """Whether a sheet is large enough, and in a format, worth streaming."""
+    extension = os.path.splitext(filePath)[1].lower()
+    return (
+        extension in STREAMABLE_EXTENSIONS
+        and os.path.isfile(filePath)
+        and os.path.getsize(filePath) > STREAMING_THRESHOLD_BYTES
+    )
+
+
+def requirePyarrow():
+    if not PYARROW_AVAILABLE:
+        raise ValueError("Reading Parquet files requires the pyarrow package.")
+
+
+def csvTextTypes(filePath: str) -> dict:
+    """
+    dtype mapping keeping the CSV_TEXT_COLUMNS of a single-header CSV file
+    as text, so the pyarrow and the chunked readers agree on their values.
+    """
+    columns = pd.read_csv(filePath, nrows=0).columns
+    return {
+        name: str for name in columns
+        if str(name).strip().lower() in CSV_TEXT_COLUMNS
+    }
+
+
+def readCsv(filePath: str, header=0) -> pd.DataFrame:
+    """
+    Reads a CSV file, with the multithreaded pyarrow parser when it is
+    installed. pyarrow also types timestamp columns as it parses, except
+    for the text columns.
+    """
+    if header != 0:
+        return pd.read_csv(filePath, header=header)
+    dtype = csvTextTypes(filePath)
+    if PYARROW_AVAILABLE:
+        return pd.read_csv(filePath, engine="pyarrow", dtype=dtype)
+    return pd.read_csv(filePath, dtype=dtype)
+
+
+def readSheet(filePath: str, header=0) -> pd.DataFrame:
+    """
+    Reads the first sheet of an Excel, CSV or Parquet file into a DataFrame.
+    Parquet columns are flat, so a multi-row `header` raises ValueError for
+    them and callers fall back to a single header.
+    """
+    fmt = detectFormat(filePath)
+    with timed(f"read{fmt.capitalize()}"):
+        if fmt == CSV:
+            return readCsv(filePath, header)
+        if fmt == PARQUET:
+            requirePyarrow()
+            if header != 0:
+                raise ValueError("Parquet files have a single header row.")
+            return pd.read_parquet(filePath)
+        return pd.read_excel(filePath, sheet_name=0, header=header)
+
+
+def headerNames(header: tuple) -> list:
+    """Names blank header cells the way pd.read_excel does."""
+    return [
+        f"Unnamed: {i}" if name is None else name
+        for i, name in enumerate(header)
+    ]
+
+
+def iterExcelChunks(filePath: str, chunkRows: int = DEFAULT_CHUNK_ROWS):
+    """
+    Yields the first worksheet of an Excel file as DataFrames of at most
+    `chunkRows` rows. The workbook is opened in read-only mode, so only the
+    current chunk is held in memory. Column names are taken from the first
+    row as-is; duplicates are left for handleDuplicateColumns.
+    """
+    workbook = openpyxl.load_workbook(filePath, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = headerNames(header)
+        width = len(columns)
+
+        chunk = []
+        for row in rows:
+            # Read-only rows can be ragged; pad or trim them to the header
+            if len(row) != width:
+                row = (tuple(row) + (None,) * width)[:width]
+            chunk.append(row)
+            if len(chunk) >= chunkRows:
+                yield pd.DataFrame(chunk, columns=columns)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=columns)
+    finally:
+        workbook.close()
+
+
+def iterCsvChunks(filePath: str, chunkRows: int = DEFAULT_CHUNK_ROWS):
+    """Yields a CSV file as DataFrames of at most `chunkRows` rows."""
+    # The pyarrow engine does not support chunked reads
+    with pd.read_csv(
+        filePath, chunksize=chunkRows, dtype=csvTextTypes(filePath)
+    ) as reader:
+        yield from reader
+
+
+def iterParquetChunks(filePath: str, chunkRows: int = DEFAULT_CHUNK_ROWS):
+    """Yields a Parquet file as DataFrames of at most `chunkRows` rows."""
+    requirePyarrow()
+    import pyarrow.parquet as pq
+
+    parquetFile = pq.ParquetFile(filePath)
+    try:
+        for batch in parquetFile.iter_batches(batch_size=chunkRows):
+            yield batch.to_pandas()
+    finally:
+        parquetFile.close()
+
+
+def iterSheetChunks(filePath: str, chunkRows: int = DEFAULT_CHUNK_ROWS):
+    """Yields any supported sheet in chunks, dispatching on its format."""
+    fmt = detectFormat(filePath)
+    if fmt == CSV:
+        return iterCsvChunks(filePath, chunkRows)
+    if fmt == PARQUET:
+        return iterParquetChunks(filePath, chunkRows)
+    return iterExcelChunks(filePath, chunkRows)
+
+
+async def iterInThread(iterableFactory, maxPending: int = MAX_PENDING_CHUNKS):
+    """
+    Runs a blocking iterator on a worker thread and yields its items to the
+    event loop, so the next item is produced while the caller awaits on the
+    current one. At most `maxPending` items are buffered.
+    """
+    loop = asyncio.get_running_loop()
+    items = queue.Queue(maxsize=maxPending)
+    stop = threading.Event()
+    finished = object()
+
+    def offer(item) -> bool:
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterableFactory():
+                if not offer(item):
+                    return
+        except BaseException as e:
+            offer(e)
+        offer(finished)
+
+    producer = loop.run_in_executor(None, produce)
+    try:
+        while True:
+            item = await loop.run_in_executor(None, items.get)
+            if item is finished:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        # Lets the producer exit if the caller stopped early, and wakes a
+        # getter left waiting by cancellation
+        stop.set()
+        try:
+            items.put_nowait(finished)
+        except queue.Full:
+            pass
+        await producer
@@ -0,0 +1,48 @@
+# -----------------------------------------------------------------------------
+# Primary author: Jason T
+# Year: 2025
+# Purpose: Server-side staging of data sheets whose experiment is ambiguous,
+# so they can be linked later without uploading the file again.
+# -----------------------------------------------------------------------------
+
+import secrets
+from datetime import datetime, timezone
+
+STAGED_SHEETS_COLLECTION = "stagedSheets"
+STAGED_ROWS_COLLECTION = "stagedRows"
+
+# Unresolved sheets are dropped by a TTL index after this long. MongoDB reads
+# the indexed times as UTC, so they are stored timezone-aware
+STAGING_TTL_SECONDS = 24 * 60 * 60
+STAGED_ROWS_PER_DOC = 1000
+
+
+def newStagingToken() -> str:
+    return secrets.token_urlsafe(16)
+
+
+def buildStagedSheet(token: str, ambiguous: dict) -> dict:
+    """The document describing a staged sheet and its candidate experiments."""
+    return {
+        "_id": token,
+        "dataId": ambiguous["dataId"],
+        "matchingExp": ambiguous["matchingExp"],
+        "createdAt": datetime.now(timezone.utc),
+    }
+
+
+def buildStagedRows(token: str, records: list[dict], firstChunk: int = 0) -> list[dict]:
+    """
+    Packs cleaned rows into documents of STAGED_ROWS_PER_DOC rows each,
+    numbered from `firstChunk` so a sheet can be staged across several calls.
+    """
+    createdAt = datetime.now(timezone.utc)
+    return [
+        {
+            "token": token,
+            "chunk": firstChunk + i,
+            "rows": records[start:start + STAGED_ROWS_PER_DOC],
+            "createdAt": createdAt,
+        }
+        for i, start in enumerate(range(0, len(records), STAGED_ROWS_PER_DOC))
+    ]
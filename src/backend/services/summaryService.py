@@ -0,0 +1,215 @@
+# -----------------------------------------------------------------------------
+# Primary author: Jennifer Y
+# Year: 2025
+# Purpose: Materialized per-experiment summary statistics of the 'data'
+# collection, so overviews and cross-experiment comparisons read one small
+# document per experiment and column instead of scanning samples.
+# -----------------------------------------------------------------------------
+
+import math
+from datetime import datetime
+
+import pandas as pd
+from pymongo import DeleteMany, UpdateOne
+
+from utils import TIME_FORMAT
+
+DATA_SUMMARIES_COLLECTION = "data_summaries"
+
+# Bookkeeping and key columns that are not summarized as measurements
+UNSUMMARIZED_COLUMNS = ("_id", "experimentId", "dataSheetId", "#", "Time")
+
+
+def summaryId(experimentId: str, column: str = None) -> str:
+    """
+    ID of the summary document of an experiment column. The document without
+    a column holds the sample count and time span of the experiment.
+    """
+    return experimentId if column is None else f"{experimentId}:{column}"
+
+
+def formatTime(value) -> str:
+    return value.strftime(TIME_FORMAT) if isinstance(value, datetime) else str(value)
+
+
+def summarizeDataSheet(df: pd.DataFrame) -> dict:
+    """
+    Summarizes data rows into mergeable statistics: the sample count and
+    time span, and per numeric column the count, sum, sum of squares, min and
+    max. Computed column-wise, so large sheets cost a few vectorized passes.
+    """
+    summary = {"sampleCount": len(df), "firstTime": None, "lastTime": None, "columns": {}}
+
+    if "Time" in df.columns:
+        times = df["Time"].dropna()
+        if pd.api.types.is_datetime64_any_dtype(times):
+            times = times.dt.strftime(TIME_FORMAT)
+        elif len(times) and not pd.api.types.is_string_dtype(times):
+            times = times.map(formatTime)
+        if len(times):
+            # The stored format sorts chronologically as text
+            summary["firstTime"], summary["lastTime"] = times.min(), times.max()
+
+    for column in df.columns:
+        if column in UNSUMMARIZED_COLUMNS:
+            continue
+        values = df[column]
+        if pd.api.types.is_bool_dtype(values) or not pd.api.types.is_numeric_dtype(values):
+            continue
+        values = values.dropna()
+        if not len(values):
+            continue
+        summary["columns"][column] = {
+            "count": len(values),
+            "sum": float(values.sum()),
+            "sumSq": float((values.astype(float) ** 2).sum()),
+            "min": values.min().item(),
+            "max": values.max().item(),
+        }
+    return summary
+
+
+def buildSummaryUpdates(experimentId: str, summary: dict) -> list:
+    """
+    Bulk write operations merging a summary into the stored one. Counts and
+    sums are incremented and bounds widened atomically, so chunks of a sheet
+    and concurrent imports can be merged in any order.
+    """
+    updatedAt = datetime.now()
+    experimentUpdate = {
+        "$setOnInsert": {"experimentId": experimentId, "column": None},
+        "$set": {"updatedAt": updatedAt},
+        "$inc": {"sampleCount": summary["sampleCount"]},
+    }
+    if summary["firstTime"] is not None:
+        experimentUpdate["$min"] = {"firstTime": summary["firstTime"]}
+        experimentUpdate["$max"] = {"lastTime": summary["lastTime"]}
+    operations = [
+        UpdateOne({"_id": summaryId(experimentId)}, experimentUpdate, upsert=True)
+    ]
+
+    for column, stats in summary["columns"].items():
+        operations.append(UpdateOne(
+            {"_id": summaryId(experimentId, column)},
+            {
+                "$setOnInsert": {"experimentId": experimentId, "column": column},
+                "$set": {"updatedAt": updatedAt},
+                "$inc": {"count": stats["count"], "sum": stats["sum"], "sumSq": stats["sumSq"]},
+                "$min": {"min": stats["min"]},
+                "$max": {"max": stats["max"]},
+            },
+            upsert=True,
+        ))
+    return operations
+
+
+def summaryPipeline(experimentId: str) -> list:
+    """
+    Aggregation computing an experiment's summary from its data rows in a
+    single pass, used to refresh summaries from scratch.
+    """
+    return [
+        {"$match": {"experimentId": experimentId}},
+        {"$facet": {
+            "rows": [
+                {"$group": {
+                    "_id": None,
+                    "sampleCount": {"$sum": 1},
+                    "firstTime": {"$min": "$Time"},
+                    "lastTime": {"$max": "$Time"},
+                }},
+            ],
+            "columns": [
+                {"$project": {"fields": {"$objectToArray": "$$ROOT"}}},
+                {"$unwind": "$fields"},
+                {"$match": {
+                    "fields.k": {"$nin": list(UNSUMMARIZED_COLUMNS)},
+                    "fields.v": {"$type": "number"},
+                }},
+                {"$group": {
+                    "_id": "$fields.k",
+                    "count": {"$sum": 1},
+                    "sum": {"$sum": "$fields.v"},
+                    "sumSq": {"$sum": {"$multiply": ["$fields.v", "$fields.v"]}},
+                    "min": {"$min": "$fields.v"},
+                    "max": {"$max": "$fields.v"},
+                }},
+            ],
+        }},
+    ]
+
+
+def buildSummaryRefresh(experimentId: str, aggregated: list[dict]) -> list:
+    """
+    Operations replacing an experiment's summary with the result of
+    summaryPipeline. An experiment without data rows loses its summary.
+    """
+    operations = [DeleteMany({"experimentId": experimentId})]
+    facets = aggregated[0] if aggregated else {}
+    rows = facets.get("rows") or []
+    if not rows or not rows[0]["sampleCount"]:
+        return operations
+
+    summary = {
+        "sampleCount": rows[0]["sampleCount"],
+        "firstTime": rows[0]["firstTime"],
+        "lastTime": rows[0]["lastTime"],
+        "columns": {
+            stats["_id"]: {key: stats[key] for key in ("count", "sum", "sumSq", "min", "max")}
+            for stats in facets.get("columns", [])
+        },
+    }
+    return operations + buildSummaryUpdates(experimentId, summary)
+
+
+def parseTime(value):
+    try:
+        return datetime.strptime(value, TIME_FORMAT)
+    except (TypeError, ValueError):
+        return None
+
+
+def describeColumn(document: dict) -> dict:
+    """Count, bounds, mean and sample standard deviation of a column."""
+    count = document["count"]
+    mean = document["sum"] / count if count else None
+    std = None
+    if count > 1:
+        variance = (document["sumSq"] - count * mean * mean) / (count - 1)
+        # Rounding can leave a tiny negative variance for constant columns
+        std = math.sqrt(max(variance, 0))
+    return {
+        "count": count,
+        "min": document.get("min"),
+        "max": document.get("max"),
+        "mean": mean,
+        "std": std,
+    }
+
+
+def describeSummaries(documents: list[dict], columns: list[str] = None) -> list[dict]:
+    """
+    Assembles stored summary documents into one summary per experiment,
+    optionally limited to some columns.
+    """
+    experiments = {}
+    for document in documents:
+        experiment = experiments.setdefault(document["experimentId"], {
+            "experimentId": document["experimentId"],
+            "sampleCount": 0,
+            "firstTime": None,
+            "lastTime": None,
+            "durationMinutes": None,
+            "columns": {},
+        })
+        column = document.get("column")
+        if column is None:
+            experiment["sampleCount"] = document.get("sampleCount", 0)
+            experiment["firstTime"] = document.get("firstTime")
+            experiment["lastTime"] = document.get("lastTime")
+            start, end = parseTime(experiment["firstTime"]), parseTime(experiment["lastTime"])
+            if start and end:
+                experiment["durationMinutes"] = (end - start).total_seconds() / 60
+        elif columns is None or column in columns:
+            experiment["columns"][column] = describeColumn(document)
+    return list(experiments.values())
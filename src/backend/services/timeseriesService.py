@@ -0,0 +1,204 @@
+# -----------------------------------------------------------------------------
+# Primary author: Jennifer Y
+# Year: 2025
+# Purpose: Vectorized helpers aligning experiment time series on elapsed time,
+# so runs recorded at different times and sample rates can be overlaid.
+# -----------------------------------------------------------------------------
+
+import numpy as np
+import pandas as pd
+
+from utils import TIME_FORMAT
+
+INTERPOLATE = "interpolate"
+BIN_MEAN = "mean"
+
+DEFAULT_GRID_POINTS = 500
+# Aligned grids are capped like saved graphs, to keep payloads small
+MAX_GRID_POINTS = 5000
+
+
+def elapsedMinutes(times) -> np.ndarray:
+    """
+    Minutes since the first sample, the same notion as ElapsedTime in
+    groupData. Unparseable times become NaN.
+    """
+    parsed = pd.to_datetime(pd.Series(times), format=TIME_FORMAT, errors="coerce")
+    nanos = parsed.to_numpy(dtype="datetime64[ns]").astype("int64").astype(float)
+    nanos[parsed.isna().to_numpy()] = np.nan
+    if np.isnan(nanos).all():
+        return nanos
+    return (nanos - np.nanmin(nanos)) / 60e9
+
+
+def buildGrid(
+    duration: float, step: float = None, points: int = DEFAULT_GRID_POINTS,
+    start: float = None, end: float = None
+) -> np.ndarray:
+    """
+    Evenly spaced elapsed minutes from `start` (default 0) to `end`
+    (default `duration`), either every `step` minutes or as `points` points.
+    Raises ValueError for grids longer than MAX_GRID_POINTS.
+    """
+    start = 0.0 if start is None else float(start)
+    end = duration if end is None else float(end)
+    if not end > start:
+        return np.array([start])
+    if step:
+        count = int(np.floor((end - start) / step)) + 1
+        if count > MAX_GRID_POINTS:
+            raise ValueError(f"A step of {step} minutes gives {count} points; the maximum is {MAX_GRID_POINTS}.")
+        return start + np.arange(count) * step
+    if points > MAX_GRID_POINTS:
+        raise ValueError(f"At most {MAX_GRID_POINTS} points can be requested.")
+    return np.linspace(start, end, max(points, 2))
+
+
+def interpolateOnGrid(x: np.ndarray, y: np.ndarray, grid: np.ndarray) -> np.ndarray:
+    """Linear interpolation onto the grid; NaN outside the sampled range."""
+    valid = ~(np.isnan(x) | np.isnan(y))
+    if not valid.any():
+        return np.full(len(grid), np.nan)
+    return np.interp(grid, x[valid], y[valid], left=np.nan, right=np.nan)
+
+
+def binMeanOnGrid(x: np.ndarray, y: np.ndarray, grid: np.ndarray) -> np.ndarray:
+    """
+    Mean of the samples in each grid cell, the cell of a grid point running
+    up to the next one. Empty cells are NaN.
+    """
+    valid = ~(np.isnan(x) | np.isnan(y))
+    x, y = x[valid], y[valid]
+    width = grid[1] - grid[0] if len(grid) > 1 else np.inf
+    cells = np.floor((x - grid[0]) / width).astype(int) if len(x) else np.array([], dtype=int)
+    inside = (cells >= 0) & (cells < len(grid))
+    sums = np.bincount(cells[inside], weights=y[inside], minlength=len(grid))
+    counts = np.bincount(cells[inside], minlength=len(grid))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
+def toList(values: np.ndarray) -> list:
+    """JSON-ready list with NaN as None."""
+    return [None if value != value else value for value in values.tolist()]
+
+
+def numericColumn(df: pd.DataFrame, attribute: str) -> np.ndarray:
+    if attribute not in df.columns:
+        return np.full(len(df), np.nan)
+    return pd.to_numeric(df[attribute], errors="coerce").to_numpy(dtype=float)
+
+
+def alignExperiments(
+    rows: list[dict], experimentIds: list[str], attributes: list[str],
+    method: str = INTERPOLATE, step: float = None, points: int = DEFAULT_GRID_POINTS,
+    start: float = None, end: float = None
+) -> dict:
+    """
+    Resamples each experiment's attributes onto one elapsed-minutes grid
+    covering the longest run. Returns the grid, the aligned values per
+    experiment and attribute, and the experiments that had no data.
+    """
+    df = pd.DataFrame(rows)
+    if df.empty or "Time" not in df.columns:
+        return {"grid": [], "series": {}, "missing": list(experimentIds)}
+
+    experiments = {}
+    for experimentId, group in df.groupby("experimentId", sort=False):
+        elapsed = elapsedMinutes(group["Time"])
+        order = np.argsort(elapsed, kind="stable")
+        experiments[experimentId] = (
+            group.iloc[order], elapsed[order]
+        )
+
+    duration = max(
+        (np.nanmax(elapsed) for _, elapsed in experiments.values() if not np.isnan(elapsed).all()),
+        default=0.0,
+    )
+    grid = buildGrid(duration, step, points, start, end)
+    resample = binMeanOnGrid if method == BIN_MEAN else interpolateOnGrid
+
+    series = {}
+    for experimentId in experimentIds:
+        if experimentId not in experiments:
+            continue
+        group, elapsed = experiments[experimentId]
+        series[experimentId] = {
+            attribute: toList(resample(elapsed, numericColumn(group, attribute), grid))
+            for attribute in attributes
+        }
+
+    return {
+        "grid": grid.tolist(),
+        "series": series,
+        "missing": [experimentId for experimentId in experimentIds if experimentId not in series],
+    }
+
+
+# Aggregations of a resample bucket and their accumulators
+RESAMPLE_AGGREGATIONS = {
+    "mean": "$avg",
+    "min": "$min",
+    "max": "$max",
+    "first": "$first",
+    "last": "$last",
+}
+ORDERED_AGGREGATIONS = ("first", "last")
+
+# Time as a date, whether stored as a date or in the sheets' text format
+TIME_AS_DATE = {
+    "$cond": [
+        {"$eq": [{"$type": "$Time"}, "date"]},
+        "$Time",
+        {"$dateFromString": {
+            "dateString": "$Time", "format": TIME_FORMAT, "onError": None, "onNull": None,
+        }},
+    ]
+}
+
+
+def resamplePipeline(
+    experimentId: str, attributes: list[str], widthSeconds: int, aggregations: list[str]
+) -> list:
+    """
+    Aggregation bucketing an experiment's rows into fixed `widthSeconds`
+    intervals with $dateTrunc and aggregating each attribute per bucket, so
+    only one row per bucket leaves the database. Attributes are renamed to
+    positional fields, as $group output names cannot contain dots.
+    """
+    pipeline = [
+        {"$match": {"experimentId": experimentId}},
+        {"$project": {
+            "_id": 0,
+            "time": TIME_AS_DATE,
+            **{f"f{i}": f"${attribute}" for i, attribute in enumerate(attributes)},
+        }},
+        {"$match": {"time": {"$type": "date"}}},
+    ]
+    if any(aggregation in ORDERED_AGGREGATIONS for aggregation in aggregations):
+        pipeline.append({"$sort": {"time": 1}})
+    pipeline.append({"$group": {
+        "_id": {"$dateTrunc": {"date": "$time", "unit": "second", "binSize": widthSeconds}},
+        "count": {"$sum": 1},
+        **{
+            f"f{i}_{aggregation}": {RESAMPLE_AGGREGATIONS[aggregation]: f"$f{i}"}
+            for i in range(len(attributes))
+            for aggregation in aggregations
+        },
+    }})
+    pipeline.append({"$sort": {"_id": 1}})
+    return pipeline
+
+
+def formatBucket(bucket: dict, attributes: list[str], aggregations: list[str]) -> dict:
+    """
+    A resampled row keyed like the data rows: the bucket start as Time, the
+    sample count, and each attribute, suffixed with the aggregation when
+    several were requested.
+    """
+    row = {"Time": bucket["_id"].strftime(TIME_FORMAT), "count": bucket["count"]}
+    for i, attribute in enumerate(attributes):
+        for aggregation in aggregations:
+            name = attribute if len(aggregations) == 1 else f"{attribute} ({aggregation})"
+            row[name] = bucket.get(f"f{i}_{aggregation}")
+    return row
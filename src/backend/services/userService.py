@@ -4,24 +4,99 @@
 # Purpose: Service class for handling user information in MongoDB and use RBAC.
 # -----------------------------------------------------------------------------
 
+import asyncio
 import bcrypt
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from motor.motor_asyncio import AsyncIOMotorClient
 
+# bcrypt runs on a small dedicated pool so a burst of logins cannot block the
+# event loop or starve the default executor
+BCRYPT_WORKERS = 4
+bcryptExecutor = ThreadPoolExecutor(
+    max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt"
+)
+
+SESSION_CACHE_TTL = 300
+SESSION_CACHE_SIZE = 10000
+
+
+class SessionCache:
+    """
+    Thread-safe TTL cache of session_id -> {email, role}. Entries are
+    invalidated explicitly on logout, role changes and account deletion; the
+    TTL bounds staleness for changes made by other processes.
+    """
+    def __init__(self, ttl: float = SESSION_CACHE_TTL, maxSize: int = SESSION_CACHE_SIZE):
+        self.ttl = ttl
+        self.maxSize = maxSize
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def get(self, sessionToken: str) -> dict:
+        with self.lock:
+            entry = self.entries.get(sessionToken)
+            if entry is None:
+                return None
+            expiresAt, user = entry
+            if expiresAt < time.monotonic():
+                del self.entries[sessionToken]
+                return None
+            return dict(user)
+
+    def set(self, sessionToken: str, user: dict):
+        with self.lock:
+            if len(self.entries) >= self.maxSize:
+                # Evict the entry closest to expiry
+                oldest = min(self.entries, key=lambda token: self.entries[token][0])
+                del self.entries[oldest]
+            self.entries[sessionToken] = (time.monotonic() + self.ttl, dict(user))
+
+    def invalidateToken(self, sessionToken: str):
+        with self.lock:
+            self.entries.pop(sessionToken, None)
+
+    def invalidateEmail(self, email: str):
+        with self.lock:
+            for token in [
+                token for token, (_, user) in self.entries.items()
+                if user["email"] == email
+            ]:
+                del self.entries[token]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+sessionCache = SessionCache()
+
+
+async def runBcrypt(function, *args):
+    """Run a bcrypt call on the bcrypt thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(bcryptExecutor, function, *args)
+
 
 class UserService:
     """
     Service class for handling user information in MongoDB and enable Role-
     Based Access Control.
     """
-    def __init__(self, mongoUri, dbName):
+    def __init__(self, mongoUri, dbName, client=None):
         """
-        Initialize the service with MongoDB connection details.
+        Initialize the service with MongoDB connection details. When a shared
+        `client` is given it is used instead of opening a new one, and is left
+        open by closeConnection.
         """
-        self.client = AsyncIOMotorClient(mongoUri)
+        self.ownsClient = client is None
+        self.client = client if client is not None else AsyncIOMotorClient(mongoUri)
         self.db = self.client[dbName]
 
         self.usersCollection = self.db["users"]
+        self.sessionCache = sessionCache
 
     @staticmethod
     def hashPassword(password: str) -> str:
@@ -29,6 +104,23 @@ class UserService:
         salt = bcrypt.gensalt()
         return bcrypt.hashpw(bytes, salt).decode('utf-8')
 
+    @staticmethod
+    def checkPassword(password: str, hashedPassword: str) -> bool:
+        return bcrypt.checkpw(
+            password.encode('utf-8'),
+            hashedPassword.encode('utf-8')
+        )
+
+    @staticmethod
+    async def hashPasswordAsync(password: str) -> str:
+        """Hash a password without blocking the event loop."""
+        return await runBcrypt(UserService.hashPassword, password)
+
+    @staticmethod
+    async def checkPasswordAsync(password: str, hashedPassword: str) -> bool:
+        """Verify a password without blocking the event loop."""
+        return await runBcrypt(UserService.checkPassword, password, hashedPassword)
+
     async def createUser(self, email: str, password: str, role: str) -> dict:
         """
         Check if a user with input email already exists.
@@ -40,7 +132,7 @@ class UserService:
             )
             return None
 
-        hashedPassword = UserService.hashPassword(password)
+        hashedPassword = await UserService.hashPasswordAsync(password)
         newUser = {
             "email": email,
             "hashed_password": hashedPassword,
@@ -75,9 +167,8 @@ class UserService:
             )
             return None
 
-        if bcrypt.checkpw(
-            password.encode('utf-8'),
-            user["hashed_password"].encode('utf-8')
+        if await UserService.checkPasswordAsync(
+            password, user["hashed_password"]
         ):
             return {
                 "email": user["email"],
@@ -91,16 +182,23 @@ class UserService:
 
     async def getCurrentUserAndRole(self, sessionToken: str) -> dict:
         """
-        Fetch the current user's email and role from the database.
+        Fetch the current user's email and role, from the session cache when
+        possible and from the database otherwise.
         """
+        cachedUser = self.sessionCache.get(sessionToken)
+        if cachedUser:
+            return cachedUser
+
         user = await self.usersCollection.find_one(
             {"session_id": sessionToken}
         )
         if user:
-            return {
+            currentUser = {
                 "email": user["email"],
                 "role": user["role"]
             }
+            self.sessionCache.set(sessionToken, currentUser)
+            return currentUser
         logging.error(
             "Session token not found."
         )
@@ -116,12 +214,20 @@ class UserService:
                 "Session token not found."
             )
             return None
+        # The returned document holds the replaced session, if any
+        if user.get("session_id"):
+            self.sessionCache.invalidateToken(user["session_id"])
+        if "role" in user:
+            self.sessionCache.set(
+                sessionToken, {"email": user["email"], "role": user["role"]}
+            )
         return user
 
     async def endSession(self, sessionToken: str) -> bool:
         """
         Remove active sessionToken from a user document.
         """
+        self.sessionCache.invalidateToken(sessionToken)
         user = await self.usersCollection.find_one_and_update(
                 {"session_id": sessionToken},
                 {"$unset": {"session_id": ""}}
@@ -144,7 +250,7 @@ class UserService:
             )
             return False
 
-        hashedPassword = UserService.hashPassword(newPassword)
+        hashedPassword = await UserService.hashPasswordAsync(newPassword)
         try:
             self.usersCollection.update_one(
                 {"email": email},
@@ -178,6 +284,7 @@ class UserService:
                 {"email": email},
                 {"$set": {"role": newRole}}
             )
+            self.sessionCache.invalidateEmail(email)
             return True
         except Exception as e:
             logging.error(f"Error updating your role: {e}")
@@ -188,10 +295,12 @@ class UserService:
             await self.usersCollection.delete_one(
                 {"email": email}
             )
+            self.sessionCache.invalidateEmail(email)
         except Exception as e:
             logging.error(f"Error deleting user: {e}")
             return False
 
     async def closeConnection(self):
-        """Close the MongoDB client connection."""
-        self.client.close()
+        """Close the MongoDB client connection if this service opened it."""
+        if self.ownsClient:
+            self.client.close()
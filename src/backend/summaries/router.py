@@ -0,0 +1,115 @@
+# -----------------------------------------------------------------------------
+# Primary author: Jennifer Y
+# Year: 2025
+# Purpose: Endpoints serving the per-experiment summary statistics of the
+# 'data' collection.
+# -----------------------------------------------------------------------------
+
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException
+
+from database import getConnection
+from utils import cleanData
+from services.summaryService import (
+    buildSummaryRefresh,
+    describeSummaries,
+    summaryPipeline
+)
+
+router = APIRouter()
+
+
+# Helper functions
+def refreshSummary(dataCollection, summaryCollection, experimentId: str):
+    """Recompute an experiment's summary with a single aggregation."""
+    aggregated = list(dataCollection.aggregate(summaryPipeline(experimentId)))
+    summaryCollection.bulk_write(buildSummaryRefresh(experimentId, aggregated))
+
+
+def parseColumns(attributes: Optional[str]) -> Optional[list[str]]:
+    return [name.strip() for name in attributes.split(",")] if attributes else None
+
+
+# Routes
+@router.get("/summaries")
+async def getSummaries(attributes: Optional[str] = None):
+    """
+    Fetches the summary of every experiment: sample count, time span and
+    per-column count, min, max, mean and standard deviation. `attributes`
+    is an optional comma-separated list of columns to include, which makes
+    cross-experiment comparisons a read of one document per experiment.
+    """
+    connection = getConnection("data_summaries")
+    collection, client = connection["collection"], connection["client"]
+
+    try:
+        columns = parseColumns(attributes)
+        query = {} if columns is None else {"column": {"$in": [None, *columns]}}
+        summaries = describeSummaries(list(collection.find(query)), columns)
+        return {"status": "success", "data": cleanData(summaries)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching summaries: {str(e)}")
+    finally:
+        client.close()
+
+
+@router.get("/summaries/{experimentId}")
+async def getSummary(experimentId: str, attributes: Optional[str] = None):
+    """
+    Fetches the summary of one experiment. Experiments imported before
+    summaries existed are summarized on first request.
+    """
+    connection = getConnection("data_summaries")
+    collection, client = connection["collection"], connection["client"]
+
+    try:
+        documents = list(collection.find({"experimentId": experimentId}))
+        if not documents:
+            refreshSummary(collection.database["data"], collection, experimentId)
+            documents = list(collection.find({"experimentId": experimentId}))
+        if not documents:
+            raise HTTPException(
+                status_code=404, detail=f"No data found for experimentId: {experimentId}"
+            )
+        summary = describeSummaries(documents, parseColumns(attributes))[0]
+        return {"status": "success", "data": cleanData(summary)}
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching summary: {str(e)}")
+    finally:
+        client.close()
+
+
+@router.post("/summaries/{experimentId}/refresh")
+async def refreshExperimentSummary(experimentId: str):
+    """Recomputes the summary of one experiment from its data rows."""
+    connection = getConnection("data_summaries")
+    collection, client = connection["collection"], connection["client"]
+
+    try:
+        refreshSummary(collection.database["data"], collection, experimentId)
+        return {"status": "success", "message": f"Refreshed summary of {experimentId}."}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error refreshing summary: {str(e)}")
+    finally:
+        client.close()
+
+
+@router.post("/summaries/refresh")
+async def refreshAllSummaries():
+    """Recomputes the summaries of every experiment with data rows."""
+    connection = getConnection("data_summaries")
+    collection, client = connection["collection"], connection["client"]
+
+    try:
+        dataCollection = collection.database["data"]
+        experimentIds = dataCollection.distinct("experimentId")
+        for experimentId in experimentIds:
+            refreshSummary(dataCollection, collection, experimentId)
+        return {"status": "success", "message": f"Refreshed {len(experimentIds)} summaries."}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error refreshing summaries: {str(e)}")
+    finally:
+        client.close()
@@ -5,10 +5,52 @@
 # Purpose: Table-related API endpoints for handling data and experiment retrieval.
 # -----------------------------------------------------------------------------
 
-from fastapi import APIRouter, HTTPException
+import logging
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException
+from pymongo import ReturnDocument
 
 from database import getConnection
+from dependencies import (
+    conditionalOn,
+    getCatalogRefreshService,
+    getEventBus,
+    getSchemaCompactionService
+)
 from utils import cleanData
+from services.catalogService import (
+    CATALOG_COLLECTION,
+    CatalogRefreshService,
+    buildCatalogUpdates,
+    buildFieldRemoval,
+    buildFieldReset,
+    buildRecordEdit,
+    buildRecordRemoval,
+    catalogId,
+    ensureCatalog,
+    summarizeRecords
+)
+from services.dateIndexService import (
+    DATE_INDEX_COLLECTION,
+    buildDateIndexRemoval,
+    buildDateIndexUpdates,
+    rebuildDateIndex
+)
+from services.eventBus import DELETE, INSERT, REPLACE, UPDATE, EventBus
+from services.revisionService import REVISIONS_COLLECTION, buildRevisionUpdates
+from services.schemaService import (
+    COLUMN_TYPES_QUERY,
+    EAGER_COLUMNS,
+    SchemaCompactionService,
+    applySchema,
+    isDropped,
+    isRegistered,
+    loadSchema,
+    updateSchema,
+    withColumn,
+    withoutColumn
+)
 from table.models import (
     AddColumnRequest,
     AddRowRequest,
@@ -20,6 +62,45 @@ from table.models import (
 )
 
 router = APIRouter()
+logger = logging.getLogger('Catalog')
+
+
+# Helper functions
+def bulkWrite(collection, operations):
+    """Apply bulk write operations to a collection, skipping empty batches."""
+    if operations:
+        collection.bulk_write(operations)
+
+
+def updateCatalog(collection, operations):
+    """
+    Apply the catalog operations of a write to `collection`. The write is
+    already committed, so a catalog failure is logged rather than failing
+    the request.
+    """
+    try:
+        bulkWrite(collection.database[CATALOG_COLLECTION], operations)
+    except Exception as e:
+        logger.warning(f"Could not update catalog for {collection.name}: {e}")
+
+
+def bumpRevisions(collection, *collections):
+    """Bump the revisions of the collections a write changed."""
+    bulkWrite(
+        collection.database[REVISIONS_COLLECTION], buildRevisionUpdates(list(collections))
+    )
+
+
+def isStoredColumn(collection, schema, columnName):
+    """Whether documents may already hold a column, as values or leftovers."""
+    catalog = collection.database[CATALOG_COLLECTION]
+    ensureCatalog(collection, catalog)
+    return (
+        isRegistered(schema, columnName)
+        or isDropped(schema, columnName)
+        or catalog.count_documents({"_id": catalogId("experiments", columnName)}, limit=1) > 0
+    )
+
 
 
 @router.post("/data")
@@ -46,7 +127,7 @@ async def getExperimentData(payload: DataRequest):
         client.close()
 
 
-@router.get("/experimentIds")
+@router.get("/experimentIds", dependencies=[Depends(conditionalOn("experiments"))])
 async def getExperimentIds():
     """
     Fetches all experimentIds from the 'experiments' collection.
@@ -61,12 +142,15 @@ async def getExperimentIds():
         ]
         return {"status": "success", "experimentIds": experimentIdList}
     except Exception as e:
-        return {"error": str(e)}
+        # Raised rather than returned, so the error is not cached under the ETag
+        raise HTTPException(
+            status_code=500, detail=f"Error fetching experimentIds: {str(e)}"
+        )
     finally:
         client.close()
 
 
-@router.get("/experiments")
+@router.get("/experiments", dependencies=[Depends(conditionalOn("experiments"))])
 async def getExperiments():
     """
     Fetches all data from the 'experiments' collection.
@@ -75,9 +159,9 @@ async def getExperiments():
     collection, client = connection["collection"], connection["client"]
 
     try:
-        experiments = collection.find()
-        experimentsList = list(experiments)
-        experimentsList = [cleanData(item) for item in experimentsList]
+        schema = loadSchema(collection.database["config"])
+        experiments = applySchema(list(collection.find()), schema)
+        experimentsList = [cleanData(item) for item in experiments]
         if experimentsList:
             return {"status": "success", "data": experimentsList}
         else:
@@ -93,7 +177,10 @@ async def getExperiments():
 
 
 @router.put("/update-data")
-async def updateData(payload: UpdateDataPayload):
+async def updateData(
+    payload: UpdateDataPayload, eventBus: EventBus = Depends(getEventBus),
+    catalogRefreshService: CatalogRefreshService = Depends(getCatalogRefreshService)
+):
     """
     Updates multiple rows in the 'data' collection based on experiment IDs.
     Each experiment ID maps to a dictionary of fields to update.
@@ -103,6 +190,7 @@ async def updateData(payload: UpdateDataPayload):
 
     try:
         totalModifiedCount = 0
+        schema = loadSchema(collection.database["config"])
 
         for experimentId, updateFields in payload.updatedData.items():
             processedFields = {}
@@ -118,17 +206,51 @@ async def updateData(payload: UpdateDataPayload):
                 else:
                     processedFields[key] = value
 
-            result = collection.update_one(
-                {"experimentId": experimentId}, {"$set": processedFields}
+            # The old values are read in the same round trip, so the catalog
+            # is updated from this experiment alone
+            projection = {field: 1 for field in processedFields}
+            before = collection.find_one_and_update(
+                {"experimentId": experimentId},
+                {"$set": processedFields},
+                projection={"_id": 0, **projection},
+                return_document=ReturnDocument.BEFORE
             )
 
-            if result.matched_count == 0:
+            if before is None:
                 raise HTTPException(
                     status_code=404,
                     detail=f"No experiment found with ID: {experimentId}",
                 )
 
-            totalModifiedCount += result.modified_count
+            if any(
+                key not in before or before[key] != value
+                for key, value in processedFields.items()
+            ):
+                totalModifiedCount += 1
+            updateCatalog(collection, buildRecordEdit(
+                "experiments",
+                applySchema([before], schema, fields=projection)[0],
+                processedFields
+            ))
+            bumpRevisions(
+                collection, "experiments",
+                *([DATE_INDEX_COLLECTION] if "Date" in processedFields else [])
+            )
+            eventBus.publish(
+                "experiments", UPDATE,
+                key="experimentId", ids=[experimentId], set=processedFields
+            )
+            if "Date" in processedFields:
+                bulkWrite(
+                    collection.database[DATE_INDEX_COLLECTION],
+                    buildDateIndexRemoval([experimentId])
+                    + buildDateIndexUpdates([
+                        {"experimentId": experimentId, "Date": processedFields["Date"]}
+                    ])
+                )
+
+        # Recompute the catalog entries the old values may have bounded
+        catalogRefreshService.wake()
 
         return {
             "status": "success",
@@ -141,20 +263,50 @@ async def updateData(payload: UpdateDataPayload):
 
 
 @router.put("/experiments/add-column")
-async def addColumn(payload: AddColumnRequest):
+async def addColumn(
+    payload: AddColumnRequest, eventBus: EventBus = Depends(getEventBus)
+):
     """
-    Adds a new column to all documents in the 'experiments' collection.
+    Adds a column with a default value to the 'experiments' collection. A
+    new column is only registered in the schema, and reads fill in its
+    default, so the change takes constant time. Columns documents may
+    already hold, and the columns other collections key on, are still set
+    on every document.
     """
     connection = getConnection("experiments")
     collection, client = connection["collection"], connection["client"]
 
     try:
-        result = collection.update_many(
-            {}, {"$set": {payload.columnName: payload.defaultValue}}
+        config = collection.database["config"]
+        schema = loadSchema(config)
+        if payload.columnName in EAGER_COLUMNS or isStoredColumn(collection, schema, payload.columnName):
+            result = collection.update_many(
+                {}, {"$set": {payload.columnName: payload.defaultValue}}
+            )
+            rowCount = result.matched_count
+        else:
+            rowCount = collection.estimated_document_count()
+        if payload.columnName not in EAGER_COLUMNS:
+            updateSchema(
+                config, lambda current: withColumn(current, payload.columnName, payload.defaultValue)
+            )
+        updateCatalog(
+            collection,
+            buildFieldReset(
+                "experiments",
+                payload.columnName,
+                payload.defaultValue,
+                rowCount
+            )
+        )
+        bumpRevisions(collection, "experiments", "config")
+        eventBus.publish(
+            "experiments", UPDATE,
+            key="experimentId", ids=None, set={payload.columnName: payload.defaultValue}
         )
         return {
             "status": "success",
-            "message": f"Added column {payload.columnName} to {result.modified_count} rows.",
+            "message": f"Added column {payload.columnName} to {rowCount} rows.",
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error adding column: {str(e)}")
@@ -163,7 +315,9 @@ async def addColumn(payload: AddColumnRequest):
 
 
 @router.post("/experiments/add-row")
-async def addRow(payload: AddRowRequest):
+async def addRow(
+    payload: AddRowRequest, eventBus: EventBus = Depends(getEventBus)
+):
     """
     Adds a new row (document) to the 'experiments' collection.
     """
@@ -172,6 +326,18 @@ async def addRow(payload: AddRowRequest):
 
     try:
         collection.insert_one(payload.rowData)
+        updateCatalog(
+            collection,
+            buildCatalogUpdates("experiments", summarizeRecords([payload.rowData]))
+        )
+        bulkWrite(
+            collection.database[DATE_INDEX_COLLECTION],
+            buildDateIndexUpdates([payload.rowData])
+        )
+        bumpRevisions(collection, "experiments", DATE_INDEX_COLLECTION)
+        eventBus.publish(
+            "experiments", INSERT, key="experimentId", documents=[payload.rowData]
+        )
         return {"status": "success", "message": "Row added successfully."}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error adding row: {str(e)}")
@@ -180,18 +346,43 @@ async def addRow(payload: AddRowRequest):
 
 
 @router.put("/experiments/remove-column")
-async def removeColumn(payload: RemoveColumnRequest):
+async def removeColumn(
+    payload: RemoveColumnRequest, eventBus: EventBus = Depends(getEventBus),
+    schemaCompactionService: SchemaCompactionService = Depends(getSchemaCompactionService)
+):
     """
-    Removes a column from all documents in the 'experiments' collection.
+    Removes a column from the 'experiments' collection. The column is marked
+    dropped in the schema, which hides it from reads at once, and the
+    background compaction removes it from the documents. Columns other
+    collections key on are removed from every document immediately.
     """
     connection = getConnection("experiments")
     collection, client = connection["collection"], connection["client"]
 
     try:
-        result = collection.update_many({}, {"$unset": {payload.columnName: ""}})
+        if payload.columnName in EAGER_COLUMNS:
+            result = collection.update_many({}, {"$unset": {payload.columnName: ""}})
+            rowCount = result.modified_count
+        else:
+            updateSchema(
+                collection.database["config"],
+                lambda current: withoutColumn(current, payload.columnName, datetime.now())
+            )
+            schemaCompactionService.wake()
+            rowCount = collection.estimated_document_count()
+        updateCatalog(
+            collection, buildFieldRemoval("experiments", payload.columnName)
+        )
+        if payload.columnName == "Date":
+            rebuildDateIndex(collection, collection.database[DATE_INDEX_COLLECTION])
+        bumpRevisions(collection, "experiments", "config")
+        eventBus.publish(
+            "experiments", UPDATE,
+            key="experimentId", ids=None, unset=[payload.columnName]
+        )
         return {
             "status": "success",
-            "message": f"Removed column {payload.columnName} from {result.modified_count} rows.",
+            "message": f"Removed column {payload.columnName} from {rowCount} rows.",
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error removing column: {str(e)}")
@@ -200,7 +391,10 @@ async def removeColumn(payload: RemoveColumnRequest):
 
 
 @router.delete("/experiments/remove-rows")
-async def removeRows(payload: RemoveRowRequest):
+async def removeRows(
+    payload: RemoveRowRequest, eventBus: EventBus = Depends(getEventBus),
+    catalogRefreshService: CatalogRefreshService = Depends(getCatalogRefreshService)
+):
     """
     Removes one or more rows (documents) from the 'experiments' collection by experimentIds.
     """
@@ -208,14 +402,36 @@ async def removeRows(payload: RemoveRowRequest):
     collection, client = connection["collection"], connection["client"]
 
     try:
-        result = collection.delete_many(
-            {"experimentId": {"$in": payload.experimentIds}}
-        )
-        if result.deleted_count == 0:
+        # Documents are deleted one by one so the catalog is updated with
+        # exactly those this request removed
+        removed = []
+        while True:
+            document = collection.find_one_and_delete(
+                {"experimentId": {"$in": payload.experimentIds}}, projection={"_id": 0}
+            )
+            if document is None:
+                break
+            removed.append(document)
+        if not removed:
             raise HTTPException(status_code=404, detail="Experiments not found.")
+        updateCatalog(
+            collection,
+            buildRecordRemoval(
+                "experiments", applySchema(removed, loadSchema(collection.database["config"]))
+            )
+        )
+        catalogRefreshService.wake()
+        bulkWrite(
+            collection.database[DATE_INDEX_COLLECTION],
+            buildDateIndexRemoval(payload.experimentIds)
+        )
+        bumpRevisions(collection, "experiments", DATE_INDEX_COLLECTION)
+        eventBus.publish(
+            "experiments", DELETE, key="experimentId", ids=payload.experimentIds
+        )
         return {
             "status": "success",
-            "message": f"{result.deleted_count} rows removed successfully.",
+            "message": f"{len(removed)} rows removed successfully.",
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error removing rows: {str(e)}")
@@ -223,7 +439,7 @@ async def removeRows(payload: RemoveRowRequest):
         client.close()
 
 
-@router.get("/columntypes")
+@router.get("/columntypes", dependencies=[Depends(conditionalOn("config"))])
 async def getColumnTypes():
     """
     Fetches the types for each column from the 'config' collection.
@@ -232,7 +448,7 @@ async def getColumnTypes():
     collection, client = connection["collection"], connection["client"]
 
     try:
-        types = collection.find()
+        types = collection.find(COLUMN_TYPES_QUERY)
         typesList = list(types)
         typesList = [cleanData(item) for item in typesList]
         if typesList:
@@ -250,7 +466,9 @@ async def getColumnTypes():
 
 
 @router.put("/update-column-types")
-async def updateColumnTypes(payload: SetColumnTypes):
+async def updateColumnTypes(
+    payload: SetColumnTypes, eventBus: EventBus = Depends(getEventBus)
+):
     """
     Updates new column types in the "config" collection.
     """
@@ -261,7 +479,7 @@ async def updateColumnTypes(payload: SetColumnTypes):
         raise HTTPException(status_code=500, detail="No payload found.")
     
     try:
-        current = collection.find_one({})
+        current = collection.find_one(COLUMN_TYPES_QUERY)
         updateOperations = {}
         updateFields = {
             col: newType
@@ -276,7 +494,11 @@ async def updateColumnTypes(payload: SetColumnTypes):
         if removeFields:
             updateOperations["$unset"] = removeFields
         
-        result = collection.update_one({}, updateOperations)
+        result = collection.update_one({"_id": current["_id"]}, updateOperations)
+        bumpRevisions(collection, "config")
+        eventBus.publish(
+            "config", REPLACE, key="_id", documents=[collection.find_one({"_id": current["_id"]})]
+        )
         return {"status": "success", "message": f"{result.modified_count} column types updated successfully."}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error updating column types: {str(e)}")
@@ -0,0 +1,226 @@
+import asyncio
+import warnings
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+import numpy as np
+import pandas as pd
+from pymongo import DeleteMany, DeleteOne, UpdateOne
+
+from services import catalogService
+from services.catalogService import (
+    CatalogRefreshService,
+    buildCatalogUpdates,
+    buildFieldRefresh,
+    buildFieldReset,
+    buildRecordEdit,
+    buildRecordRemoval,
+    catalogId,
+    summarizeDataFrame,
+    summarizeRecords,
+)
+
+
+def test_summarize_records_union_of_fields():
+    """Test summarizeRecords collects fields across heterogeneous documents"""
+    records = [
+        {"_id": 1, "Date": "2023-05-01", "Temperature": 24.5},
+        {"_id": 2, "Date": "2023-05-02", "Operator": "Jane"},
+        {"_id": 3, "Date": "2023-05-02", "Temperature": None},
+    ]
+
+    summary = summarizeRecords(records)
+
+    assert set(summary) == {"Date", "Temperature", "Operator"}
+    assert summary["Date"]["count"] == 3
+    assert summary["Date"]["values"] == {"2023-05-01", "2023-05-02"}
+    assert summary["Temperature"]["nullCount"] == 1
+    assert summary["Temperature"]["types"] == {"number": 1, "null": 1}
+    assert summary["Temperature"]["min"] == 24.5
+    assert summary["Operator"]["types"] == {"string": 1}
+
+
+def test_summarize_records_caps_values(monkeypatch):
+    """Test summarizeRecords drops value lists above the cardinality cap"""
+    monkeypatch.setattr(catalogService, "VALUE_CARDINALITY_CAP", 3)
+
+    summary = summarizeRecords([{"Time": i} for i in range(5)])
+
+    assert summary["Time"]["valuesCapped"] is True
+    assert summary["Time"]["values"] == set()
+    assert summary["Time"]["min"] == 0
+    assert summary["Time"]["max"] == 4
+
+
+def test_summarize_data_frame():
+    """Test summarizeDataFrame computes statistics column-wise"""
+    df = pd.DataFrame(
+        {
+            "U Stac": [1.5, np.nan, 3.0],
+            "Operator": ["John", None, "John"],
+        }
+    )
+
+    summary = summarizeDataFrame(df)
+
+    assert summary["U Stac"]["count"] == 3
+    assert summary["U Stac"]["nullCount"] == 1
+    assert summary["U Stac"]["min"] == 1.5
+    assert summary["U Stac"]["max"] == 3.0
+    assert summary["U Stac"]["values"] == {1.5, 3.0}
+    assert not isinstance(summary["U Stac"]["min"], np.generic)
+    assert summary["Operator"]["types"] == {"string": 2, "null": 1}
+    assert summary["Operator"]["values"] == {"John"}
+
+
+def test_summarize_data_frame_dates_as_datetimes():
+    """Test summarizeDataFrame lists datetime columns as Python datetimes, without warnings"""
+    df = pd.DataFrame({"Time": pd.to_datetime(["2023-05-01 09:00", "2023-05-01 09:00", None])})
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        summary = summarizeDataFrame(df)
+
+    assert summary["Time"]["types"] == {"date": 2, "null": 1}
+    assert summary["Time"]["values"] == {datetime(2023, 5, 1, 9, 0)}
+    assert all(type(value) is datetime for value in summary["Time"]["values"])
+
+
+def test_build_catalog_updates():
+    """Test buildCatalogUpdates merges counts, bounds and values atomically"""
+    summary = summarizeRecords([{"Temperature": 20}, {"Temperature": 25}])
+
+    operations = buildCatalogUpdates("experiments", summary)
+
+    assert all(isinstance(op, UpdateOne) for op in operations)
+    upsert = operations[0]._doc
+    assert operations[0]._filter == {"_id": catalogId("experiments", "Temperature")}
+    assert upsert["$inc"]["count"] == 2
+    assert upsert["$inc"]["types.number"] == 2
+    assert upsert["$min"] == {"min": 20}
+    assert upsert["$max"] == {"max": 25}
+    assert sorted(operations[1]._doc["$addToSet"]["values"]["$each"]) == [20, 25]
+
+
+def test_build_field_reset():
+    """Test buildFieldReset replaces a column set to one default value"""
+    operations = buildFieldReset("experiments", "Notes", "n/a", 10)
+
+    assert isinstance(operations[0], DeleteOne)
+    upsert = operations[1]._doc
+    assert upsert["$inc"]["count"] == 10
+    assert upsert["$inc"]["types.string"] == 10
+    assert operations[2]._doc["$addToSet"]["values"]["$each"] == ["n/a"]
+
+
+def test_build_field_refresh_replaces_statistics():
+    """Test buildFieldRefresh sets exact statistics, so edited-away values disappear"""
+    documents = [{"Operator": "Ann", "Flow": 2}, {"Operator": "Bo", "Flow": 5}, {"Flow": None}]
+
+    operations = buildFieldRefresh("experiments", documents, ["Operator", "Flow", "Old"])
+
+    operator = operations[0]._doc
+    assert sorted(operator["$set"]["values"]) == ["Ann", "Bo"]
+    assert operator["$set"]["count"] == 2
+    assert "$inc" not in operator
+    flow = operations[1]._doc["$set"]
+    assert (flow["min"], flow["max"], flow["nullCount"]) == (2, 5, 1)
+    assert flow["types"] == {"number": 2, "null": 1}
+    assert isinstance(operations[2], DeleteOne)
+
+
+def test_build_record_removal_decrements_and_marks_stale():
+    """Test removed documents are subtracted and entries that held their values marked stale"""
+    operations = buildRecordRemoval("experiments", [{"Flow": 2, "Notes": None}])
+
+    flowId = catalogId("experiments", "Flow")
+    assert operations[0]._filter == {"_id": flowId}
+    assert operations[0]._doc == {"$inc": {"count": -1, "nullCount": 0, "types.number": -1}}
+    assert operations[1]._filter == {"_id": flowId, "$or": [
+        {"values": {"$in": [2]}}, {"min": {"$in": [2, 2]}}, {"max": {"$in": [2, 2]}},
+    ]}
+    assert operations[1]._doc == {"$inc": {"stale": 1}}
+    # A removed null bounds nothing, so its entry is only decremented
+    assert operations[2]._doc["$inc"]["types.null"] == -1
+    assert isinstance(operations[3], DeleteMany)
+    assert operations[3]._filter == {
+        "collection": "experiments", "field": {"$in": ["Flow", "Notes"]}, "count": {"$lte": 0}
+    }
+
+
+def test_build_record_edit_only_touches_changed_fields():
+    """Test an edit adds the new values and removes the old ones of changed fields only"""
+    operations = buildRecordEdit(
+        "experiments", {"Flow": 2, "Operator": "Ann"}, {"Flow": 3, "Operator": "Ann", "pH": 7}
+    )
+
+    added = operations[0]._doc
+    assert operations[0]._filter == {"_id": catalogId("experiments", "Flow")}
+    assert added["$inc"]["count"] == 1
+    assert added["$max"] == {"max": 3}
+    removals = [
+        op for op in operations
+        if isinstance(op, UpdateOne) and op._doc.get("$inc", {}).get("count") == -1
+    ]
+    assert [op._filter for op in removals] == [{"_id": catalogId("experiments", "Flow")}]
+    assert all("Operator" not in str(op._filter) for op in operations)
+    assert buildRecordEdit("experiments", {"Flow": 2}, {"Flow": 2}) == []
+
+
+@pytest.mark.asyncio
+async def test_catalog_refresh_recomputes_stale_entries():
+    """Test refreshOnce recomputes stale entries and clears only unchanged stale marks"""
+    catalog = AsyncMock()
+    staleEntries = MagicMock()
+    staleEntries.to_list = AsyncMock(return_value=[
+        {"_id": "experiments:Flow", "collection": "experiments", "field": "Flow", "stale": 2},
+    ])
+    catalog.find = MagicMock(return_value=staleEntries)
+    experiments = MagicMock()
+    documents = MagicMock()
+    documents.to_list = AsyncMock(return_value=[{"Flow": 3}, {"Flow": 5}])
+    experiments.find = MagicMock(return_value=documents)
+    config = AsyncMock()
+    config.find_one.return_value = None
+    database = MagicMock()
+    database.__getitem__.side_effect = lambda name: {
+        "catalog": catalog, "experiments": experiments, "config": config
+    }[name]
+
+    refreshed = await CatalogRefreshService(database).refreshOnce()
+
+    assert refreshed == 1
+    experiments.find.assert_called_once_with({}, {"_id": 0, "Flow": 1})
+    refresh = catalog.bulk_write.await_args.args[0][0]._doc["$set"]
+    assert (refresh["min"], refresh["max"], refresh["count"]) == (3, 5, 2)
+    catalog.update_one.assert_awaited_once_with(
+        {"_id": "experiments:Flow", "stale": 2}, {"$unset": {"stale": ""}}
+    )
+
+
+@pytest.mark.asyncio
+async def test_catalog_refresh_stops_right_after_wake():
+    """Test stop() ends the refresh loop even when it arrives as the loop is woken"""
+    service = CatalogRefreshService(MagicMock(), delaySeconds=0)
+    service.refreshOnce = AsyncMock(return_value=0)
+    await service.start()
+    await asyncio.sleep(0)
+
+    service.wake()
+    await asyncio.wait_for(service.stop(), 1)
+
+    assert service.task is None
+
+
+@pytest.mark.parametrize("value, expected", [
+    (None, "null"),
+    (float("nan"), "null"),
+    (True, "boolean"),
+    (np.float64(1.5), "number"),
+    ("text", "string"),
+    ({"a": 1}, "object"),
+])
+def test_infer_type(value, expected):
+    """Test inferType maps values to catalog type names"""
+    assert catalogService.inferType(value) == expected
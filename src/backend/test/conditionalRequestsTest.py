@@ -0,0 +1,42 @@
+from datetime import datetime, timezone
+
+from services.conditionalRequests import (
+    CACHE_CONTROL,
+    cacheHeaders,
+    entityTag,
+    matchesEntityTag,
+    requestVariant,
+)
+
+
+def test_request_variant_depends_on_every_part():
+    """Test requests to other paths, queries or bodies get other variants"""
+    variant = requestVariant("GET", "/generatedGraphs/latest", "latest=5")
+
+    assert variant == requestVariant("GET", "/generatedGraphs/latest", "latest=5")
+    assert variant != requestVariant("GET", "/generatedGraphs/latest", "latest=3")
+    assert variant != requestVariant("GET", "/experiments", "latest=5")
+    assert variant != requestVariant("GET", "/generatedGraphs/latest", "", b"latest=5")
+
+
+def test_matches_entity_tag_uses_weak_comparison():
+    """Test If-None-Match lists, weak prefixes and wildcards"""
+    etag = entityTag("rev3", "abc")
+
+    assert etag == 'W/"rev3-abc"'
+    assert matchesEntityTag('W/"rev3-abc"', etag)
+    assert matchesEntityTag('"other", "rev3-abc"', etag)
+    assert matchesEntityTag("*", etag)
+    assert not matchesEntityTag('W/"rev2-abc"', etag)
+    assert not matchesEntityTag(None, etag)
+
+
+def test_cache_headers():
+    """Test responses must be revalidated and carry an HTTP date"""
+    headers = cacheHeaders('W/"a"', datetime(2025, 1, 2, 3, 4, 5, 678, tzinfo=timezone.utc))
+
+    assert headers == {
+        "ETag": 'W/"a"',
+        "Last-Modified": "Thu, 02 Jan 2025 03:04:05 GMT",
+        "Cache-Control": CACHE_CONTROL,
+    }
@@ -0,0 +1,100 @@
+from datetime import datetime
+from unittest.mock import MagicMock
+
+from pymongo import DeleteMany, ReplaceOne, UpdateMany, UpdateOne
+
+from services.dateIndexService import (
+    buildDateIndexRebuild,
+    buildDateIndexRemoval,
+    buildDateIndexUpdates,
+    getExperimentIdsForDates,
+    getIndexedDates,
+)
+
+
+def test_build_date_index_updates_groups_by_date():
+    """Test buildDateIndexUpdates adds each experiment under its date"""
+    experiments = [
+        {"experimentId": "#1 2023-05-01", "Date": "2023-05-01"},
+        {"experimentId": "#2 2023-05-01", "Date": "2023-05-01"},
+        {"experimentId": "#3 2023-05-02", "Date": datetime(2023, 5, 2)},
+        {"experimentId": "#4", "Date": None},
+    ]
+
+    operations = buildDateIndexUpdates(experiments)
+
+    assert len(operations) == 2
+    assert all(isinstance(op, UpdateOne) for op in operations)
+    assert operations[0]._filter == {"_id": "2023-05-01"}
+    assert operations[0]._doc == {
+        "$addToSet": {"experimentIds": {"$each": ["#1 2023-05-01", "#2 2023-05-01"]}}
+    }
+    assert operations[1]._filter == {"_id": "2023-05-02"}
+
+
+def test_build_date_index_removal():
+    """Test buildDateIndexRemoval pulls experiments and drops empty dates"""
+    operations = buildDateIndexRemoval(["#1 2023-05-01"])
+
+    assert isinstance(operations[0], UpdateMany)
+    assert operations[0]._doc == {
+        "$pull": {"experimentIds": {"$in": ["#1 2023-05-01"]}}
+    }
+    assert isinstance(operations[1], DeleteMany)
+
+
+def test_build_date_index_rebuild_keeps_datetime_dates():
+    """Test a rebuild indexes datetime dates under their YYYY-MM-DD form, like updates do"""
+    experiments = [
+        {"experimentId": "#1 2023-05-01", "Date": "2023-05-01"},
+        {"experimentId": "#2 2023-05-02", "Date": datetime(2023, 5, 2, 9, 30)},
+        {"experimentId": "#3 2023-05-02", "Date": "2023-05-02"},
+        {"experimentId": "#4", "Date": ""},
+    ]
+
+    *replacements, removal = buildDateIndexRebuild(experiments)
+
+    assert all(isinstance(op, ReplaceOne) for op in replacements)
+    assert [op._doc for op in replacements] == [
+        {"_id": "2023-05-01", "experimentIds": ["#1 2023-05-01"]},
+        {"_id": "2023-05-02", "experimentIds": ["#2 2023-05-02", "#3 2023-05-02"]},
+    ]
+    assert isinstance(removal, DeleteMany)
+    assert removal._filter == {"_id": {"$nin": ["2023-05-01", "2023-05-02"]}}
+
+
+def test_build_date_index_rebuild_of_no_experiments_clears_index():
+    """Test a rebuild without experiments only drops every date"""
+    operations = buildDateIndexRebuild([])
+
+    assert len(operations) == 1
+    assert operations[0]._filter == {"_id": {"$nin": []}}
+
+
+def test_get_indexed_dates():
+    """Test getIndexedDates reads sorted dates, optionally by experiment"""
+    dateIndex = MagicMock()
+    dateIndex.find.return_value.sort.return_value = [
+        {"_id": "2023-05-01"}, {"_id": "2023-05-02"}
+    ]
+
+    assert getIndexedDates(dateIndex) == ["2023-05-01", "2023-05-02"]
+    dateIndex.find.assert_called_with({}, {"_id": 1})
+
+    getIndexedDates(dateIndex, ["#1 2023-05-01"])
+    dateIndex.find.assert_called_with(
+        {"experimentIds": {"$in": ["#1 2023-05-01"]}}, {"_id": 1}
+    )
+
+
+def test_get_experiment_ids_for_dates():
+    """Test getExperimentIdsForDates flattens the IDs of the matching dates"""
+    dateIndex = MagicMock()
+    dateIndex.find.return_value.sort.return_value = [
+        {"_id": "2023-05-01", "experimentIds": ["#1 2023-05-01", "#2 2023-05-01"]},
+        {"_id": "2023-05-02", "experimentIds": ["#3 2023-05-02"]},
+    ]
+
+    result = getExperimentIdsForDates(dateIndex, ["2023-05-01", "2023-05-02"])
+
+    assert result == ["#1 2023-05-01", "#2 2023-05-01", "#3 2023-05-02"]
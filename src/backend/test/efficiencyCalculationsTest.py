@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+from efficiencies.efficiencyCalculations import (
+    COND_TO_CONC,
+    MOLAR_MASS,
+    CondToConcConverter,
+    computeCurrentEfficiency,
+    computeVoltageDropEfficiency,
+    concentrationSeries,
+    convertCondtoConc,
+    currentEfficiencySeries,
+    getConverter,
+    voltageDropEfficiencySeries,
+)
+
+
+def test_convert_matches_table_points():
+    """Test table conductivities convert to their tabulated concentrations"""
+    converter = CondToConcConverter("HCL")
+    cond = np.array(COND_TO_CONC["HCL"]) / 1000
+    expected = np.array(COND_TO_CONC["conc"]) / (MOLAR_MASS["HCL"] * 1000)
+
+    np.testing.assert_allclose(converter.convert(cond), expected)
+    np.testing.assert_allclose(CondToConcConverter("HCL", logScale=True).convert(cond), expected)
+
+
+def test_convert_array_matches_scalar_conversion():
+    """Test array conversion agrees with converting each value"""
+    cond = np.array([0.0, 0.5, 12.3, 250.0, 1000.0])
+    converted = getConverter("NaOH").convert(cond)
+
+    assert converted.shape == cond.shape
+    assert converted.tolist() == pytest.approx([convertCondtoConc(c, "NaOH") for c in cond])
+    assert isinstance(convertCondtoConc(12.3, "NaOH"), float)
+
+
+def test_log_scale_interpolates_between_points_and_clamps():
+    """Test log-log interpolation and clamping outside the table"""
+    converter = getConverter("HCL", logScale=True)
+    # Midway between 1140 and 3390 uS/cm in log space
+    midpoint = np.sqrt(1140 * 3390) / 1000
+    expected = np.sqrt(100 * 300) / (MOLAR_MASS["HCL"] * 1000)
+
+    assert converter.convert(midpoint) == pytest.approx(expected)
+    assert converter.convert(0) == pytest.approx(converter.convert(0.0117))
+    assert converter.convert(1e6) == pytest.approx(converter.convert(850))
+
+
+def test_get_converter_is_shared():
+    """Test converters are built once per compound and scale"""
+    assert getConverter("HCL") is getConverter("HCL")
+    assert getConverter("HCL") is not getConverter("HCL", logScale=True)
+
+
+def test_concentration_series_reads_compound_field():
+    """Test per-sample series use C1 for HCl and C2 for NaOH"""
+    data = [{"C1 Cond": 1.14, "C2 Cond": 0.603}, {"C1 Cond": 3.39, "C2 Cond": 1.78}]
+
+    np.testing.assert_allclose(
+        concentrationSeries(data, "HCL"), np.array([100, 300]) / (MOLAR_MASS["HCL"] * 1000)
+    )
+    np.testing.assert_allclose(
+        concentrationSeries(data, "NaOH"), np.array([100, 300]) / (MOLAR_MASS["NaOH"] * 1000)
+    )
+
+
+def intervalData(minutes):
+    """One sample a minute: 1 A, rising C1 conductivity, U Stac half of U Cmm"""
+    return [
+        {
+            "Time": f"2025/01/01 10:{minute:02d}:00",
+            "I Cmm": 1.0 if minute <= 10 else 0.0,
+            "C1 Cond": 1.14 + minute * 0.1,
+            "C2 Cond": 0.603,
+            "U Stac": 2.0,
+            "U Cmm": 4.0,
+        }
+        for minute in range(minutes)
+    ]
+
+
+def test_current_efficiency_series_has_one_entry_per_interval_after_the_first():
+    """Test intervals after the baseline keep their start, efficiency, current and concentration"""
+    series = currentEfficiencySeries(intervalData(16), "HCL", 1.5, 10)
+
+    assert series["Time"] == ["2025/01/01 10:06:00", "2025/01/01 10:11:00"]
+    assert series["Current"] == [1.0, 0.0]
+    # No current in the last interval: efficiency 0, concentration still kept
+    assert series["Efficiency"][1] == 0
+    assert series["Concentration"][1] == pytest.approx(convertCondtoConc(1.14 + 1.3, "HCL"))
+    assert computeCurrentEfficiency(intervalData(16), "HCL", 1.5, 10) == pytest.approx(
+        np.mean(series["Efficiency"])
+    )
+
+
+def test_voltage_drop_series_covers_every_interval():
+    """Test every interval, including the first, has a voltage drop efficiency"""
+    series = voltageDropEfficiencySeries(intervalData(16))
+
+    assert series["Time"] == ["2025/01/01 10:00:00", "2025/01/01 10:06:00", "2025/01/01 10:11:00"]
+    assert series["Efficiency"] == [50.0, 50.0, 50.0]
+    assert computeVoltageDropEfficiency(intervalData(16)) == 50.0
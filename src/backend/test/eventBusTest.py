@@ -0,0 +1,89 @@
+import json
+import math
+
+import pytest
+from bson import ObjectId
+
+from services.eventBus import (
+    DELETE,
+    INSERT,
+    RESYNC,
+    UPDATE,
+    EventBus,
+    formatEvent,
+)
+
+
+@pytest.mark.asyncio
+async def test_publish_delivers_json_safe_deltas():
+    """Test subscribers receive published changes with ids and NaN cleaned"""
+    eventBus = EventBus()
+    subscription = eventBus.subscribe()
+    objectId = ObjectId()
+
+    eventBus.publish("experiments", INSERT, key="experimentId", documents=[
+        {"_id": objectId, "experimentId": "#1", "Current": math.nan}
+    ])
+
+    event = await subscription.next(timeout=1)
+    assert event["operation"] == INSERT
+    assert event["documents"] == [{"_id": str(objectId), "experimentId": "#1", "Current": None}]
+    assert json.loads(formatEvent(event).split("data: ")[1]) == event
+
+
+@pytest.mark.asyncio
+async def test_subscription_filters_collections():
+    """Test a subscriber only receives the collections it asked for"""
+    eventBus = EventBus()
+    subscription = eventBus.subscribe(["graphs"])
+
+    eventBus.publish("experiments", DELETE, key="experimentId", ids=["#1"])
+    eventBus.publish("graphs", DELETE, key="_id", ids=[3])
+
+    assert (await subscription.next(timeout=1))["collection"] == "graphs"
+    assert await subscription.next(timeout=0.01) is None
+
+
+def test_listeners_see_every_event_as_published():
+    """Test listeners are called synchronously with each published event"""
+    eventBus = EventBus()
+    seen = []
+    eventBus.addListener(seen.append)
+
+    event = eventBus.publish("graphs", DELETE, key="_id", ids=[3])
+
+    assert seen == [event]
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_is_told_to_resync():
+    """Test an overflowing queue is replaced by a single resync event"""
+    eventBus = EventBus(queueSize=2)
+    subscription = eventBus.subscribe()
+
+    for i in range(3):
+        eventBus.publish("experiments", UPDATE, key="experimentId", ids=[f"#{i}"], set={})
+
+    assert (await subscription.next(timeout=1))["operation"] == RESYNC
+    assert subscription.queue.empty()
+
+
+@pytest.mark.asyncio
+async def test_reconnect_replays_missed_events():
+    """Test Last-Event-ID replays held events and resyncs otherwise"""
+    eventBus = EventBus(historySize=2)
+    first = eventBus.publish("graphs", DELETE, key="_id", ids=[1])
+    eventBus.publish("graphs", DELETE, key="_id", ids=[2])
+    third = eventBus.publish("graphs", DELETE, key="_id", ids=[3])
+
+    resumed = eventBus.subscribe(lastEventId=eventBus.history[0]["id"])
+    assert (await resumed.next(timeout=1))["id"] == third["id"]
+
+    tooOld = eventBus.subscribe(lastEventId=first["id"].replace("-1", "-0"))
+    assert (await tooOld.next(timeout=1))["operation"] == RESYNC
+
+    restarted = eventBus.subscribe(lastEventId="00000000-3")
+    assert (await restarted.next(timeout=1))["operation"] == RESYNC
+
+    eventBus.unsubscribe(resumed)
+    assert resumed not in eventBus.subscribers
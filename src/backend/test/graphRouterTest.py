@@ -0,0 +1,86 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from graph.models import AttributeValues, ExperimentFilter
+from graph.router import downsampleRows, getFilterCollectionAttrValues, getFilterCollectionDates
+from services.dateIndexService import DATE_INDEX_COLLECTION
+from services.schemaService import emptySchema, withColumn, withoutColumn
+
+
+def mockExperiments(schema):
+    """An experiments collection whose database holds `schema` and a date index"""
+    collection = MagicMock()
+    config = MagicMock()
+    config.find_one.return_value = schema
+    dateIndex = MagicMock()
+    dateIndex.find.return_value.sort.return_value = [{"_id": "2025-01-01"}]
+    collections = {"config": config, DATE_INDEX_COLLECTION: dateIndex, "experiments": collection}
+    collection.database.__getitem__.side_effect = lambda name: collections[name]
+    return collection
+
+
+def test_downsample_rows_keeps_extrema_of_every_attribute():
+    """Test spikes in any numeric attribute survive downsampling"""
+    rows = [{"Time": f"t{i}", "U Stac": (i % 7) * 0.1, "I Cmm": 1.0} for i in range(20000)]
+    rows[12345]["U Stac"] = 99.0
+    rows[777]["I Cmm"] = -5.0
+
+    points = downsampleRows(rows, maxPoints=100)
+
+    assert len(points) <= 100
+    assert points[0] is rows[0] and points[-1] is rows[-1]
+    assert rows[12345] in points and rows[777] in points
+    assert [point["Time"] for point in points] == sorted(
+        (point["Time"] for point in points), key=lambda time: int(time[1:])
+    )
+
+
+def test_downsample_rows_spaces_non_numeric_points_evenly():
+    """Test points without numeric attributes fall back to evenly spaced selection"""
+    rows = [{"Notes": f"n{i}"} for i in range(1000)]
+
+    points = downsampleRows(rows, maxPoints=11)
+
+    assert len(points) == 11
+    assert points[0]["Notes"] == "n0" and points[5]["Notes"] == "n500" and points[-1]["Notes"] == "n999"
+    assert downsampleRows(rows[:5], maxPoints=11) == rows[:5]
+
+
+@pytest.mark.asyncio
+async def test_filter_dates_by_added_column_matches_its_default():
+    """Test filtering on a column only registered in the schema finds its default"""
+    collection = mockExperiments(withColumn(emptySchema(), "Membrane", "A"))
+    collection.distinct.return_value = ["#1"]
+
+    with patch("graph.router.getConnection", return_value={"collection": collection, "client": MagicMock()}):
+        response = await getFilterCollectionDates(
+            ExperimentFilter(collection="experiments", attribute="Membrane", filterValue="A")
+        )
+
+    assert response["data"] == ["2025-01-01"]
+    query = collection.distinct.call_args[0][1]
+    assert query == {"$and": [{"$or": [{"Membrane": "A"}, {"Membrane": {"$exists": False}}]}]}
+
+
+@pytest.mark.asyncio
+async def test_attribute_values_follow_the_schema():
+    """Test distinct values include an added column's default and skip dropped ones"""
+    schema = withoutColumn(withColumn(emptySchema(), "Membrane", "A"), "Old", None)
+    collection = mockExperiments(schema)
+    collection.distinct.return_value = ["B"]
+    collection.count_documents.return_value = 1
+    connection = {"collection": collection, "client": MagicMock()}
+
+    # High-cardinality fields fall back to a distinct scan
+    with patch("graph.router.CATALOGED_COLLECTIONS", ()), \
+            patch("graph.router.getConnection", return_value=connection):
+        added = await getFilterCollectionAttrValues(
+            AttributeValues(collection="experiments", attribute="Membrane")
+        )
+        dropped = await getFilterCollectionAttrValues(
+            AttributeValues(collection="experiments", attribute="Old")
+        )
+
+    assert added["data"] == ["A", "B"]
+    assert dropped["status"] == "error"
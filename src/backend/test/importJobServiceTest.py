@@ -0,0 +1,220 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+import pytest_asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+from pymongo.errors import DuplicateKeyError
+
+from services.importJobService import (
+    AMBIGUOUS,
+    DUPLICATE,
+    IMPORTED,
+    SKIPPED,
+    ImportJobService,
+    contentHash,
+)
+
+
+@pytest_asyncio.fixture
+async def importJobService(tmp_path):
+    """Fixture with mocked job collections and migration service"""
+    database = MagicMock()
+    collections = {"importJobs": AsyncMock(), "importedSheets": AsyncMock()}
+    database.__getitem__.side_effect = lambda name: collections[name]
+
+    migrationService = MagicMock()
+    migrationService.importExperimentSheet = AsyncMock(return_value=[{"experimentId": "#1"}])
+    migrationService.importDataSheet = AsyncMock(return_value=[{}, {}])
+
+    service = ImportJobService(database, migrationService, spoolDir=str(tmp_path))
+    yield service
+    await service.stop()
+
+
+@pytest.mark.asyncio
+async def test_submit_spools_files_and_queues_job(importJobService, tmp_path):
+    """Test submit stores the job with experiments first and queues it"""
+    jobId = await importJobService.submit([
+        {"filename": "data.xlsx", "kind": "data", "content": b"data"},
+        {"filename": "exp.xlsx", "kind": "experiment", "content": b"exp"},
+    ])
+
+    job = importJobService.jobsCollection.insert_one.call_args[0][0]
+    assert job["_id"] == jobId
+    assert job["status"] == "queued"
+    assert [f["kind"] for f in job["files"]] == ["experiment", "data"]
+    assert job["files"][1]["sha256"] == contentHash(b"data")
+    with open(job["files"][1]["path"], "rb") as spooled:
+        assert spooled.read() == b"data"
+    assert importJobService.queue.get_nowait() == jobId
+
+
+@pytest.mark.asyncio
+async def test_process_job_records_file_outcomes(importJobService):
+    """Test processJob claims the job, imports pending files and completes it"""
+    importJobService.jobsCollection.find_one_and_update = AsyncMock(return_value={
+        "_id": "job1",
+        "status": "running",
+        "files": [
+            {"filename": "exp.xlsx", "kind": "experiment", "path": "exp.xlsx",
+             "sha256": "a", "status": "pending"},
+            {"filename": "data.xlsx", "kind": "data", "path": "data.xlsx",
+             "sha256": "b", "status": "pending"},
+            {"filename": "done.xlsx", "kind": "data", "path": "done.xlsx",
+             "sha256": "c", "status": "imported"},
+        ],
+    })
+
+    await importJobService.processJob("job1")
+
+    claim = importJobService.jobsCollection.find_one_and_update.call_args[0]
+    assert claim[0]["$or"][0] == {"status": "queued"}
+    assert claim[1]["$set"]["owner"] == importJobService.owner
+    updates = importJobService.jobsCollection.update_one.call_args_list
+    assert all(c[0][0] == {"_id": "job1", "owner": importJobService.owner} for c in updates)
+    assert updates[0][0][1]["$set"]["files.0.status"] == IMPORTED
+    assert updates[1][0][1]["$set"]["files.1.records"] == 2
+    assert updates[-1][0][1]["$set"]["status"] == "completed"
+    importJobService.migrationService.importDataSheet.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_process_job_leaves_job_claimed_by_another_worker(importJobService):
+    """Test a job leased by another worker is not imported, only watched"""
+    leaseUntil = datetime.now() + timedelta(minutes=5)
+    importJobService.jobsCollection.find_one_and_update = AsyncMock(return_value=None)
+    importJobService.jobsCollection.find_one = AsyncMock(return_value={
+        "_id": "job1", "status": "running", "owner": "other", "leaseUntil": leaseUntil,
+    })
+
+    await importJobService.processJob("job1")
+
+    importJobService.migrationService.importDataSheet.assert_not_called()
+    importJobService.jobsCollection.update_one.assert_not_called()
+    assert len(importJobService.tasks) == 1
+
+
+@pytest.mark.asyncio
+async def test_process_job_stops_when_lease_is_lost(importJobService):
+    """Test processJob stops once another worker took over its job"""
+    importJobService.jobsCollection.find_one_and_update = AsyncMock(return_value={
+        "_id": "job1",
+        "status": "running",
+        "files": [
+            {"filename": "a.xlsx", "kind": "data", "path": "a.xlsx",
+             "sha256": "a", "status": "pending"},
+            {"filename": "b.xlsx", "kind": "data", "path": "b.xlsx",
+             "sha256": "b", "status": "pending"},
+        ],
+    })
+    importJobService.jobsCollection.update_one = AsyncMock(
+        return_value=MagicMock(matched_count=0)
+    )
+
+    await importJobService.processJob("job1")
+
+    importJobService.migrationService.importDataSheet.assert_called_once()
+    assert importJobService.jobsCollection.update_one.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_process_file_skips_imported_sheet(importJobService):
+    """Test a data sheet whose hash is already claimed is skipped"""
+    importJobService.importedSheetsCollection.insert_one.side_effect = DuplicateKeyError("dup")
+    # The existing claim is imported or still leased, so it is not taken over
+    importJobService.importedSheetsCollection.find_one_and_update = AsyncMock(return_value=None)
+
+    outcome = await importJobService.processFile(
+        "job1", {"filename": "data.xlsx", "kind": "data", "path": "data.xlsx", "sha256": "b"}
+    )
+
+    assert outcome["status"] == SKIPPED
+    importJobService.migrationService.importDataSheet.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_process_file_takes_over_expired_sheet_claim(importJobService):
+    """Test a sheet claim whose lease expired is taken over and imported"""
+    importJobService.importedSheetsCollection.insert_one.side_effect = DuplicateKeyError("dup")
+    importJobService.importedSheetsCollection.find_one_and_update = AsyncMock(
+        return_value={"_id": "b"}
+    )
+
+    outcome = await importJobService.processFile(
+        "job1", {"filename": "data.xlsx", "kind": "data", "path": "data.xlsx", "sha256": "b"}
+    )
+
+    assert outcome == {"status": IMPORTED, "records": 2}
+    takeover = importJobService.importedSheetsCollection.find_one_and_update.call_args[0]
+    assert takeover[0]["status"] == "running"
+    assert {"leaseUntil": {"$exists": False}} in takeover[0]["$or"]
+    assert takeover[1]["$set"]["owner"] == importJobService.owner
+
+
+@pytest.mark.asyncio
+async def test_process_file_reports_duplicate_sheet(importJobService):
+    """Test a sheet whose rows were all imported before is a duplicate"""
+    async def duplicate(path, result):
+        result.duplicateRows += 3
+        return []
+
+    importJobService.migrationService.importDataSheet.side_effect = duplicate
+
+    outcome = await importJobService.processFile(
+        "job1", {"filename": "data.xlsx", "kind": "data", "path": "data.xlsx", "sha256": "b"}
+    )
+
+    assert outcome["status"] == DUPLICATE
+    assert "3 rows" in outcome["reason"]
+    importJobService.importedSheetsCollection.delete_one.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_process_file_releases_claim_when_ambiguous(importJobService):
+    """Test an ambiguous sheet releases its claim so it can be resubmitted"""
+    async def ambiguous(path, result):
+        result.ambiguousData.append({"dataId": "data.xlsx", "matchingExp": ["#1", "#2"]})
+        return None
+
+    importJobService.migrationService.importDataSheet.side_effect = ambiguous
+
+    outcome = await importJobService.processFile(
+        "job1", {"filename": "data.xlsx", "kind": "data", "path": "data.xlsx", "sha256": "b"}
+    )
+
+    assert outcome == {"status": AMBIGUOUS, "matchingExp": ["#1", "#2"], "token": None}
+    importJobService.importedSheetsCollection.delete_one.assert_called_once_with(
+        {"_id": "b", "owner": importJobService.owner}
+    )
+
+
+@pytest.mark.asyncio
+async def test_resume_requeues_unfinished_jobs(importJobService):
+    """Test resume requeues queued jobs and running jobs whose lease expired"""
+    now = datetime.now()
+    cursor = MagicMock()
+    cursor.to_list = AsyncMock(return_value=[
+        {"_id": "queued", "status": "queued"},
+        {"_id": "expired", "status": "running", "leaseUntil": now - timedelta(minutes=1)},
+        {"_id": "unleased", "status": "running"},
+        {"_id": "leased", "status": "running", "leaseUntil": now + timedelta(minutes=5)},
+    ])
+    importJobService.jobsCollection.find = MagicMock(return_value=cursor)
+
+    await importJobService.resume()
+
+    queued = [importJobService.queue.get_nowait() for _ in range(importJobService.queue.qsize())]
+    assert queued == ["queued", "expired", "unleased"]
+    assert len(importJobService.tasks) == 1
+    importJobService.importedSheetsCollection.delete_many.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_requeue_after_lease(importJobService):
+    """Test a watched job is queued again once its lease has ended"""
+    importJobService.requeueAfterLease("job1", datetime.now())
+    await asyncio.sleep(0.01)
+
+    assert importJobService.queue.get_nowait() == "job1"
@@ -0,0 +1,190 @@
+import pytest
+import pytest_asyncio
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock
+
+from services.schemaService import emptySchema, withColumn, withoutColumn
+from services.liveIngestService import (
+    LiveIngestService,
+    RunningBins,
+    buildBinUpdates,
+)
+
+START = datetime(2025, 1, 1, 10)
+
+
+def sample(minutes, current=2.0, uStack=8.0, uTotal=10.0, c1=1.0, c2=0.5):
+    return {
+        "Time": (START + timedelta(minutes=minutes)).strftime("%Y/%m/%d %H:%M:%S"),
+        "I Cmm": current, "U Stac": uStack, "U Cmm": uTotal,
+        "C1 Cond": c1, "C2 Cond": c2,
+    }
+
+
+@pytest_asyncio.fixture
+async def liveIngestService():
+    """Fixture with mocked collections and migration service"""
+    database = MagicMock()
+    collections = {
+        "liveBins": AsyncMock(), "experiments": AsyncMock(), "data": AsyncMock(),
+        "config": AsyncMock(),
+    }
+    database.__getitem__.side_effect = lambda name: collections[name]
+    collections["config"].find_one.return_value = None
+
+    migrationService = MagicMock()
+    migrationService.cleanData = MagicMock(side_effect=lambda df: df)
+    migrationService.linkData = AsyncMock(
+        side_effect=lambda df, experimentId, firstRow=0: df.to_dict("records")
+    )
+    migrationService.storeLinkedData = AsyncMock(side_effect=lambda df, records, sheet=None: records)
+    migrationService.finishSheet = AsyncMock()
+
+    service = LiveIngestService(database, migrationService, batchSize=2)
+    yield service
+
+
+def test_running_bins_sum_samples_per_interval():
+    """Test samples land in 5 minute bins and skip missing values"""
+    bins = RunningBins(START)
+    delta = {}
+    assert bins.add(sample(0), delta) == 0
+    assert bins.add(sample(4.9, uStack=6.0), delta) == 0
+    assert bins.add({**sample(5), "U Stac": None}, delta) == 1
+
+    assert bins.mean(0, "uStack") == 7.0
+    assert bins.bins[1]["counts"]["uStack"] == 0
+    assert delta[0]["sums"]["current"] == 4.0
+
+
+def test_running_bins_efficiencies():
+    """Test bin efficiencies follow the batch calculation formulas"""
+    bins = RunningBins(START)
+    bins.add(sample(0))
+    bins.add(sample(6, uStack=5.0, c1=3.39))
+    bins.add(sample(11, current=0))
+
+    assert bins.voltageDropEfficiency() == pytest.approx((0.8 + 0.5 + 0.8) / 3 * 100)
+    efficiencies = bins.efficiencies({"Final volume (L) HCL": 1.5, "# of Stacks": 10})
+    assert efficiencies["bins"] == 3
+    assert efficiencies["Current Efficiency (NaOH)"] is None
+    assert efficiencies["Current Efficiency (HCl)"] > 0
+
+
+def test_build_bin_updates_increments_sums():
+    """Test persisted bins are updated with $inc upserts"""
+    bins = RunningBins(START)
+    delta = {}
+    bins.add(sample(1), delta)
+
+    operation = buildBinUpdates("#1", START, delta)[0]
+    assert operation._filter == {"_id": "#1:0"}
+    assert operation._doc["$inc"]["sums.current"] == 2.0
+    assert operation._doc["$setOnInsert"]["startTime"] == START
+
+
+@pytest.mark.asyncio
+async def test_session_flushes_new_rows_into_bins(liveIngestService):
+    """Test a session batches samples and only bins the rows stored"""
+    liveIngestService.experimentsCollection.find_one.return_value = {"experimentId": "#1"}
+    cursor = MagicMock()
+    cursor.to_list = AsyncMock(return_value=[])
+    liveIngestService.binsCollection.find = MagicMock(return_value=cursor)
+    liveIngestService.dataCollection.find_one.return_value = None
+    liveIngestService.migrationService.storeLinkedData.side_effect = lambda df, records, sheet=None: records[:1]
+
+    session = await liveIngestService.openSession("#1")
+    session.add([sample(0)])
+    assert not session.shouldFlush()
+    session.add([sample(1)])
+    assert session.shouldFlush()
+
+    update = await session.flush()
+    assert update["received"] == 2
+    assert update["inserted"] == 1
+    assert session.pending == []
+    liveIngestService.binsCollection.bulk_write.assert_called_once()
+    assert await session.flush() is None
+
+
+
+@pytest.mark.asyncio
+async def test_session_rolls_up_summary_and_pyramid_less_often(liveIngestService):
+    """Test stored rows reach the summary and pyramid per rollup, not per flush"""
+    liveIngestService.experimentsCollection.find_one.return_value = {"experimentId": "#1"}
+    cursor = MagicMock()
+    cursor.to_list = AsyncMock(return_value=[])
+    liveIngestService.binsCollection.find = MagicMock(return_value=cursor)
+    liveIngestService.dataCollection.find_one.return_value = None
+    liveIngestService.rollupRows = 4
+
+    def store(df, records, sheet=None):
+        sheet.pending.append(df)
+        return records
+    liveIngestService.migrationService.storeLinkedData.side_effect = store
+    finishSheet = liveIngestService.migrationService.finishSheet
+
+    session = await liveIngestService.openSession("#1")
+    for minutes in range(3):
+        session.add([sample(minutes)])
+        await session.flush()
+    finishSheet.assert_not_called()
+
+    session.add([sample(3)])
+    await session.flush()
+    sheet = finishSheet.call_args[0][0]
+    assert sheet.deferRollups and sheet.pendingRows == 4
+    assert session.sheet.pending == []
+
+    session.add([sample(4)])
+    await session.close()
+    assert finishSheet.call_count == 2
+    assert finishSheet.call_args[0][0].pendingRows == 1
+
+
+@pytest.mark.asyncio
+async def test_session_rejects_samples_without_valid_time(liveIngestService):
+    """Test invalid samples raise ValueError and nothing is buffered"""
+    liveIngestService.experimentsCollection.find_one.return_value = None
+    assert await liveIngestService.openSession("#1") is None
+
+    liveIngestService.experimentsCollection.find_one.return_value = {"experimentId": "#1"}
+    cursor = MagicMock()
+    cursor.to_list = AsyncMock(return_value=[])
+    liveIngestService.binsCollection.find = MagicMock(return_value=cursor)
+    liveIngestService.dataCollection.find_one.return_value = None
+    session = await liveIngestService.openSession("#1")
+
+    with pytest.raises(ValueError):
+        session.add([sample(0), {"Time": "yesterday"}])
+    assert session.pending == []
+
+
+@pytest.mark.asyncio
+async def test_efficiencies_follow_the_schema(liveIngestService):
+    """Test dropped columns are ignored and added ones read their default"""
+    liveIngestService.experimentsCollection.find_one.return_value = {
+        "experimentId": "#1", "Final volume (L) HCL": 1.5, "# of Stacks": 10,
+    }
+    bins = RunningBins(START)
+    delta = {}
+    for row in (sample(0), sample(6, uStack=5.0, c1=3.39), sample(11, current=0)):
+        bins.add(row, delta)
+    documents = [{"bin": index, "startTime": START, **increments} for index, increments in delta.items()]
+    cursor = MagicMock()
+    cursor.to_list = AsyncMock(return_value=documents)
+    liveIngestService.binsCollection.find = MagicMock(return_value=cursor)
+    assert (await liveIngestService.getEfficiencies("#1"))["Current Efficiency (HCl)"] > 0
+
+    # Compaction has not reached the document yet, but the column is gone
+    liveIngestService.configCollection.find_one.return_value = withoutColumn(
+        emptySchema(), "# of Stacks", START
+    )
+    assert (await liveIngestService.getEfficiencies("#1"))["Current Efficiency (HCl)"] is None
+
+    liveIngestService.configCollection.find_one.return_value = withColumn(
+        withoutColumn(emptySchema(), "# of Stacks", START), "Final volume (L) NaOH", 1.5
+    )
+    session = await liveIngestService.openSession("#1")
+    assert session.experiment["Final volume (L) NaOH"] == 1.5
+    assert "# of Stacks" not in session.experiment
@@ -0,0 +1,54 @@
+from types import SimpleNamespace
+
+from metrics import Counter, Histogram, MongoCommandListener, OPERATION_DURATION, timed
+import metrics
+
+
+def test_histogram_render():
+    """Test Histogram renders cumulative buckets, sum and count"""
+    histogram = Histogram("test_seconds", "Test histogram.", ("route",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, "/data")
+    histogram.observe(0.5, "/data")
+
+    lines = histogram.render()
+
+    assert 'test_seconds_bucket{route="/data",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{route="/data",le="1.0"} 2' in lines
+    assert 'test_seconds_bucket{route="/data",le="+Inf"} 2' in lines
+    assert 'test_seconds_count{route="/data"} 2' in lines
+
+
+def test_counter_escapes_labels():
+    """Test Counter escapes quotes in label values"""
+    counter = Counter("test_total", "Test counter.", ("name",))
+    counter.inc(3, 'say "hi"')
+
+    assert 'test_total{name="say \\"hi\\""} 3' in counter.render()
+
+
+def test_timed_decorator_records_duration():
+    """Test timed records one observation per decorated call"""
+    @timed("testOperation")
+    def work():
+        return 42
+
+    assert work() == 42
+    assert work() == 42
+    assert OPERATION_DURATION.series[("testOperation",)]["count"] == 2
+
+
+def test_mongo_listener_counts_documents(monkeypatch):
+    """Test MongoCommandListener records commands and returned documents"""
+    documents = Counter("docs_total", "Docs.", ("command", "collection"))
+    monkeypatch.setattr(metrics, "MONGO_DOCUMENTS_RETURNED", documents)
+    listener = MongoCommandListener()
+
+    listener.started(SimpleNamespace(
+        command={"find": "data"}, command_name="find", connection_id=1, request_id=7
+    ))
+    listener.succeeded(SimpleNamespace(
+        command_name="find", connection_id=1, request_id=7, duration_micros=1500,
+        reply={"cursor": {"firstBatch": [{}, {}, {}]}}
+    ))
+
+    assert documents.values[("find", "data")] == 3
@@ -1,9 +1,21 @@
+from datetime import timezone
+
 import pytest
 import pandas as pd
 import numpy as np
 from unittest.mock import patch, MagicMock, AsyncMock
 
-from services.migrationService import MigrationService
+from pymongo import ReplaceOne
+from pymongo.errors import OperationFailure
+
+from services.migrationService import (
+    MigrationResult,
+    MigrationService,
+    SheetImport,
+    UPSERT_DUPLICATES,
+    mergeHeaderRows,
+    toRecords,
+)
 
 @pytest.fixture
 def mock_motor_client():
@@ -20,12 +32,24 @@ def mock_motor_client():
             mock_experiments if x == "experiments" else mock_data
         )
 
+        # Motor's find is synchronous and returns a cursor
+        mock_rows = MagicMock()
+        mock_rows.to_list = AsyncMock(return_value=[])
+        mock_data.find = MagicMock(return_value=mock_rows)
+
         # Create a service with the mock
         service = MigrationService("mongodb://localhost:27017", "test_db")
 
         # Replace the collections with our mocks for easier access in tests
         service.experimentsCollection = mock_experiments
         service.dataSheetsCollection = mock_data
+        service.catalogCollection = AsyncMock()
+        service.dateIndexCollection = AsyncMock()
+        service.stagedSheetsCollection = AsyncMock()
+        service.stagedRowsCollection = AsyncMock()
+        service.dataSummariesCollection = AsyncMock()
+        service.revisionsCollection = AsyncMock()
+        service.dataPyramidsCollection = AsyncMock()
 
         # Add a close method to the mock client
         mock_client.return_value.close = MagicMock()
@@ -106,6 +130,54 @@ async def test_clean_data(mock_motor_client):
     assert 4 not in cleaned_df.index
 
 
+@pytest.mark.asyncio
+async def test_clean_data_keeps_dtypes(mock_motor_client):
+    """Test cleanData keeps numeric columns numeric and mixed columns intact"""
+    service, _, _ = mock_motor_client
+    df = pd.DataFrame(
+        {
+            "A": [1.5, np.nan, 0.0, 0.0],
+            "B": [1, 2, 0, 0],
+            "Notes": ["x", None, 0, "keep"],
+        }
+    )
+
+    cleaned_df = service.cleanData(df)
+
+    assert cleaned_df["A"].dtype == np.float64
+    assert cleaned_df["B"].dtype == np.int64
+    # Row 2 is zero in every column; row 3 has a note
+    assert list(cleaned_df.index) == [0, 1, 3]
+
+
+def test_to_records_converts_missing_values():
+    """Test toRecords emits None for NaN and NaT and keeps other values"""
+    df = pd.DataFrame(
+        {
+            "A": [1.5, np.nan],
+            "Time": pd.to_datetime(["2023-05-01 10:00", None]),
+            "B": [1, 2],
+        }
+    )
+
+    records = toRecords(df)
+
+    assert records[0] == {"A": 1.5, "Time": pd.Timestamp("2023-05-01 10:00"), "B": 1}
+    assert records[1] == {"A": None, "Time": None, "B": 2}
+    assert type(records[1]["B"]) is int
+
+
+def test_merge_header_rows_is_cached():
+    """Test two-row headers are merged once per header signature"""
+    header = (("#", "Unnamed: 0_level_1"), ("C1", "Cond"), ("Notes", "x"))
+    mergeHeaderRows.cache_clear()
+
+    assert mergeHeaderRows(header) == ("#", "C1 Cond", "Notes")
+    mergeHeaderRows(header)
+
+    assert mergeHeaderRows.cache_info().hits == 1
+
+
 @pytest.mark.asyncio
 async def test_is_exp_duplicate(mock_motor_client):
     """Test isExpDuplicate method returns correct boolean based on DB search"""
@@ -157,11 +229,12 @@ async def test_find_experiment_multiple_matches(mock_motor_client):
     )
     mock_experiments.find = MagicMock(return_value=mock_cursor)
 
-    result = await service.findExperiment("2023-05-01", "data1.xlsx")
+    migrationResult = MigrationResult()
+    result = await service.findExperiment("2023-05-01", "data1.xlsx", migrationResult)
     assert result is None
-    assert len(service.ambiguousData) == 1
-    assert service.ambiguousData[0]["dataId"] == "data1.xlsx"
-    assert service.ambiguousData[0]["matchingExp"] == ["exp1", "exp2"]
+    assert len(migrationResult.ambiguousData) == 1
+    assert migrationResult.ambiguousData[0]["dataId"] == "data1.xlsx"
+    assert migrationResult.ambiguousData[0]["matchingExp"] == ["exp1", "exp2"]
 
 
 @pytest.mark.asyncio
@@ -174,9 +247,10 @@ async def test_find_experiment_no_matches(mock_motor_client):
     mock_cursor.to_list = AsyncMock(return_value=[])
     mock_experiments.find = MagicMock(return_value=mock_cursor)
 
-    result = await service.findExperiment("2023-05-01", "data1.xlsx")
+    migrationResult = MigrationResult()
+    result = await service.findExperiment("2023-05-01", "data1.xlsx", migrationResult)
     assert result is None
-    assert len(service.ambiguousData) == 0
+    assert len(migrationResult.ambiguousData) == 0
 
 
 @pytest.mark.asyncio
@@ -251,14 +325,23 @@ async def test_import_data_sheet_with_match(mock_motor_client, sample_data_df):
                     ]
                     mock_link_data.return_value = sample_records
 
-                    # Mock insert_many to avoid actual DB insertion
-                    mock_data.insert_many = AsyncMock()
+                    # Mock bulk_write to avoid actual DB insertion
+                    mock_data.bulk_write = AsyncMock(
+                        return_value=MagicMock(upserted_ids={0: "a", 1: "b"})
+                    )
 
                     # Call the method
-                    await service.importDataSheet("test_data.xlsx")
+                    result = await service.importDataSheet("test_data.xlsx")
 
-                    # Verify correct data was sent to insert_many
-                    mock_data.insert_many.assert_called_once_with(sample_records)
+                    # Verify each record was upserted on its row key
+                    operations = mock_data.bulk_write.call_args[0][0]
+                    assert [op._filter for op in operations] == [
+                        {"experimentId": "matched_experiment_id", "dataSheetId": "data1"},
+                        {"experimentId": "matched_experiment_id", "dataSheetId": "data2"},
+                    ]
+                    assert operations[0]._doc == {"$setOnInsert": sample_records[0]}
+                    assert mock_data.bulk_write.call_args[1] == {"ordered": False}
+                    assert result == sample_records
 
 
 @pytest.mark.asyncio
@@ -295,10 +378,15 @@ async def test_migrate(mock_motor_client):
         with patch.object(
             service, "importDataSheet", new_callable=AsyncMock
         ) as mock_import_data:
-            # Set up ambiguous data for return
-            service.ambiguousData = [
-                {"dataId": "data1.xlsx", "matchingExp": ["exp1", "exp2"]}
-            ]
+            # Record an ambiguous link for the first data sheet
+            async def importData(path, migrationResult):
+                if path == "data1.xlsx":
+                    migrationResult.ambiguousData.append(
+                        {"dataId": path, "matchingExp": ["exp1", "exp2"]}
+                    )
+                return None
+
+            mock_import_data.side_effect = importData
 
             # Call migrate with sample file paths
             exp_paths = ["exp1.xlsx", "exp2.xlsx"]
@@ -311,12 +399,413 @@ async def test_migrate(mock_motor_client):
             mock_import_exp.assert_any_call("exp2.xlsx")
 
             assert mock_import_data.call_count == 2
-            mock_import_data.assert_any_call("data1.xlsx")
-            mock_import_data.assert_any_call("data2.xlsx")
+            mock_import_data.assert_any_call("data1.xlsx", result)
+            mock_import_data.assert_any_call("data2.xlsx", result)
 
             # Verify ambiguous data was returned
-            assert len(result) == 1
-            assert result[0]["dataId"] == "data1.xlsx"
+            assert len(result.ambiguousData) == 1
+            assert result.ambiguousData[0]["dataId"] == "data1.xlsx"
+
+
+@pytest.mark.asyncio
+async def test_migrate_results_are_per_call(mock_motor_client):
+    """Test concurrent migrate calls do not share ambiguous links"""
+    service, _, _ = mock_motor_client
+
+    async def importData(path, migrationResult):
+        migrationResult.ambiguousData.append({"dataId": path, "matchingExp": []})
+
+    with patch.object(service, "importDataSheet", side_effect=importData):
+        first = await service.migrate(dataFilePaths=["data1.xlsx"])
+        second = await service.migrate(dataFilePaths=["data2.xlsx"])
+
+    assert [d["dataId"] for d in first.ambiguousData] == ["data1.xlsx"]
+    assert [d["dataId"] for d in second.ambiguousData] == ["data2.xlsx"]
+
+
+@pytest.mark.asyncio
+async def test_import_data_sheet_streaming(mock_motor_client, sample_data_df):
+    """Test importDataSheetStreaming links and inserts each chunk"""
+    service, _, mock_data = mock_motor_client
+    chunks = [sample_data_df.iloc[:2].copy(), sample_data_df.iloc[2:].copy()]
+
+    async def upsertAll(operations, ordered):
+        return MagicMock(upserted_ids={i: i for i in range(len(operations))})
+
+    mock_data.bulk_write = AsyncMock(side_effect=upsertAll)
+
+    with patch(
+        "services.migrationService.iterSheetChunks", return_value=iter(chunks)
+    ):
+        with patch.object(
+            service, "findExperiment", new_callable=AsyncMock
+        ) as mock_find_exp:
+            mock_find_exp.return_value = "matched_experiment_id"
+            inserted = await service.importDataSheetStreaming("large.xlsx")
+
+    assert inserted == len(sample_data_df)
+    assert mock_data.bulk_write.call_count == 2
+    mock_find_exp.assert_called_once()
+    secondChunk = mock_data.bulk_write.call_args_list[1][0][0]
+    assert all(op._filter["experimentId"] == "matched_experiment_id" for op in secondChunk)
+
+
+@pytest.mark.asyncio
+async def test_import_data_sheet_streaming_counts_duplicate_rows(mock_motor_client, sample_data_df):
+    """Test rows of a re-imported sheet are reported as duplicates"""
+    service, _, mock_data = mock_motor_client
+    mock_data.bulk_write = AsyncMock(return_value=MagicMock(upserted_ids={}))
+    result = MigrationResult()
+
+    with patch(
+        "services.migrationService.iterSheetChunks", return_value=iter([sample_data_df.copy()])
+    ):
+        with patch.object(
+            service, "findExperiment", new_callable=AsyncMock, return_value="matched_experiment_id"
+        ):
+            inserted = await service.importDataSheetStreaming("large.xlsx", result)
+
+    assert inserted == 0
+    assert result.duplicateRows == len(sample_data_df)
+
+
+@pytest.mark.asyncio
+async def test_import_linked_data_sheet_renames_duplicate_columns(mock_motor_client):
+    """Test a manually linked sheet keeps both of its repeated columns, as other imports do"""
+    service, _, mock_data = mock_motor_client
+    df = pd.DataFrame(
+        [["2025/01/01 10:00:00", 7.0, 7.5], ["2025/01/01 10:01:00", 8.0, 8.5]],
+        columns=["Time", "pH", "pH"],
+    )
+
+    async def upsertAll(operations, ordered):
+        return MagicMock(upserted_ids={i: i for i in range(len(operations))})
+
+    mock_data.bulk_write = AsyncMock(side_effect=upsertAll)
+
+    with patch("services.migrationService.readSheet", return_value=df):
+        inserted = await service.importLinkedDataSheet("linked.csv", "exp1")
+
+    assert inserted == 2
+    document = mock_data.bulk_write.call_args[0][0][0]._doc["$setOnInsert"]
+    assert document["pH"] == 7.0
+    assert document["pH (1)"] == 7.5
+
+
+@pytest.mark.asyncio
+async def test_insert_records_skips_existing_rows(mock_motor_client):
+    """Test insertRecords returns only the rows that were new"""
+    service, _, mock_data = mock_motor_client
+    records = [
+        {"experimentId": "exp1", "dataSheetId": "#1"},
+        {"experimentId": "exp1", "dataSheetId": "#1"},
+        {"experimentId": "exp1", "dataSheetId": "#2"},
+        {"experimentId": "exp1", "dataSheetId": "#3"},
+    ]
+    # Only the third operation (record 3) was an insert
+    mock_data.bulk_write = AsyncMock(return_value=MagicMock(upserted_ids={2: "x"}))
+
+    positions = await service.insertRecords(records)
+
+    assert len(mock_data.bulk_write.call_args[0][0]) == 3
+    assert positions == [3]
+
+
+@pytest.mark.asyncio
+async def test_insert_records_upsert_mode(mock_motor_client):
+    """Test insertRecords replaces stored rows in upsert mode"""
+    service, _, mock_data = mock_motor_client
+    service.importMode = UPSERT_DUPLICATES
+    record = {"experimentId": "exp1", "dataSheetId": "#1", "pH": 7}
+    mock_data.bulk_write = AsyncMock(return_value=MagicMock(upserted_ids={}))
+
+    assert await service.insertRecords([record]) == []
+    operation = mock_data.bulk_write.call_args[0][0][0]
+    assert isinstance(operation, ReplaceOne)
+    assert operation._doc == record
+
+
+@pytest.mark.asyncio
+async def test_store_linked_data_merges_new_rows_into_summary(mock_motor_client):
+    """Test only new rows are merged into the data summary"""
+    service, _, mock_data = mock_motor_client
+    df = pd.DataFrame({"#": [1, 2], "Time": ["2025/01/01 10:00:00", "2025/01/01 10:01:00"], "pH": [7.0, 8.0]})
+    records = await service.linkData(df, "exp1")
+    mock_data.bulk_write = AsyncMock(return_value=MagicMock(upserted_ids={1: "x"}))
+
+    await service.storeLinkedData(df, records)
+
+    operations = service.dataSummariesCollection.bulk_write.call_args[0][0]
+    assert operations[0]._doc["$inc"] == {"sampleCount": 1}
+    assert operations[1]._doc["$inc"]["sum"] == 8.0
+
+
+@pytest.mark.asyncio
+async def test_store_linked_data_bumps_data_revision_only_on_change(mock_motor_client):
+    """Test conditional reads of data are invalidated only when rows change"""
+    service, _, mock_data = mock_motor_client
+    df = pd.DataFrame({"#": [1, 2], "Time": ["2025/01/01 10:00:00", "2025/01/01 10:01:00"], "pH": [7.0, 8.0]})
+    records = await service.linkData(df, "exp1")
+
+    mock_data.bulk_write = AsyncMock(return_value=MagicMock(upserted_ids={}))
+    await service.storeLinkedData(df, records)
+    service.revisionsCollection.bulk_write.assert_not_called()
+
+    mock_data.bulk_write = AsyncMock(return_value=MagicMock(upserted_ids={0: "x"}))
+    await service.storeLinkedData(df, records)
+    operations = service.revisionsCollection.bulk_write.call_args[0][0]
+    assert [operation._filter for operation in operations] == [{"_id": "data"}]
+
+
+@pytest.mark.asyncio
+async def test_replaced_rows_refresh_summary_once_per_sheet(mock_motor_client):
+    """Test chunks replacing rows defer the summary refresh to the end of the sheet"""
+    service, _, mock_data = mock_motor_client
+    service.importMode = UPSERT_DUPLICATES
+    service.refreshDataSummary = AsyncMock()
+    service.refreshPyramid = AsyncMock()
+    df = pd.DataFrame({"#": [1, 2], "Time": ["2025/01/01 10:00:00", "2025/01/01 10:01:00"], "pH": [7.0, 8.0]})
+    records = await service.linkData(df, "exp1")
+    mock_data.bulk_write = AsyncMock(return_value=MagicMock(upserted_ids={}))
+
+    sheet = SheetImport("exp1")
+    for _ in range(3):
+        await service.storeLinkedData(df, records, sheet)
+    service.refreshDataSummary.assert_not_called()
+
+    await service.finishSheet(sheet)
+    service.refreshDataSummary.assert_called_once_with("exp1")
+    assert sheet.replaced and sheet.inserted == 0
+
+
+@pytest.mark.asyncio
+async def test_store_linked_data_appends_new_rows_to_pyramid(mock_motor_client):
+    """Test new rows are merged into the pyramid unless the sheet replaced rows"""
+    service, _, mock_data = mock_motor_client
+    service.appendToPyramid = AsyncMock()
+    df = pd.DataFrame({"#": [1, 2], "Time": ["2025/01/01 10:00:00", "2025/01/01 10:01:00"], "pH": [7.0, 8.0]})
+    records = await service.linkData(df, "exp1")
+    mock_data.bulk_write = AsyncMock(return_value=MagicMock(upserted_ids={0: "x", 1: "y"}))
+
+    await service.storeLinkedData(df, records, SheetImport("exp1"))
+    assert service.appendToPyramid.call_args[0][0] == "exp1"
+    assert len(service.appendToPyramid.call_args[0][1]) == 2
+
+    service.appendToPyramid.reset_mock()
+    await service.storeLinkedData(df, records, SheetImport("exp1", replaced=True))
+    service.appendToPyramid.assert_not_called()
+
+
+
+@pytest.mark.asyncio
+async def test_deferred_rollups_merge_rows_at_finish(mock_motor_client):
+    """Test a sheet deferring rollups merges all its new rows into the summary and pyramid once"""
+    service, _, mock_data = mock_motor_client
+    service.updateDataSummary = AsyncMock()
+    service.appendToPyramid = AsyncMock()
+    df = pd.DataFrame({"#": [1, 2], "Time": ["2025/01/01 10:00:00", "2025/01/01 10:01:00"], "pH": [7.0, 8.0]})
+    records = await service.linkData(df, "exp1")
+    mock_data.bulk_write = AsyncMock(return_value=MagicMock(upserted_ids={0: "x"}))
+
+    sheet = SheetImport("exp1", deferRollups=True)
+    for _ in range(3):
+        await service.storeLinkedData(df, records, sheet)
+    service.updateDataSummary.assert_not_called()
+    service.appendToPyramid.assert_not_called()
+    assert sheet.pendingRows == 3
+
+    await service.finishSheet(sheet)
+    assert len(service.updateDataSummary.call_args[0][1]) == 3
+    assert len(service.appendToPyramid.call_args[0][1]) == 3
+
+
+@pytest.mark.asyncio
+async def test_link_data_fallback_ids_are_deterministic(mock_motor_client):
+    """Test rows without '#' and 'Time' get the same ID on every import"""
+    service, _, _ = mock_motor_client
+    df = pd.DataFrame({"pH": [7.0, 7.1], "Temp": [20, 21]})
+
+    first = await service.linkData(df, "exp1")
+    second = await service.linkData(df, "exp1")
+
+    assert [r["dataSheetId"] for r in first] == [r["dataSheetId"] for r in second]
+    assert first[0]["dataSheetId"] != first[1]["dataSheetId"]
+    assert first[0]["dataSheetId"].startswith("DATA-")
+
+
+@pytest.mark.asyncio
+async def test_link_data_keeps_identical_rows(mock_motor_client):
+    """Test identical rows without '#' and 'Time' get distinct IDs by position"""
+    service, _, _ = mock_motor_client
+    df = pd.DataFrame({"pH": [7.0, 7.0], "Temp": [20, 20]})
+
+    records = await service.linkData(df, "exp1")
+    nextChunk = await service.linkData(df, "exp1", firstRow=2)
+
+    ids = [r["dataSheetId"] for r in records + nextChunk]
+    assert len(set(ids)) == 4
+    assert ids[0].endswith("-0") and ids[3].endswith("-3")
+
+
+@pytest.mark.asyncio
+async def test_link_data_without_position_identifies_rows_by_value(mock_motor_client):
+    """Test rows linked without a position, as live samples are, collapse when identical"""
+    service, _, _ = mock_motor_client
+    df = pd.DataFrame({"pH": [7.0, 7.0], "Temp": [20, 20]})
+
+    records = await service.linkData(df, "exp1", firstRow=None)
+
+    assert records[0]["dataSheetId"] == records[1]["dataSheetId"]
+
+
+@pytest.mark.asyncio
+async def test_ensure_data_indexes_dedupes_rows_blocking_unique_index(mock_motor_client):
+    """Test duplicate rows are removed when they block the unique data index"""
+    service, _, mock_data = mock_motor_client
+    mock_data.create_index.side_effect = [OperationFailure("E11000 duplicate key"), None]
+    groups = MagicMock()
+    groups.to_list = AsyncMock(return_value=[
+        {"_id": {"experimentId": "exp1", "dataSheetId": "#1 t"}, "ids": ["a", "b", "c"], "count": 3},
+    ])
+    mock_data.aggregate = MagicMock(return_value=groups)
+    mock_data.delete_many.return_value = MagicMock(deleted_count=2)
+
+    with patch.object(service, "refreshDataSummary", new=AsyncMock()) as refreshSummary:
+        with patch.object(service, "refreshPyramid", new=AsyncMock()) as refreshPyramid:
+            await service.ensureDataIndexes()
+
+    mock_data.delete_many.assert_awaited_once_with({"_id": {"$in": ["b", "c"]}})
+    assert mock_data.create_index.await_count == 2
+    refreshSummary.assert_awaited_once_with("exp1")
+    refreshPyramid.assert_awaited_once_with("exp1")
+
+
+@pytest.mark.asyncio
+async def test_ensure_data_indexes_fails_when_index_still_cannot_be_created(mock_motor_client):
+    """Test startup fails rather than running without the unique data index"""
+    service, _, mock_data = mock_motor_client
+    mock_data.create_index.side_effect = OperationFailure("index build failed")
+    groups = MagicMock()
+    groups.to_list = AsyncMock(return_value=[])
+    mock_data.aggregate = MagicMock(return_value=groups)
+
+    with pytest.raises(OperationFailure):
+        await service.ensureDataIndexes()
+
+
+@pytest.mark.asyncio
+async def test_import_data_sheet_stages_ambiguous_sheet(mock_motor_client, sample_data_df):
+    """Test an ambiguous data sheet is staged under a token instead of skipped"""
+    service, _, mock_data = mock_motor_client
+
+    async def ambiguous(date, dataId, result):
+        result.ambiguousData.append({"dataId": dataId, "matchingExp": ["exp1", "exp2"]})
+        return None
+
+    migrationResult = MigrationResult()
+    with patch("pandas.read_excel", return_value=sample_data_df):
+        with patch.object(service, "findExperiment", side_effect=ambiguous):
+            result = await service.importDataSheet("test_data.xlsx", migrationResult)
+
+    assert result is None
+    token = migrationResult.ambiguousData[0]["token"]
+    stagedSheet = service.stagedSheetsCollection.insert_one.call_args[0][0]
+    assert stagedSheet["_id"] == token
+    assert stagedSheet["matchingExp"] == ["exp1", "exp2"]
+    stagedRows = service.stagedRowsCollection.insert_many.call_args[0][0]
+    assert stagedRows[0]["token"] == token
+    assert len(stagedRows[0]["rows"]) == len(sample_data_df)
+    mock_data.bulk_write.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_staged_documents_expire_from_utc_times(mock_motor_client):
+    """Test staged sheets and rows store timezone-aware UTC times for the TTL index"""
+    service, _, _ = mock_motor_client
+
+    token = await service.stageSheet({"dataId": "run.xlsx", "matchingExp": ["exp1", "exp2"]})
+    await service.stageRows(token, pd.DataFrame({"pH": [7.0]}))
+
+    sheet = service.stagedSheetsCollection.insert_one.await_args.args[0]
+    rows = service.stagedRowsCollection.insert_many.await_args.args[0]
+    assert sheet["createdAt"].tzinfo == timezone.utc
+    assert rows[0]["createdAt"].tzinfo == timezone.utc
+
+
+@pytest.mark.asyncio
+async def test_resolve_staged_sheet(mock_motor_client):
+    """Test resolveStagedSheet links staged rows and clears the staging"""
+    service, _, mock_data = mock_motor_client
+    service.stagedSheetsCollection.find_one = AsyncMock(
+        return_value={"_id": "tok", "dataId": "data1.xlsx", "matchingExp": ["exp1", "exp2"]}
+    )
+    cursor = MagicMock()
+    cursor.__aiter__.return_value = [
+        {"token": "tok", "chunk": 0, "rows": [{"#": 1, "Time": "10:00", "pH": 7.0}]},
+        {"token": "tok", "chunk": 1, "rows": [{"#": 2, "Time": "10:05", "pH": None}]},
+    ]
+    service.stagedRowsCollection.find = MagicMock(
+        return_value=MagicMock(sort=MagicMock(return_value=cursor))
+    )
+    mock_data.bulk_write = AsyncMock(return_value=MagicMock(upserted_ids={0: "a"}))
+
+    inserted = await service.resolveStagedSheet("tok", "exp2")
+
+    assert inserted == 2
+    operations = mock_data.bulk_write.call_args_list[1][0][0]
+    assert operations[0]._doc["$setOnInsert"]["experimentId"] == "exp2"
+    assert operations[0]._doc["$setOnInsert"]["pH"] is None
+    service.stagedRowsCollection.delete_many.assert_called_once_with({"token": "tok"})
+    service.stagedSheetsCollection.delete_one.assert_called_once_with({"_id": "tok"})
+
+
+@pytest.mark.asyncio
+async def test_resolve_staged_sheet_rejects_other_experiments(mock_motor_client):
+    """Test resolveStagedSheet only links to a candidate experiment"""
+    service, _, _ = mock_motor_client
+    service.stagedSheetsCollection.find_one = AsyncMock(
+        return_value={"_id": "tok", "dataId": "data1.xlsx", "matchingExp": ["exp1", "exp2"]}
+    )
+
+    with pytest.raises(ValueError):
+        await service.resolveStagedSheet("tok", "exp3")
+
+    service.stagedSheetsCollection.find_one = AsyncMock(return_value=None)
+    assert await service.resolveStagedSheet("missing", "exp1") is None
+
+
+@pytest.mark.asyncio
+async def test_ensure_date_index_rebuilds_empty_index(mock_motor_client):
+    """Test ensureDateIndex bootstraps an empty date index from the experiments"""
+    service, mock_experiments, _ = mock_motor_client
+    service.dateIndexCollection.estimated_document_count.return_value = 0
+    mock_experiments.estimated_document_count.return_value = 2
+    cursor = MagicMock()
+    cursor.to_list = AsyncMock(return_value=[
+        {"experimentId": "#1 2023-05-01", "Date": "2023-05-01"},
+        {"experimentId": "#2 2023-05-02", "Date": "2023-05-02"},
+    ])
+    mock_experiments.find = MagicMock(return_value=cursor)
+
+    await service.ensureDateIndex()
+
+    operations = service.dateIndexCollection.bulk_write.await_args.args[0]
+    assert [op._filter for op in operations[:2]] == [
+        {"_id": "2023-05-01"}, {"_id": "2023-05-02"}
+    ]
+    service.revisionsCollection.bulk_write.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_ensure_date_index_keeps_existing_index(mock_motor_client):
+    """Test ensureDateIndex leaves a populated date index alone"""
+    service, mock_experiments, _ = mock_motor_client
+    service.dateIndexCollection.estimated_document_count.return_value = 3
+    mock_experiments.estimated_document_count.return_value = 2
+
+    await service.ensureDateIndex()
+
+    service.dateIndexCollection.bulk_write.assert_not_awaited()
 
 
 @pytest.mark.asyncio
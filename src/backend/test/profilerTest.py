@@ -0,0 +1,110 @@
+import sys
+import threading
+import time
+from collections import Counter
+
+from profiling.profiler import (
+    ProfileStore,
+    StackSampler,
+    isProfileRequested,
+    toCollapsed,
+    toSpeedscope,
+)
+
+
+def sample_profile():
+    return {
+        "id": "abc",
+        "method": "POST",
+        "path": "/calculate-efficiencies",
+        "intervalMs": 1.0,
+        "samples": Counter({
+            (("handler", "/app/router.py", 10), ("groupData", "/app/calc.py", 40)): 3,
+            (("handler", "/app/router.py", 10),): 1,
+        }),
+    }
+
+
+def test_to_collapsed():
+    """Test toCollapsed emits one semicolon-joined stack per line with counts"""
+    lines = toCollapsed(sample_profile()).splitlines()
+
+    assert "handler (router.py:10);groupData (calc.py:40) 3" in lines
+    assert "handler (router.py:10) 1" in lines
+
+
+def test_to_speedscope():
+    """Test toSpeedscope shares frames and weights samples by interval"""
+    document = toSpeedscope(sample_profile())
+
+    frames = document["shared"]["frames"]
+    profile = document["profiles"][0]
+    assert [frame["name"] for frame in frames] == ["handler", "groupData"]
+    assert profile["samples"] == [[0, 1], [0]]
+    assert profile["weights"] == [3.0, 1.0]
+    assert profile["endValue"] == 4.0
+
+
+def test_profile_store_is_bounded():
+    """Test ProfileStore keeps only the most recent profiles"""
+    store = ProfileStore(size=2)
+    for profileId in ("a", "b", "c"):
+        store.add({"id": profileId, "samples": Counter()})
+
+    assert [profile["id"] for profile in store.list()] == ["c", "b"]
+    assert store.get("a") is None
+    assert "samples" not in store.list()[0]
+
+
+def test_stack_sampler_captures_thread():
+    """Test StackSampler records stacks of the sampled thread"""
+    def busyWork():
+        end = time.perf_counter() + 0.1
+        while time.perf_counter() < end:
+            pass
+
+    sampler = StackSampler(threading.get_ident(), interval=0.001)
+    sampler.start()
+    busyWork()
+    samples = sampler.stop()
+
+    assert samples
+    assert any(frame[0] == "busyWork" for stack in samples for frame in stack)
+
+
+def busyFor(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_stack_sampler_keeps_only_stacks_under_root_frame():
+    """Test a rooted sampler ignores work on the thread outside the root frame"""
+    def profiledRequest():
+        sampler = StackSampler(threading.get_ident(), interval=0.001, rootFrame=sys._getframe())
+        sampler.start()
+        busyFor(0.05)
+        return sampler
+
+    def otherRequest():
+        busyFor(0.05)
+
+    sampler = profiledRequest()
+    otherRequest()
+    samples = sampler.stop()
+
+    frames = {frame[0] for stack in samples for frame in stack}
+    assert "profiledRequest" in frames
+    assert "otherRequest" not in frames
+
+
+def test_profile_requested_by_exact_query_parameter():
+    """Test only profile=1 itself, not similar parameters, requests a profile"""
+    def scope(query):
+        return {"headers": [], "query_string": query}
+
+    assert isProfileRequested(scope(b"profile=1"))
+    assert isProfileRequested(scope(b"a=2&profile=1"))
+    assert not isProfileRequested(scope(b"myprofile=1"))
+    assert not isProfileRequested(scope(b"profile=10"))
+    assert isProfileRequested({"headers": [(b"x-profile", b"1")], "query_string": b""})
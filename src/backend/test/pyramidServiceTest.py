@@ -0,0 +1,206 @@
+import numpy as np
+import pandas as pd
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from pymongo import InsertOne, ReplaceOne
+
+from services.pyramidService import (
+    CHUNK_BUCKETS,
+    MAX_LEVEL,
+    appendToPyramid,
+    assembleTile,
+    batchDocuments,
+    buildLevels,
+    chooseLevel,
+    concatenate,
+    describePyramid,
+    epochSeconds,
+    levelRange,
+    mergeDocuments,
+    mergeIntoPyramid,
+    rebuildPyramid,
+    tileQuery,
+)
+
+
+def dataFrame(count, stepSeconds=1):
+    times = pd.date_range("2025-01-01 10:00:00", periods=count, freq=f"{stepSeconds}s")
+    return pd.DataFrame({
+        "experimentId": "#1",
+        "Time": times.strftime("%Y/%m/%d %H:%M:%S"),
+        "U Stac": np.arange(count, dtype=float),
+        "Notes": "run",
+    })
+
+
+def test_level_range_follows_sampling_interval_and_span():
+    """Test the finest level matches the median interval and the coarsest spans the run"""
+    seconds = epochSeconds(dataFrame(100, stepSeconds=4)["Time"])
+    assert levelRange(seconds) == (2, 9)
+
+
+def test_build_levels_merges_each_level_from_the_one_below():
+    """Test every level keeps the count, mean, min and max of its buckets"""
+    seconds = np.array([0, 1, 2, 3, 4, np.nan], dtype=float)
+    values = np.array([1, 5, 2, np.nan, 7, 9], dtype=float)
+
+    levels = {level[0]: level[1:] for level in buildLevels(seconds, values, 0, 3)}
+
+    buckets, counts, sums, mins, maxs = levels[1]
+    assert buckets.tolist() == [0, 1, 2]
+    assert counts.tolist() == [2, 1, 1]
+    assert mins.tolist() == [1, 2, 7] and maxs.tolist() == [5, 2, 7]
+    buckets, counts, sums, mins, maxs = levels[3]
+    assert buckets.tolist() == [0]
+    assert counts.tolist() == [4] and sums.tolist() == [15]
+
+
+def test_batch_documents_hold_numeric_attributes_at_every_level():
+    """Test a batch yields chunks of numeric columns only, from the finest level to the last"""
+    documents, attributes, start, end = batchDocuments("#1", "g1", dataFrame(3 * CHUNK_BUCKETS), 0)
+
+    assert attributes == ["U Stac"]
+    assert end - start == 3 * CHUNK_BUCKETS - 1
+    assert {document["attribute"] for document in documents} == {"U Stac"}
+    assert {document["generation"] for document in documents} == {"g1"}
+    assert {document["level"] for document in documents} == set(range(MAX_LEVEL + 1))
+    finest = [document for document in documents if document["level"] == 0]
+    assert sum(len(document["buckets"]) // 8 for document in finest) == 3 * CHUNK_BUCKETS
+
+
+def test_batch_documents_without_times():
+    """Test a batch without parseable times yields nothing"""
+    assert batchDocuments("#1", "g1", pd.DataFrame({"Time": ["bad"], "U Stac": [1.0]}), 0) is None
+
+
+def test_merge_documents_matches_building_at_once():
+    """Test merging the chunks of two batches equals the chunks of both rows together"""
+    df = dataFrame(100)
+    df.loc[10, "U Stac"] = -50.0
+
+    def chunksOf(frame):
+        documents = batchDocuments("#1", "g1", frame, 0)[0]
+        return {document["_id"]: document for document in documents}
+
+    whole = chunksOf(df)
+    merged = chunksOf(df.iloc[:37])
+    for documentId, document in chunksOf(df.iloc[37:]).items():
+        merged[documentId] = mergeDocuments(merged.get(documentId), document)
+
+    assert merged.keys() == whole.keys()
+    for documentId, document in whole.items():
+        for field in ("buckets", "count", "min", "max"):
+            assert concatenate([merged[documentId]], field).tolist() == concatenate([document], field).tolist()
+        np.testing.assert_allclose(concatenate([merged[documentId]], "mean"), concatenate([document], "mean"))
+
+
+def test_choose_level_fits_the_pixel_width():
+    """Test the level has buckets no wider than a pixel, within the built levels"""
+    pyramid = {"finestLevel": 1, "coarsestLevel": 12}
+
+    assert chooseLevel(0, 3600, 100, pyramid) == 5
+    assert chooseLevel(0, 60, 1000, pyramid) == 1
+    assert chooseLevel(0, 10 ** 7, 10, pyramid) == 12
+
+
+def test_tile_returns_window_of_the_chosen_level():
+    """Test a tile reads the overlapping chunks and keeps the buckets in the window"""
+    documents, attributes, start, end = batchDocuments("#1", "g1", dataFrame(4000), 0)
+    pyramid = describePyramid("#1", "g1", attributes, 0, start, end)
+    start = pyramid["start"] + 100
+    end = start + 63
+
+    query = tileQuery(pyramid, ["U Stac"], 2, start, end)
+    assert query["generation"] == "g1"
+    matching = [
+        document for document in documents
+        if document["level"] == 2
+        and query["chunk"]["$gte"] <= document["chunk"] <= query["chunk"]["$lte"]
+    ]
+    series = assembleTile(matching, ["U Stac"], 2, start, end)["U Stac"]
+
+    assert series["Time"][0] == "2025/01/01 10:01:40"
+    assert len(series["Time"]) == 16
+    assert series["count"] == [4] * 16
+    assert series["mean"][0] == 101.5
+    assert series["min"][0] == 100 and series["max"][0] == 103
+
+
+def mockCursor(batches):
+    cursor = MagicMock()
+    cursor.to_list = AsyncMock(side_effect=batches)
+    cursor.batch_size.return_value = cursor
+    return cursor
+
+
+@pytest.mark.asyncio
+async def test_merge_into_pyramid_retries_chunks_changed_concurrently():
+    """Test a chunk another writer replaced meanwhile is read and merged again"""
+    documents = batchDocuments("#1", "g1", dataFrame(2), 0)[0][:1]
+    documentId = documents[0]["_id"]
+    stored = {**documents[0], "writer": "other"}
+    collection = AsyncMock()
+    writers = []
+
+    def find(query, projection=None):
+        if projection is None:
+            return mockCursor([[stored]])
+        # The first write lost the race; the second one is found
+        return mockCursor([[{"_id": documentId}] if len(writers) > 1 else []])
+
+    async def bulkWrite(operations, ordered):
+        writers.append(operations[0]._doc["writer"])
+
+    collection.find = MagicMock(side_effect=find)
+    collection.bulk_write = AsyncMock(side_effect=bulkWrite)
+
+    await mergeIntoPyramid(collection, documents)
+
+    operation = collection.bulk_write.call_args[0][0][0]
+    assert isinstance(operation, ReplaceOne)
+    assert operation._filter == {"_id": documentId, "writer": "other"}
+    assert concatenate([operation._doc], "count").tolist() == [2, 2]
+    assert len(writers) == 2
+
+
+@pytest.mark.asyncio
+async def test_rebuild_switches_generation_before_removing_old_chunks():
+    """Test a rebuild reads rows in batches and only drops old chunks after the swap"""
+    collection = AsyncMock()
+    # Nothing is stored yet, and every write is found afterwards
+    collection.find = MagicMock(side_effect=lambda query, projection=None: mockCursor(
+        [[]] if projection is None else [[{"_id": documentId} for documentId in query["_id"]["$in"]]]
+    ))
+    rows = dataFrame(6).drop(columns="experimentId").to_dict("records")
+    dataCollection = MagicMock()
+    dataCollection.find.return_value = mockCursor([rows[:3], rows[3:], []])
+    calls = []
+    collection.replace_one = AsyncMock(side_effect=lambda *args, **kwargs: calls.append("swap"))
+    collection.delete_many = AsyncMock(side_effect=lambda *args: calls.append("cleanup"))
+
+    await rebuildPyramid(collection, dataCollection, "#1", batchRows=3)
+
+    assert calls == ["swap", "cleanup"]
+    description = collection.replace_one.call_args[0][1]
+    assert (description["start"], description["end"]) == (
+        epochSeconds(["2025/01/01 10:00:00"])[0], epochSeconds(["2025/01/01 10:00:05"])[0]
+    )
+    assert collection.bulk_write.await_count == 2
+    assert isinstance(collection.bulk_write.call_args_list[0][0][0][0], InsertOne)
+    cleanup = collection.delete_many.call_args[0][0]
+    assert cleanup["generation"] == {"$ne": description["generation"]}
+
+
+@pytest.mark.asyncio
+async def test_append_without_generation_rebuilds():
+    """Test rows for an experiment without a current pyramid rebuild it from all rows"""
+    collection = AsyncMock()
+    collection.find_one.return_value = {"_id": "#1", "finestLevel": 0}
+    dataCollection = MagicMock()
+    dataCollection.find.return_value = mockCursor([[]])
+
+    await appendToPyramid(collection, dataCollection, "#1", dataFrame(3))
+
+    dataCollection.find.assert_called_once()
+    collection.find_one_and_update.assert_not_called()
@@ -0,0 +1,138 @@
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from services.eventBus import EventBus, UPDATE
+from services.revisionService import (
+    RevisionService,
+    buildRevisionUpdates,
+    combineRevisions,
+)
+
+STARTED_AT = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def revisionDocument(collection, sequence, epoch="e1", changedAt=datetime(2025, 1, 2)):
+    return {"_id": collection, "epoch": epoch, "sequence": sequence, "changedAt": changedAt}
+
+
+def test_build_revision_updates_bumps_each_collection_once():
+    """Test each collection's revision is incremented and created on first write"""
+    operations = buildRevisionUpdates(["experiments", "experimentDates", "experiments"])
+
+    assert [operation._filter for operation in operations] == [
+        {"_id": "experimentDates"}, {"_id": "experiments"}
+    ]
+    update = operations[0]._doc
+    assert update["$inc"] == {"sequence": 1}
+    assert update["$currentDate"] == {"changedAt": True}
+    assert "epoch" in update["$setOnInsert"]
+    assert operations[0]._upsert
+
+
+def test_combine_revisions_changes_with_any_collection():
+    """Test the revision follows every collection and the latest change time"""
+    documents = [revisionDocument("experiments", 3), revisionDocument("config", 1)]
+    revision, changedAt = combineRevisions(documents, ["experiments", "config"], STARTED_AT)
+
+    assert revision == combineRevisions(list(reversed(documents)), ["config", "experiments"], STARTED_AT)[0]
+    assert changedAt == datetime(2025, 1, 2, tzinfo=timezone.utc)
+
+    bumped = [revisionDocument("experiments", 4), revisionDocument("config", 1)]
+    assert combineRevisions(bumped, ["experiments", "config"], STARTED_AT)[0] != revision
+    # A revisions collection recreated from scratch does not repeat old tags
+    recreated = [revisionDocument("experiments", 3, epoch="e2"), revisionDocument("config", 1)]
+    assert combineRevisions(recreated, ["experiments", "config"], STARTED_AT)[0] != revision
+
+
+def test_combine_revisions_of_unchanged_collections():
+    """Test collections never written are at revision 0, as of startup"""
+    revision, changedAt = combineRevisions([], ["graphs"], STARTED_AT)
+
+    assert changedAt == STARTED_AT
+    assert revision != combineRevisions([revisionDocument("graphs", 1)], ["graphs"], STARTED_AT)[0]
+
+
+@pytest.mark.asyncio
+async def test_revision_reads_requested_collections():
+    """Test revisions are read from MongoDB for the requested collections"""
+    database = MagicMock()
+    service = RevisionService(database)
+    cursor = MagicMock()
+    cursor.to_list = AsyncMock(return_value=[revisionDocument("graphs", 2)])
+    service.revisionsCollection.find = MagicMock(return_value=cursor)
+
+    revision, changedAt = await service.revision(("graphs",))
+
+    service.revisionsCollection.find.assert_called_once_with({"_id": {"$in": ["graphs"]}})
+    assert revision == combineRevisions([revisionDocument("graphs", 2)], ["graphs"], STARTED_AT)[0]
+    assert changedAt == datetime(2025, 1, 2, tzinfo=timezone.utc)
+
+
+def cachedService(documents, **kwargs):
+    service = RevisionService(MagicMock(), **kwargs)
+    cursor = MagicMock()
+    cursor.to_list = AsyncMock(side_effect=documents)
+    service.revisionsCollection.find = MagicMock(return_value=cursor)
+    return service
+
+
+@pytest.mark.asyncio
+async def test_revision_is_cached_until_an_event_is_published():
+    """Test revalidations are served from the cache until a write publishes an event"""
+    eventBus = EventBus()
+    service = cachedService(
+        [[revisionDocument("experiments", 1)], [revisionDocument("experiments", 2)]],
+        eventBus=eventBus
+    )
+
+    first = await service.revision(("experiments",))
+    assert await service.revision(("experiments",)) == first
+    assert service.revisionsCollection.find.call_count == 1
+
+    eventBus.publish("experiments", UPDATE, key="experimentId", ids=["#1"], set={})
+
+    assert (await service.revision(("experiments",)))[0] != first[0]
+    assert service.revisionsCollection.find.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_revision_cache_expires():
+    """Test cached revisions are read again after the cache time, for other workers' writes"""
+    service = cachedService(
+        [[revisionDocument("graphs", 1)], [revisionDocument("graphs", 2)]], cacheSeconds=0
+    )
+
+    first = await service.revision(("graphs",))
+
+    assert (await service.revision(("graphs",)))[0] != first[0]
+
+
+@pytest.mark.asyncio
+async def test_revision_reads_only_uncached_collections():
+    """Test collections already cached, including never-bumped ones, are not read again"""
+    service = cachedService([[], [revisionDocument("config", 1)]])
+
+    await service.revision(("graphs",))
+    await service.revision(("graphs", "config"))
+
+    assert service.revisionsCollection.find.call_args_list[1].args[0] == {"_id": {"$in": ["config"]}}
+
+
+@pytest.mark.asyncio
+async def test_revision_read_racing_an_invalidation_is_not_cached():
+    """Test a read started before a write was published does not refill the cache"""
+    service = RevisionService(MagicMock())
+    cursor = MagicMock()
+
+    async def readThenInvalidate(length):
+        service.invalidate()
+        return [revisionDocument("graphs", 1)]
+
+    cursor.to_list = readThenInvalidate
+    service.revisionsCollection.find = MagicMock(return_value=cursor)
+
+    await service.revision(("graphs",))
+
+    assert service.cache == {}
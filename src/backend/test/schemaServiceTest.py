@@ -0,0 +1,147 @@
+import asyncio
+import pytest
+import pytest_asyncio
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock
+
+from pymongo.errors import DuplicateKeyError
+
+from services.schemaService import (
+    EXPERIMENTS_SCHEMA_ID,
+    SchemaCompactionService,
+    applySchema,
+    emptySchema,
+    schemaQuery,
+    updateSchema,
+    withColumn,
+    withoutColumn,
+)
+
+DROPPED_AT = datetime(2025, 1, 1)
+
+
+def test_column_changes_are_exclusive():
+    """Test adding a column undrops it and dropping one unregisters it"""
+    schema = withColumn(emptySchema(), "Flow", 0)
+    schema = withoutColumn(schema, "Flow", DROPPED_AT)
+    assert schema["columns"] == []
+    assert schema["dropped"] == [{"name": "Flow", "droppedAt": DROPPED_AT}]
+
+    schema = withColumn(schema, "Flow", 5)
+    assert schema["columns"] == [{"name": "Flow", "default": 5}]
+    assert schema["dropped"] == []
+    assert schema["version"] == 3
+
+
+def test_apply_schema_fills_defaults_and_hides_dropped():
+    """Test reads see defaults for missing columns, last, and no dropped columns"""
+    schema = withoutColumn(withColumn(emptySchema(), "Flow", 0), "Old", DROPPED_AT)
+    documents = [{"experimentId": "#1", "Old": 1}, {"experimentId": "#2", "Flow": 3}]
+
+    rows = applySchema(documents, schema)
+
+    assert rows == [{"experimentId": "#1", "Flow": 0}, {"experimentId": "#2", "Flow": 3}]
+    assert list(rows[0]) == ["experimentId", "Flow"]
+    assert applySchema(documents, schema, fields={"experimentId": 1}) == [
+        {"experimentId": "#1"}, {"experimentId": "#2", "Flow": 3}
+    ]
+    assert applySchema(documents, emptySchema()) is documents
+
+
+def test_update_schema_retries_on_concurrent_change():
+    """Test a schema write conditioned on a stale version is retried"""
+    config = MagicMock()
+    config.find_one.side_effect = [None, {**emptySchema(), "version": 1}]
+    config.replace_one.side_effect = [
+        DuplicateKeyError("dup"),
+        MagicMock(matched_count=1, upserted_id=None),
+    ]
+
+    schema = updateSchema(config, lambda current: withColumn(current, "Flow", 0))
+
+    assert schema["version"] == 2
+    assert config.replace_one.call_args[0][0] == {"_id": EXPERIMENTS_SCHEMA_ID, "version": 1}
+
+
+def test_schema_query_matches_registered_defaults():
+    """Test documents without an added column match conditions its default meets"""
+    schema = withColumn(emptySchema(), "Flow", 0)
+
+    assert schemaQuery(schema, {"Flow": 0, "Date": "2025-01-01"}) == {
+        "Date": "2025-01-01",
+        "$and": [{"$or": [{"Flow": 0}, {"Flow": {"$exists": False}}]}],
+    }
+    assert schemaQuery(schema, {"Flow": {"$ne": 0}}) == {
+        "$and": [{"$and": [{"Flow": {"$exists": True}}, {"Flow": {"$ne": 0}}]}]
+    }
+    assert schemaQuery(schema, {"Flow": {"$gt": 1}}) == {"Flow": {"$gt": 1}}
+
+
+def test_schema_query_treats_dropped_columns_as_missing():
+    """Test leftovers of a dropped column never match"""
+    schema = withoutColumn(emptySchema(), "Flow", DROPPED_AT)
+
+    assert schemaQuery(schema, {"Flow": 5}) == {"$and": [{"_id": {"$exists": False}}]}
+    assert schemaQuery(schema, {"Flow": None}) == {}
+    assert schemaQuery(schema, {"Flow": {"$exists": False}}) == {}
+    assert schemaQuery(emptySchema(), {"Flow": 5}) == {"Flow": 5}
+
+
+@pytest_asyncio.fixture
+async def compactionService():
+    """Fixture with mocked config and experiments collections"""
+    database = MagicMock()
+    collections = {"config": AsyncMock(), "experiments": AsyncMock(), "revisions": AsyncMock()}
+    database.__getitem__.side_effect = lambda name: collections[name]
+    yield SchemaCompactionService(database, batchSize=2)
+
+
+def mockBatches(service, batches):
+    cursor = MagicMock()
+    cursor.sort.return_value.limit.return_value.to_list = AsyncMock(side_effect=batches)
+    service.experimentsCollection.find = MagicMock(return_value=cursor)
+
+
+@pytest.mark.asyncio
+async def test_compaction_cleans_batches_then_forgets_column(compactionService):
+    """Test dropped fields are unset batch by batch in _id order"""
+    compactionService.configCollection.find_one.return_value = withoutColumn(
+        emptySchema(), "Old", DROPPED_AT
+    )
+    mockBatches(compactionService, [[{"_id": 1}, {"_id": 2}], []])
+
+    assert await compactionService.compactOnce() == 2
+    compactionService.experimentsCollection.update_many.assert_called_once_with(
+        {"_id": {"$in": [1, 2]}}, {"$unset": {"Old": ""}}
+    )
+    bumped = compactionService.revisionsCollection.bulk_write.call_args[0][0]
+    assert [operation._filter for operation in bumped] == [{"_id": "experiments"}]
+
+    assert await compactionService.compactOnce() == 0
+    query = compactionService.experimentsCollection.find.call_args[0][0]
+    assert query == {"Old": {"$exists": True}, "_id": {"$gt": 2}}
+    update = compactionService.configCollection.update_one.call_args[0][1]
+    assert update["$pull"] == {"dropped": {"name": "Old", "droppedAt": DROPPED_AT}}
+    assert compactionService.positions == {}
+
+
+@pytest.mark.asyncio
+async def test_compaction_without_schema_does_nothing(compactionService):
+    """Test an unregistered schema leaves the collection alone"""
+    compactionService.configCollection.find_one.return_value = None
+
+    assert await compactionService.compactOnce() == 0
+    compactionService.experimentsCollection.update_many.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_compaction_stops_right_after_wake(compactionService):
+    """Test stop() ends the compaction loop even when it arrives as the loop is woken"""
+    compactionService.compactOnce = AsyncMock(return_value=0)
+    await compactionService.start()
+    await asyncio.sleep(0)
+
+    compactionService.wake()
+    await asyncio.wait_for(compactionService.stop(), 1)
+
+    assert compactionService.task is None
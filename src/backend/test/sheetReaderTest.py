@@ -0,0 +1,175 @@
+import openpyxl
+import pandas as pd
+import pytest
+
+from services import sheetReader
+from services.sheetReader import (
+    CSV,
+    EXCEL,
+    PARQUET,
+    detectFormat,
+    headerNames,
+    iterExcelChunks,
+    iterInThread,
+    iterSheetChunks,
+    readSheet,
+    shouldStream,
+    withFormatExtension,
+)
+
+
+@pytest.fixture
+def workbookPath(tmp_path):
+    """Fixture writing a small data sheet with a duplicate and a blank header"""
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(["#", "Time", "pH", "pH", None])
+    for i in range(5):
+        sheet.append([i + 1, f"2023-05-01 10:0{i}:00", 7.0 + i, 6.0 + i, None])
+    path = tmp_path / "data.xlsx"
+    workbook.save(path)
+    return str(path)
+
+
+def test_header_names_fill_blanks():
+    """Test headerNames names blank cells like pd.read_excel"""
+    assert headerNames(("#", None, "pH")) == ["#", "Unnamed: 1", "pH"]
+
+
+def test_iter_excel_chunks(workbookPath):
+    """Test iterExcelChunks splits the sheet into bounded chunks"""
+    chunks = list(iterExcelChunks(workbookPath, chunkRows=2))
+
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    assert list(chunks[0].columns) == ["#", "Time", "pH", "pH", "Unnamed: 4"]
+    assert chunks[2].iloc[0, 0] == 5
+
+
+def test_should_stream(workbookPath, monkeypatch):
+    """Test shouldStream only streams large Excel files"""
+    assert shouldStream(workbookPath) is False
+
+    monkeypatch.setattr("services.sheetReader.STREAMING_THRESHOLD_BYTES", 0)
+    assert shouldStream(workbookPath) is True
+    assert shouldStream(workbookPath.replace(".xlsx", ".xls")) is False
+
+
+@pytest.fixture
+def sampleDf():
+    """Fixture with a typed data sheet"""
+    return pd.DataFrame({
+        "#": [1, 2, 3],
+        "Time": pd.to_datetime(["2023-05-01 10:00", "2023-05-01 10:05", "2023-05-01 10:10"]),
+        "pH": [7.0, 7.1, 7.2],
+    })
+
+
+def test_detect_format():
+    """Test detectFormat dispatches on extension and defaults to Excel"""
+    assert detectFormat("run.CSV") == CSV
+    assert detectFormat("run.parquet") == PARQUET
+    assert detectFormat("run.xlsx") == EXCEL
+    assert detectFormat("run") == EXCEL
+
+
+def test_with_format_extension():
+    """Test withFormatExtension only uses the mimetype without an extension"""
+    assert withFormatExtension("run", "text/csv") == "run.csv"
+    assert withFormatExtension("run.csv", "application/vnd.ms-excel") == "run.csv"
+    assert withFormatExtension("run", "application/octet-stream") == "run"
+
+
+def test_read_sheet_csv(tmp_path, sampleDf):
+    """Test readSheet reads CSV files with numeric columns"""
+    path = tmp_path / "run.csv"
+    sampleDf.to_csv(path, index=False)
+
+    df = readSheet(str(path))
+
+    assert list(df.columns) == ["#", "Time", "pH"]
+    assert df["pH"].tolist() == [7.0, 7.1, 7.2]
+
+
+def test_read_sheet_parquet(tmp_path, sampleDf):
+    """Test readSheet and iterSheetChunks read Parquet files"""
+    pytest.importorskip("pyarrow")
+    path = tmp_path / "run.parquet"
+    sampleDf.to_parquet(path, index=False)
+
+    pd.testing.assert_frame_equal(readSheet(str(path)), sampleDf, check_dtype=False)
+    assert [len(chunk) for chunk in iterSheetChunks(str(path), chunkRows=2)] == [2, 1]
+
+    with pytest.raises(ValueError):
+        readSheet(str(path), header=[0, 1])
+
+
+def test_iter_sheet_chunks_csv(tmp_path, sampleDf):
+    """Test iterSheetChunks reads CSV files in chunks"""
+    path = tmp_path / "run.csv"
+    sampleDf.to_csv(path, index=False)
+
+    chunks = list(iterSheetChunks(str(path), chunkRows=2))
+
+    assert [len(chunk) for chunk in chunks] == [2, 1]
+    assert chunks[1]["#"].tolist() == [3]
+
+
+def test_csv_readers_agree_on_iso_times(tmp_path, monkeypatch):
+    """Test whole and chunked CSV reads keep ISO Time values as the same text"""
+    path = tmp_path / "run.csv"
+    pd.DataFrame({
+        "#": [1, 2, 3],
+        " time ": ["2023-05-01 10:00:00", "2023-05-01 10:00:01", "2023-05-01 10:00:02"],
+        "pH": [7.0, 7.1, 7.2],
+    }).to_csv(path, index=False)
+
+    whole = readSheet(str(path))
+    chunked = pd.concat(iterSheetChunks(str(path), chunkRows=2), ignore_index=True)
+    monkeypatch.setattr(sheetReader, "PYARROW_AVAILABLE", False)
+    withoutPyarrow = readSheet(str(path))
+
+    expected = ["2023-05-01 10:00:00", "2023-05-01 10:00:01", "2023-05-01 10:00:02"]
+    assert whole[" time "].tolist() == expected
+    assert chunked[" time "].tolist() == expected
+    assert withoutPyarrow[" time "].tolist() == expected
+
+
+@pytest.mark.asyncio
+async def test_iter_in_thread_yields_items():
+    """Test iterInThread yields every item produced on the worker thread"""
+    items = [item async for item in iterInThread(lambda: iter(range(10)))]
+
+    assert items == list(range(10))
+
+
+@pytest.mark.asyncio
+async def test_iter_in_thread_raises_producer_errors():
+    """Test iterInThread re-raises errors from the producer"""
+    def failing():
+        yield 1
+        raise ValueError("bad sheet")
+
+    with pytest.raises(ValueError):
+        async for _ in iterInThread(failing):
+            pass
+
+
+@pytest.mark.asyncio
+async def test_iter_in_thread_stops_early():
+    """Test iterInThread lets the producer exit when the consumer stops"""
+    produced = []
+
+    def endless():
+        i = 0
+        while True:
+            produced.append(i)
+            yield i
+            i += 1
+
+    chunks = iterInThread(endless, maxPending=1)
+    async for item in chunks:
+        if item == 3:
+            break
+    await chunks.aclose()
+
+    assert len(produced) < 10
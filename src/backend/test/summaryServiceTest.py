@@ -0,0 +1,83 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from services.summaryService import (
+    buildSummaryRefresh,
+    buildSummaryUpdates,
+    describeSummaries,
+    summarizeDataSheet,
+)
+
+
+@pytest.fixture
+def dataDf():
+    return pd.DataFrame({
+        "#": [1, 2, 3],
+        "Time": ["2025/01/01 10:05:00", "2025/01/01 10:00:00", "2025/01/01 10:30:00"],
+        "U Stac": [1.0, 2.0, np.nan],
+        "I Cmm": [3, 4, 5],
+        "Notes": ["a", "b", "c"],
+    })
+
+
+def test_summarize_data_sheet(dataDf):
+    """Test numeric columns are summarized and keys and text skipped"""
+    summary = summarizeDataSheet(dataDf)
+
+    assert summary["sampleCount"] == 3
+    assert summary["firstTime"] == "2025/01/01 10:00:00"
+    assert summary["lastTime"] == "2025/01/01 10:30:00"
+    assert set(summary["columns"]) == {"U Stac", "I Cmm"}
+    assert summary["columns"]["U Stac"] == {"count": 2, "sum": 3.0, "sumSq": 5.0, "min": 1.0, "max": 2.0}
+
+
+def test_summary_updates_merge_atomically(dataDf):
+    """Test summaries are merged with $inc, $min and $max upserts"""
+    operations = buildSummaryUpdates("#1", summarizeDataSheet(dataDf))
+
+    experiment = operations[0]
+    assert experiment._filter == {"_id": "#1"}
+    assert experiment._doc["$inc"] == {"sampleCount": 3}
+    assert experiment._doc["$min"] == {"firstTime": "2025/01/01 10:00:00"}
+
+    column = next(op for op in operations if op._filter == {"_id": "#1:I Cmm"})
+    assert column._doc["$inc"] == {"count": 3, "sum": 12.0, "sumSq": 50.0}
+    assert column._doc["$max"] == {"max": 5}
+
+
+def test_summary_refresh_replaces_stored_summary():
+    """Test a refresh deletes the old summary and writes the aggregated one"""
+    aggregated = [{
+        "rows": [{"_id": None, "sampleCount": 2, "firstTime": "a", "lastTime": "b"}],
+        "columns": [{"_id": "I Cmm", "count": 2, "sum": 4, "sumSq": 10, "min": 1, "max": 3}],
+    }]
+
+    operations = buildSummaryRefresh("#1", aggregated)
+    assert operations[0]._filter == {"experimentId": "#1"}
+    assert [op._filter for op in operations[1:]] == [{"_id": "#1"}, {"_id": "#1:I Cmm"}]
+
+    empty = buildSummaryRefresh("#1", [{"rows": [], "columns": []}])
+    assert len(empty) == 1
+
+
+def test_describe_summaries_derives_mean_std_and_duration(dataDf):
+    """Test stored sums give the same mean and std as pandas"""
+    documents = [
+        {"experimentId": "#1", "column": None, "sampleCount": 3,
+         "firstTime": "2025/01/01 10:00:00", "lastTime": "2025/01/01 10:30:00"},
+        {"experimentId": "#1", "column": "I Cmm", "count": 3, "sum": 12.0, "sumSq": 50.0, "min": 3, "max": 5},
+        {"experimentId": "#1", "column": "U Stac", "count": 1, "sum": 2.0, "sumSq": 4.0, "min": 2, "max": 2},
+    ]
+
+    summary = describeSummaries(documents, ["I Cmm"])[0]
+    assert summary["durationMinutes"] == 30
+    assert list(summary["columns"]) == ["I Cmm"]
+    assert summary["columns"]["I Cmm"]["mean"] == pytest.approx(dataDf["I Cmm"].mean())
+    assert summary["columns"]["I Cmm"]["std"] == pytest.approx(dataDf["I Cmm"].std())
+
+    single = describeSummaries(documents)[0]["columns"]["U Stac"]
+    assert single["mean"] == 2.0
+    assert single["std"] is None
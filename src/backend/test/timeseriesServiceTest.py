@@ -0,0 +1,106 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from services.timeseriesService import (
+    BIN_MEAN,
+    alignExperiments,
+    binMeanOnGrid,
+    buildGrid,
+    elapsedMinutes,
+    formatBucket,
+    interpolateOnGrid,
+    resamplePipeline,
+)
+
+
+def rows(experimentId, start, stepSeconds, values):
+    return [
+        {"experimentId": experimentId,
+         "Time": f"2025/01/01 {start}:{(i * stepSeconds) // 60:02d}:{(i * stepSeconds) % 60:02d}",
+         "U Stac": value}
+        for i, value in enumerate(values)
+    ]
+
+
+def test_elapsed_minutes_from_first_sample():
+    """Test times become minutes since the earliest sample"""
+    elapsed = elapsedMinutes(["2025/01/01 10:01:30", "2025/01/01 10:00:00", "bad"])
+    assert elapsed[:2].tolist() == [1.5, 0.0]
+    assert np.isnan(elapsed[2])
+
+
+def test_build_grid_by_step_or_points():
+    """Test grids follow the step or point count and enforce the cap"""
+    assert buildGrid(2.0, step=0.5).tolist() == [0.0, 0.5, 1.0, 1.5, 2.0]
+    assert buildGrid(10.0, points=3, start=2).tolist() == [2.0, 6.0, 10.0]
+    with pytest.raises(ValueError):
+        buildGrid(1000.0, step=0.01)
+
+
+def test_resampling_methods():
+    """Test interpolation and bin means, with NaN where there are no samples"""
+    x = np.array([0.0, 1.0, 2.0, 2.5])
+    y = np.array([0.0, 10.0, 20.0, np.nan])
+    grid = np.array([0.0, 1.0, 2.0, 3.0])
+
+    interpolated = interpolateOnGrid(x, y, np.array([0.5, 3.0]))
+    assert interpolated[0] == 5.0
+    assert np.isnan(interpolated[1])
+
+    means = binMeanOnGrid(np.array([0.1, 0.9, 2.2]), np.array([1.0, 3.0, 5.0]), grid)
+    assert means[0] == 2.0
+    assert np.isnan(means[1])
+    assert means[2] == 5.0
+
+
+def test_align_experiments_on_common_grid():
+    """Test runs with different starts and rates share one grid"""
+    data = rows("#1", 10, 30, [0, 1, 2, 3, 4]) + rows("#2", 14, 60, [0, 10, 20])
+
+    aligned = alignExperiments(data, ["#1", "#2", "#3"], ["U Stac"], points=3)
+
+    assert aligned["grid"] == [0.0, 1.0, 2.0]
+    assert aligned["series"]["#1"]["U Stac"] == [0.0, 2.0, 4.0]
+    assert aligned["series"]["#2"]["U Stac"] == [0.0, 10.0, 20.0]
+    assert aligned["missing"] == ["#3"]
+
+    means = alignExperiments(data, ["#1"], ["U Stac"], method=BIN_MEAN, step=1)
+    assert means["series"]["#1"]["U Stac"] == [0.5, 2.5, 4.0]
+
+
+def test_resample_pipeline_groups_on_time_buckets():
+    """Test the resample pipeline buckets by $dateTrunc and aggregates per attribute"""
+    pipeline = resamplePipeline("#1", ["U Stac", "Cond.1.Val"], 60, ["mean", "max"])
+
+    assert pipeline[0] == {"$match": {"experimentId": "#1"}}
+    assert pipeline[1]["$project"]["f0"] == "$U Stac"
+    assert pipeline[1]["$project"]["f1"] == "$Cond.1.Val"
+    group = pipeline[3]["$group"]
+    assert group["_id"] == {"$dateTrunc": {"date": "$time", "unit": "second", "binSize": 60}}
+    assert group["f0_mean"] == {"$avg": "$f0"}
+    assert group["f1_max"] == {"$max": "$f1"}
+    assert pipeline[-1] == {"$sort": {"_id": 1}}
+
+
+def test_resample_pipeline_sorts_for_ordered_aggregations():
+    """Test first and last are computed over rows sorted by time"""
+    unordered = resamplePipeline("#1", ["U Stac"], 10, ["min"])
+    ordered = resamplePipeline("#1", ["U Stac"], 10, ["last"])
+
+    assert {"$sort": {"time": 1}} not in unordered
+    assert ordered[3] == {"$sort": {"time": 1}}
+    assert ordered[4]["$group"]["f0_last"] == {"$last": "$f0"}
+
+
+def test_format_bucket_names_columns_by_aggregation():
+    """Test buckets become rows keyed by attribute, suffixed when several aggregations"""
+    bucket = {"_id": datetime(2025, 1, 1, 10, 5), "count": 12, "f0_mean": 1.5, "f0_max": 2.0}
+
+    assert formatBucket(bucket, ["U Stac"], ["mean"]) == {
+        "Time": "2025/01/01 10:05:00", "count": 12, "U Stac": 1.5
+    }
+    assert formatBucket(bucket, ["U Stac"], ["mean", "max"]) == {
+        "Time": "2025/01/01 10:05:00", "count": 12, "U Stac (mean)": 1.5, "U Stac (max)": 2.0
+    }
@@ -0,0 +1,21 @@
+import os
+
+from upload.router import removeUpload, saveUpload
+
+
+def test_concurrent_uploads_of_one_name_do_not_collide():
+    """Test uploads sharing a file name get separate paths and are removed separately"""
+    first = saveUpload(b"first", "run 2025-01-01.xlsx")
+    second = saveUpload(b"second", "run 2025-01-01.xlsx")
+
+    try:
+        assert first != second
+        assert os.path.basename(first) == os.path.basename(second) == "run 2025-01-01.xlsx"
+
+        removeUpload(first)
+        assert not os.path.exists(os.path.dirname(first))
+        with open(second, "rb") as upload:
+            assert upload.read() == b"second"
+    finally:
+        removeUpload(first)
+        removeUpload(second)
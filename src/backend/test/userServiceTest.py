@@ -1,8 +1,8 @@
 import pytest
 import pytest_asyncio
 
-from unittest.mock import AsyncMock, patch
-from services.userService import UserService
+from unittest.mock import AsyncMock, MagicMock, patch
+from services.userService import SessionCache, UserService
 
 @pytest_asyncio.fixture
 async def userService():
@@ -11,6 +11,7 @@ async def userService():
         mockDB.__getitem__.return_value = mockDB
         mockDB.users = mockDB
         service = UserService("mongodb://localhost:27017", "test_db")
+        service.sessionCache = SessionCache(ttl=60)
         yield service
 
 @pytest.mark.asyncio
@@ -137,4 +138,100 @@ async def test_deleteUser_nonExistentUser(userService):
     userService.usersCollection.delete_one = AsyncMock(return_value=None)
 
     result = await userService.deleteUser("nonexistent@example.com")
-    assert result is None
\ No newline at end of file
+    assert result is None
+
+@pytest.mark.asyncio
+async def test_hashPasswordAsync(userService):
+    """
+    Test hashPasswordAsync produces a hash that checkPasswordAsync accepts.
+    Verifies the thread-pool offload returns the same results as bcrypt.
+    """
+    hashed_password = await UserService.hashPasswordAsync("password123")
+
+    assert await UserService.checkPasswordAsync("password123", hashed_password)
+    assert not await UserService.checkPasswordAsync("wrongpassword", hashed_password)
+
+@pytest.mark.asyncio
+async def test_getCurrentUserAndRole_cached(userService):
+    """
+    Test getCurrentUserAndRole serves repeated lookups from the session cache.
+    Ensures the database is only queried once per session token.
+    """
+    userService.usersCollection.find_one = AsyncMock(return_value={"email": "test@example.com", "role": "researcher"})
+
+    await userService.getCurrentUserAndRole("session_token")
+    result = await userService.getCurrentUserAndRole("session_token")
+
+    assert result == {"email": "test@example.com", "role": "researcher"}
+    userService.usersCollection.find_one.assert_called_once()
+
+@pytest.mark.asyncio
+async def test_endSession_invalidatesCache(userService):
+    """
+    Test endSession removes the session from the cache.
+    Ensures a logged-out token is looked up in the database again.
+    """
+    userService.sessionCache.set("session_token", {"email": "test@example.com", "role": "researcher"})
+    userService.usersCollection.find_one_and_update = AsyncMock(return_value={"email": "test@example.com"})
+    userService.usersCollection.find_one = AsyncMock(return_value=None)
+
+    await userService.endSession("session_token")
+    result = await userService.getCurrentUserAndRole("session_token")
+
+    assert result is None
+
+@pytest.mark.asyncio
+async def test_updateRole_invalidatesCache(userService):
+    """
+    Test updateRole drops cached sessions of the user.
+    Checks that the new role is read from the database afterwards.
+    """
+    userService.sessionCache.set("session_token", {"email": "test@example.com", "role": "researcher"})
+    userService.getUser = AsyncMock(return_value={"email": "test@example.com", "role": "researcher"})
+    userService.usersCollection.update_one = AsyncMock()
+
+    await userService.updateRole("test@example.com", "admin")
+
+    assert userService.sessionCache.get("session_token") is None
+
+@pytest.mark.asyncio
+async def test_deleteUser_invalidatesCache(userService):
+    """
+    Test deleteUser drops cached sessions of the user.
+    Confirms a deleted account cannot keep authenticating from the cache.
+    """
+    userService.sessionCache.set("session_token", {"email": "test@example.com", "role": "researcher"})
+    userService.usersCollection.delete_one = AsyncMock()
+
+    await userService.deleteUser("test@example.com")
+
+    assert userService.sessionCache.get("session_token") is None
+
+def test_sessionCache_expires():
+    """
+    Test SessionCache entries expire after their TTL.
+    """
+    cache = SessionCache(ttl=0)
+    cache.set("session_token", {"email": "test@example.com", "role": "researcher"})
+
+    assert cache.get("session_token") is None
+
+@pytest.mark.asyncio
+async def test_closeConnection_keepsSharedClient():
+    """
+    Test closing a service built on a shared client leaves the client usable.
+    Checks that another service on the same client still reaches the database.
+    """
+    sharedClient = MagicMock()
+    usersCollection = sharedClient.__getitem__.return_value.__getitem__.return_value
+    usersCollection.find_one = AsyncMock(return_value=None)
+    usersCollection.insert_one = AsyncMock()
+    service = UserService(None, "test_db", client=sharedClient)
+    otherService = UserService(None, "test_db", client=sharedClient)
+
+    await service.closeConnection()
+    result = await otherService.createUser("test@example.com", "password123", "researcher")
+
+    assert result == {"email": "test@example.com", "role": "researcher"}
+    usersCollection.insert_one.assert_awaited_once()
+    sharedClient.close.assert_not_called()
@@ -0,0 +1,36 @@
+from utils import COMPRESSION_THRESHOLD, decodeSeries, encodeSeries
+
+
+def test_encode_series_round_trip():
+    """Test encodeSeries stores rows column-wise and decodes them back"""
+    rows = [{"x": 1, "y": 2.5}, {"x": 2, "y": 3.5}]
+
+    series = encodeSeries(rows)
+
+    assert series["encoding"] == "none"
+    assert series["columns"] == ["x", "y"]
+    assert series["values"] == [[1, 2], [2.5, 3.5]]
+    assert decodeSeries(series) == rows
+
+
+def test_encode_series_compresses_large_payloads():
+    """Test encodeSeries compresses payloads above the threshold"""
+    rows = [{"Time": f"2023/05/01 09:{i % 60:02d}:00", "U Stac": i * 0.1}
+            for i in range(COMPRESSION_THRESHOLD // 10)]
+
+    series = encodeSeries(rows)
+
+    assert series["encoding"] == "zlib"
+    assert isinstance(series["values"], bytes)
+    assert decodeSeries(series) == rows
+
+
+def test_encode_series_round_trips_rows_with_different_keys():
+    """Test rows lacking a column decode without it, unlike an explicit None"""
+    rows = [{"x": 1, "y": 2.5}, {"x": 2}, {"x": 3, "y": None, "z": "a"}]
+
+    series = encodeSeries(rows)
+
+    assert series["missing"] == [[1, [1]], [2, [0, 1]]]
+    assert decodeSeries(series) == rows
+    assert "missing" not in encodeSeries([{"x": 1}, {"x": 2}])
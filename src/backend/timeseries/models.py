@@ -0,0 +1,19 @@
+from typing import List, Literal, Optional
+from pydantic import BaseModel
+
+
+class CompareRequest(BaseModel):
+    experimentIds: List[str]
+    attributes: List[str]
+    method: Literal["interpolate", "mean"] = "interpolate"
+    step: Optional[float] = None
+    points: Optional[int] = 500
+    start: Optional[float] = None
+    end: Optional[float] = None
+
+
+class ResampleRequest(BaseModel):
+    experimentId: str
+    attributes: List[str]
+    width: int
+    aggregations: List[Literal["mean", "min", "max", "first", "last"]] = ["mean"]
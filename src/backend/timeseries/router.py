@@ -0,0 +1,110 @@
+# -----------------------------------------------------------------------------
+# Primary author: Jennifer Y
+# Year: 2025
+# Purpose: Time series endpoints for comparing and resampling experiment data.
+# -----------------------------------------------------------------------------
+
+import json
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+
+from database import getConnection
+from utils import cleanData
+from services.timeseriesService import (
+    DEFAULT_GRID_POINTS,
+    alignExperiments,
+    formatBucket,
+    resamplePipeline
+)
+from timeseries.models import CompareRequest, ResampleRequest
+
+router = APIRouter()
+
+# Runs compared in one request
+MAX_COMPARED_EXPERIMENTS = 50
+
+
+# Routes
+@router.post("/timeseries/compare")
+async def compareExperiments(payload: CompareRequest):
+    """
+    Aligns the attributes of several experiments on elapsed minutes since each
+    run's first sample, resampled onto one common grid by linear
+    interpolation or by the mean of each grid cell. Returns the grid once and
+    one array per experiment and attribute, with null where a run has no data.
+    """
+    if not payload.experimentIds or not payload.attributes:
+        raise HTTPException(status_code=400, detail="Experiment IDs and attributes are required.")
+    if len(payload.experimentIds) > MAX_COMPARED_EXPERIMENTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_COMPARED_EXPERIMENTS} experiments can be compared."
+        )
+    if payload.step is not None and payload.step <= 0:
+        raise HTTPException(status_code=400, detail="The step must be positive.")
+
+    connection = getConnection("data")
+    collection, client = connection["collection"], connection["client"]
+
+    try:
+        projection = {"_id": 0, "experimentId": 1, "Time": 1}
+        projection.update({attribute: 1 for attribute in payload.attributes})
+        rows = list(collection.find(
+            {"experimentId": {"$in": payload.experimentIds}}, projection
+        ))
+        aligned = alignExperiments(
+            rows, payload.experimentIds, payload.attributes,
+            method=payload.method, step=payload.step,
+            points=payload.points or DEFAULT_GRID_POINTS,
+            start=payload.start, end=payload.end,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error comparing experiments: {str(e)}")
+    finally:
+        client.close()
+
+    if not aligned["series"]:
+        raise HTTPException(status_code=404, detail="No data found for the given experiments.")
+    return {"status": "success", "data": aligned}
+
+
+@router.post("/timeseries/resample")
+async def resampleExperiment(payload: ResampleRequest):
+    """
+    Aggregates an experiment's attributes over fixed buckets of `width`
+    seconds (mean, min, max, first or last), computed by MongoDB. Buckets
+    are streamed back as newline-delimited JSON rows, oldest first.
+    """
+    if not payload.attributes or not payload.aggregations:
+        raise HTTPException(status_code=400, detail="Attributes and aggregations are required.")
+    if payload.width < 1:
+        raise HTTPException(status_code=400, detail="The bucket width must be at least 1 second.")
+    if any(attribute.startswith("$") for attribute in payload.attributes):
+        raise HTTPException(status_code=400, detail="Attribute names cannot start with '$'.")
+
+    aggregations = list(dict.fromkeys(payload.aggregations))
+    connection = getConnection("data")
+    collection, client = connection["collection"], connection["client"]
+
+    try:
+        buckets = collection.aggregate(
+            resamplePipeline(payload.experimentId, payload.attributes, payload.width, aggregations),
+            allowDiskUse=True,
+        )
+    except Exception as e:
+        client.close()
+        raise HTTPException(status_code=500, detail=f"Error resampling data: {str(e)}")
+
+    def stream():
+        # Runs in a worker thread, so the blocking cursor does not stall the loop
+        try:
+            for bucket in buckets:
+                row = formatBucket(bucket, payload.attributes, aggregations)
+                yield json.dumps(cleanData(row)) + "\n"
+        finally:
+            client.close()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
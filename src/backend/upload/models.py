@@ -21,3 +21,8 @@ class LinkedDataPayload(BaseModel):
 
 class ManualUploadPayload(BaseModel):
     linkedData: list[LinkedDataPayload]
+
+
+class ResolveAmbiguousPayload(BaseModel):
+    token: str
+    experimentId: str
@@ -6,20 +6,23 @@
 
 import os
 import base64
+import shutil
+import tempfile
 
-import pandas as pd
-from dotenv import load_dotenv
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 
+from dependencies import getImportJobService, getMigrationService
+from services.importJobService import DATA, EXPERIMENT, ImportJobService
 from services.migrationService import MigrationService
+from services.sheetReader import withFormatExtension
 from upload.models import (
     FilesPayload,
     FilePayload,
     LinkedDataPayload,
-    ManualUploadPayload
+    ManualUploadPayload,
+    ResolveAmbiguousPayload
 )
 
-load_dotenv()
 router = APIRouter()
 
 
@@ -29,50 +32,67 @@ def sanitizeFilename(filename: str) -> str:
     return "".join(c for c in filename if c.isalnum() or c in (" ", ".", "_")).strip()
 
 
-def decodeAndSave(filePayload: FilePayload) -> str:
-    """Decode the base64 content of the file and saves it to a temporary location."""
+def decodeContent(filePayload: FilePayload) -> bytes:
+    """Decode the base64 content of an uploaded file."""
     try:
-        fileContent = base64.b64decode(filePayload.content)
+        return base64.b64decode(filePayload.content)
     except Exception as decode_error:
         raise HTTPException(
             status_code=400,
             detail=f"Invalid base64 content for file: {filePayload.filename}",) from decode_error
 
-    sanitizedFilename = sanitizeFilename(filePayload.filename)
-    tempFilePath = os.path.join(os.getcwd(), sanitizedFilename)
+
+def savedFilename(filePayload: FilePayload) -> str:
+    """Sanitized filename carrying the extension of the file's format."""
+    return withFormatExtension(
+        sanitizeFilename(filePayload.filename), filePayload.mimetype
+    )
+
+
+def saveUpload(content: bytes, filename: str) -> str:
+    """
+    Saves uploaded content under its own temporary directory, so concurrent
+    uploads of the same file name never share a path. The file keeps its
+    name, from which the importer can read the experiment date.
+    """
+    tempFilePath = os.path.join(tempfile.mkdtemp(prefix="alkalytics-upload-"), filename)
 
     with open(tempFilePath, "wb") as tempFile:
-        tempFile.write(fileContent)
+        tempFile.write(content)
 
     return tempFilePath
 
 
-def decodeAndSaveLinked(filePayload: LinkedDataPayload) -> dict:
-    """Decode the base64 content of the data file and saves it to a temporary
-    location with its linked ID."""
-    try:
-        fileContent = base64.b64decode(filePayload.content)
-    except Exception as decode_error:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Invalid base64 content for file: {filePayload.filename}",
-        ) from decode_error
+def removeUpload(tempFilePath: str):
+    """Removes a file saved by saveUpload, with its temporary directory."""
+    shutil.rmtree(os.path.dirname(tempFilePath), ignore_errors=True)
 
-    sanitizedFilename = sanitizeFilename(filePayload.filename)
-    tempFilePath = os.path.join(os.getcwd(), sanitizedFilename)
 
-    with open(tempFilePath, "wb") as tempFile:
-        tempFile.write(fileContent)
+def decodeAndSave(filePayload: FilePayload) -> str:
+    """Decode the base64 content of the file and saves it to a temporary location."""
+    return saveUpload(decodeContent(filePayload), savedFilename(filePayload))
+
 
-    return {"path": tempFilePath, "linkedId": filePayload.linkedId}
+def decodeAndSaveLinked(filePayload: LinkedDataPayload) -> dict:
+    """Decode the base64 content of the data file and saves it to a temporary
+    location with its linked ID."""
+    return {
+        "path": saveUpload(decodeContent(filePayload), savedFilename(filePayload)),
+        "linkedId": filePayload.linkedId,
+    }
 
 
 @router.post("/upload")
-async def upload(payload: FilesPayload):
+async def upload(
+    payload: FilesPayload,
+    migrationService: MigrationService = Depends(getMigrationService)
+):
     """
     Processes uploaded files for experiment and data categories.
     Decodes base64 content, saves them temporarily, uses MigrationService
-    to handle the files, and cleans up resources.
+    to handle the files, and cleans up resources. Data sheets matching
+    several experiments are staged; each ambiguous entry carries the token
+    to pass to /upload/resolve.
     """
     tempExperimentFiles = []
     tempDataFiles = []
@@ -89,56 +109,97 @@ async def upload(payload: FilesPayload):
                 status_code=400, detail="No valid files provided."
             )
 
-        MONGO_URI = os.getenv("CONNECTION_STRING")
-        DB_NAME = "alkalyticsDB"
-        migrationService = MigrationService(MONGO_URI, DB_NAME)
-
-        try:
-            ambiguousData = await migrationService.migrate(
-                experimentFilePaths=tempExperimentFiles,
-                dataFilePaths=tempDataFiles,
-            )
-        finally:
-            await migrationService.closeConnection()
-
-        fileMap = {file.filename: file for file in payload.dataFiles}
-
-        for data in ambiguousData:
-            if data["dataId"] in fileMap:
-                data["dataFile"] = fileMap[data["dataId"]]
-
-        # Clean up temporary files
-        for tempFile in tempExperimentFiles:
-            os.remove(tempFile)
-        for tempFile in tempDataFiles:
-            os.remove(tempFile)
+        result = await migrationService.migrate(
+            experimentFilePaths=tempExperimentFiles,
+            dataFilePaths=tempDataFiles,
+        )
 
         return {
             "status": "success",
             "message": "Files processed successfully.",
-            "ambiguousData": ambiguousData,
+            "ambiguousData": result.ambiguousData,
         }
 
     except HTTPException as e:
         raise e
     except Exception as e:
-        # Clean up temporary experiment files
-        for tempFile in tempExperimentFiles:
-            if os.path.exists(tempFile):
-                os.remove(tempFile)
+        raise HTTPException(
+            status_code=500, detail=f"Error processing files: {str(e)}"
+        )
+    finally:
+        # Clean up temporary files
+        for tempFile in tempExperimentFiles + tempDataFiles:
+            removeUpload(tempFile)
 
-        # Clean up temporary data files
-        for tempFile in tempDataFiles:
-            if os.path.exists(tempFile):
-                os.remove(tempFile)
 
+@router.post("/upload/resolve")
+async def resolveAmbiguous(
+    payload: ResolveAmbiguousPayload,
+    migrationService: MigrationService = Depends(getMigrationService)
+):
+    """
+    Links a data sheet staged by /upload, because it matched several
+    experiments, to the experiment the user chose. The staged rows are
+    imported without the file being sent again.
+    """
+    try:
+        inserted = await migrationService.resolveStagedSheet(
+            payload.token, payload.experimentId
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if inserted is None:
         raise HTTPException(
-            status_code=500, detail=f"Error processing files: {str(e)}"
+            status_code=404, detail="Staged data sheet not found or expired."
         )
+    return {
+        "status": "success",
+        "message": f"Linked {inserted} records to {payload.experimentId}.",
+    }
+
+
+@router.post("/upload/jobs")
+async def submitImportJob(
+    payload: FilesPayload,
+    importJobService: ImportJobService = Depends(getImportJobService)
+):
+    """
+    Queues the uploaded files as a background import job and returns its ID
+    for polling. Data sheets already imported by an earlier job are skipped.
+    """
+    files = [
+        {"filename": savedFilename(file), "kind": EXPERIMENT, "content": decodeContent(file)}
+        for file in payload.experimentFiles
+    ] + [
+        {"filename": savedFilename(file), "kind": DATA, "content": decodeContent(file)}
+        for file in payload.dataFiles
+    ]
+    if not files:
+        raise HTTPException(status_code=400, detail="No valid files provided.")
+
+    jobId = await importJobService.submit(files)
+    return {"status": "success", "jobId": jobId}
+
+
+@router.get("/upload/jobs/{jobId}")
+async def getImportJob(
+    jobId: str,
+    importJobService: ImportJobService = Depends(getImportJobService)
+):
+    """
+    Reports the progress of an import job and the outcome of each file.
+    """
+    job = await importJobService.getJob(jobId)
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found.")
+    return {"status": "success", "data": job}
 
 
 @router.post("/manual-upload")
-async def manualUpload(payload: ManualUploadPayload):
+async def manualUpload(
+    payload: ManualUploadPayload,
+    migrationService: MigrationService = Depends(getMigrationService)
+):
     """
     Processes uploaded files for experiment and data categories.
     Decodes base64 content, saves them temporarily, uses
@@ -150,29 +211,10 @@ async def manualUpload(payload: ManualUploadPayload):
         for file in payload.linkedData:
             tempLinkedDataFiles.append(decodeAndSaveLinked(file))
 
-        MONGO_URI = os.getenv("CONNECTION_STRING")
-        DB_NAME = "alkalyticsDB"
-        migrationService = MigrationService(MONGO_URI, DB_NAME)
-
-        try:
-            for tempData in tempLinkedDataFiles:
-                dataDf = pd.read_excel(tempData["path"], sheet_name=0)
-                dataDf = migrationService.cleanData(dataDf)
-
-                records = await migrationService.linkData(
-                    dataDf, tempData["linkedId"]
-                )
-
-                if records:
-                    await migrationService.dataSheetsCollection.insert_many(
-                        records
-                    )
-        finally:
-            await migrationService.closeConnection()
-
-        for tempFile in tempLinkedDataFiles:
-            if os.path.exists(tempFile["path"]):
-                os.remove(tempFile["path"])
+        for tempData in tempLinkedDataFiles:
+            await migrationService.importLinkedDataSheet(
+                tempData["path"], tempData["linkedId"]
+            )
 
         return {
             "status": "success",
@@ -182,10 +224,9 @@ async def manualUpload(payload: ManualUploadPayload):
     except HTTPException as e:
         raise e
     except Exception as e:
-        for tempFile in tempLinkedDataFiles:
-            if os.path.exists(tempFile):
-                os.remove(tempFile)
-
         raise HTTPException(
             status_code=500, detail=f"Error processing files: {str(e)}"
         )
+    finally:
+        for tempData in tempLinkedDataFiles:
+            removeUpload(tempData["path"])
@@ -1,5 +1,14 @@
+import json
 import math
-from bson import ObjectId
+import zlib
+
+from bson import Binary, ObjectId
+
+# Serialized payloads above this size are stored zlib-compressed
+COMPRESSION_THRESHOLD = 64 * 1024
+
+# Format of the Time column of data rows
+TIME_FORMAT = "%Y/%m/%d %H:%M:%S"
 
 
 def cleanData(obj):
@@ -12,3 +21,44 @@ def cleanData(obj):
     if isinstance(obj, list):
         return [cleanData(i) for i in obj]
     return obj
+
+
+def encodeSeries(rows: list[dict]) -> dict:
+    """
+    Encodes a list of row dicts column-wise, so keys are stored once instead
+    of per row. Large payloads are compressed. Rows lacking a column are
+    listed under "missing" as [column index, row indices] pairs, so they
+    decode without it rather than with None.
+    """
+    columns = list(dict.fromkeys(key for row in rows for key in row))
+    values = [[row.get(column) for row in rows] for column in columns]
+    missing = [
+        [index, absent] for index, column in enumerate(columns)
+        if (absent := [i for i, row in enumerate(rows) if column not in row])
+    ]
+
+    payload = json.dumps(values, separators=(",", ":")).encode("utf-8")
+    if len(payload) > COMPRESSION_THRESHOLD:
+        series = {
+            "columns": columns,
+            "encoding": "zlib",
+            "values": Binary(zlib.compress(payload)),
+        }
+    else:
+        series = {"columns": columns, "encoding": "none", "values": values}
+    if missing:
+        series["missing"] = missing
+    return series
+
+
+def decodeSeries(series: dict) -> list[dict]:
+    """Decodes a series produced by encodeSeries back into row dicts."""
+    values = series["values"]
+    if series.get("encoding") == "zlib":
+        values = json.loads(zlib.decompress(values))
+    rows = [dict(zip(series["columns"], row)) for row in zip(*values)]
+    for index, absent in series.get("missing", []):
+        column = series["columns"][index]
+        for i in absent:
+            del rows[i][column]
+    return rows
@@ -10,9 +10,9 @@ import { useState } from "react";
 import WarningIcon from "@mui/icons-material/Warning";
 import { gql, useMutation } from "@apollo/client";
 
-const MANUAL_UPLOAD = gql`
-  mutation ManualUpload($linkedData: [Base64FileInput!]!) {
-    manualUpload(linkedData: $linkedData) {
+const RESOLVE_AMBIGUOUS = gql`
+  mutation ResolveAmbiguous($token: String!, $experimentId: String!) {
+    resolveAmbiguous(token: $token, experimentId: $experimentId) {
       status
       message
     }
@@ -21,7 +21,7 @@ const MANUAL_UPLOAD = gql`
 
 type AmbiguousData = {
   dataId: string;
-  dataFile?: any;
+  token: string;
   matchingExp: string[];
 };
 
@@ -44,7 +44,7 @@ const LinkDataModal: React.FC<LinkDataModalProps> = ({
 }) => {
   const [currentIndex, setCurrentIndex] = useState(0);
   const [loading, setLoading] = useState(false);
-  const [manualUploadFiles] = useMutation(MANUAL_UPLOAD);
+  const [resolveAmbiguous] = useMutation(RESOLVE_AMBIGUOUS);
 
   const handleMatchChange = (dataId: string, experimentId: string) => {
     setMatchingMap((prev) => ({ ...prev, [dataId]: experimentId }));
@@ -65,21 +65,23 @@ const LinkDataModal: React.FC<LinkDataModalProps> = ({
   const handleSubmit = async () => {
     setLoading(true);
     try {
-      const linkedData = ambiguousData.map((data) => {
-        return {
-          filename: data.dataFile.filename,
-          mimetype: data.dataFile.mimetype,
-          content: data.dataFile.content,
-          linkedId: matchingMap[data?.dataFile?.filename],
-        };
-      });
-      const response = await manualUploadFiles({
-        variables: {
-          linkedData,
-        },
-      });
-
-      if (response.data.manualUpload.status !== "success") {
+      // The data files are staged on the server, so only the choices are sent
+      const responses = await Promise.all(
+        ambiguousData.map((data) =>
+          resolveAmbiguous({
+            variables: {
+              token: data.token,
+              experimentId: matchingMap[data.dataId],
+            },
+          })
+        )
+      );
+
+      if (
+        responses.some(
+          (response) => response.data.resolveAmbiguous.status !== "success"
+        )
+      ) {
         throw new Error("Upload failed");
       }
 
@@ -8,6 +8,7 @@
 
 import type React from "react";
 import { useContext, useState } from "react";
+import { gql, useLazyQuery } from "@apollo/client";
 import IconButton from "@mui/material/IconButton";
 import KeyboardDoubleArrowRightIcon from "@mui/icons-material/KeyboardDoubleArrowRight";
 import AddIcon from "@mui/icons-material/Add";
@@ -21,6 +22,12 @@ import { FormDataContext } from "../../pages/DataVisualize";
 import useGraphs from "../../hooks/useGraphs";
 import RemoveGraphModal from "../modal/RemoveGraphModal";
 
+const GET_GRAPH_DATA = gql`
+  query GetGraphData($graphId: Int!) {
+    getGraphData(graphId: $graphId)
+  }
+`;
+
 type GraphSideBarProps = {
   onSubmit: () => void;
   onGraphSelect: (graphData: any) => void;
@@ -46,6 +53,7 @@ const GraphSideBar: React.FC<GraphSideBarProps> = ({
   const[ error, setError] = useState(false);
 
   const { latestGraphs, loading : graphsLoading, error : graphsError, refetch } = useGraphs(0);
+  const [getGraphData] = useLazyQuery<{ getGraphData: any }>(GET_GRAPH_DATA);
   const validGraphs =
     latestGraphs?.filter((graph) => graph !== null && graph !== undefined) ??
     [];
@@ -94,11 +102,12 @@ const GraphSideBar: React.FC<GraphSideBarProps> = ({
     setSubmit(false);
   };
 
-  const handleSelectGraph = (id: number) => {
+  const handleSelectGraph = async (id: number) => {
     setSelectedGraphId(id);
-    const graphData = latestGraphs.find((graph) => graph._id === id);
-    if (graphData) {
-      onGraphSelect(graphData);
+    // The graph list only holds metadata, so points are loaded on selection
+    const { data } = await getGraphData({ variables: { graphId: id } });
+    if (data?.getGraphData) {
+      onGraphSelect(data.getGraphData);
     }
   };
 
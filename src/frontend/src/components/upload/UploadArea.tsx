@@ -111,7 +111,7 @@ const UploadArea = memo(
               <input
                 id={inputId}
                 type="file"
-                accept=".csv, .xlsx"
+                accept=".csv, .xlsx, .parquet"
                 multiple
                 className="hidden"
                 onChange={handleBrowseFile}
@@ -129,7 +129,7 @@ const UploadArea = memo(
                     or click to browse
                   </p>
                   <div className="rounded-lg bg-blue-100 px-4 py-2 text-xs text-blue-600">
-                    Accepts .csv and .xlsx files
+                    Accepts .csv, .xlsx and .parquet files
                   </div>
                 </div>
               ) : (
@@ -1,5 +1,6 @@
 import { gql } from "@apollo/client";
 import axios from "axios";
+import { conditionalRequest } from "../utils/conditionalRequest";
 
 export const typeDefs = gql`
   scalar JSON
@@ -14,7 +15,8 @@ export const typeDefs = gql`
     getFilterCollectionData(attributes: [String!]!, collection: String!, dates: [String], analysis: Boolean): filterCollectionDataResponse
     getFilterCollectionDates(attribute: String!, collection: String!, filterValue: JSON!): [String!]!
     getFilterCollectionAttrValues(attribute: String!, collection: String!): [JSON]
-    getLastestGraph(latest:Int):[JSON]
+    getLastestGraph(latest:Int, includeData: Boolean):[JSON]
+    getGraphData(graphId: Int!): JSON
     }
     
     type Mutation {
@@ -125,10 +127,10 @@ export const resolvers = {
 
         getLastestGraph: async(
           _:undefined,
-          {latest}:{latest:Number}):Promise<any> => {
+          {latest, includeData}:{latest:Number, includeData?: Boolean}):Promise<any> => {
             try {
-              const response = await axios.post("http://127.0.0.1:8000/generatedGraphs/latest", {latest}, {
-                headers: { "Content-Type": "application/json" },
+              const response = await conditionalRequest("get", "http://127.0.0.1:8000/generatedGraphs/latest", undefined, {
+                params: { latest, includeData },
               });
               if (response.data) {
                 return response.data; 
@@ -143,6 +145,23 @@ export const resolvers = {
               throw new Error("Failed to fetch saved graph data.");
             }
           },
+
+        getGraphData: async(
+          _:undefined,
+          {graphId}:{graphId:number}):Promise<any> => {
+            try {
+              const response = await axios.post("http://127.0.0.1:8000/generatedGraphs/data", {graphId}, {
+                headers: { "Content-Type": "application/json" },
+              });
+              return response.data;
+            } catch (error) {
+              console.error(
+                "Error fetching saved graph points:",
+                error instanceof Error ? error.message : error
+              );
+              throw new Error("Failed to fetch saved graph points.");
+            }
+          },
   },
   Mutation: {
     addGeneratedGraphs: async(
@@ -1,6 +1,7 @@
 import { gql } from "@apollo/client";
 import axios from "axios";
 import { DataRow } from "../components/table/Table";
+import { conditionalRequest } from "../utils/conditionalRequest";
 
 export const typeDefs = gql`
   scalar JSON
@@ -17,8 +18,8 @@ export const resolvers = {
   Query: {
     getExperimentIds: async (): Promise<string[]> => {
       try {
-        const response = await axios.get<{ experimentIds: string[] }>(
-          "http://127.0.0.1:8000/experimentIds"
+        const response = await conditionalRequest<{ experimentIds: string[] }>(
+          "get", "http://127.0.0.1:8000/experimentIds"
         );
         return response.data.experimentIds;
       } catch (error) {
@@ -57,7 +58,7 @@ export const resolvers = {
 
     getExperiments: async (): Promise<Record<string, DataRow>[]> => {
       try {
-        const response = await axios.get("http://127.0.0.1:8000/experiments", {
+        const response = await conditionalRequest("get", "http://127.0.0.1:8000/experiments", undefined, {
           headers: { "Content-Type": "application/json" },
         });
         if (response.data.status === "success") {
@@ -76,7 +77,7 @@ export const resolvers = {
 
     getEfficiencies: async (): Promise<Record<string, DataRow>[]> => {
       try {
-        const response = await axios.get("http://127.0.0.1:8000/efficiencies", {
+        const response = await conditionalRequest("get", "http://127.0.0.1:8000/efficiencies", undefined, {
           headers: { "Content-Type": "application/json" },
         });
         if (response.data.status === "success") {
@@ -1,6 +1,7 @@
 import { gql } from "@apollo/client";
 import axios from "axios";
 import { DataRow } from "../components/table/Table";
+import { conditionalRequest } from "../utils/conditionalRequest";
 
 export const typeDefs = gql`
   scalar JSON
@@ -24,8 +25,8 @@ export const resolvers = {
   Query: {
     getColumnTypes: async (): Promise<Record<string, string>[]> =>  {
       try {
-        const response = await axios.get(
-          "http://127.0.0.1:8000/columntypes",
+        const response = await conditionalRequest(
+          "get", "http://127.0.0.1:8000/columntypes", undefined,
           { headers: { "Content-Type": "application/json" }}
         )
         if (response.data.status === "success") {
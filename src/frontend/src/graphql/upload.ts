@@ -17,7 +17,7 @@ export const typeDefs = gql`
 
   type AmbiguousData {
     dataId: String!
-    dataFile: Base64File
+    token: String!
     matchingExp: [String!]!
   }
 
@@ -33,6 +33,7 @@ export const typeDefs = gql`
       dataFiles: [Base64FileInput!]!
     ): UploadResponse!
     manualUpload(linkedData: [Base64FileInput!]!): UploadResponse!
+    resolveAmbiguous(token: String!, experimentId: String!): UploadResponse!
   }
 `;
 
@@ -44,7 +45,7 @@ export type Base64FileInput = {
 
 export type AmbiguousData = {
   dataId: string;
-  dataFile?: any;
+  token: string;
   matchingExp: string[];
 };
 
@@ -134,5 +135,30 @@ export const resolvers = {
         throw new Error("Failed to upload and process the files.");
       }
     },
+
+    resolveAmbiguous: async (
+      _: unknown,
+      { token, experimentId }: { token: string; experimentId: string }
+    ): Promise<UploadResponse> => {
+      try {
+        const response = await axios.post(
+          "http://127.0.0.1:8000/upload/resolve",
+          {
+            token,
+            experimentId,
+          },
+          {
+            headers: { "Content-Type": "application/json" },
+          }
+        );
+        return {
+          status: response.data.status,
+          message: response.data.message,
+          ambiguousData: [],
+        };
+      } catch (error) {
+        throw new Error("Failed to link the data file.");
+      }
+    },
   },
 };
@@ -0,0 +1,86 @@
+// -----------------------------------------------------------------------------
+// Primary Author: Jason T
+// Year: 2025
+// Component: useChangeFeed
+// Purpose: Custom hook subscribing to the backend's change feed.
+// -----------------------------------------------------------------------------
+
+import { useEffect, useRef, useState } from "react";
+import { ChangeEvent, EVENTS_URL } from "../utils/changeFeed";
+
+interface Listener {
+  collections: string[];
+  onChange: (event: ChangeEvent) => void;
+  onResync: () => void;
+  onStatus: (connected: boolean) => void;
+}
+
+// Every hook shares one connection; browsers allow few per origin
+const listeners = new Set<Listener>();
+let source: EventSource | null = null;
+let connected = false;
+
+const setStatus = (status: boolean) => {
+  connected = status;
+  listeners.forEach((listener) => listener.onStatus(status));
+};
+
+const openFeed = () => {
+  source = new EventSource(EVENTS_URL);
+  source.onopen = () => setStatus(true);
+  // The browser reconnects on its own, sending the last event ID
+  source.onerror = () => setStatus(false);
+  source.addEventListener("change", (message) => {
+    const event: ChangeEvent = JSON.parse((message as MessageEvent).data);
+    listeners.forEach((listener) => {
+      if (listener.collections.includes(event.collection)) listener.onChange(event);
+    });
+  });
+  source.addEventListener("resync", () =>
+    listeners.forEach((listener) => listener.onResync())
+  );
+};
+
+const closeFeed = () => {
+  source?.close();
+  source = null;
+  connected = false;
+};
+
+// Calls onChange for each change to the given collections, and onResync when
+// events were missed and the data should be reloaded. Returns whether the feed
+// is connected, so callers can fall back to refetching while it is not.
+const useChangeFeed = (
+  collections: string[],
+  onChange: (event: ChangeEvent) => void,
+  onResync: () => void
+) => {
+  const [isConnected, setIsConnected] = useState(connected);
+  const handlers = useRef({ onChange, onResync });
+  handlers.current = { onChange, onResync };
+
+  const collectionList = collections.join(",");
+
+  useEffect(() => {
+    if (typeof EventSource === "undefined") return;
+
+    const listener: Listener = {
+      collections: collectionList.split(","),
+      onChange: (event) => handlers.current.onChange(event),
+      onResync: () => handlers.current.onResync(),
+      onStatus: setIsConnected,
+    };
+    listeners.add(listener);
+    if (!source) openFeed();
+    setIsConnected(connected);
+
+    return () => {
+      listeners.delete(listener);
+      if (listeners.size === 0) closeFeed();
+    };
+  }, [collectionList]);
+
+  return isConnected;
+};
+
+export default useChangeFeed;
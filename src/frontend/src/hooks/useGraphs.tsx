@@ -6,6 +6,8 @@
 // -----------------------------------------------------------------------------
 
 import { gql, useQuery } from "@apollo/client";
+import useChangeFeed from "./useChangeFeed";
+import { applyChange, ChangeEvent } from "../utils/changeFeed";
 
 const GET_GRAPH = gql`
   query GetLastestGraph($latest: Int) {
@@ -13,17 +15,52 @@ const GET_GRAPH = gql`
   }
 `;
 
-const useGraphs = (latestNum: number) => {
-  const { data: generatedGraphData, loading, error, refetch } = useQuery<{ getLastestGraph: any[] }>(
-    GET_GRAPH,
+const GET_GRAPH_WITH_DATA = gql`
+  query GetLastestGraphWithData($latest: Int, $includeData: Boolean) {
+    getLastestGraph(latest: $latest, includeData: $includeData)
+  }
+`;
+
+// Graph points are only fetched when includeData is set; otherwise only the
+// metadata of each saved graph is returned.
+const useGraphs = (latestNum: number, includeData: boolean = false) => {
+  const { data: generatedGraphData, loading, error, refetch, updateQuery } = useQuery<{ getLastestGraph: any[] }>(
+    includeData ? GET_GRAPH_WITH_DATA : GET_GRAPH,
     {
-      variables: { latest: latestNum },
+      variables: includeData
+        ? { latest: latestNum, includeData }
+        : { latest: latestNum },
     }
   );
 
+  // Saved and removed graphs are patched in; graphs are listed newest first
+  const handleChange = (event: ChangeEvent) => {
+    // Pushed graphs carry metadata only, so lists with points are reloaded
+    if (includeData) {
+      refetch();
+      return;
+    }
+    updateQuery((prev) => {
+      if (!prev?.getLastestGraph) return prev;
+      const graphs = applyChange(prev.getLastestGraph, event)
+        .sort((a, b) => Number(b._id) - Number(a._id));
+      return {
+        ...prev,
+        getLastestGraph: latestNum > 0 ? graphs.slice(0, latestNum) : graphs,
+      };
+    });
+  };
+
+  const live = useChangeFeed(["graphs"], handleChange, () => refetch());
+
   const latestGraphs = generatedGraphData?.getLastestGraph ?? [];
 
-  return { latestGraphs, loading, error, refetch }
+  // Refetching after a mutation is only needed while the feed is down
+  const refetchUnlessLive = () => {
+    if (!live) refetch();
+  };
+
+  return { latestGraphs, loading, error, refetch: refetchUnlessLive }
 };
 
 export default useGraphs;
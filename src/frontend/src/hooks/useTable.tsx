@@ -8,6 +8,8 @@
 import { useState, useMemo } from "react";
 import { useQuery, gql } from "@apollo/client";
 import { DataRow } from "../components/table/Table";
+import useChangeFeed from "./useChangeFeed";
+import { applyChange, ChangeEvent } from "../utils/changeFeed";
 
 const GET_EXPERIMENT_IDS = gql`
   query GetExperimentIds {
@@ -45,6 +47,7 @@ const useTable = (defaultExperiment: string) => {
     loading: dataLoading,
     error: dataError,
     refetch: refetchData,
+    updateQuery: updateData,
   } = useQuery<{ getData: DataRow[] }>(GET_DATA, {
     variables: { experimentId: selectedExperiment },
     skip: selectedExperiment === "Experiment Log" || selectedExperiment === "Efficiency Calculations",
@@ -55,6 +58,7 @@ const useTable = (defaultExperiment: string) => {
     loading: experimentsLoading,
     error: experimentsError,
     refetch: refetchExperiments,
+    updateQuery: updateExperiments,
   } = useQuery<{ getExperiments: DataRow[] }>(GET_EXPERIMENTS, {
     skip: selectedExperiment !== "Experiment Log",
   });
@@ -64,10 +68,48 @@ const useTable = (defaultExperiment: string) => {
     loading: efficienciesLoading,
     error: efficienciesError,
     refetch: refetchEfficiencies,
+    updateQuery: updateEfficiencies,
   } = useQuery<{ getEfficiencies: DataRow[] }>(GET_EFFICIENCIES, {
       skip: selectedExperiment !== "Efficiency Calculations"
   })
 
+  // Changes pushed by the backend patch the cached results in place
+  const handleChange = (event: ChangeEvent) => {
+    if (event.collection === "experiments") {
+      updateExperiments((prev) =>
+        prev?.getExperiments
+          ? { ...prev, getExperiments: applyChange(prev.getExperiments, event) }
+          : prev
+      );
+    } else if (event.collection === "efficiencies") {
+      updateEfficiencies((prev) =>
+        prev?.getEfficiencies
+          ? { ...prev, getEfficiencies: applyChange(prev.getEfficiencies, event) }
+          : prev
+      );
+    } else if (event.collection === "data" && event.experimentId === selectedExperiment) {
+      // Imports only report a row count, so the open sheet is reloaded
+      refetchData();
+    }
+  };
+
+  const handleResync = () => {
+    refetchData();
+    refetchExperiments();
+    refetchEfficiencies();
+  };
+
+  const live = useChangeFeed(
+    ["experiments", "efficiencies", "data"],
+    handleChange,
+    handleResync
+  );
+
+  // Refetching after a mutation is only needed while the feed is down
+  const refetchUnlessLive = (refetch: () => unknown) => () => {
+    if (!live) refetch();
+  };
+
   const ids = experimentIds?.getExperimentIds ?? [];
   const experiments = experimentsResponse?.getExperiments ?? [];
   const data = dataResponse?.getData ?? [];
@@ -117,9 +159,9 @@ const useTable = (defaultExperiment: string) => {
     sortedData,
     tableName,
     handleSelectExperiment,
-    refetchData,
-    refetchExperiments,
-    refetchEfficiencies,
+    refetchData: refetchUnlessLive(refetchData),
+    refetchExperiments: refetchUnlessLive(refetchExperiments),
+    refetchEfficiencies: refetchUnlessLive(refetchEfficiencies),
   };
 };
 
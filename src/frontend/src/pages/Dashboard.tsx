@@ -17,7 +17,7 @@ import { useNavigate } from "react-router-dom";
 const Dashboard = () => {
   const { sortedData, tableName, refetchData, refetchExperiments, refetchEfficiencies } = useTable("Efficiency Calculations");
 
-  const { latestGraphs, loading, error } = useGraphs(3);
+  const { latestGraphs, loading, error } = useGraphs(3, true);
   const validGraphs = useMemo(
     () =>
       latestGraphs?.filter((graph) => graph !== null && graph !== undefined) ??
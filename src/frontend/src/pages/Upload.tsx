@@ -17,11 +17,7 @@ import ArrowForwardIcon from "@mui/icons-material/ArrowForward";
 
 type AmbiguousData = {
   dataId: string;
-  dataFile?: {
-    filename: string;
-    mimetype: string;
-    content: string;
-  };
+  token: string;
   matchingExp: string[];
 };
 
@@ -39,11 +35,7 @@ const UPLOAD = gql`
       message
       ambiguousData {
         dataId
-        dataFile {
-          filename
-          mimetype
-          content
-        }
+        token
         matchingExp
       }
     }
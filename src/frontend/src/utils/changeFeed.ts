@@ -0,0 +1,56 @@
+// -----------------------------------------------------------------------------
+// Primary Author: Jason T
+// Year: 2025
+// Purpose: Types and helpers for the backend's /events change feed, used to
+// patch cached query results instead of refetching whole collections.
+// -----------------------------------------------------------------------------
+
+export const EVENTS_URL = "http://127.0.0.1:8000/events";
+
+type Row = Record<string, unknown>;
+
+export interface ChangeEvent {
+  id: string;
+  collection: string;
+  operation: "insert" | "update" | "replace" | "delete";
+  key?: string;
+  // Rows for insert and replace
+  documents?: Row[];
+  // Rows targeted by update and delete; null means every row
+  ids?: unknown[] | null;
+  set?: Row;
+  unset?: string[];
+  // Summary of imported data rows
+  experimentId?: string;
+  count?: number;
+}
+
+/**
+ * Applies a change event to a list of rows and returns the patched list.
+ * Inserted and replaced rows overwrite rows with the same key.
+ */
+export function applyChange<T extends Row>(rows: T[], event: ChangeEvent): T[] {
+  const key = event.key ?? "_id";
+  const targets = event.ids ? new Set(event.ids) : null;
+  const isTarget = (row: T) => targets === null || targets.has(row[key]);
+
+  switch (event.operation) {
+    case "insert":
+    case "replace": {
+      const documents = (event.documents ?? []) as T[];
+      const incoming = new Set(documents.map((document) => document[key]));
+      return [...rows.filter((row) => !incoming.has(row[key])), ...documents];
+    }
+    case "update":
+      return rows.map((row) => {
+        if (!isTarget(row)) return row;
+        const updated: Row = { ...row, ...event.set };
+        (event.unset ?? []).forEach((field) => delete updated[field]);
+        return updated as T;
+      });
+    case "delete":
+      return rows.filter((row) => !isTarget(row));
+    default:
+      return rows;
+  }
+}
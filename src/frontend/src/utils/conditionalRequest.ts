@@ -0,0 +1,59 @@
+// -----------------------------------------------------------------------------
+// Primary Author: Jason T
+// Year: 2025
+// Purpose: Conditional requests to the backend's slowly-changing endpoints,
+// revalidating cached responses with their ETag instead of refetching them.
+// -----------------------------------------------------------------------------
+
+import axios, { AxiosRequestConfig, AxiosResponse } from "axios";
+
+interface CachedResponse {
+  etag: string;
+  data: unknown;
+}
+
+// Last tagged response per method, URL, query parameters and body
+const cache = new Map<string, CachedResponse>();
+
+/**
+ * Sends a request with the ETag of the last response to the same request.
+ * When the backend answers 304 Not Modified, the cached body is returned
+ * as a 200 response, so callers handle both cases the same way.
+ */
+export async function conditionalRequest<T = any>(
+  method: "get" | "post",
+  url: string,
+  body?: unknown,
+  config: AxiosRequestConfig = {}
+): Promise<AxiosResponse<T>> {
+  const key = [
+    method,
+    url,
+    JSON.stringify(config.params ?? {}),
+    body === undefined ? "" : JSON.stringify(body),
+  ].join(" ");
+  const cached = cache.get(key);
+
+  const response = await axios.request<T>({
+    ...config,
+    method,
+    url,
+    data: body,
+    headers: {
+      ...config.headers,
+      ...(cached ? { "If-None-Match": cached.etag } : {}),
+    },
+    validateStatus: (status) => (status >= 200 && status < 300) || status === 304,
+  });
+
+  if (response.status === 304 && cached) {
+    return { ...response, status: 200, data: cached.data as T };
+  }
+  const etag = response.headers["etag"];
+  if (etag) {
+    cache.set(key, { etag, data: response.data });
+  } else {
+    cache.delete(key);
+  }
+  return response;
+}